@@ -0,0 +1,68 @@
+"""
+一括作成エンドポイントのベンチマーク
+POST /api/items を1件ずつ呼ぶ場合と POST /api/items/bulk の登録スループットを比較する
+
+実行方法（リポジトリルートから）:
+    python -m modules.api.benchmarks.bench_bulk --count 5000
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from ..main import app
+from ..storage.memory import InMemoryItemStorage
+from ..storage.provider import set_storage
+
+PAYLOAD = {"name": "ベンチマーク", "description": "ベンチマーク用のアイテム"}
+
+
+def _report(label: str, count: int, elapsed: float) -> None:
+    print(f"  {label:<16} {count / elapsed:>10.0f} items/s {elapsed:>8.3f} s")
+
+
+async def run(count: int, batch_sizes: list[int]) -> None:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        set_storage(InMemoryItemStorage())
+        start = time.perf_counter()
+        for _ in range(count):
+            response = await client.post("/api/items", json=PAYLOAD)
+            assert response.status_code == 201
+        _report("single", count, time.perf_counter() - start)
+
+        for batch_size in batch_sizes:
+            set_storage(InMemoryItemStorage())
+            batch = [PAYLOAD] * batch_size
+            start = time.perf_counter()
+            for _ in range(count // batch_size):
+                response = await client.post("/api/items/bulk", json=batch)
+                assert response.status_code == 201
+            created = count // batch_size * batch_size
+            _report(f"bulk x{batch_size}", created, time.perf_counter() - start)
+
+    set_storage(None)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=2000, help="登録件数")
+    parser.add_argument(
+        "--batch-sizes",
+        type=int,
+        nargs="+",
+        default=[10, 100, 1000],
+        help="一括作成1回あたりの件数",
+    )
+    args = parser.parse_args()
+
+    print("create throughput (memory):")
+    asyncio.run(run(args.count, args.batch_sizes))
+
+
+if __name__ == "__main__":
+    main()
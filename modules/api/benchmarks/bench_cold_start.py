@@ -0,0 +1,115 @@
+"""
+コールドスタート時の初期化時間のベンチマーク
+同じ件数のデータを用意するまでの時間を、APIで投入する場合と
+スナップショット（APP_SNAPSHOT_PATH）を読み込む場合で比較する
+
+- empty:    データなし（アプリのインポートのみ）
+- api:      POST /api/items/bulk で投入
+- snapshot: mmapしたスナップショットを読み込み（レコードは初回アクセス時に復元）
+
+実行方法（リポジトリルートから）:
+    python -m modules.api.benchmarks.bench_cold_start --counts 10000 100000
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from ..storage.record import ItemRecord, now_micros
+from ..storage.snapshot import write_snapshot
+
+BULK_SIZE = 1000
+
+
+def _build_snapshot(path: str, count: int) -> None:
+    created_at = now_micros()
+    records = [
+        ItemRecord(i, f"アイテム{i}", f"アイテム{i}の説明です", created_at)
+        for i in range(1, count + 1)
+    ]
+    write_snapshot(path, records, wal_segment=1)
+
+
+async def _seed_through_api(app, count: int) -> None:
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as c:
+        for start in range(0, count, BULK_SIZE):
+            payload = [
+                {"name": f"アイテム{i}", "description": f"アイテム{i}の説明です"}
+                for i in range(start + 1, min(start + BULK_SIZE, count) + 1)
+            ]
+            response = await c.post("/api/items/bulk", json=payload)
+            assert response.status_code == 201
+
+
+async def _first_request(app, item_id: int) -> float:
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as c:
+        start = time.perf_counter()
+        response = await c.get(f"/api/items/{item_id}")
+        elapsed = time.perf_counter() - start
+    assert response.status_code in (200, 404)
+    return elapsed
+
+
+def run_child(mode: str, path: str, count: int) -> None:
+    """子プロセスとして1パターンを計測し、初期化時間と初回リクエスト時間を出力する"""
+    start = time.perf_counter()
+    if mode == "snapshot":
+        os.environ["APP_SNAPSHOT_PATH"] = path
+
+    from ..main import app
+    from ..storage.provider import get_storage
+
+    get_storage()
+    if mode == "api":
+        asyncio.run(_seed_through_api(app, count))
+    init = time.perf_counter() - start
+
+    first = asyncio.run(_first_request(app, count // 2 or 1))
+    print(init, first)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--counts", type=int, nargs="+", default=[10_000, 100_000], help="件数"
+    )
+    parser.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child[0], args.child[1], int(args.child[2]))
+        return
+
+    print(f"  {'items':>10} {'mode':<9} {'init ms':>10} {'first req ms':>13}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for count in args.counts:
+            path = os.path.join(tmp_dir, f"snapshot-{count}.bin")
+            _build_snapshot(path, count)
+            for mode in ("empty", "api", "snapshot"):
+                # 計測ごとにプロセスを分けて、インポート済みモジュールの影響を除く
+                output = subprocess.run(
+                    [sys.executable, "-m", __spec__.name, "--child", mode, path]
+                    + [str(count)],
+                    check=True,
+                    capture_output=True,
+                    text=True,
+                ).stdout
+                init, first = map(float, output.strip().splitlines()[-1].split())
+                print(
+                    f"  {count:>10} {mode:<9} {init * 1000:>10.1f}"
+                    f" {first * 1000:>13.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+アイテム作成のリクエストボディの検証のベンチマーク
+FastAPIのボディ引数（json.loads → 検証）と高速な経路を、ペイロードの大きさごとに比較する
+
+- decode: ボディのバイト列からItemCreateを作るまでの時間
+  （json.loads / PydanticのJSONパーサー / orjson（高速な経路で使う））
+- endpoint: ストレージを使わないエンドポイントへのPOSTの1リクエストあたりのCPU時間
+
+実行方法（リポジトリルートから）:
+    python -m modules.api.benchmarks.bench_decode --iterations 100000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+import orjson
+from fastapi import Depends, FastAPI
+
+from ..models.schemas import ItemCreate
+from ..routers.items import item_create_body
+
+PAYLOADS = {
+    "small": {"name": "ノートPC", "description": "14インチ・16GBメモリ"},
+    "typical": {
+        "name": "ワイヤレスイヤホン Pro 第2世代",
+        "description": "ノイズキャンセリング対応。" * 8,
+    },
+    "max": {"name": "名" * 100, "description": "説" * 500},
+}
+
+
+def _fastapi_decode(body: bytes) -> ItemCreate:
+    return ItemCreate.model_validate(json.loads(body), from_attributes=True)
+
+
+def _fast_decode(body: bytes) -> ItemCreate:
+    return ItemCreate.model_validate(orjson.loads(body), from_attributes=True)
+
+
+def _pydantic_decode(body: bytes) -> ItemCreate:
+    return ItemCreate.model_validate_json(body)
+
+
+def _time_per_call(decode, body: bytes, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        decode(body)
+    return (time.perf_counter() - start) / iterations
+
+
+def _endpoint_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/body")
+    async def body_parameter(item: ItemCreate) -> None:
+        return None
+
+    @app.post("/fast")
+    async def fast_decode(item: ItemCreate = Depends(item_create_body)) -> None:
+        return None
+
+    return app
+
+
+async def _endpoint_cpu(
+    client: httpx.AsyncClient, path: str, body: bytes, requests: int
+) -> float:
+    headers = {"content-type": "application/json"}
+    start = time.process_time()
+    for _ in range(requests):
+        response = await client.post(path, content=body, headers=headers)
+        assert response.status_code == 200
+    return (time.process_time() - start) / requests
+
+
+async def run(iterations: int, requests: int) -> None:
+    transport = httpx.ASGITransport(app=_endpoint_app())
+    print(
+        f"  {'payload':<8} {'bytes':>6} {'json.loads µs':>14} {'pydantic µs':>12}"
+        f" {'orjson µs':>10} {'endpoint body µs':>17} {'fast µs':>8}"
+    )
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        for label, payload in PAYLOADS.items():
+            body = json.dumps(payload, ensure_ascii=False).encode()
+            assert _fastapi_decode(body) == _fast_decode(body)
+            slow = _time_per_call(_fastapi_decode, body, iterations)
+            pydantic = _time_per_call(_pydantic_decode, body, iterations)
+            fast = _time_per_call(_fast_decode, body, iterations)
+            await _endpoint_cpu(client, "/body", body, 100)
+            await _endpoint_cpu(client, "/fast", body, 100)
+            slow_endpoint = await _endpoint_cpu(client, "/body", body, requests)
+            fast_endpoint = await _endpoint_cpu(client, "/fast", body, requests)
+            print(
+                f"  {label:<8} {len(body):>6} {slow * 1e6:>14.2f}"
+                f" {pydantic * 1e6:>12.2f} {fast * 1e6:>10.2f}"
+                f" {slow_endpoint * 1e6:>17.1f} {fast_endpoint * 1e6:>8.1f}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--iterations", type=int, default=100_000, help="検証の計測回数"
+    )
+    parser.add_argument(
+        "--requests", type=int, default=3000, help="エンドポイントの計測回数"
+    )
+    args = parser.parse_args()
+
+    asyncio.run(run(args.iterations, args.requests))
+
+
+if __name__ == "__main__":
+    main()
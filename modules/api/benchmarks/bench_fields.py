@@ -0,0 +1,101 @@
+"""
+フィールドの絞り込み（fields=）のベンチマーク
+GET /api/items の1リクエストあたりのレスポンスサイズとCPU時間を
+全フィールドの場合と fields=id,name の場合で比較する
+
+実行方法（リポジトリルートから）:
+    python -m modules.api.benchmarks.bench_fields --items 10000 --limit 1000
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from ..main import app
+from ..storage.memory import InMemoryItemStorage
+from ..storage.provider import set_storage
+
+BULK_SIZE = 1000
+# 説明は最大長（500文字）にする
+DESCRIPTION = "説明" * 250
+VARIANTS = [
+    ("all", None),
+    ("id,name", "id,name"),
+    ("id", "id"),
+]
+
+
+async def _seed(client: httpx.AsyncClient, items: int) -> None:
+    for start in range(0, items, BULK_SIZE):
+        payload = [
+            {"name": f"アイテム{i}", "description": DESCRIPTION}
+            for i in range(start, min(start + BULK_SIZE, items))
+        ]
+        response = await client.post("/api/items/bulk", json=payload)
+        assert response.status_code == 201
+
+
+async def _measure(
+    client: httpx.AsyncClient, fields: str | None, limit: int, requests: int
+) -> tuple[float, float, int]:
+    """(1リクエストあたりのCPU時間, 経過時間, レスポンスのバイト数)を返す"""
+    params: dict[str, str | int] = {"limit": limit}
+    if fields is not None:
+        params["fields"] = fields
+    size = 0
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    for _ in range(requests):
+        response = await client.get("/api/items", params=params)
+        assert response.status_code == 200
+        size = len(response.content)
+    cpu = (time.process_time() - cpu_start) / requests
+    wall = (time.perf_counter() - wall_start) / requests
+    return cpu, wall, size
+
+
+async def run(items: int, limit: int, requests: int) -> None:
+    set_storage(InMemoryItemStorage())
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        await _seed(client, items)
+        # ウォームアップ
+        await _measure(client, None, limit, 3)
+
+        print(
+            f"  {'fields':<9} {'bytes/req':>10} {'cpu ms/req':>11} {'wall ms/req':>12}"
+        )
+        baseline_cpu = baseline_size = 0.0
+        for label, fields in VARIANTS:
+            cpu, wall, size = await _measure(client, fields, limit, requests)
+            if fields is None:
+                baseline_cpu, baseline_size = cpu, size
+            saved = (
+                f"  (-{(1 - size / baseline_size) * 100:.0f}% bytes,"
+                f" -{(1 - cpu / baseline_cpu) * 100:.0f}% cpu)"
+                if fields is not None
+                else ""
+            )
+            print(
+                f"  {label:<9} {size:>10} {cpu * 1000:>11.2f} {wall * 1000:>12.2f}"
+                + saved
+            )
+
+    set_storage(None)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=10_000, help="アイテム件数")
+    parser.add_argument("--limit", type=int, default=1000, help="1ページの件数")
+    parser.add_argument("--requests", type=int, default=50, help="計測回数")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.items, args.limit, args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Idempotency-Keyのベンチマーク
+POST /api/items の1リクエストあたりのCPU時間を、キーなし・キーありの初回・
+再送（保存済みのレスポンスを返す）で比較し、キャッシュのヒット率と使用メモリを表示する
+
+--retry-rateの割合のリクエストを、直前に送ったキーのいずれかで再送する。
+--sharedを指定するとSQLiteファイルで共有するキャッシュ（sqlite・sharedバックエンド）を使う。
+
+実行方法（リポジトリルートから）:
+    python -m modules.api.benchmarks.bench_idempotency --requests 5000 --retry-rate 0.2
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from ..main import app
+from ..storage.memory import InMemoryItemStorage
+from ..storage.provider import get_idempotency_cache, set_storage
+
+PAYLOAD = {"name": "アイテム", "description": "説明" * 100}
+
+
+async def _measure(
+    client: httpx.AsyncClient, headers: list[dict[str, str]]
+) -> tuple[float, int]:
+    """(1リクエストあたりのCPU時間, 再送として返されたレスポンス数)を返す"""
+    replayed = 0
+    start = time.process_time()
+    for header in headers:
+        response = await client.post("/api/items", json=PAYLOAD, headers=header)
+        assert response.status_code == 201
+        replayed += "idempotent-replayed" in response.headers
+    return (time.process_time() - start) / len(headers), replayed
+
+
+def _keys(count: int, retry_rate: float) -> list[dict[str, str]]:
+    """retry_rateの割合で、直近100件のいずれかのキーを再送するキーの列"""
+    rng = random.Random(1)
+    keys: list[str] = []
+    for i in range(count):
+        if keys and rng.random() < retry_rate:
+            keys.append(rng.choice(keys[-100:]))
+        else:
+            keys.append(f"key-{i}")
+    return [{"Idempotency-Key": key} for key in keys]
+
+
+async def run(requests: int, retry_rate: float, shared: bool) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        if shared:
+            # キャッシュの選択のみsqliteバックエンドと同じにする（アイテムはインメモリ）
+            os.environ["APP_STORAGE_BACKEND"] = "sqlite"
+            os.environ["APP_IDEMPOTENCY_PATH"] = str(Path(directory) / "idem.db")
+        set_storage(InMemoryItemStorage())
+        cache = get_idempotency_cache()
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench"
+        ) as client:
+            # ウォームアップ
+            await _measure(client, [{}] * 100)
+
+            plain, _ = await _measure(client, [{}] * requests)
+            unique, _ = await _measure(
+                client, [{"Idempotency-Key": f"first-{i}"} for i in range(requests)]
+            )
+            replay, _ = await _measure(
+                client, [{"Idempotency-Key": f"first-{i}"} for i in range(requests)]
+            )
+            cache.hits = cache.misses = 0
+            mixed, replayed = await _measure(client, _keys(requests, retry_rate))
+
+        print(f"  cache: {type(cache).__name__}")
+        print(f"  {'requests':<20} {'cpu ms/req':>11}")
+        for label, cpu in (
+            ("no key", plain),
+            ("key (first)", unique),
+            ("key (replay)", replay),
+            (f"retry {retry_rate:.0%}", mixed),
+        ):
+            print(f"  {label:<20} {cpu * 1000:>11.3f}")
+
+        stats = cache.stats()
+        print(
+            f"  retry mix: {replayed}/{requests} replayed,"
+            f" hit rate {stats['hit_rate']:.1%},"
+            f" {stats['entries']} entries, {stats['bytes'] / 1024:.0f} KiB"
+        )
+        set_storage(None)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000, help="計測回数")
+    parser.add_argument(
+        "--retry-rate", type=float, default=0.2, help="再送するリクエストの割合"
+    )
+    parser.add_argument(
+        "--shared", action="store_true", help="SQLiteファイルで共有するキャッシュを使う"
+    )
+    args = parser.parse_args()
+
+    asyncio.run(run(args.requests, args.retry_rate, args.shared))
+
+
+if __name__ == "__main__":
+    main()
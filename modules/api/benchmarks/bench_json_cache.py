@@ -0,0 +1,124 @@
+"""
+アイテムのJSONキャッシュのベンチマーク
+読み出し中心のワークロードで、キャッシュあり・なし（APP_JSON_CACHE_BYTES=0）の
+1リクエストあたりのCPU時間を比較する
+
+- detail: GET /api/items/{id}（人気の偏りがあるランダムなID）
+- list: GET /api/items?limit=100（ランダムなページ）
+- mixed: detail 90%・list 5%・更新 5%
+
+実行方法（リポジトリルートから）:
+    python -m modules.api.benchmarks.bench_json_cache --items 10000 --requests 5000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+
+import httpx
+
+from ..main import app
+from ..routers.items import encode_cursor
+from ..storage.memory import InMemoryItemStorage
+from ..storage.provider import get_json_cache, set_storage
+
+BULK_SIZE = 1000
+PAGE_SIZE = 100
+DESCRIPTION = "説明" * 100
+WORKLOADS = ["detail", "list", "mixed"]
+
+
+async def _seed(client: httpx.AsyncClient, items: int) -> None:
+    for start in range(0, items, BULK_SIZE):
+        payload = [
+            {"name": f"アイテム{i}", "description": DESCRIPTION}
+            for i in range(start, min(start + BULK_SIZE, items))
+        ]
+        response = await client.post("/api/items/bulk", json=payload)
+        assert response.status_code == 201
+
+
+def _requests(workload: str, items: int, count: int) -> list[tuple[str, str, dict]]:
+    """(メソッド, パス, パラメータ)の一覧を作る。IDは小さいほど選ばれやすくする"""
+    rng = random.Random(1)
+    requests = []
+    for _ in range(count):
+        kind = workload
+        if workload == "mixed":
+            kind = rng.choices(["detail", "list", "update"], [90, 5, 5])[0]
+        item_id = min(items, int(rng.paretovariate(1.2)))
+        if kind == "detail":
+            requests.append(("GET", f"/api/items/{item_id}", {}))
+        elif kind == "list":
+            page = rng.randrange(items // PAGE_SIZE)
+            params: dict = {"limit": PAGE_SIZE}
+            if page:
+                params["cursor"] = encode_cursor(page * PAGE_SIZE)
+            requests.append(("GET", "/api/items", params))
+        else:
+            requests.append(("PUT", f"/api/items/{item_id}", {}))
+    return requests
+
+
+async def _measure(
+    client: httpx.AsyncClient, requests: list[tuple[str, str, dict]]
+) -> float:
+    """1リクエストあたりのCPU時間を返す"""
+    start = time.process_time()
+    for method, path, params in requests:
+        if method == "GET":
+            response = await client.get(path, params=params)
+        else:
+            response = await client.put(path, json={"name": "更新"})
+        assert response.status_code == 200
+    return (time.process_time() - start) / len(requests)
+
+
+async def run(items: int, requests: int) -> None:
+    transport = httpx.ASGITransport(app=app)
+    print(
+        f"  {'workload':<8} {'cache':<5} {'cpu ms/req':>11} {'hit rate':>9} {'MiB':>7}"
+    )
+    for workload in WORKLOADS:
+        planned = _requests(workload, items, requests)
+        baseline = 0.0
+        for cache_bytes in ("0", None):
+            if cache_bytes is None:
+                os.environ.pop("APP_JSON_CACHE_BYTES", None)
+            else:
+                os.environ["APP_JSON_CACHE_BYTES"] = cache_bytes
+            set_storage(InMemoryItemStorage())
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://bench"
+            ) as client:
+                await _seed(client, items)
+                cache = get_json_cache()
+                cache.hits = cache.misses = 0
+                cpu = await _measure(client, planned)
+
+            stats = cache.stats()
+            label = "off" if cache_bytes == "0" else "on"
+            speedup = f"  (x{baseline / cpu:.2f})" if cache_bytes is None else ""
+            baseline = cpu
+            print(
+                f"  {workload:<8} {label:<5} {cpu * 1000:>11.3f}"
+                f" {stats['hit_rate']:>9.1%} {stats['bytes'] / 2**20:>7.1f}" + speedup
+            )
+
+    os.environ.pop("APP_JSON_CACHE_BYTES", None)
+    set_storage(None)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=10_000, help="アイテム件数")
+    parser.add_argument("--requests", type=int, default=5000, help="リクエスト数")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.items, args.requests))
+
+
+if __name__ == "__main__":
+    main()
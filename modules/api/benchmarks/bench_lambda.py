@@ -0,0 +1,123 @@
+"""
+Lambdaハンドラーの呼び出しごとのオーバーヘッドのベンチマーク
+API Gatewayのイベントを作ってハンドラーを直接呼び出し、1回あたりの時間を比較する
+
+- rebuild: 呼び出しごとにMangumのアダプターを作る（変更前の lambda_handler）
+- reuse:   初期化フェーズで作ったアダプターを使い回す（現在の lambda_handler）
+
+ネットワーク・Lambdaのランタイムは含まない。差がウォームな呼び出しごとに
+節約できる時間になる。
+
+実行方法（リポジトリルートから）:
+    python -m modules.api.benchmarks.bench_lambda --invocations 2000
+"""
+
+import argparse
+import json
+import statistics
+import time
+from collections.abc import Callable
+from typing import Any
+
+from ..main import app, lambda_handler
+from ..storage.memory import InMemoryItemStorage
+from ..storage.provider import set_storage
+
+
+def _event(method: str, path: str, body: Any = None) -> dict:
+    """API Gateway（REST API、プロキシ統合）のイベント"""
+    return {
+        "resource": "/{proxy+}",
+        "path": path,
+        "httpMethod": method,
+        "headers": {"Host": "example.com", "Content-Type": "application/json"},
+        "multiValueHeaders": {},
+        "queryStringParameters": None,
+        "multiValueQueryStringParameters": None,
+        "requestContext": {
+            "resourcePath": "/{proxy+}",
+            "httpMethod": method,
+            "path": path,
+            "stage": "prod",
+            "identity": {"sourceIp": "127.0.0.1"},
+        },
+        "body": json.dumps(body) if body is not None else None,
+        "isBase64Encoded": False,
+    }
+
+
+EVENTS = {
+    "GET /health": _event("GET", "/health"),
+    "GET /api/items/1": _event("GET", "/api/items/1"),
+    "POST /api/items": _event(
+        "POST", "/api/items", {"name": "アイテム", "description": "説明"}
+    ),
+}
+
+
+def _rebuild_handler(event, context):
+    """変更前の lambda_handler（呼び出しごとにアダプターを作る）"""
+    from mangum import Mangum
+
+    handler = Mangum(app, lifespan="off")
+    return handler(event, context)
+
+
+HANDLERS: dict[str, Callable[[dict, Any], dict]] = {
+    "rebuild": _rebuild_handler,
+    "reuse": lambda_handler,
+}
+
+
+def _measure(event: dict, n: int) -> dict[str, list[float]]:
+    """ハンドラーを交互に呼び出し、ハンドラーごとの1回あたりの秒数を返す"""
+    timings: dict[str, list[float]] = {mode: [] for mode in HANDLERS}
+    for _ in range(n):
+        for mode, handler in HANDLERS.items():
+            start = time.perf_counter()
+            response = handler(event, None)
+            timings[mode].append(time.perf_counter() - start)
+            assert response["statusCode"] < 300, response
+    return timings
+
+
+def _measure_build(n: int) -> float:
+    """アダプターの作成だけにかかる1回あたりの秒数"""
+    from mangum import Mangum
+
+    start = time.perf_counter()
+    for _ in range(n):
+        Mangum(app, lifespan="off")
+    return (time.perf_counter() - start) / n
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--invocations", type=int, default=2000, help="イベントごとの呼び出し回数"
+    )
+    args = parser.parse_args()
+
+    set_storage(InMemoryItemStorage())
+    lambda_handler(EVENTS["POST /api/items"], None)
+
+    print(
+        f"  {'event':<18} {'handler':<8} {'mean us':>9} {'p50 us':>9} {'saved us':>9}"
+    )
+    for name, event in EVENTS.items():
+        # ウォームアップ
+        _measure(event, 50)
+        results = _measure(event, args.invocations)
+        baseline = statistics.median(results["rebuild"])
+        for mode, timings in results.items():
+            p50 = statistics.median(timings)
+            print(
+                f"  {name:<18} {mode:<8} {statistics.fmean(timings) * 1e6:>9.1f}"
+                f" {p50 * 1e6:>9.1f} {(baseline - p50) * 1e6:>9.1f}"
+            )
+    print(f"  Mangum(app) build: {_measure_build(args.invocations) * 1e6:.1f} us")
+    set_storage(None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+インメモリストレージのメモリ使用量（RSS）ベンチマーク
+ECSタスクのメモリ見積もり用に、件数ごとのRSS増加量を計測する
+
+- record: 現在の実装（__slots__のItemRecord + エポックマイクロ秒）
+- dict:   従来の実装（dict + datetime）
+
+実行方法（リポジトリルートから）:
+    python -m modules.api.benchmarks.bench_memory --counts 100000 1000000
+"""
+
+import argparse
+import asyncio
+import resource
+import subprocess
+import sys
+from datetime import UTC, datetime
+
+from ..storage.memory import InMemoryItemStorage
+
+BATCH_SIZE = 10_000
+
+
+def _max_rss_bytes() -> int:
+    # Linuxではru_maxrssの単位はKB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _item(i: int) -> tuple[str, str]:
+    # 実データに近づけるため、アイテムごとに別の文字列を作る
+    return f"アイテム{i}", f"アイテム{i}の説明です"
+
+
+async def _fill_records(count: int) -> object:
+    storage = InMemoryItemStorage()
+    for start in range(0, count, BATCH_SIZE):
+        end = min(start + BATCH_SIZE, count)
+        await storage.create_items([_item(i) for i in range(start, end)])
+    return storage
+
+
+def _fill_dicts(count: int) -> object:
+    items_storage = {}
+    for i in range(count):
+        name, description = _item(i)
+        items_storage[i + 1] = {
+            "name": name,
+            "description": description,
+            "created_at": datetime.now(UTC),
+            "updated_at": None,
+        }
+    return items_storage
+
+
+def run_child(mode: str, count: int) -> None:
+    """子プロセスとして1パターンを計測し、増加量(bytes)を出力する"""
+    before = _max_rss_bytes()
+    if mode == "record":
+        storage = asyncio.run(_fill_records(count))
+    else:
+        storage = _fill_dicts(count)
+    after = _max_rss_bytes()
+
+    assert storage is not None
+    print(after - before)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--counts", type=int, nargs="+", default=[100_000, 1_000_000], help="件数"
+    )
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child[0], int(args.child[1]))
+        return
+
+    print(f"  {'items':>10} {'mode':<8} {'RSS MiB':>10} {'bytes/item':>12}")
+    for count in args.counts:
+        for mode in ("dict", "record"):
+            # 計測ごとにプロセスを分けて、前の計測の影響を受けないようにする
+            output = subprocess.run(
+                [sys.executable, "-m", __spec__.name, "--child", mode, str(count)],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            delta = int(output.strip().splitlines()[-1])
+            print(
+                f"  {count:>10} {mode:<8} {delta / 2**20:>10.1f} {delta / count:>12.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+全文検索のベンチマーク
+転置インデックスによる検索と全件走査の検索のレイテンシを比較する
+
+アイテムは漢字・ひらがなの単語をランダムに並べた名前・説明で作成し、
+クエリには語彙中の単語を使う。
+
+実行方法（リポジトリルートから）:
+    python -m modules.api.benchmarks.bench_search --items 1000000 --queries 1000
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from ..storage.base import ItemStorage
+from ..storage.memory import InMemoryItemStorage
+
+BATCH_SIZE = 10_000
+# 常用漢字付近の漢字とひらがなから単語を作る
+_CHARACTERS = [chr(c) for c in range(0x4E00, 0x4E00 + 2000)] + [
+    chr(c) for c in range(0x3041, 0x3094)
+]
+
+
+def _vocabulary(size: int, rng: random.Random) -> list[str]:
+    return ["".join(rng.choices(_CHARACTERS, k=rng.randint(2, 4))) for _ in range(size)]
+
+
+async def _fill(storage: InMemoryItemStorage, items: int, vocabulary: list[str]):
+    rng = random.Random(1)
+    for start in range(0, items, BATCH_SIZE):
+        await storage.create_items(
+            [
+                (
+                    "".join(rng.choices(vocabulary, k=2)),
+                    "".join(rng.choices(vocabulary, k=6)),
+                )
+                for _ in range(min(BATCH_SIZE, items - start))
+            ]
+        )
+
+
+def _report(label: str, latencies: list[float], hits: int) -> None:
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(
+        f"  {label:<8} p50 {statistics.median(latencies) * 1000:>9.3f} ms"
+        f"  p99 {p99 * 1000:>9.3f} ms  avg hits {hits / len(latencies):>8.1f}"
+    )
+
+
+async def run(items: int, queries: int, scan_queries: int, vocab: int) -> None:
+    rng = random.Random(2)
+    vocabulary = _vocabulary(vocab, rng)
+    storage = InMemoryItemStorage()
+    await _fill(storage, items, vocabulary)
+    words = rng.choices(vocabulary, k=queries)
+
+    start = time.perf_counter()
+    await storage.search(words[0], 20)
+    print(f"  index build (初回の検索): {time.perf_counter() - start:.2f} s")
+
+    latencies, hits = [], 0
+    for word in words:
+        start = time.perf_counter()
+        hits += (await storage.search(word, 20))[1]
+        latencies.append(time.perf_counter() - start)
+    _report("index", latencies, hits)
+
+    latencies, hits = [], 0
+    for word in words[:scan_queries]:
+        start = time.perf_counter()
+        hits += (await ItemStorage.search(storage, word, 20))[1]
+        latencies.append(time.perf_counter() - start)
+    _report("scan", latencies, hits)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=100_000, help="アイテム件数")
+    parser.add_argument("--queries", type=int, default=1000, help="検索回数")
+    parser.add_argument("--scan-queries", type=int, default=5, help="全件走査の回数")
+    parser.add_argument("--vocabulary", type=int, default=50_000, help="語彙数")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.items, args.queries, args.scan_queries, args.vocabulary))
+
+
+if __name__ == "__main__":
+    main()
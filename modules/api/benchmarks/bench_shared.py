@@ -0,0 +1,76 @@
+"""
+共有メモリストレージの読み取りスケーリングのベンチマーク
+uvicornのワーカー数を想定し、プロセス数ごとの合計読み取り性能を計測する
+
+実行方法（リポジトリルートから）:
+    python -m modules.api.benchmarks.bench_shared --items 10000 --processes 1 2 4
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from ..storage.shared import SharedItemStorage
+
+BATCH_SIZE = 1000
+
+
+async def _fill(path: str, items: int) -> None:
+    storage = SharedItemStorage(path, capacity=items)
+    for start in range(0, items, BATCH_SIZE):
+        count = min(BATCH_SIZE, items - start)
+        await storage.create_items(
+            [(f"アイテム{start + i}", "説明") for i in range(count)]
+        )
+    await storage.close()
+
+
+def _read_worker(path: str, items: int, duration: float) -> int:
+    """duration秒間ランダムなIDを読み続け、読み取り件数を返す"""
+
+    async def read() -> int:
+        storage = SharedItemStorage(path, capacity=items)
+        ids = [random.randint(1, items) for _ in range(10_000)]
+        reads = 0
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            for item_id in ids:
+                await storage.get_item(item_id)
+            reads += len(ids)
+        await storage.close()
+        return reads
+
+    return asyncio.run(read())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=10_000, help="アイテム件数")
+    parser.add_argument(
+        "--processes", type=int, nargs="+", default=[1, 2, 4], help="プロセス数"
+    )
+    parser.add_argument("--duration", type=float, default=2.0, help="計測秒数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "bench.shm")
+        asyncio.run(_fill(path, args.items))
+
+        print(f"  {'processes':>10} {'reads/s':>12} {'per process':>12}")
+        for processes in args.processes:
+            with multiprocessing.get_context("spawn").Pool(processes) as pool:
+                reads = sum(
+                    pool.starmap(
+                        _read_worker, [(path, args.items, args.duration)] * processes
+                    )
+                )
+            total = reads / args.duration
+            print(f"  {processes:>10} {total:>12.0f} {total / processes:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
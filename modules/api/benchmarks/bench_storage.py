@@ -0,0 +1,94 @@
+"""
+ストレージバックエンドのベンチマーク
+CRUDエンドポイントをバックエンドごとに計測する
+
+実行方法（リポジトリルートから）:
+    python -m modules.api.benchmarks.bench_storage --count 2000
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+
+import httpx
+
+from ..main import app
+from ..storage.base import ItemStorage
+from ..storage.memory import InMemoryItemStorage
+from ..storage.provider import set_storage
+from ..storage.sqlite import SQLiteItemStorage
+
+
+async def _measure(
+    label: str, count: int, func: Callable[[int], Awaitable[None]]
+) -> None:
+    """count回の呼び出しを計測して結果を表示する"""
+    start = time.perf_counter()
+    for i in range(count):
+        await func(i)
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"  {label:<8} {count / elapsed:>10.0f} ops/s"
+        f" {elapsed / count * 1_000_000:>10.1f} us/op"
+    )
+
+
+async def run_crud(storage: ItemStorage, count: int) -> None:
+    """1バックエンド分のCRUDベンチマークを実行する"""
+    set_storage(storage)
+    transport = httpx.ASGITransport(app=app)
+    payload = {"name": "ベンチマーク", "description": "ベンチマーク用のアイテム"}
+
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+
+        async def create(_: int) -> None:
+            response = await client.post("/api/items", json=payload)
+            assert response.status_code == 201
+
+        async def read(i: int) -> None:
+            assert (await client.get(f"/api/items/{i + 1}")).status_code == 200
+
+        async def update(i: int) -> None:
+            response = await client.put(f"/api/items/{i + 1}", json={"name": "更新"})
+            assert response.status_code == 200
+
+        async def list_all(_: int) -> None:
+            assert (await client.get("/api/items")).status_code == 200
+
+        async def delete(i: int) -> None:
+            assert (await client.delete(f"/api/items/{i + 1}")).status_code == 204
+
+        await _measure("create", count, create)
+        await _measure("read", count, read)
+        await _measure("update", count, update)
+        await _measure("list", max(count // 100, 1), list_all)
+        await _measure("delete", count, delete)
+
+    await storage.close()
+    set_storage(None)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=1000, help="操作ごとの回数")
+    parser.add_argument("--pool-size", type=int, default=4, help="SQLite接続数")
+    args = parser.parse_args()
+
+    print("memory:")
+    asyncio.run(run_crud(InMemoryItemStorage(), args.count))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print("sqlite (WAL):")
+        path = str(Path(tmp_dir) / "bench.db")
+        storage = SQLiteItemStorage(path, pool_size=args.pool_size)
+        asyncio.run(run_crud(storage, args.count))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+WebSocketでの変更の配信のベンチマーク
+購読者（接続）の数を変えて、POST /api/items を送ってから全購読者に変更が届くまでの
+時間（ファンアウトのレイテンシ）を計測する
+
+接続はASGIアプリを直接呼び出すインプロセスのWebSocketで、ネットワークは含まない。
+購読者は何も送らずに待つだけの（アイドルな）接続とする。
+
+実行方法（リポジトリルートから）:
+    python -m modules.api.benchmarks.bench_websocket --subscribers 10 100 1000 5000
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from ..main import app
+from ..storage.memory import InMemoryItemStorage
+from ..storage.provider import get_change_feed, set_storage
+
+PAYLOAD = {"name": "アイテム", "description": "説明"}
+
+
+class _Connection:
+    """ASGIのreceive/sendを持つ1接続分のクライアント"""
+
+    def __init__(self, on_message) -> None:
+        self._on_message = on_message
+        self._closed = asyncio.Event()
+        self._connected = False
+        self.accepted = asyncio.Event()
+
+    async def receive(self) -> dict:
+        if not self._connected:
+            self._connected = True
+            return {"type": "websocket.connect"}
+        await self._closed.wait()
+        return {"type": "websocket.disconnect", "code": 1000}
+
+    async def send(self, message: dict) -> None:
+        if message["type"] == "websocket.accept":
+            self.accepted.set()
+        elif message["type"] == "websocket.send":
+            self._on_message()
+
+    def close(self) -> None:
+        self._closed.set()
+
+
+_SCOPE = {
+    "type": "websocket",
+    "asgi": {"version": "3.0"},
+    "scheme": "ws",
+    "path": "/api/items/ws",
+    "raw_path": b"/api/items/ws",
+    "query_string": b"",
+    "headers": [],
+    "client": ("bench", 0),
+    "server": ("bench", 80),
+    "subprotocols": [],
+}
+
+
+async def _measure(
+    client: httpx.AsyncClient, subscribers: int, events: int
+) -> tuple[float, list[float]]:
+    """(全接続の確立までの秒数, 変更ごとの全購読者に届くまでの秒数)を返す"""
+    received = 0
+    delivered = asyncio.Event()
+
+    def on_message() -> None:
+        nonlocal received
+        received += 1
+        if received == subscribers:
+            delivered.set()
+
+    connections = [_Connection(on_message) for _ in range(subscribers)]
+    start = time.perf_counter()
+    tasks = [
+        asyncio.create_task(app(dict(_SCOPE), c.receive, c.send)) for c in connections
+    ]
+    await asyncio.gather(*(c.accepted.wait() for c in connections))
+    # accept後に購読するため、全員が購読するまで待つ
+    while get_change_feed().subscribers < subscribers:
+        await asyncio.sleep(0)
+    connect = time.perf_counter() - start
+
+    latencies = []
+    for _ in range(events):
+        received = 0
+        delivered.clear()
+        start = time.perf_counter()
+        response = await client.post("/api/items", json=PAYLOAD)
+        assert response.status_code == 201
+        await delivered.wait()
+        latencies.append(time.perf_counter() - start)
+
+    for connection in connections:
+        connection.close()
+    await asyncio.gather(*tasks)
+    assert get_change_feed().subscribers == 0
+    return connect, latencies
+
+
+async def run(counts: list[int], events: int) -> None:
+    set_storage(InMemoryItemStorage())
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        # ウォームアップ
+        await _measure(client, 10, 10)
+
+        print(
+            f"  {'subscribers':>11} {'connect ms':>11} {'p50 ms':>9}"
+            f" {'max ms':>9} {'us/subscriber':>14}"
+        )
+        for count in counts:
+            connect, latencies = await _measure(client, count, events)
+            p50 = statistics.median(latencies)
+            print(
+                f"  {count:>11} {connect * 1000:>11.1f} {p50 * 1000:>9.3f}"
+                f" {max(latencies) * 1000:>9.3f} {p50 / count * 1e6:>14.2f}"
+            )
+    set_storage(None)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--subscribers",
+        type=int,
+        nargs="+",
+        default=[10, 100, 1000, 5000],
+        help="計測する購読者数",
+    )
+    parser.add_argument("--events", type=int, default=20, help="購読者数ごとの変更数")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.subscribers, args.events))
+
+
+if __name__ == "__main__":
+    main()
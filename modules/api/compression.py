@@ -0,0 +1,336 @@
+"""
+レスポンスの圧縮
+Accept-Encodingに応じてzstd / brotli / gzipで圧縮するASGIミドルウェア
+
+- 最小サイズ未満のレスポンス・圧縮に向かないContent-Typeは圧縮しない
+- StreamingResponseはチャンクごとに圧縮し、一定の量・間隔ごとにフラッシュする
+  （NDJSONの1行ずつフラッシュすると圧縮が効かないため、まとめて逐次届ける）
+- 圧縮方式を選べたリクエストには、ボディの大きさによらず強いETagを弱いETagにして返す
+  （ボディのない304でも200と同じETagになる）
+- 大きなボディの圧縮はワーカースレッドで行い、イベントループを止めない
+- disable_compressionを依存関係に指定したルートは圧縮しない
+
+zstd・brotliはzstandard・brotliパッケージがある場合のみ使う（requirements.txtで導入）。
+"""
+
+import time
+import zlib
+from collections.abc import Callable
+
+from fastapi import Request
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - 任意の依存パッケージ
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - 任意の依存パッケージ
+    brotli = None
+
+DEFAULT_MINIMUM_SIZE = 1024
+DEFAULT_THREAD_MIN_SIZE = 64 * 1024
+# ストリーミングでフラッシュするまでにまとめるボディの量・間隔
+DEFAULT_STREAM_FLUSH_SIZE = 16 * 1024
+DEFAULT_STREAM_FLUSH_SECONDS = 0.1
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+# brotliのデフォルト（11）は動的なレスポンスには遅すぎる
+BROTLI_QUALITY = 4
+
+# 圧縮するContent-Type（前方一致）。画像などの圧縮済みの形式は除く
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "text/",
+)
+
+# ルートごとに圧縮しないことを示すscopeのキー
+_DISABLED_KEY = "app.compression_disabled"
+
+
+async def disable_compression(request: Request) -> None:
+    """このルートのレスポンスを圧縮しない（dependencies=[Depends(...)]で指定する）"""
+    request.scope[_DISABLED_KEY] = True
+
+
+class _GzipStream:
+    def __init__(self) -> None:
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.compress(chunk)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _ZstdStream:
+    def __init__(self) -> None:
+        self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.compress(chunk)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliStream:
+    def __init__(self) -> None:
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.process(chunk)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+def _gzip(data: bytes) -> bytes:
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+class Codec:
+    """Content-Encodingの名前と、一括・ストリーミングの圧縮方法"""
+
+    def __init__(
+        self,
+        name: str,
+        compress: Callable[[bytes], bytes],
+        stream: Callable[[], _GzipStream | _ZstdStream | _BrotliStream],
+    ) -> None:
+        self.name = name
+        self.compress = compress
+        self.stream = stream
+
+
+def available_codecs() -> list[Codec]:
+    """使える圧縮方式を優先順（同じq値の場合に選ぶ順）に返す"""
+    codecs = []
+    if zstandard is not None:
+        # ZstdCompressorはスレッドセーフでないため、一括圧縮でも呼び出しごとに作る
+        codecs.append(
+            Codec(
+                "zstd",
+                lambda data: zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data),
+                _ZstdStream,
+            )
+        )
+    if brotli is not None:
+        codecs.append(
+            Codec(
+                "br",
+                lambda data: brotli.compress(data, quality=BROTLI_QUALITY),
+                _BrotliStream,
+            )
+        )
+    codecs.append(Codec("gzip", _gzip, _GzipStream))
+    return codecs
+
+
+def negotiate(accept_encoding: str, codecs: list[Codec]) -> Codec | None:
+    """
+    Accept-Encodingのq値が最も大きい圧縮方式を選ぶ（同じ場合はcodecsの順）
+    q=0は拒否、*は明示されていない方式に適用する
+    """
+    weights: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        params = params.strip().replace(" ", "")
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name] = weight
+
+    best, best_weight = None, 0.0
+    for codec in codecs:
+        weight = weights.get(codec.name, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = codec, weight
+    return best
+
+
+def _weaken_etag(headers: MutableHeaders) -> None:
+    """圧縮後のバイト列は元の表現と異なるため、強いETagは弱いETagにする"""
+    etag = headers.get("etag")
+    if etag is not None and not etag.startswith("W/"):
+        headers["ETag"] = f"W/{etag}"
+
+
+def _is_compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers:
+        return False
+    if "no-transform" in headers.get("cache-control", ""):
+        return False
+    content_type = headers.get("content-type", "")
+    return content_type.startswith(COMPRESSIBLE_TYPES) or "+json" in content_type
+
+
+class CompressionMiddleware:
+    """
+    レスポンスを圧縮するASGIミドルウェア
+
+    minimum_size未満のボディは圧縮しない（ストリーミングは常に圧縮する）。
+    thread_min_size以上のボディ・チャンクはワーカースレッドで圧縮する。
+    ストリーミングは最初のチャンクと、前回のフラッシュからstream_flush_size以上の
+    ボディを受け取ったとき・stream_flush_seconds以上経ってチャンクを受け取ったときに
+    フラッシュする（チャンクが届かない間はフラッシュしない）。
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = DEFAULT_MINIMUM_SIZE,
+        thread_min_size: int = DEFAULT_THREAD_MIN_SIZE,
+        codecs: list[Codec] | None = None,
+        stream_flush_size: int = DEFAULT_STREAM_FLUSH_SIZE,
+        stream_flush_seconds: float = DEFAULT_STREAM_FLUSH_SECONDS,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.thread_min_size = thread_min_size
+        self.stream_flush_size = stream_flush_size
+        self.stream_flush_seconds = stream_flush_seconds
+        self.codecs = codecs if codecs is not None else available_codecs()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        codec = negotiate(Headers(scope=scope).get("accept-encoding", ""), self.codecs)
+        responder = _Responder(self, scope, send, codec)
+        await self.app(scope, receive, responder.send)
+
+
+class _Responder:
+    """1リクエスト分のレスポンスの開始メッセージを保留し、最初のボディで圧縮方法を決める"""
+
+    def __init__(
+        self,
+        middleware: CompressionMiddleware,
+        scope: Scope,
+        send: Send,
+        codec: Codec | None,
+    ) -> None:
+        self.middleware = middleware
+        self.scope = scope
+        self.codec = codec
+        self._send = send
+        self._start: Message | None = None
+        self._stream = None
+        self._passthrough = False
+        # 前回のフラッシュ以降に圧縮したボディの量と、前回のフラッシュの時刻
+        self._unflushed = 0
+        self._flushed_at = float("-inf")
+
+    async def send(self, message: Message) -> None:
+        if self._passthrough:
+            await self._send(message)
+        elif message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            if (
+                message["status"] in (204, 304)
+                or self.scope.get(_DISABLED_KEY)
+                or not _is_compressible(headers)
+            ):
+                if message["status"] == 304 and not self.scope.get(_DISABLED_KEY):
+                    self._not_modified(MutableHeaders(scope=message))
+                self._passthrough = True
+                await self._send(message)
+            else:
+                self._start = message
+        elif message["type"] != "http.response.body":
+            await self._send(message)
+        elif self._stream is not None:
+            await self._send_chunk(message)
+        else:
+            await self._send_first(message)
+
+    def _not_modified(self, headers: MutableHeaders) -> None:
+        """304のヘッダーを、圧縮に向く形式の200と揃える（ボディがなく形式はわからない）"""
+        headers.add_vary_header("Accept-Encoding")
+        if self.codec is not None:
+            _weaken_etag(headers)
+
+    async def _send_first(self, message: Message) -> None:
+        start = self._start
+        assert start is not None
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        headers = MutableHeaders(scope=start)
+
+        headers.add_vary_header("Accept-Encoding")
+        if self.codec is not None:
+            # 小さいボディは圧縮しないが、ボディのない304では大きさがわからないため、
+            # 圧縮方式を選べたリクエストには大きさによらず同じ弱いETagを返す
+            _weaken_etag(headers)
+        if self.codec is None or (
+            not more_body and len(body) < self.middleware.minimum_size
+        ):
+            self._passthrough = True
+            await self._send(start)
+            await self._send(message)
+            return
+
+        headers["Content-Encoding"] = self.codec.name
+        if more_body:
+            del headers["Content-Length"]
+            self._stream = self.codec.stream()
+            await self._send(start)
+            await self._send_chunk(message)
+            return
+
+        body = await self._run(self.codec.compress, body)
+        headers["Content-Length"] = str(len(body))
+        await self._send(start)
+        await self._send({"type": "http.response.body", "body": body})
+
+    async def _send_chunk(self, message: Message) -> None:
+        stream = self._stream
+        chunk = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        body = await self._run(stream.compress, chunk) if chunk else b""
+        self._unflushed += len(chunk)
+        if not more_body:
+            body += stream.finish()
+        elif self._unflushed and (
+            self._unflushed >= self.middleware.stream_flush_size
+            or time.monotonic() - self._flushed_at
+            >= self.middleware.stream_flush_seconds
+        ):
+            body += stream.flush()
+            self._unflushed = 0
+            self._flushed_at = time.monotonic()
+        if body or not more_body:
+            await self._send(
+                {"type": "http.response.body", "body": body, "more_body": more_body}
+            )
+
+    async def _run(self, compress: Callable[[bytes], bytes], data: bytes) -> bytes:
+        if len(data) >= self.middleware.thread_min_size:
+            return await run_in_threadpool(compress, data)
+        return compress(data)
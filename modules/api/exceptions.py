@@ -5,13 +5,16 @@
 from datetime import UTC, datetime
 
 from fastapi import HTTPException, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
 
 from .models.schemas import ErrorResponse
+from .responses import FastJSONResponse
 
 
-async def http_exception_handler(request: Request, exc: HTTPException) -> JSONResponse:
+async def http_exception_handler(
+    request: Request, exc: HTTPException
+) -> FastJSONResponse:
     """
     HTTPエラーハンドラー
     """
@@ -23,12 +26,14 @@ async def http_exception_handler(request: Request, exc: HTTPException) -> JSONRe
         "timestamp": datetime.now(UTC).isoformat(),
     }
 
-    return JSONResponse(status_code=exc.status_code, content=content)
+    return FastJSONResponse(
+        status_code=exc.status_code, content=content, headers=exc.headers
+    )
 
 
 async def validation_exception_handler(
     request: Request, exc: RequestValidationError
-) -> JSONResponse:
+) -> FastJSONResponse:
     """
     バリデーションエラーハンドラー
     """
@@ -40,16 +45,19 @@ async def validation_exception_handler(
 
     # 標準のFastAPI形式も含める
     content = {
-        "detail": exc.errors(),  # 標準のFastAPI形式
+        # 標準のFastAPI形式（ctx内の例外やbytesの入力値もJSON化できる形に変換）
+        "detail": jsonable_encoder(exc.errors()),
         "error": "VALIDATION_ERROR",
         "message": "; ".join(error_messages),
         "timestamp": datetime.now(UTC).isoformat(),
     }
 
-    return JSONResponse(status_code=422, content=content)
+    return FastJSONResponse(status_code=422, content=content)
 
 
-async def general_exception_handler(request: Request, exc: Exception) -> JSONResponse:
+async def general_exception_handler(
+    request: Request, exc: Exception
+) -> FastJSONResponse:
     """
     一般的なエラーハンドラー
     """
@@ -59,4 +67,6 @@ async def general_exception_handler(request: Request, exc: Exception) -> JSONRes
         timestamp=datetime.now(UTC),
     )
 
-    return JSONResponse(status_code=500, content=error_response.model_dump(mode="json"))
+    return FastJSONResponse(
+        status_code=500, content=error_response.model_dump(mode="json")
+    )
@@ -3,6 +3,11 @@ FastAPI アプリケーションのメインファイル
 CI/CDパイプライン比較用のシンプルなREST API
 """
 
+import asyncio
+import contextlib
+import os
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 from datetime import UTC, datetime
 from typing import Any
 
@@ -11,14 +16,26 @@ from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 
+from .compression import (
+    DEFAULT_MINIMUM_SIZE,
+    DEFAULT_THREAD_MIN_SIZE,
+    CompressionMiddleware,
+)
 from .exceptions import (
     general_exception_handler,
     http_exception_handler,
     validation_exception_handler,
 )
+from .responses import FastJSONResponse
 
 # ルーターとエラーハンドラーのインポート
 from .routers import health, items, version
+from .storage.provider import (
+    close_storage,
+    create_compactor,
+    get_item_expiry,
+    get_storage,
+)
 
 
 class Settings(BaseModel):
@@ -36,6 +53,32 @@ class Settings(BaseModel):
 # 設定インスタンスの作成
 settings = Settings()
 
+
+def startup() -> None:
+    """
+    最初のリクエストの前に済ませる起動時の処理
+    スナップショットの読み込みなど、ストレージの初期化を行う
+    """
+    get_storage()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """アプリケーションの起動・終了処理"""
+    startup()
+    # 削除したアイテムの墓標を、リクエストの合間に少しずつ回収する
+    compaction = asyncio.create_task(create_compactor().run())
+    # 有効期限が来たアイテムをタイミングホイールから取り出して削除する
+    expiry = asyncio.create_task(get_item_expiry().run(items.delete_expired_items))
+    yield
+    for task in (compaction, expiry):
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+    # ストレージの接続などを解放
+    await close_storage()
+
+
 # FastAPIアプリケーションの作成
 app = FastAPI(
     title=settings.app_name,
@@ -43,6 +86,17 @@ app = FastAPI(
     description="GitHub Actions、GitLab CI/CD、AWS CodePipelineの比較用API",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
+)
+
+# レスポンスの圧縮（一覧・エクスポートの日本語テキストは圧縮率が高く、転送量を減らせる）
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.getenv("APP_COMPRESSION_MIN_BYTES", str(DEFAULT_MINIMUM_SIZE))),
+    thread_min_size=int(
+        os.getenv("APP_COMPRESSION_THREAD_BYTES", str(DEFAULT_THREAD_MIN_SIZE))
+    ),
 )
 
 # CORS設定
@@ -53,6 +107,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # 条件付きGET・再送の判別のためにブラウザからヘッダーを参照できるようにする
+    expose_headers=["ETag", "Idempotent-Replayed"],
 )
 
 # エラーハンドラーの登録
@@ -67,24 +123,48 @@ app.include_router(items.router)
 
 
 @app.get("/")
-async def root() -> dict[str, Any]:
+async def root() -> FastJSONResponse:
     """ルートエンドポイント"""
-    return {
-        "message": f"Welcome to {settings.app_name}",
-        "version": settings.version,
-        "environment": settings.environment,
-        "timestamp": datetime.now(UTC).isoformat(),
-    }
+    return FastJSONResponse(
+        {
+            "message": f"Welcome to {settings.app_name}",
+            "version": settings.version,
+            "environment": settings.environment,
+            "timestamp": datetime.now(UTC).isoformat(),
+        }
+    )
+
+
+# Mangumのアダプター（ウォームな呼び出しでは作り直さずに使い回す）
+_mangum: Any = None
+
+
+def get_lambda_adapter() -> Any:
+    """
+    Mangumのアダプターを取得する（初回のみ起動時の処理を行って作成する）
+    Mangumのlifespanは呼び出しごとに起動・終了処理を行うため使わない
+    """
+    global _mangum
+
+    if _mangum is None:
+        from mangum import Mangum
+
+        startup()
+        _mangum = Mangum(app, lifespan="off")
+    return _mangum
+
+
+# Lambdaではインポート時（初期化フェーズ）にアダプターを作り、起動時の処理も済ませる
+if os.getenv("AWS_LAMBDA_FUNCTION_NAME"):
+    get_lambda_adapter()
+elif os.getenv("APP_SNAPSHOT_PATH"):
+    get_storage()
 
 
 # Lambda ハンドラー
 def lambda_handler(event, context):
     """AWS Lambda用のハンドラー関数"""
-    from mangum import Mangum
-
-    # Mangumを使用してFastAPIアプリケーションをLambda対応にする
-    handler = Mangum(app, lifespan="off")
-    return handler(event, context)
+    return get_lambda_adapter()(event, context)
 
 
 if __name__ == "__main__":
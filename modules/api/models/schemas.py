@@ -4,9 +4,15 @@ API リクエスト・レスポンス用のスキーマ
 """
 
 from datetime import datetime
+from typing import Annotated, Literal
 
 from pydantic import BaseModel, ConfigDict, Field, field_validator
 
+# 一括作成で受け付ける最大件数
+MAX_BULK_ITEMS = 1000
+# 有効期限（ttl_seconds）の上限
+MAX_TTL_SECONDS = 30 * 24 * 60 * 60
+
 
 class HealthResponse(BaseModel):
     """ヘルスチェックレスポンスモデル"""
@@ -40,26 +46,39 @@ class ItemBase(BaseModel):
     @field_validator("name")
     @classmethod
     def validate_name(cls, v):
-        if not v or not v.strip():
+        stripped = v.strip()
+        if not stripped:
             raise ValueError("名前は空白のみにはできません")
-        if len(v.strip()) > 100:
+        if len(stripped) > 100:
             raise ValueError("名前は100文字以内で入力してください")
-        return v.strip()
+        return stripped
 
     @field_validator("description")
     @classmethod
     def validate_description(cls, v):
-        if not v or not v.strip():
+        stripped = v.strip()
+        if not stripped:
             raise ValueError("説明は空白のみにはできません")
-        if len(v.strip()) > 500:
+        if len(stripped) > 500:
             raise ValueError("説明は500文字以内で入力してください")
-        return v.strip()
+        return stripped
 
 
 class ItemCreate(ItemBase):
     """アイテム作成用モデル"""
 
-    pass
+    ttl_seconds: int | None = Field(
+        None,
+        ge=1,
+        le=MAX_TTL_SECONDS,
+        description="有効期限までの秒数（期限が来ると削除する。省略時は無期限）",
+    )
+
+
+# 一括作成リクエスト（TypeAdapterで配列全体を一度に検証する）
+ItemCreateList = Annotated[
+    list[ItemCreate], Field(min_length=1, max_length=MAX_BULK_ITEMS)
+]
 
 
 class ItemUpdate(BaseModel):
@@ -71,20 +90,45 @@ class ItemUpdate(BaseModel):
     description: str | None = Field(
         None, min_length=1, max_length=500, description="アイテム説明"
     )
+    ttl_seconds: int | None = Field(
+        None,
+        ge=1,
+        le=MAX_TTL_SECONDS,
+        description="有効期限までの秒数（指定した場合は今から設定し直す）",
+    )
 
     @field_validator("name")
     @classmethod
     def validate_name(cls, v):
-        if v is not None and not v.strip():
+        if v is None:
+            return v
+        stripped = v.strip()
+        if not stripped:
             raise ValueError("名前は空白のみにはできません")
-        return v.strip() if v else v
+        return stripped
 
     @field_validator("description")
     @classmethod
     def validate_description(cls, v):
-        if v is not None and not v.strip():
+        if v is None:
+            return v
+        stripped = v.strip()
+        if not stripped:
             raise ValueError("説明は空白のみにはできません")
-        return v.strip() if v else v
+        return stripped
+
+
+class ItemBulkUpdate(ItemUpdate):
+    """アイテム一括更新の1件分"""
+
+    id: int = Field(..., description="アイテムID")
+
+
+# 一括更新・一括削除リクエスト
+ItemBulkUpdateList = Annotated[
+    list[ItemBulkUpdate], Field(min_length=1, max_length=MAX_BULK_ITEMS)
+]
+ItemIdList = Annotated[list[int], Field(min_length=1, max_length=MAX_BULK_ITEMS)]
 
 
 class Item(ItemBase):
@@ -102,6 +146,87 @@ class ItemList(BaseModel):
 
     items: list[Item]
     total: int = Field(..., description="総件数")
+    next_cursor: str | None = Field(
+        None, description="次ページ取得用のカーソル（最終ページではnull）"
+    )
+
+
+class ItemSearchResponse(BaseModel):
+    """アイテム検索レスポンスモデル"""
+
+    items: list[Item] = Field(..., description="関連度の高い順の検索結果")
+    total: int = Field(..., description="一致件数")
+
+
+class ItemBulkCreateResponse(BaseModel):
+    """アイテム一括作成レスポンスモデル"""
+
+    items: list[Item]
+    created: int = Field(..., description="作成件数")
+
+
+class ItemBulkStatusResponse(BaseModel):
+    """アイテム一括更新・一括削除レスポンスモデル"""
+
+    statuses: list[int] = Field(
+        ..., description="リクエスト順のIDごとの結果（HTTPステータスコード）"
+    )
+    succeeded: int = Field(..., description="成功件数")
+
+
+class ItemChange(BaseModel):
+    """アイテムの変更（変更フィードの1件）"""
+
+    seq: int = Field(..., description="変更のシーケンス番号（ワーカーごと）")
+    cursor: str = Field(..., description="この変更の後から再開する場合のsince")
+    op: Literal["created", "updated", "deleted"] = Field(..., description="変更の種類")
+    id: int = Field(..., description="アイテムID")
+    item: Item | None = Field(..., description="変更後のアイテム（削除の場合はnull）")
+
+
+class ItemChanges(BaseModel):
+    """変更フィードのレスポンスモデル"""
+
+    events: list[ItemChange] = Field(..., description="sinceより後の変更（古い順）")
+    last_seq: int = Field(..., description="返した最後の変更のシーケンス番号")
+    cursor: str = Field(
+        ..., description="次のsinceに指定するカーソル（epoch:last_seq）"
+    )
+    resync_required: bool = Field(
+        False,
+        description="sinceの直後の変更を保持していない（一覧を取得し直し、cursorから再開する）",
+    )
+
+
+class ItemExpiryStats(BaseModel):
+    """アイテムの有効期限の処理状況（ワーカーごと）"""
+
+    backlog: int = Field(..., description="期限を待っているアイテムの件数")
+    scheduled: int = Field(..., description="期限を設定した回数")
+    cancelled: int = Field(..., description="期限の前に削除されて取り消した件数")
+    expired: int = Field(..., description="期限が来て削除した件数")
+
+
+class ItemTombstone(BaseModel):
+    """削除したアイテム（墓標）"""
+
+    id: int = Field(..., description="アイテムID")
+    deleted_at: datetime = Field(..., description="削除日時")
+
+    model_config = ConfigDict(json_encoders={datetime: lambda v: v.isoformat()})
+
+
+class ItemTombstones(BaseModel):
+    """削除したアイテム一覧のレスポンスモデル"""
+
+    items: list[ItemTombstone] = Field(..., description="削除日時の古い順")
+    next_cursor: str | None = Field(
+        None, description="次ページ取得用のカーソル（最終ページではnull）"
+    )
+    resync_required: bool = Field(
+        False,
+        description="sinceより後の削除をすべては保持していない（一覧を取得し直す）",
+    )
 
 
 class ErrorResponse(BaseModel):
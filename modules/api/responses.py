@@ -0,0 +1,46 @@
+"""
+JSONレスポンス
+標準のJSONResponseと同じバイト列を、orjsonがあればorjsonで高速にエンコードする
+"""
+
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjsonはrequirements.txtでのみ導入する
+    orjson = None
+
+
+def dump_json(content: Any) -> bytes:
+    """
+    JSONResponseと同じ形式（区切りの空白なし・非ASCII文字をエスケープしない）でエンコードする
+    floatの指数表記など出力が異なる値はレスポンスに含めない
+    """
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """アプリケーション全体のデフォルトのレスポンスクラス"""
+
+    def render(self, content: Any) -> bytes:
+        return dump_json(content)
+
+
+def model_response(
+    model: BaseModel,
+    status_code: int = 200,
+    headers: dict[str, str] | None = None,
+) -> FastJSONResponse:
+    """
+    組み立て済み（検証済み）のモデルをレスポンスにする
+    Responseを返すとresponse_modelによる再検証とjsonable_encoderを省ける
+    """
+    return FastJSONResponse(
+        model.model_dump(mode="json"), status_code=status_code, headers=headers
+    )
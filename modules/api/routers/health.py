@@ -7,16 +7,21 @@ from datetime import UTC, datetime
 from fastapi import APIRouter
 
 from ..models.schemas import HealthResponse
+from ..responses import FastJSONResponse, model_response
 
 router = APIRouter()
 
 
 @router.get("/health", response_model=HealthResponse, tags=["Health"])
-async def health_check() -> HealthResponse:
+async def health_check() -> FastJSONResponse:
     """
     ヘルスチェックエンドポイント
     アプリケーションの稼働状況を確認する
     """
-    return HealthResponse(
-        status="healthy", timestamp=datetime.now(UTC), service="CI/CD Comparison API"
+    return model_response(
+        HealthResponse(
+            status="healthy",
+            timestamp=datetime.now(UTC),
+            service="CI/CD Comparison API",
+        )
     )
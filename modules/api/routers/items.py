@@ -2,136 +2,1063 @@
 アイテムCRUDエンドポイント
 """
 
+import asyncio
+import base64
+import binascii
+import email.message
+import json
+from collections.abc import AsyncIterator, Callable
 from datetime import UTC, datetime
 from typing import Any
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from starlette.exceptions import HTTPException as StarletteHTTPException
 
-from ..models.schemas import Item, ItemCreate, ItemList, ItemUpdate
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjsonはrequirements.txtでのみ導入する
+    orjson = None
+
+from ..models.schemas import (
+    MAX_BULK_ITEMS,
+    Item,
+    ItemBulkCreateResponse,
+    ItemBulkStatusResponse,
+    ItemBulkUpdate,
+    ItemBulkUpdateList,
+    ItemChanges,
+    ItemCreate,
+    ItemCreateList,
+    ItemExpiryStats,
+    ItemIdList,
+    ItemList,
+    ItemSearchResponse,
+    ItemTombstones,
+    ItemUpdate,
+)
+from ..responses import FastJSONResponse, dump_json, model_response
+from ..storage.base import ItemStorage, VersionConflictError
+from ..storage.changefeed import CREATED, DELETED, UPDATED, Subscription
+from ..storage.idempotency import (
+    IdempotencyKeyInUse,
+    IdempotencyKeyMismatch,
+    StoredResponse,
+    fingerprint,
+)
+from ..storage.jsoncache import ItemJsonCache
+from ..storage.provider import (
+    get_change_feed,
+    get_idempotency_cache,
+    get_item_expiry,
+    get_json_cache,
+    get_storage,
+)
+from ..storage.record import ItemRecord, from_micros, to_micros
+from ..storage.timeindex import UNBOUNDED, TimeRange, sort_value
 
 router = APIRouter()
 
-# インメモリストレージ（実際のプロジェクトではデータベースを使用）
-items_storage: dict[int, dict[str, Any]] = {}
-next_id = 1
+# 一覧取得の1ページあたりの件数
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# 一覧の並び順（日時は-を付けると降順）
+SORT_PATTERN = "^(id|-?created_at|-?updated_at)$"
+
+# fieldsで指定できるフィールド（レスポンスのキーはItemと同じ順に並べる）
+ITEM_FIELDS = ("name", "description", "id", "created_at", "updated_at")
+
+# 検索結果の件数
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+DEFAULT_CHANGES_LIMIT = 100
+MAX_CHANGES_LIMIT = 1000
+# API Gatewayの統合のタイムアウト（29秒）より短くする
+MAX_CHANGES_TIMEOUT = 25.0
+
+# NDJSONストリーミングでストレージから一度に読み出す件数
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+STREAM_BATCH_SIZE = 500
+
+# 一括操作のリクエストボディは配列ごと1回で検証する
+_item_create_list_adapter = TypeAdapter(ItemCreateList)
+_item_update_list_adapter = TypeAdapter(ItemBulkUpdateList)
+_item_id_list_adapter = TypeAdapter(ItemIdList)
+_item_id_adapter = TypeAdapter(int)
+
+
+def _request_body(schema: dict[str, Any]) -> dict[str, Any]:
+    """リクエストボディを自前で検証するエンドポイントのOpenAPI用定義"""
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": schema}},
+        }
+    }
+
+
+def _bulk_request_body(items_schema: dict[str, Any]) -> dict[str, Any]:
+    """一括操作エンドポイントのOpenAPI用リクエストボディ定義"""
+    return _request_body(
+        {
+            "type": "array",
+            "items": items_schema,
+            "minItems": 1,
+            "maxItems": MAX_BULK_ITEMS,
+        }
+    )
+
+
+async def _validate_bulk_body(request: Request, adapter: TypeAdapter[Any]) -> Any:
+    """リクエストボディをTypeAdapterで検証し、失敗時は422エラーにする"""
+    try:
+        return adapter.validate_json(await request.body())
+    except ValidationError as e:
+        errors = e.errors(include_url=False)
+        for error in errors:
+            error["loc"] = ("body", *error["loc"])
+        raise RequestValidationError(errors) from e
+
+
+def _is_json_content_type(request: Request) -> bool:
+    """
+    FastAPIがボディをJSONとして読むContent-Type（application/json・+json）
+    未指定の場合はstrict_content_type（新しいFastAPIではデフォルトで有効）でなければJSON
+    """
+    content_type = request.headers.get("content-type")
+    if not content_type:
+        strict = getattr(request.scope.get("route"), "strict_content_type", False)
+        return not getattr(strict, "value", strict)
+    if content_type == "application/json":
+        return True
+    # FastAPIと同じくemailモジュールでパースする（不正な値はtext/plain扱いになる）
+    message = email.message.Message()
+    message["content-type"] = content_type
+    subtype = message.get_content_subtype()
+    return message.get_content_maintype() == "application" and (
+        subtype == "json" or subtype.endswith("+json")
+    )
+
+
+def _body_errors(model: type[BaseModel], body: bytes, json_body: bool) -> list | Any:
+    """
+    FastAPIのボディ引数と同じ手順（json.loads → 検証）でボディを検証する
+    成功した場合はモデルを、失敗した場合はエラーの一覧を返す
+    """
+    value: Any = body
+    if not body:
+        value = None
+    elif json_body:
+        try:
+            value = json.loads(body)
+        except json.JSONDecodeError as e:
+            # FastAPIはJSONの構文エラーを他の検証エラーと合わせずにすぐ返す
+            raise RequestValidationError(
+                [
+                    {
+                        "type": "json_invalid",
+                        "loc": ("body", e.pos),
+                        "msg": "JSON decode error",
+                        "input": {},
+                        "ctx": {"error": e.msg},
+                    }
+                ]
+            ) from e
+        except UnicodeDecodeError as e:
+            # FastAPIはStarletteのHTTPExceptionで返す（アプリのhttp_exception_handlerを通らない）
+            raise StarletteHTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="There was an error parsing the body",
+            ) from e
+    if value is None:
+        return [
+            {
+                "type": "missing",
+                "loc": ("body",),
+                "msg": "Field required",
+                "input": None,
+            }
+        ]
+    try:
+        return model.model_validate(value, from_attributes=True)
+    except ValidationError as e:
+        errors = e.errors(include_url=False)
+        for error in errors:
+            error["loc"] = ("body", *error["loc"])
+        return errors
+
 
+def _path_errors(request: Request, name: str) -> list:
+    """IDのパスパラメータの検証エラー（FastAPIがボディのエラーの前に並べるもの）"""
+    try:
+        _item_id_adapter.validate_python(request.path_params[name])
+    except ValidationError as e:
+        return [
+            {**error, "loc": ("path", name)} for error in e.errors(include_url=False)
+        ]
+    return []
 
-@router.get("/api/items", response_model=ItemList, tags=["Items"])
-async def get_items() -> ItemList:
+
+async def _decode_item_body(
+    request: Request, model: type[BaseModel], path_param: str | None = None
+) -> Any:
+    """
+    1件分のリクエストボディをjson.loadsを使わずに検証する
+    orjsonがあればorjsonでデコードし（非ASCII文字の長い文字列ではPydanticの
+    JSONパーサーより速い）、なければPydanticのJSONパーサーで直接検証する
+
+    失敗した場合のみFastAPIと同じ手順で検証し直し、同じエラー
+    （JSONの構文エラーの位置、パスパラメータのエラーとの結合を含む）で422にする
+    """
+    body = await request.body()
+    json_body = _is_json_content_type(request)
+    if body and json_body:
+        try:
+            if orjson is not None:
+                return model.model_validate(orjson.loads(body), from_attributes=True)
+            return model.model_validate_json(body)
+        except ValueError:
+            # 構文エラー・検証エラー（どちらもValueErrorのサブクラス）
+            pass
+
+    result = _body_errors(model, body, json_body)
+    if isinstance(result, BaseModel):
+        # BOM付き・NaNなど、json.loadsだけが受け付けるJSON
+        return result
+    path_errors = _path_errors(request, path_param) if path_param else []
+    raise RequestValidationError(path_errors + result)
+
+
+async def item_storage() -> ItemStorage:
+    """
+    共有ストレージを取得する依存関係
+    同期関数の依存関係はリクエストごとにスレッドプールで実行されるため、非同期関数にする
+    （ストレージは起動時に初期化済みで、取得はブロックしない）
+    lifespanを使わない環境（Lambda）では削除のタスクが動かないため、期限が来た
+    アイテムがあればここで削除する
+    """
+    expiry = get_item_expiry()
+    if expiry.has_due():
+        await expiry.expire_due(delete_expired_items)
+    return get_storage()
+
+
+async def item_create_body(request: Request) -> ItemCreate:
+    return await _decode_item_body(request, ItemCreate)
+
+
+async def item_update_body(request: Request) -> ItemUpdate:
+    return await _decode_item_body(request, ItemUpdate, path_param="item_id")
+
+
+def _iso(value: int | None) -> str | None:
+    return from_micros(value).isoformat() if value is not None else None
+
+
+# フィールドごとにレコードからJSONの値を取り出す（Itemのシリアライズ結果と同じ形式）
+_FIELD_GETTERS: dict[str, Callable[[ItemRecord], Any]] = {
+    "name": lambda record: record.name,
+    "description": lambda record: record.description,
+    "id": lambda record: record.id,
+    "created_at": lambda record: _iso(record.created_at),
+    "updated_at": lambda record: _iso(record.updated_at),
+}
+
+Projection = Callable[[ItemRecord], dict[str, Any]]
+
+
+def _item_json(record: ItemRecord) -> bytes:
+    """レコードをItemのレスポンスと同じJSONにする（Pydanticモデルを経由しない）"""
+    return dump_json({name: getter(record) for name, getter in _FIELD_GETTERS.items()})
+
+
+def _items_json(records: list[ItemRecord], cache: ItemJsonCache) -> bytes:
+    """キャッシュ済みのアイテムのJSONを連結して配列にする"""
+    return (
+        b"[" + b",".join([cache.get(record, _item_json) for record in records]) + b"]"
+    )
+
+
+def _put_item(record: ItemRecord, op: str) -> bytes:
+    """書き込んだレコードのJSONをキャッシュし、同じバイト列で変更フィードに記録する"""
+    data = get_json_cache().put(record, _item_json)
+    get_change_feed().publish(op, record.id, data)
+    return data
+
+
+def _discard_item(item_id: int) -> None:
+    get_json_cache().discard(item_id)
+    get_item_expiry().cancel(item_id)
+    get_change_feed().publish(DELETED, item_id, None)
+
+
+async def delete_expired_items(item_ids: list[int]) -> int:
+    """
+    有効期限が来たアイテムを削除し、削除した件数を返す
+    キャッシュ・変更フィードへの反映はDELETEと同じ
+    """
+    # 期限を設定し直したアイテムは削除しない（期限の確認はストレージで行う）
+    results = await get_storage().delete_expired(item_ids, get_item_expiry().now())
+    for item_id, deleted in zip(item_ids, results, strict=True):
+        if deleted:
+            _discard_item(item_id)
+    return results.count(True)
+
+
+def _expires_at(ttl_seconds: int | None) -> int | None:
+    """
+    ttl_secondsから有効期限（エポックマイクロ秒）を求める
+    タイミングホイールで予約できない長さは、書き込む前に422にする
+    """
+    if ttl_seconds is None:
+        return None
+    expiry = get_item_expiry()
+    if ttl_seconds > expiry.max_ttl_seconds:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail=f"ttl_secondsは{int(expiry.max_ttl_seconds)}秒以内で指定してください",
+        )
+    return expiry.expires_at(ttl_seconds)
+
+
+def _schedule_expiry(record: ItemRecord) -> None:
+    if record.expires_at is not None:
+        get_item_expiry().schedule(record.id, record.expires_at)
+
+
+def _json_bytes_response(
+    body: bytes, status_code: int = status.HTTP_200_OK, headers: dict | None = None
+) -> Response:
+    return Response(
+        body, status_code=status_code, media_type="application/json", headers=headers
+    )
+
+
+FIELDS_QUERY = Query(
+    None,
+    description="返すフィールド（カンマ区切り。例: id,name）",
+    examples=["id,name"],
+)
+
+
+def _parse_fields(fields: str | None) -> Projection | None:
+    """
+    fieldsパラメータから指定フィールドのみのdictを作る関数を返す（未指定はNone）
+    Pydanticモデルを経由せず、指定されていないフィールドは変換もしない
+    """
+    if fields is None:
+        return None
+    names = {name.strip() for name in fields.split(",")}
+    unknown = sorted(names.difference(ITEM_FIELDS))
+    if unknown:
+        raise RequestValidationError(
+            [
+                {
+                    "type": "value_error",
+                    "loc": ("query", "fields"),
+                    "msg": f"不明なフィールドです: {', '.join(unknown)}",
+                    "input": fields,
+                }
+            ]
+        )
+    getters = [(name, _FIELD_GETTERS[name]) for name in ITEM_FIELDS if name in names]
+    return lambda record: {name: getter(record) for name, getter in getters}
+
+
+def item_etag(record: ItemRecord) -> str:
+    """
+    アイテムの強いETag
+    最終変更日時は更新ごとに必ず進むため、アイテムのバージョンとして使える
+    """
+    return f'"{record.version}"'
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Matchのいずれかが現在のETagと一致するか（弱い比較）"""
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(",")
+    )
+
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+
+IF_NONE_MATCH_HEADER = Header(None, description="前回のETag（変更がなければ304を返す）")
+IDEMPOTENCY_KEY_HEADER = Header(
+    None,
+    max_length=255,
+    description="再送で重複して作成しないためのキー（同じキーには最初のレスポンスを返す）",
+)
+IF_MATCH_HEADER = Header(
+    None, description="取得時のETag（アイテムが変更されていれば412を返す）"
+)
+
+
+def _if_match_versions(if_match: str | None) -> frozenset[int] | None:
+    """
+    If-Matchをストレージに渡すバージョンの集合に変換する（なし・*はNone）
+    圧縮で弱いETagになったものも同じバージョンとして扱う。数値でないETagは一致しない
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+    versions = set()
+    for tag in if_match.split(","):
+        value = tag.strip().removeprefix("W/")
+        if len(value) > 2 and value[0] == value[-1] == '"' and value[1:-1].isdigit():
+            versions.add(int(value[1:-1]))
+    return frozenset(versions)
+
+
+def _precondition_failed(version: int | None) -> HTTPException:
+    """If-Matchが一致しない場合の412（現在のETagを返し、クライアントが再取得できるようにする）"""
+    return HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail="アイテムは他のリクエストで変更されています",
+        headers={"ETag": f'"{version}"'} if version is not None else None,
+    )
+
+
+def _not_found(item_id: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail=f"アイテムID {item_id} が見つかりません",
+    )
+
+
+def encode_cursor(item_id: int, order_by: str = "id", value: int = 0) -> str:
+    """
+    最後に返したアイテムの位置を不透明なカーソル文字列に変換する
+    日時順の場合は並び順のフィールド名と値（エポックマイクロ秒）も含める
+    """
+    payload = f"id:{item_id}" if order_by == "id" else f"{order_by}:{value}:{item_id}"
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, order_by: str = "id") -> tuple[int, int]:
+    """カーソル文字列から(並び順の値, アイテムID)を取り出す（ID順の場合は値もID）"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        prefix, _, value = base64.urlsafe_b64decode(padded).decode().partition(":")
+        if prefix != order_by:
+            raise ValueError(cursor)
+        if order_by == "id":
+            return int(value), int(value)
+        sort_value, _, item_id = value.partition(":")
+        return int(sort_value), int(item_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="カーソルの形式が正しくありません",
+        ) from e
+
+
+def _time_bound(value: datetime | None, offset: int = 0) -> int | None:
+    """クエリパラメータの日時をエポックマイクロ秒に変換する（タイムゾーンなしはUTC）"""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=UTC)
+    return to_micros(value) + offset
+
+
+def _ndjson_encoder(projection: Projection | None) -> Callable[[ItemRecord], bytes]:
+    """レコードをNDJSONの1行に変換する関数を返す"""
+    if projection is None:
+        # 全件を流すとキャッシュの内容が入れ替わるため、キャッシュは使わない
+        return lambda record: _item_json(record) + b"\n"
+    return lambda record: dump_json(projection(record)) + b"\n"
+
+
+async def _ndjson_lines(
+    storage: ItemStorage,
+    after_id: int | None,
+    encode: Callable[[ItemRecord], bytes],
+) -> AsyncIterator[bytes]:
+    """ストレージのイテレータから1行1アイテムのNDJSONを生成する"""
+    async for record in storage.iter_items(
+        after_id=after_id, batch_size=STREAM_BATCH_SIZE
+    ):
+        yield encode(record)
+
+
+async def _ndjson_lines_by_time(
+    storage: ItemStorage,
+    order_by: str,
+    created: TimeRange,
+    modified: TimeRange,
+    after: tuple[int, int] | None,
+    descending: bool,
+    encode: Callable[[ItemRecord], bytes],
+) -> AsyncIterator[bytes]:
+    """日時の範囲・並び順を指定した場合のNDJSONをページ単位で取得しながら生成する"""
+    while records := await storage.list_items_by_time(
+        order_by, created, modified, after, STREAM_BATCH_SIZE, descending
+    ):
+        for record in records:
+            yield encode(record)
+        last = records[-1]
+        after = (sort_value(last, order_by), last.id)
+
+
+@router.get(
+    "/api/items",
+    response_model=ItemList,
+    tags=["Items"],
+    responses={200: {"content": {NDJSON_MEDIA_TYPE: {}}}},
+)
+async def get_items(
+    request: Request,
+    limit: int = Query(
+        DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="取得件数"
+    ),
+    cursor: str | None = Query(None, description="前ページのnext_cursor"),
+    created_after: datetime | None = Query(
+        None, description="この日時より後に作成されたアイテムに絞り込む"
+    ),
+    created_before: datetime | None = Query(
+        None, description="この日時より前に作成されたアイテムに絞り込む"
+    ),
+    updated_since: datetime | None = Query(
+        None,
+        description="この日時以降に更新（未更新の場合は作成）されたアイテムに絞り込む",
+    ),
+    sort: str = Query(
+        "id",
+        pattern=SORT_PATTERN,
+        description="並び順（id / created_at / updated_at。-を付けると降順）",
+    ),
+    fields: str | None = FIELDS_QUERY,
+    if_none_match: str | None = IF_NONE_MATCH_HEADER,
+    storage: ItemStorage = Depends(item_storage),
+):
     """
     アイテム一覧取得
+    並び順のキーとIDを組み合わせたカーソルでページングする
+
+    日時で絞り込む場合やsortに日時を指定した場合は、作成日時・更新日時の
+    索引から範囲内のアイテムだけを取り出す。updated_atの並び順・絞り込みでは
+    未更新のアイテムを作成日時で扱う。totalは条件によらず全件数を返す
+
+    fieldsを指定した場合、itemsの各要素は指定したフィールドのみになる。
+    指定しない場合はアイテムごとのキャッシュ済みJSONを連結してレスポンスにする
+
+    ETagはストレージ全体のバージョンで、いずれかのアイテムが変わる・期限切れになると変わる。
+    If-None-Matchが一致した場合はアイテムを読み出さずに304を返す
+
+    Accept: application/x-ndjson の場合はcursor以降の全件を1行1アイテムで
+    ストリーミングする（limitは無視される）
     """
-    items = []
-    for item_id, item_data in items_storage.items():
-        items.append(
-            Item(
-                id=item_id,
-                name=item_data["name"],
-                description=item_data["description"],
-                created_at=item_data["created_at"],
-                updated_at=item_data.get("updated_at"),
+    descending = sort.startswith("-")
+    order_by = sort.removeprefix("-")
+    created = (_time_bound(created_after, 1), _time_bound(created_before))
+    modified = (_time_bound(updated_since), None)
+    after = decode_cursor(cursor, order_by) if cursor is not None else None
+    by_time = sort != "id" or created != UNBOUNDED or modified != UNBOUNDED
+    projection = _parse_fields(fields)
+
+    if NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        # ストリーミングはETagの対象外
+        encode = _ndjson_encoder(projection)
+        lines = (
+            _ndjson_lines_by_time(
+                storage, order_by, created, modified, after, descending, encode
             )
+            if by_time
+            else _ndjson_lines(storage, after[1] if after is not None else None, encode)
         )
+        return StreamingResponse(lines, media_type=NDJSON_MEDIA_TYPE)
 
-    return ItemList(items=items, total=len(items))
+    # バージョンはアイテムより先に読む（途中で変わった場合も古いETagになるだけ）
+    version = await storage.store_version()
+    etag = f'"{version}"' if version is not None else None
+    if etag is not None and _etag_matches(if_none_match, etag):
+        return _not_modified(etag)
+    headers = {"ETag": etag} if etag is not None else None
 
+    # 1件多く取得して次ページの有無を判定する
+    if by_time:
+        records = await storage.list_items_by_time(
+            order_by, created, modified, after, limit + 1, descending
+        )
+    else:
+        records = await storage.list_items(
+            after_id=after[1] if after is not None else None, limit=limit + 1
+        )
+    has_next = len(records) > limit
+    records = records[:limit]
 
-@router.get("/api/items/{item_id}", response_model=Item, tags=["Items"])
-async def get_item(item_id: int) -> Item:
+    next_cursor = None
+    if has_next:
+        last = records[-1]
+        next_cursor = encode_cursor(last.id, order_by, sort_value(last, order_by))
+    if projection is not None:
+        # Responseを直接返し、response_modelによる検証・変換を省く
+        return FastJSONResponse(
+            {
+                "items": [projection(record) for record in records],
+                "total": await storage.count(),
+                "next_cursor": next_cursor,
+            },
+            headers=headers,
+        )
+    # ItemListと同じキーの順・形式で組み立てる
+    body = b'{"items":%s,"total":%d,"next_cursor":%s}' % (
+        _items_json(records, get_json_cache()),
+        await storage.count(),
+        dump_json(next_cursor),
+    )
+    return _json_bytes_response(body, headers=headers)
+
+
+@router.get("/api/items/search", response_model=ItemSearchResponse, tags=["Items"])
+async def search_items(
+    q: str = Query(..., min_length=1, max_length=100, description="検索文字列"),
+    limit: int = Query(
+        DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_SEARCH_LIMIT, description="取得件数"
+    ),
+    storage: ItemStorage = Depends(item_storage),
+):
     """
-    アイテム詳細取得
+    アイテム検索
+    name・descriptionにqを含むアイテムを関連度の高い順に返す
+    （名前に含むものを優先し、同点はID順）
+    """
+    records, total = await storage.search(q, limit)
+    body = b'{"items":%s,"total":%d}' % (_items_json(records, get_json_cache()), total)
+    return _json_bytes_response(body)
+
+
+@router.get(
+    "/api/items/changes",
+    response_model=ItemChanges,
+    tags=["Items"],
+    responses={
+        status.HTTP_410_GONE: {
+            "model": ItemChanges,
+            "description": "sinceの直後の変更を保持していない（再同期が必要）",
+        }
+    },
+)
+async def list_item_changes(
+    since: str = Query(
+        "0", description="前回のレスポンスのcursor（初回は0）", max_length=64
+    ),
+    limit: int = Query(
+        DEFAULT_CHANGES_LIMIT, ge=1, le=MAX_CHANGES_LIMIT, description="取得件数"
+    ),
+    timeout: float = Query(
+        0,
+        ge=0,
+        le=MAX_CHANGES_TIMEOUT,
+        description="sinceより後の変更がない場合に、届くまで待つ秒数（ロングポーリング）",
+    ),
+):
     """
-    if item_id not in items_storage:
+    アイテムの変更フィード
+    sinceより後の作成・更新・削除を古い順に返す（変更後のアイテムを含む）
+
+    変更フィードはワーカー（プロセス）ごとで、再起動するとやり直す。
+    sinceの直後の変更がリングバッファから押し出されている場合や、sinceが別のプロセス・
+    再起動前のカーソルの場合は410とresync_required=trueを返す。一覧を取得し直し、
+    このレスポンスのcursorから再開する（一覧の取得中の変更は重複して届くが、取りこぼしはない）
+    """
+    feed = get_change_feed()
+    try:
+        seq = feed.resolve(since)
+    except ValueError as e:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"アイテムID {item_id} が見つかりません",
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="カーソルの形式が正しくありません",
+        ) from e
+    events = feed.since(seq, limit) if seq is not None else None
+    if events == [] and timeout > 0 and seq is not None:
+        await feed.wait(seq, timeout)
+        events = feed.since(seq, limit)
+    if events is None:
+        last_seq = feed.last_seq
+        body = b'{"events":[],"last_seq":%d,"cursor":"%s","resync_required":true}' % (
+            last_seq,
+            feed.cursor(last_seq).encode(),
         )
+        return _json_bytes_response(body, status.HTTP_410_GONE)
+
+    last_seq = events[-1].seq if events else seq
+    body = b'{"events":[%s],"last_seq":%d,"cursor":"%s","resync_required":false}' % (
+        b",".join([event.data for event in events]),
+        last_seq,
+        feed.cursor(last_seq).encode(),
+    )
+    return _json_bytes_response(body)
+
+
+@router.get(
+    "/api/items/deleted",
+    response_model=ItemTombstones,
+    tags=["Items"],
+    responses={
+        status.HTTP_410_GONE: {
+            "model": ItemTombstones,
+            "description": "sinceより後の削除をすべては保持していない（再同期が必要）",
+        }
+    },
+)
+async def list_deleted_items(
+    since: datetime = Query(..., description="この日時以降に削除されたアイテムを返す"),
+    limit: int = Query(
+        DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="取得件数"
+    ),
+    cursor: str | None = Query(None, description="前ページのnext_cursor"),
+    storage: ItemStorage = Depends(item_storage),
+):
+    """
+    削除したアイテムの一覧（墓標）
+    sinceの日時以降の削除を削除日時の順に返す。updated_sinceを指定した一覧と
+    組み合わせると、前回の同期以降の変更を全件を取得し直さずに反映できる
 
-    item_data = items_storage[item_id]
-    return Item(
-        id=item_id,
-        name=item_data["name"],
-        description=item_data["description"],
-        created_at=item_data["created_at"],
-        updated_at=item_data.get("updated_at"),
+    墓標は保持期間（APP_TOMBSTONE_RETENTION_SECONDS）を過ぎると回収される。
+    sinceより後の削除をすべては保持していない場合（回収済み・再起動前の削除）は
+    410とresync_required=trueを返す。墓標を保持しないバックエンド（shared）では常に410
+    """
+    after = (
+        decode_cursor(cursor, "deleted_at")
+        if cursor is not None
+        else (_time_bound(since), 0)
     )
+    tombstones = await storage.list_tombstones(after, limit + 1)
+    if tombstones is None:
+        body = b'{"items":[],"next_cursor":null,"resync_required":true}'
+        return _json_bytes_response(body, status.HTTP_410_GONE)
+
+    next_cursor = None
+    if len(tombstones) > limit:
+        tombstones = tombstones[:limit]
+        last = tombstones[-1]
+        next_cursor = encode_cursor(last.id, "deleted_at", last.deleted_at)
+    return FastJSONResponse(
+        {
+            "items": [
+                {"id": tombstone.id, "deleted_at": _iso(tombstone.deleted_at)}
+                for tombstone in tombstones
+            ],
+            "next_cursor": next_cursor,
+            "resync_required": False,
+        }
+    )
+
+
+@router.get("/api/items/expiry", response_model=ItemExpiryStats, tags=["Items"])
+async def get_item_expiry_stats():
+    """
+    アイテムの有効期限の処理状況
+    期限はワーカーごとに管理するため、このリクエストを処理したワーカーの値を返す
+    """
+    return FastJSONResponse(get_item_expiry().stats())
+
+
+# 送信が追いつかずに切り離す場合のクローズコード（Try Again Later）
+WS_CLOSE_SLOW_CONSUMER = 1013
+
+
+@router.websocket("/api/items/ws")
+async def item_changes_websocket(websocket: WebSocket):
+    """
+    アイテムの変更のプッシュ配信
+    接続後の作成・更新・削除を、変更フィードのイベントと同じJSONのテキストフレームで送る
+
+    送信が追いつかずに未送信の変更が上限（APP_WS_QUEUE_SIZE）を超えた場合は
+    1013で切断する。再接続後は、最後に受け取ったイベントのcursorを変更フィードの
+    sinceに指定して取りこぼした分を取得する
+    """
+    await websocket.accept()
+    subscription = get_change_feed().subscribe()
+    # 切断はクライアントからの受信で検知し、送信側の待機を終わらせる
+    receiver = asyncio.create_task(_close_on_disconnect(websocket, subscription))
+    try:
+        while (events := await subscription.get()) is not None:
+            for text in events:
+                await websocket.send_text(text)
+        # 切断されていないのに購読が終わった場合は、送信が追いつかずに切り離された
+        slow = not receiver.done()
+    except WebSocketDisconnect:
+        slow = False
+    finally:
+        subscription.close()
+        receiver.cancel()
+    if slow:
+        await websocket.close(code=WS_CLOSE_SLOW_CONSUMER, reason="slow consumer")
+
+
+async def _close_on_disconnect(
+    websocket: WebSocket, subscription: Subscription
+) -> None:
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+    subscription.close()
 
 
 @router.post(
-    "/api/items",
-    response_model=Item,
+    "/api/items/bulk",
+    response_model=ItemBulkCreateResponse,
     status_code=status.HTTP_201_CREATED,
     tags=["Items"],
+    openapi_extra=_bulk_request_body(ItemCreate.model_json_schema()),
 )
-async def create_item(item: ItemCreate) -> Item:
+async def create_items_bulk(
+    request: Request, storage: ItemStorage = Depends(item_storage)
+):
     """
-    アイテム作成
+    アイテム一括作成
+    全件の検証に成功した場合のみ、連続したIDでまとめて登録する
     """
-    global next_id
+    items = await _validate_bulk_body(request, _item_create_list_adapter)
+    expires_at = [_expires_at(item.ttl_seconds) for item in items]
+    records = await storage.create_items(
+        [(item.name, item.description) for item in items], expires_at
+    )
+    for record in records:
+        _schedule_expiry(record)
+    body = b'{"items":[%s],"created":%d}' % (
+        b",".join([_put_item(record, CREATED) for record in records]),
+        len(records),
+    )
+    return _json_bytes_response(body, status.HTTP_201_CREATED)
 
-    current_time = datetime.now(UTC)
-    item_data = {
-        "name": item.name,
-        "description": item.description,
-        "created_at": current_time,
-        "updated_at": None,
-    }
 
-    items_storage[next_id] = item_data
-    created_item = Item(
-        id=next_id,
-        name=item_data["name"],
-        description=item_data["description"],
-        created_at=item_data["created_at"],
-        updated_at=item_data["updated_at"],
+@router.patch(
+    "/api/items/bulk",
+    response_model=ItemBulkStatusResponse,
+    tags=["Items"],
+    openapi_extra=_bulk_request_body(ItemBulkUpdate.model_json_schema()),
+)
+async def update_items_bulk(
+    request: Request, storage: ItemStorage = Depends(item_storage)
+):
+    """
+    アイテム一括更新
+    IDごとの結果を200（更新）/ 404（存在しない）で返す
+    """
+    updates = await _validate_bulk_body(request, _item_update_list_adapter)
+    expires_at = [_expires_at(update.ttl_seconds) for update in updates]
+    results = await storage.update_items(
+        [(update.id, update.name, update.description) for update in updates],
+        expires_at,
     )
+    for record, record_expires in zip(results, expires_at, strict=True):
+        if record is not None:
+            _put_item(record, UPDATED)
+            if record_expires is not None:
+                _schedule_expiry(record)
 
-    next_id += 1
-    return created_item
+    statuses = [
+        status.HTTP_200_OK if record is not None else status.HTTP_404_NOT_FOUND
+        for record in results
+    ]
+    return model_response(
+        ItemBulkStatusResponse(
+            statuses=statuses, succeeded=statuses.count(status.HTTP_200_OK)
+        )
+    )
 
 
-@router.put("/api/items/{item_id}", response_model=Item, tags=["Items"])
-async def update_item(item_id: int, item: ItemUpdate) -> Item:
+@router.delete(
+    "/api/items/bulk",
+    response_model=ItemBulkStatusResponse,
+    tags=["Items"],
+    openapi_extra=_bulk_request_body({"type": "integer"}),
+)
+async def delete_items_bulk(
+    request: Request, storage: ItemStorage = Depends(item_storage)
+):
     """
-    アイテム更新
+    アイテム一括削除
+    IDごとの結果を204（削除）/ 404（存在しない）で返す
     """
-    if item_id not in items_storage:
+    item_ids = await _validate_bulk_body(request, _item_id_list_adapter)
+    results = await storage.delete_items(item_ids)
+    for item_id, deleted in zip(item_ids, results, strict=True):
+        if deleted:
+            _discard_item(item_id)
+
+    statuses = [
+        status.HTTP_204_NO_CONTENT if deleted else status.HTTP_404_NOT_FOUND
+        for deleted in results
+    ]
+    return model_response(
+        ItemBulkStatusResponse(
+            statuses=statuses, succeeded=statuses.count(status.HTTP_204_NO_CONTENT)
+        )
+    )
+
+
+@router.get("/api/items/{item_id}", response_model=Item, tags=["Items"])
+async def get_item(
+    item_id: int,
+    fields: str | None = FIELDS_QUERY,
+    if_none_match: str | None = IF_NONE_MATCH_HEADER,
+    storage: ItemStorage = Depends(item_storage),
+):
+    """
+    アイテム詳細取得
+    fieldsを指定した場合は指定したフィールドのみを返す
+    If-None-MatchがアイテムのETagと一致した場合はレスポンスを組み立てずに304を返す
+    それ以外はキャッシュ済みのJSONをそのまま返す
+    """
+    projection = _parse_fields(fields)
+    record = await storage.get_item(item_id)
+    if record is None:
+        raise _not_found(item_id)
+
+    etag = item_etag(record)
+    if _etag_matches(if_none_match, etag):
+        return _not_modified(etag)
+    if projection is not None:
+        return FastJSONResponse(projection(record), headers={"ETag": etag})
+    return _json_bytes_response(
+        get_json_cache().get(record, _item_json), headers={"ETag": etag}
+    )
+
+
+@router.post(
+    "/api/items",
+    response_model=Item,
+    status_code=status.HTTP_201_CREATED,
+    tags=["Items"],
+    openapi_extra=_request_body(ItemCreate.model_json_schema()),
+)
+async def create_item(
+    request: Request,
+    idempotency_key: str | None = IDEMPOTENCY_KEY_HEADER,
+    storage: ItemStorage = Depends(item_storage),
+):
+    """
+    アイテム作成
+    作成したアイテムのJSONはそのままキャッシュし、以降の読み出しで使う
+    ttl_secondsを指定した場合は、その秒数が過ぎると削除する
+
+    Idempotency-Keyを指定した場合、同じキー・同じボディの再送には検証・作成を
+    やり直さずに最初のレスポンスを返す（処理中の再送は409、別のボディでの再利用は422）
+    """
+    if idempotency_key is None:
+        return await _create_item(request, storage)
+
+    cache = get_idempotency_cache()
+    try:
+        stored = await cache.begin(idempotency_key, fingerprint(await request.body()))
+    except IdempotencyKeyInUse as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="同じIdempotency-Keyのリクエストを処理中です",
+        ) from e
+    except IdempotencyKeyMismatch as e:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"アイテムID {item_id} が見つかりません",
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail="Idempotency-Keyは別の内容のリクエストで使用済みです",
+        ) from e
+    if stored is not None:
+        return _json_bytes_response(
+            stored.body, stored.status_code, headers={"Idempotent-Replayed": "true"}
         )
 
-    item_data = items_storage[item_id]
-    current_time = datetime.now(UTC)
+    try:
+        response = await _create_item(request, storage)
+    except BaseException:
+        # 検証エラーなどは保存せず、同じキーで送り直せるようにする
+        await cache.release(idempotency_key)
+        raise
+    await cache.complete(
+        idempotency_key, StoredResponse(response.status_code, response.body)
+    )
+    return response
 
-    # 更新されたフィールドのみを更新
-    if item.name is not None:
-        item_data["name"] = item.name
-    if item.description is not None:
-        item_data["description"] = item.description
 
-    item_data["updated_at"] = current_time
+async def _create_item(request: Request, storage: ItemStorage) -> Response:
+    item = await item_create_body(request)
+    record = await storage.create_item(
+        item.name, item.description, _expires_at(item.ttl_seconds)
+    )
+    _schedule_expiry(record)
+    return _json_bytes_response(_put_item(record, CREATED), status.HTTP_201_CREATED)
 
-    return Item(
-        id=item_id,
-        name=item_data["name"],
-        description=item_data["description"],
-        created_at=item_data["created_at"],
-        updated_at=item_data["updated_at"],
+
+@router.put(
+    "/api/items/{item_id}",
+    response_model=Item,
+    tags=["Items"],
+    openapi_extra=_request_body(ItemUpdate.model_json_schema()),
+)
+async def update_item(
+    item_id: int,
+    item: ItemUpdate = Depends(item_update_body),
+    if_match: str | None = IF_MATCH_HEADER,
+    storage: ItemStorage = Depends(item_storage),
+):
+    """
+    アイテム更新
+    If-Matchを指定した場合、アイテムのバージョンが一致するときのみ更新する（不一致は412）
+    ttl_secondsを指定した場合は有効期限を今から設定し直す（省略時は変えない）
+    """
+    # 更新されたフィールドのみを更新
+    expires_at = _expires_at(item.ttl_seconds)
+    try:
+        record = await storage.update_item(
+            item_id,
+            item.name,
+            item.description,
+            _if_match_versions(if_match),
+            expires_at,
+        )
+    except VersionConflictError as e:
+        raise _precondition_failed(e.version) from e
+    if record is None:
+        # 存在しないアイテムにはIf-Matchのどれも一致しない
+        raise (
+            _precondition_failed(None) if if_match is not None else _not_found(item_id)
+        )
+    if expires_at is not None:
+        _schedule_expiry(record)
+
+    return _json_bytes_response(
+        _put_item(record, UPDATED), headers={"ETag": item_etag(record)}
     )
 
 
 @router.delete(
     "/api/items/{item_id}", status_code=status.HTTP_204_NO_CONTENT, tags=["Items"]
 )
-async def delete_item(item_id: int):
+async def delete_item(
+    item_id: int,
+    if_match: str | None = IF_MATCH_HEADER,
+    storage: ItemStorage = Depends(item_storage),
+):
     """
     アイテム削除
+    If-Matchの扱いは更新と同じ
     """
-    if item_id not in items_storage:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"アイテムID {item_id} が見つかりません",
+    try:
+        deleted = await storage.delete_item(item_id, _if_match_versions(if_match))
+    except VersionConflictError as e:
+        raise _precondition_failed(e.version) from e
+    if not deleted:
+        raise (
+            _precondition_failed(None) if if_match is not None else _not_found(item_id)
         )
-
-    del items_storage[item_id]
+    _discard_item(item_id)
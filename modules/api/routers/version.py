@@ -8,19 +8,22 @@ from datetime import UTC, datetime
 from fastapi import APIRouter
 
 from ..models.schemas import VersionResponse
+from ..responses import FastJSONResponse, model_response
 
 router = APIRouter()
 
 
 @router.get("/version", response_model=VersionResponse, tags=["Version"])
-async def get_version() -> VersionResponse:
+async def get_version() -> FastJSONResponse:
     """
     バージョン情報エンドポイント
     アプリケーションのバージョン情報を取得する
     """
-    return VersionResponse(
-        version="1.0.0",
-        build_time=datetime.now(UTC),
-        commit_hash=os.getenv("COMMIT_HASH", "unknown"),
-        environment=os.getenv("APP_ENVIRONMENT", "local"),
+    return model_response(
+        VersionResponse(
+            version="1.0.0",
+            build_time=datetime.now(UTC),
+            commit_hash=os.getenv("COMMIT_HASH", "unknown"),
+            environment=os.getenv("APP_ENVIRONMENT", "local"),
+        )
     )
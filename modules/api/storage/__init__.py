@@ -0,0 +1 @@
+# ストレージパッケージ
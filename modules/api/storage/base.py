@@ -0,0 +1,204 @@
+"""
+アイテムストレージのインターフェース定義
+ルーターはこのインターフェースにのみ依存する
+"""
+
+from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator, Collection
+
+from .record import ItemRecord, Tombstone
+from .search import normalize, score, top_matches
+from .timeindex import UNBOUNDED, TimeRange, in_range, sort_value
+
+
+class VersionConflictError(Exception):
+    """If-Matchで指定されたバージョンとアイテムの現在のバージョンが一致しない"""
+
+    def __init__(self, item_id: int, version: int) -> None:
+        super().__init__(f"item {item_id} is at version {version}")
+        self.item_id = item_id
+        self.version = version
+
+
+class ItemStorage(ABC):
+    """
+    アイテムストレージの抽象基底クラス
+
+    有効期限（expires_at）を過ぎたアイテムは、削除される前でもすべての読み取り・
+    更新・削除で存在しないものとして扱う（count()だけは未削除のものを含みうる）。
+    期限切れのアイテムはdelete_expired()で削除する
+    """
+
+    @abstractmethod
+    async def list_items(
+        self, after_id: int | None = None, limit: int | None = None
+    ) -> list[ItemRecord]:
+        """
+        アイテムをID昇順で取得する
+        after_idより大きいIDから最大limit件を返す（キーセットページネーション）
+        """
+
+    @abstractmethod
+    def iter_items(
+        self, after_id: int | None = None, batch_size: int = 500
+    ) -> AsyncIterator[ItemRecord]:
+        """
+        アイテムをID昇順で1件ずつ返す非同期イテレータ
+        開始時点のスナップショットを返し、途中の書き込みの影響を受けない
+        """
+
+    @abstractmethod
+    async def get_item(self, item_id: int) -> ItemRecord | None:
+        """IDでアイテムを取得する（存在しない場合はNone）"""
+
+    @abstractmethod
+    async def create_item(
+        self, name: str, description: str, expires_at: int | None = None
+    ) -> ItemRecord:
+        """アイテムを作成して作成結果を返す（expires_atは有効期限。Noneは無期限）"""
+
+    @abstractmethod
+    async def create_items(
+        self,
+        items: list[tuple[str, str]],
+        expires_at: list[int | None] | None = None,
+    ) -> list[ItemRecord]:
+        """
+        (name, description)の一覧を一括作成する
+        連続したIDを一度に確保し、全件を1回の操作で登録する
+        expires_atは入力順のアイテムごとの有効期限（省略時はすべて無期限）
+        """
+
+    @abstractmethod
+    async def update_item(
+        self,
+        item_id: int,
+        name: str | None,
+        description: str | None,
+        if_match: Collection[int] | None = None,
+        expires_at: int | None = None,
+    ) -> ItemRecord | None:
+        """
+        アイテムを更新して更新結果を返す
+        Noneのフィールド・有効期限は更新しない。存在しない場合はNoneを返す
+        更新日時は変更前の最終変更日時より必ず後にする（アイテムのバージョンに使う）
+        if_matchを指定した場合、現在のバージョンがいずれとも一致しなければ
+        VersionConflictErrorを送出する（比較と書き込みは不可分に行うこと）
+        """
+
+    @abstractmethod
+    async def update_items(
+        self,
+        updates: list[tuple[int, str | None, str | None]],
+        expires_at: list[int | None] | None = None,
+    ) -> list[ItemRecord | None]:
+        """
+        (id, name, description)の一覧を一括更新する
+        結果は入力順で、存在しないIDはNoneになる
+        expires_atは入力順の新しい有効期限（Noneは変えない）
+        """
+
+    @abstractmethod
+    async def delete_item(
+        self, item_id: int, if_match: Collection[int] | None = None
+    ) -> bool:
+        """
+        アイテムを削除する（削除できた場合True）
+        if_matchの扱いはupdate_itemと同じ
+        """
+
+    @abstractmethod
+    async def delete_items(self, item_ids: list[int]) -> list[bool]:
+        """IDの一覧を一括削除する（結果は入力順で、削除できた場合True）"""
+
+    @abstractmethod
+    async def delete_expired(self, item_ids: list[int], now: int) -> list[bool]:
+        """
+        IDの一覧のうち、有効期限がnow以前のアイテムだけを削除する
+        （結果は入力順。期限の確認と削除は不可分に行うこと）
+        """
+
+    @abstractmethod
+    async def count(self) -> int:
+        """アイテム件数を取得する（全件走査せずに返すこと）"""
+
+    async def search(self, query: str, limit: int) -> tuple[list[ItemRecord], int]:
+        """
+        name・descriptionにqueryを含むアイテムを関連度順に最大limit件取得する
+        (上位のアイテム, 一致件数)を返す。デフォルトは全件を照合する
+        """
+        query = normalize(query)
+        scored = [
+            (value, record)
+            async for record in self.iter_items()
+            if (value := score(record, query))
+        ]
+        return top_matches(scored, limit)
+
+    async def list_items_by_time(
+        self,
+        order_by: str,
+        created: TimeRange = UNBOUNDED,
+        modified: TimeRange = UNBOUNDED,
+        after: tuple[int, int] | None = None,
+        limit: int | None = None,
+        descending: bool = False,
+    ) -> list[ItemRecord]:
+        """
+        作成日時・最終変更日時（未更新の場合は作成日時）の範囲でアイテムを取得する
+        order_by（id / created_at / updated_at）の値とIDの順に並べ、
+        afterの(値, ID)より後ろから最大limit件を返す。デフォルトは全件を照合する
+        """
+
+        def position(record: ItemRecord) -> tuple[int, int]:
+            return sort_value(record, order_by), record.id
+
+        records = [
+            record
+            async for record in self.iter_items()
+            if in_range(record.created_at, created)
+            and in_range(record.modified_at, modified)
+            and (
+                after is None
+                or (
+                    position(record) < after if descending else position(record) > after
+                )
+            )
+        ]
+        records.sort(key=position, reverse=descending)
+        return records[:limit]
+
+    async def store_version(self) -> str | None:
+        """
+        ストレージ全体のバージョン（いずれかのアイテムが変わるたびに変わる不透明な文字列）
+        有効期限が過ぎてアイテムが見えなくなった場合も、削除を待たずに変わる。
+        一覧のETagに使う。対応しない場合はNone
+        """
+        return None
+
+    async def list_tombstones(
+        self, after: tuple[int, int], limit: int
+    ) -> list[Tombstone] | None:
+        """
+        削除したアイテムの墓標を(削除日時, ID)の順に、afterより後ろから最大limit件取得する
+        afterの削除日時より後の削除をすべては保持していない場合（回収済み・起動前の削除）は
+        Noneを返す。デフォルトは墓標を保持しないため常にNone
+        """
+        return None
+
+    async def compact(self, before: int, budget: float) -> int:
+        """
+        削除日時がbeforeより前の墓標と、削除で使われなくなった領域を回収する
+        1回の呼び出しは約budget秒で打ち切り、残りは次の呼び出しで続ける。
+        回収した件数を返す。時間切れで残りがある場合は、回収した件数が0でも
+        1以上を返す（呼び出し側は0が返るまで間を空けずに続ける）。デフォルトは何もしない
+        """
+        return 0
+
+    @abstractmethod
+    async def clear(self) -> None:
+        """全アイテムを削除し、IDの採番を初期化する"""
+
+    async def close(self) -> None:
+        """ストレージが保持するリソースを解放する（デフォルトは何もしない）"""
+        return None
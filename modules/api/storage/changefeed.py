@@ -0,0 +1,249 @@
+"""
+アイテムの変更フィード
+作成・更新・削除ごとに連番（シーケンス番号）を振り、直近の変更を固定長のリングバッファに保持する
+
+- 変更はエンコード済みのJSON（1件分のイベント）として保持し、読み出しでは連結するだけにする
+- シーケンス番号はsを s % capacity の位置に置くため、任意の位置からO(1)で読み出せる
+- リングバッファから押し出された位置からの読み出しは再同期が必要（Noneを返す）
+- wait()で新しい変更が届くまで（またはタイムアウトまで）待てる（ロングポーリング）
+- subscribe()した購読者には変更を届ける（WebSocketでの配信用）。イベントの文字列は
+  1回だけ作り、購読者ごとの上限付きキューに同じものを入れる。キューが一杯の
+  購読者（送信が追いつかない）は待たずに切り離し、書き込み側を止めない
+
+変更フィードはワーカー（プロセス）ごとで、共有ストレージへの他のワーカーの変更は
+含まない。シーケンス番号は再起動すると1からやり直すため、読み出し位置は
+起動ごとのトークン（epoch）と組み合わせたカーソル（"<epoch>:<seq>"）で表し、
+別のプロセス・再起動前のカーソルは再同期が必要とする。
+"""
+
+import asyncio
+import secrets
+from collections import deque
+
+DEFAULT_CAPACITY = 10_000
+DEFAULT_QUEUE_SIZE = 256
+
+# 変更の種類
+CREATED = "created"
+UPDATED = "updated"
+DELETED = "deleted"
+
+
+class ChangeEvent:
+    """1件の変更（シーケンス番号・アイテムIDとイベントのJSON）"""
+
+    __slots__ = ("seq", "item_id", "data")
+
+    def __init__(self, seq: int, item_id: int, data: bytes) -> None:
+        self.seq = seq
+        self.item_id = item_id
+        self.data = data
+
+
+def encode_event(
+    epoch: str, seq: int, op: str, item_id: int, item_json: bytes | None
+) -> bytes:
+    """イベントのJSON（削除の場合itemはnull）"""
+    return b'{"seq":%d,"cursor":"%s:%d","op":"%s","id":%d,"item":%s}' % (
+        seq,
+        epoch.encode(),
+        seq,
+        op.encode(),
+        item_id,
+        item_json if item_json is not None else b"null",
+    )
+
+
+def _wake(waiter: "asyncio.Future[None]") -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+def _running_loop() -> asyncio.AbstractEventLoop | None:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def _notify(
+    waiter: "asyncio.Future[None]", loop: asyncio.AbstractEventLoop | None
+) -> None:
+    """待っているFutureを完了させる（別のスレッドのイベントループの場合はそのループで）"""
+    if waiter.get_loop() is loop:
+        _wake(waiter)
+    else:
+        waiter.get_loop().call_soon_threadsafe(_wake, waiter)
+
+
+class Subscription:
+    """
+    1購読者分の上限付きキュー
+    get()で溜まったイベントをまとめて受け取る。切り離された後はNoneを返す
+    """
+
+    __slots__ = ("max_queue", "dropped", "_queue", "_waiter", "_feed")
+
+    def __init__(self, feed: "ChangeFeed", max_queue: int) -> None:
+        self.max_queue = max_queue
+        self.dropped = False
+        self._queue: deque[str] = deque()
+        self._waiter: asyncio.Future[None] | None = None
+        self._feed = feed
+
+    def _push(self, text: str, loop: asyncio.AbstractEventLoop | None) -> bool:
+        """イベントを追加する（キューが一杯の場合は追加せずにFalse）"""
+        if len(self._queue) >= self.max_queue:
+            return False
+        self._queue.append(text)
+        # _waiterはget()側で外す（別のスレッドからここで消すと次の待機を消しうる）
+        waiter = self._waiter
+        if waiter is not None:
+            _notify(waiter, loop)
+        return True
+
+    def _drop(self, loop: asyncio.AbstractEventLoop | None) -> None:
+        self.dropped = True
+        self._queue.clear()
+        waiter = self._waiter
+        if waiter is not None:
+            _notify(waiter, loop)
+
+    async def get(self) -> list[str] | None:
+        """イベントが届くまで待ち、溜まっているものをすべて返す（切り離された場合はNone）"""
+        while not self._queue and not self.dropped:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiter = waiter
+            try:
+                # 別のスレッドから追加された場合に備えて、登録後にもう一度確認する
+                if not self._queue and not self.dropped:
+                    await waiter
+            finally:
+                self._waiter = None
+        if self.dropped:
+            return None
+        events = list(self._queue)
+        self._queue.clear()
+        return events
+
+    def close(self) -> None:
+        """購読をやめる（get()で待っている場合はNoneを返させる）"""
+        self._feed._subscribers.discard(self)
+        self._drop(_running_loop())
+
+
+class ChangeFeed:
+    """直近capacity件の変更を保持するリングバッファと、変更の購読者"""
+
+    def __init__(
+        self, capacity: int = DEFAULT_CAPACITY, queue_size: int = DEFAULT_QUEUE_SIZE
+    ) -> None:
+        if capacity < 1:
+            raise ValueError(f"capacityは1以上を指定してください: {capacity}")
+        self.capacity = capacity
+        self.queue_size = queue_size
+        # 起動ごとのトークン（カーソルが同じプロセスのものかを確認する）
+        self.epoch = secrets.token_hex(4)
+        self._ring: list[ChangeEvent | None] = [None] * capacity
+        self._last_seq = 0
+        self._waiters: set[asyncio.Future[None]] = set()
+        self._subscribers: set[Subscription] = set()
+        self.dropped_subscribers = 0
+
+    @property
+    def last_seq(self) -> int:
+        """最後に振ったシーケンス番号（変更がなければ0）"""
+        return self._last_seq
+
+    @property
+    def oldest_seq(self) -> int:
+        """保持している最も古い変更のシーケンス番号"""
+        return max(1, self._last_seq - self.capacity + 1)
+
+    def publish(self, op: str, item_id: int, item_json: bytes | None) -> ChangeEvent:
+        """変更を追加し、待っている読み出しを起こす"""
+        seq = self._last_seq + 1
+        data = encode_event(self.epoch, seq, op, item_id, item_json)
+        event = ChangeEvent(seq, item_id, data)
+        self._ring[seq % self.capacity] = event
+        self._last_seq = seq
+        if self._waiters or self._subscribers:
+            self._fan_out(event)
+        return event
+
+    def _fan_out(self, event: ChangeEvent) -> None:
+        loop = _running_loop()
+        # 待機・購読は別のスレッドのイベントループからも追加・削除されるため、
+        # 集合は（GILの下で1回で）コピーしてから走査する
+        waiters = tuple(self._waiters)
+        for waiter in waiters:
+            _notify(waiter, loop)
+        self._waiters.difference_update(waiters)
+
+        if self._subscribers:
+            # 文字列への変換は購読者の数によらず1回だけ行う
+            text = event.data.decode()
+            slow = [s for s in tuple(self._subscribers) if not s._push(text, loop)]
+            for subscription in slow:
+                subscription._drop(loop)
+                self._subscribers.discard(subscription)
+            self.dropped_subscribers += len(slow)
+
+    def cursor(self, seq: int) -> str:
+        """シーケンス番号の読み出し位置を表すカーソル"""
+        return f"{self.epoch}:{seq}"
+
+    def resolve(self, cursor: str) -> int | None:
+        """
+        カーソルのシーケンス番号を返す（別のプロセス・再起動前のカーソルはNone）
+        "0"は先頭を表す。形式が正しくない場合はValueError
+        """
+        epoch, _, seq = cursor.rpartition(":")
+        position = int(seq)
+        if position < 0:
+            raise ValueError(cursor)
+        if not epoch and position == 0:
+            return 0
+        return position if epoch == self.epoch else None
+
+    def since(self, seq: int, limit: int) -> list[ChangeEvent] | None:
+        """
+        seqより後の変更を古い順に最大limit件返す
+        seqの直後の変更が押し出されている・seqが未来の場合（再起動後など）はNone
+        """
+        if seq < self.oldest_seq - 1 or seq > self._last_seq:
+            return None
+        ring, capacity = self._ring, self.capacity
+        end = min(self._last_seq, seq + limit)
+        return [ring[s % capacity] for s in range(seq + 1, end + 1)]  # type: ignore[misc]
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, max_queue: int | None = None) -> Subscription:
+        """
+        以降の変更を受け取る購読者を追加する（不要になったらclose()する）
+        max_queueを超えて溜まった購読者は切り離す（省略時はqueue_size）
+        """
+        subscription = Subscription(self, max_queue or self.queue_size)
+        self._subscribers.add(subscription)
+        return subscription
+
+    async def wait(self, seq: int, timeout: float) -> bool:
+        """seqより後の変更が届くまで最大timeout秒待つ（届いた場合True）"""
+        if self._last_seq > seq:
+            return True
+        if timeout <= 0:
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.add(waiter)
+        try:
+            if self._last_seq > seq:
+                return True
+            await asyncio.wait_for(waiter, timeout)
+        except TimeoutError:
+            return self._last_seq > seq
+        finally:
+            self._waiters.discard(waiter)
+        return True
@@ -0,0 +1,67 @@
+"""
+墓標の回収
+保持期間を過ぎた墓標と、削除で使われなくなったストレージの領域をバックグラウンドで回収する
+
+- 回収は1回slice_seconds以内（目安）で打ち切り、残りは次の回に回す
+- 回収しきれなかった場合はイベントループに一度制御を返してから続けるため、
+  リクエストの処理を1回分より長く待たせない
+- 回収するものがなくなったらinterval_seconds待つ
+"""
+
+import asyncio
+import time
+from collections.abc import Callable
+
+from .base import ItemStorage
+from .record import now_micros
+
+DEFAULT_RETENTION_SECONDS = 24 * 60 * 60
+DEFAULT_INTERVAL_SECONDS = 1.0
+DEFAULT_SLICE_SECONDS = 0.005
+
+
+class TombstoneCompactor:
+    """ストレージのcompact()を短い時間ずつ繰り返し呼び出すバックグラウンドタスク"""
+
+    def __init__(
+        self,
+        get_storage: Callable[[], ItemStorage],
+        retention_seconds: float = DEFAULT_RETENTION_SECONDS,
+        interval_seconds: float = DEFAULT_INTERVAL_SECONDS,
+        slice_seconds: float = DEFAULT_SLICE_SECONDS,
+        clock: Callable[[], int] = now_micros,
+    ) -> None:
+        # ストレージはテストなどで差し替えられるため、回収のたびに取得する
+        self._get_storage = get_storage
+        self.retention_seconds = retention_seconds
+        self.interval_seconds = interval_seconds
+        self.slice_seconds = slice_seconds
+        self._clock = clock
+        self.reclaimed = 0
+        self.slices = 0
+        self.max_slice_seconds = 0.0
+
+    async def run_once(self) -> int:
+        """1回分（約slice_seconds）回収し、回収した件数を返す"""
+        before = self._clock() - int(self.retention_seconds * 1_000_000)
+        started = time.perf_counter()
+        reclaimed = await self._get_storage().compact(before, self.slice_seconds)
+        self.slices += 1
+        self.max_slice_seconds = max(
+            self.max_slice_seconds, time.perf_counter() - started
+        )
+        self.reclaimed += reclaimed
+        return reclaimed
+
+    async def run(self) -> None:
+        """キャンセルされるまで回収を続ける"""
+        while True:
+            reclaimed = await self.run_once()
+            await asyncio.sleep(0 if reclaimed else self.interval_seconds)
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "reclaimed": self.reclaimed,
+            "slices": self.slices,
+            "max_slice_seconds": self.max_slice_seconds,
+        }
@@ -0,0 +1,419 @@
+"""
+WALとスナップショットで永続化するインメモリストレージ
+読み取りはインメモリストレージのまま、変更操作だけをWALに記録する
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Callable, Collection, Iterator
+from operator import attrgetter
+
+from .base import ItemStorage, VersionConflictError
+from .memory import InMemoryItemStorage
+from .record import ItemRecord, Tombstone, now_micros
+from .snapshot import SNAPSHOT_NAME, MappedSnapshot, write_snapshot
+from .timeindex import UNBOUNDED, TimeRange
+from .wal import (
+    FSYNC_INTERVAL,
+    OP_CLEAR,
+    OP_DELETE,
+    OP_PUT,
+    WriteAheadLog,
+    encode_clear,
+    encode_delete,
+    encode_put,
+    list_segments,
+    read_segment,
+    segment_name,
+)
+
+# WALのセグメントがこのサイズを超えたらスナップショットを作成する
+DEFAULT_SNAPSHOT_BYTES = 64 * 1024 * 1024
+
+# 1回の追記で公開する変更: (id, 変更後のレコード。削除はNone)
+_Changes = list[tuple[int, ItemRecord | None]]
+
+
+def _replace(
+    record: ItemRecord,
+    updated_at: int,
+    name: str | None,
+    description: str | None,
+    expires_at: int | None = None,
+) -> ItemRecord:
+    # 同じマイクロ秒内の更新でも最終変更日時が変わるようにする
+    updated_at = max(updated_at, record.modified_at + 1)
+    return record.replace(updated_at, name, description, expires_at)
+
+
+class DurableItemStorage(ItemStorage):
+    """
+    WAL付きのインメモリストレージ
+
+    起動時に最新のスナップショットを読み込み、それ以降のWALを再生して復旧する。
+    まだスナップショットがない場合はseed_snapshot（事前に作成したもの）を初期状態とする。
+    変更操作は先にWALへ追記し、fsyncの方針に従って永続化を待ってから
+    メモリに反映する（永続化前の変更は読み取りに見せない）。
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        store: InMemoryItemStorage | None = None,
+        fsync: str = FSYNC_INTERVAL,
+        interval_ms: int = 100,
+        snapshot_bytes: int = DEFAULT_SNAPSHOT_BYTES,
+        seed_snapshot: str | None = None,
+    ) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._store = store or InMemoryItemStorage()
+        self._snapshot_bytes = snapshot_bytes
+        self._seed_snapshot = seed_snapshot
+        self._snapshot_thread: threading.Thread | None = None
+        # WALに追記済みで未公開の変更（IDごとの最新。(LSN, レコード)）と、その追記順の一覧
+        self._pending: dict[int, tuple[int, ItemRecord | None]] = {}
+        self._unpublished: deque[tuple[int, _Changes | None]] = deque()
+        # 未公開の全件削除のLSN（なければ0）
+        self._pending_clear = 0
+
+        started = time.perf_counter()
+        self.replayed_entries = 0
+        segment = self._recover()
+        self.recovery_seconds = time.perf_counter() - started
+
+        self._wal = WriteAheadLog(directory, segment, fsync, interval_ms)
+
+    def _recover(self) -> int:
+        """スナップショットとWALから復旧し、次に書き込むセグメント番号を返す"""
+        first_segment = 1
+        snapshot_path = os.path.join(self._directory, SNAPSHOT_NAME)
+        if os.path.exists(snapshot_path):
+            snapshot = MappedSnapshot(snapshot_path)
+            first_segment = snapshot.wal_segment
+            self._store.load_snapshot(snapshot)
+        elif self._seed_snapshot:
+            self._store.load_snapshot(MappedSnapshot(self._seed_snapshot))
+
+        last_segment = first_segment - 1
+        for segment in list_segments(self._directory):
+            path = os.path.join(self._directory, segment_name(segment))
+            if segment < first_segment:
+                # スナップショット作成直後に停止した場合の残骸
+                os.remove(path)
+                continue
+            for op, value in read_segment(path):
+                self._apply(op, value)
+                self.replayed_entries += 1
+            last_segment = segment
+        return last_segment + 1
+
+    def _apply(self, op: int, value: ItemRecord | int | None) -> None:
+        if op == OP_PUT and isinstance(value, ItemRecord):
+            self._store.restore_record(value)
+        elif op == OP_DELETE and isinstance(value, int):
+            self._store.discard_record(value)
+        elif op == OP_CLEAR:
+            self._store.discard_all()
+
+    async def _log(self, data: bytes, changes: _Changes | None) -> None:
+        """
+        WALに追記し、永続化を待ってからメモリに公開する（changesがNoneの場合は全件削除）
+        追記から公開までの変更は_pendingに置き、後続の書き込みの検証に使う
+        """
+        lsn = self._wal.append(data)
+        if changes is None:
+            self._pending.clear()
+            self._pending_clear = lsn
+        else:
+            for item_id, record in changes:
+                self._pending[item_id] = (lsn, record)
+        self._unpublished.append((lsn, changes))
+        if self._wal.segment_bytes >= self._snapshot_bytes:
+            await self._start_snapshot()
+        await self._wal.commit(lsn)
+        self._publish(lsn)
+
+    def _publish(self, lsn: int) -> None:
+        """
+        lsnまでの変更を追記順にメモリへ公開する
+        fsyncはそれより前の書き込みもまとめて永続化するため、先に永続化を待っていた
+        書き込みの変更もここで公開する
+        """
+        while self._unpublished and self._unpublished[0][0] <= lsn:
+            entry_lsn, changes = self._unpublished.popleft()
+            if changes is None:
+                # 以降の作成で採番済みのIDはそのまま使う
+                self._store.discard_all(reset_ids=False)
+                if self._pending_clear == entry_lsn:
+                    self._pending_clear = 0
+                continue
+            for item_id, record in changes:
+                if record is None:
+                    self._store.remove_record(item_id)
+                else:
+                    self._store.put_record(record)
+                pending = self._pending.get(item_id)
+                if pending is not None and pending[0] == entry_lsn:
+                    del self._pending[item_id]
+
+    def _current(self, item_id: int, now: int | None = None) -> ItemRecord | None:
+        """
+        公開待ちの変更を含めた最新のレコードを返す
+        nowを指定した場合、その時点で期限切れのレコードは存在しない扱いにする
+        """
+        pending = self._pending.get(item_id)
+        if pending is not None:
+            record = pending[1]
+        elif self._pending_clear:
+            return None
+        else:
+            record = self._store.lookup(item_id)
+        if record is None or (now is not None and record.expired(now)):
+            return None
+        return record
+
+    async def _start_snapshot(self) -> threading.Thread | None:
+        """
+        バックグラウンドでスナップショットを作成する（作成中の場合は何もしない）
+        イベントループではセグメントの切り替えだけを行い、前のセグメントのfsyncと
+        レコードの読み出しはスレッドで行う。読み出し中の書き込みは新しいセグメントにあり、
+        復旧時に再生されるため、読み出しがその時点の状態と一致しなくてもよい
+        """
+        if self._snapshot_thread is not None and self._snapshot_thread.is_alive():
+            return None
+
+        # 公開待ちの変更は前のセグメントにあるため、スナップショットに含める
+        pending = {item_id: record for item_id, (_, record) in self._pending.items()}
+        read_records = None if self._pending_clear else self._store.snapshot_reader()
+        segment = self._wal.rotate()
+        self._snapshot_thread = threading.Thread(
+            target=self._write_snapshot,
+            args=(read_records, pending, segment),
+            name="wal-snapshot",
+            daemon=True,
+        )
+        self._snapshot_thread.start()
+        return self._snapshot_thread
+
+    def _write_snapshot(
+        self,
+        read_records: Callable[[], Iterator[ItemRecord]] | None,
+        pending: dict[int, ItemRecord | None],
+        segment: int,
+    ) -> None:
+        self._wal.sync_rotated()
+        # 期限切れのレコードは書き出さない（復旧後も存在しない扱いのため）
+        now = now_micros()
+        records: list[ItemRecord] = []
+        for record in read_records() if read_records is not None else ():
+            if record.id in pending:
+                replaced = pending.pop(record.id)
+                if replaced is None:
+                    continue
+                record = replaced
+            if not record.expired(now):
+                records.append(record)
+        created = [
+            record
+            for record in pending.values()
+            if record is not None and not record.expired(now)
+        ]
+        if created:
+            records = sorted(records + created, key=attrgetter("id"))
+        write_snapshot(os.path.join(self._directory, SNAPSHOT_NAME), records, segment)
+        self._wal.remove_segments_before(segment)
+
+    async def checkpoint(self) -> None:
+        """スナップショットを作成し、完了まで待つ"""
+        await self._wait_snapshot()
+        thread = await self._start_snapshot()
+        if thread is not None:
+            await asyncio.to_thread(thread.join)
+
+    async def _wait_snapshot(self) -> None:
+        if self._snapshot_thread is not None:
+            await asyncio.to_thread(self._snapshot_thread.join)
+
+    async def list_items(
+        self, after_id: int | None = None, limit: int | None = None
+    ) -> list[ItemRecord]:
+        return await self._store.list_items(after_id=after_id, limit=limit)
+
+    def iter_items(
+        self, after_id: int | None = None, batch_size: int = 500
+    ) -> AsyncIterator[ItemRecord]:
+        return self._store.iter_items(after_id=after_id, batch_size=batch_size)
+
+    async def get_item(self, item_id: int) -> ItemRecord | None:
+        return await self._store.get_item(item_id)
+
+    async def create_item(
+        self, name: str, description: str, expires_at: int | None = None
+    ) -> ItemRecord:
+        (item_id,) = self._store.allocate_ids(1)
+        record = ItemRecord(item_id, name, description, now_micros(), None, expires_at)
+        await self._log(encode_put(record), [(item_id, record)])
+        return record
+
+    async def create_items(
+        self,
+        items: list[tuple[str, str]],
+        expires_at: list[int | None] | None = None,
+    ) -> list[ItemRecord]:
+        item_ids = self._store.allocate_ids(len(items))
+        created_at = now_micros()
+        records = [
+            ItemRecord(item_id, name, description, created_at, None, expires)
+            for item_id, (name, description), expires in zip(
+                item_ids, items, expires_at or [None] * len(items), strict=True
+            )
+        ]
+        # 一括操作は1回の追記・1回のfsyncにまとめる
+        await self._log(
+            b"".join(encode_put(record) for record in records),
+            [(record.id, record) for record in records],
+        )
+        return records
+
+    async def update_item(
+        self,
+        item_id: int,
+        name: str | None,
+        description: str | None,
+        if_match: Collection[int] | None = None,
+        expires_at: int | None = None,
+    ) -> ItemRecord | None:
+        updated_at = now_micros()
+        current = self._current(item_id, updated_at)
+        if current is None:
+            return None
+        if if_match is not None and current.version not in if_match:
+            raise VersionConflictError(item_id, current.version)
+        record = _replace(current, updated_at, name, description, expires_at)
+        await self._log(encode_put(record), [(item_id, record)])
+        return record
+
+    async def update_items(
+        self,
+        updates: list[tuple[int, str | None, str | None]],
+        expires_at: list[int | None] | None = None,
+    ) -> list[ItemRecord | None]:
+        updated_at = now_micros()
+        # 同じIDを複数回含む場合は、前の更新の結果に重ねる
+        changed: dict[int, ItemRecord] = {}
+        records: list[ItemRecord | None] = []
+        for (item_id, name, description), expires in zip(
+            updates, expires_at or [None] * len(updates), strict=True
+        ):
+            current = changed.get(item_id) or self._current(item_id, updated_at)
+            record = None
+            if current is not None:
+                record = changed[item_id] = _replace(
+                    current, updated_at, name, description, expires
+                )
+            records.append(record)
+        if changed:
+            await self._log(
+                b"".join(encode_put(record) for record in changed.values()),
+                list(changed.items()),
+            )
+        return records
+
+    async def delete_item(
+        self, item_id: int, if_match: Collection[int] | None = None
+    ) -> bool:
+        current = self._current(item_id, now_micros())
+        if current is None:
+            return False
+        if if_match is not None and current.version not in if_match:
+            raise VersionConflictError(item_id, current.version)
+        await self._log(encode_delete(item_id), [(item_id, None)])
+        return True
+
+    async def delete_items(self, item_ids: list[int]) -> list[bool]:
+        now = now_micros()
+        return await self._delete_where(
+            item_ids, lambda item_id: self._current(item_id, now) is not None
+        )
+
+    async def delete_expired(self, item_ids: list[int], now: int) -> list[bool]:
+        def expired(item_id: int) -> bool:
+            record = self._current(item_id)
+            return record is not None and record.expired(now)
+
+        return await self._delete_where(item_ids, expired)
+
+    async def _delete_where(
+        self, item_ids: list[int], deletable: Callable[[int], bool]
+    ) -> list[bool]:
+        """deletableがTrueのIDを1回の追記でまとめて削除する"""
+        deleted: dict[int, None] = {}
+        results = []
+        for item_id in item_ids:
+            exists = item_id not in deleted and deletable(item_id)
+            if exists:
+                deleted[item_id] = None
+            results.append(exists)
+        if deleted:
+            await self._log(
+                b"".join(encode_delete(item_id) for item_id in deleted),
+                [(item_id, None) for item_id in deleted],
+            )
+        return results
+
+    async def search(self, query: str, limit: int) -> tuple[list[ItemRecord], int]:
+        return await self._store.search(query, limit)
+
+    async def list_items_by_time(
+        self,
+        order_by: str,
+        created: TimeRange = UNBOUNDED,
+        modified: TimeRange = UNBOUNDED,
+        after: tuple[int, int] | None = None,
+        limit: int | None = None,
+        descending: bool = False,
+    ) -> list[ItemRecord]:
+        return await self._store.list_items_by_time(
+            order_by, created, modified, after, limit, descending
+        )
+
+    async def list_tombstones(
+        self, after: tuple[int, int], limit: int
+    ) -> list[Tombstone] | None:
+        return await self._store.list_tombstones(after, limit)
+
+    async def compact(self, before: int, budget: float) -> int:
+        """
+        期限切れのアイテムはWALに削除を記録して消す（復旧・スナップショットから戻った
+        アイテムも、メモリの有効期限の索引から取り出す）
+        墓標はWALに記録しない（復旧したWALの削除はそれより前を保持していない扱いになる）
+        """
+        deadline = time.perf_counter() + budget
+        now = now_micros()
+        item_ids, expired_done = self._store.take_expired(now, deadline)
+        purged = 0
+        if item_ids:
+            purged = (await self.delete_expired(item_ids, now)).count(True)
+        reclaimed, done = self._store.reclaim(before, deadline)
+        reclaimed += purged
+        return reclaimed if done and expired_done else max(reclaimed, 1)
+
+    async def count(self) -> int:
+        return await self._store.count()
+
+    async def store_version(self) -> str | None:
+        return await self._store.store_version()
+
+    async def clear(self) -> None:
+        # 以降の作成は、全件削除の公開を待たずに1から採番する
+        self._store.reset_ids()
+        await self._log(encode_clear(), None)
+
+    async def close(self) -> None:
+        await self._wait_snapshot()
+        self._wal.close()
+        await self._store.close()
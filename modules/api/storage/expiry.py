@@ -0,0 +1,224 @@
+"""
+アイテムの有効期限（TTL）
+期限を設定したアイテムを階層型タイミングホイールに登録し、期限が来たものから削除する
+
+- ホイールはLEVELS段 x SLOTS個のスロットで、段が1つ上がるごとにスロットの幅がSLOTS倍になる
+  （1段目は1tick幅）。期限が近いものほど下の段に置く
+- 上の段のスロットは、その範囲の始まりのtickで中身を下の段に移す。1件が移されるのは
+  最大LEVELS-1回のため、期限切れの処理は1件あたり償却O(1)で、アイテムの全件は走査しない
+- 登録・取り消しはO(1)（スロットはIDの集合で、IDごとに登録先のスロットを持つ）
+
+期限はストレージのレコード（expires_at）に保存し、期限切れのアイテムはどのワーカー・
+再起動後でもストレージが存在しない扱いにする。ホイールはワーカーごとの削除の予約で、
+期限を設定したワーカーが、期限が来たアイテムを削除する（変更フィードに削除を流す）。
+"""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+
+from .record import now_micros
+
+SLOT_BITS = 6
+SLOTS = 1 << SLOT_BITS
+LEVELS = 5
+DEFAULT_TICK_SECONDS = 1.0
+
+
+class TimingWheel:
+    """
+    キー（アイテムID）を期限のtickごとにまとめる階層型タイミングホイール
+    advance()で指定したtickまで進め、期限が来たキーを返す
+    """
+
+    def __init__(self, start_tick: int = 0) -> None:
+        # 次に処理するtick（これより前のtickは処理済み）
+        self._tick = start_tick
+        self._levels: list[list[set[int]]] = [
+            [set() for _ in range(SLOTS)] for _ in range(LEVELS)
+        ]
+        # key -> (期限のtick, 登録先のスロット)
+        self._timers: dict[int, tuple[int, set[int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    def __contains__(self, key: int) -> bool:
+        return key in self._timers
+
+    @property
+    def tick(self) -> int:
+        """次に処理するtick"""
+        return self._tick
+
+    @property
+    def max_ticks(self) -> int:
+        """登録できる最も遠い期限（今から何tick先までか）"""
+        return (1 << (SLOT_BITS * LEVELS)) - 1
+
+    def deadline(self, key: int) -> int | None:
+        timer = self._timers.get(key)
+        return timer[0] if timer is not None else None
+
+    def schedule(self, key: int, deadline: int) -> None:
+        """keyの期限をdeadline（tick）にする（登録済みの場合は置き換える）"""
+        self.cancel(key)
+        deadline = max(deadline, self._tick)
+        if deadline - self._tick > self.max_ticks:
+            raise ValueError(f"期限が遠すぎます: {deadline - self._tick} ticks")
+        self._place(key, deadline)
+
+    def cancel(self, key: int) -> bool:
+        """keyの期限を取り消す（登録されていた場合True）"""
+        timer = self._timers.pop(key, None)
+        if timer is None:
+            return False
+        timer[1].discard(key)
+        return True
+
+    def _place(self, key: int, deadline: int) -> None:
+        # 残りtick数のビット長から段を決める（SLOTS未満は1段目）
+        delta = deadline - self._tick
+        level = (delta.bit_length() - 1) // SLOT_BITS if delta >= SLOTS else 0
+        slot = self._levels[level][(deadline >> (SLOT_BITS * level)) & (SLOTS - 1)]
+        slot.add(key)
+        self._timers[key] = (deadline, slot)
+
+    def advance(self, now: int) -> list[int]:
+        """nowのtickまで進め、期限が来たキーを返す（返したキーは登録から外れる）"""
+        expired: list[int] = []
+        if not self._timers:
+            self._tick = max(self._tick, now + 1)
+            return expired
+
+        while self._tick <= now:
+            tick = self._tick
+            # このtickで範囲が始まる上の段のスロットを、上の段から順に下ろす
+            # （上の段から下ろしたものが、同じtickで下ろす下の段のスロットに入りうる）
+            level = 1
+            while level < LEVELS and not tick & ((1 << (SLOT_BITS * level)) - 1):
+                level += 1
+            for upper in range(level - 1, 0, -1):
+                self._cascade(upper, (tick >> (SLOT_BITS * upper)) & (SLOTS - 1))
+
+            index = tick & (SLOTS - 1)
+            slot = self._levels[0][index]
+            if slot:
+                self._levels[0][index] = set()
+                for key in slot:
+                    del self._timers[key]
+                expired.extend(slot)
+            self._tick = tick + 1
+            if not self._timers:
+                self._tick = max(self._tick, now + 1)
+                break
+        return expired
+
+    def _cascade(self, level: int, index: int) -> None:
+        slot = self._levels[level][index]
+        if not slot:
+            return
+        self._levels[level][index] = set()
+        for key in slot:
+            self._place(key, self._timers[key][0])
+
+
+class ItemExpiry:
+    """
+    期限が来たアイテムの削除の予約
+    run()で1tickごとに削除するほか、lifespanを使わない環境（Lambda）でも削除されるよう、
+    リクエストの処理時にhas_due()を確認してexpire_due()で削除する
+    """
+
+    def __init__(
+        self,
+        tick_seconds: float = DEFAULT_TICK_SECONDS,
+        clock: Callable[[], int] = now_micros,
+    ) -> None:
+        if tick_seconds <= 0:
+            raise ValueError(f"tick_secondsは0より大きくしてください: {tick_seconds}")
+        self.tick_seconds = tick_seconds
+        self._tick_micros = max(1, round(tick_seconds * 1_000_000))
+        self._clock = clock
+        self._wheel = TimingWheel(self._now_tick())
+        # ホイールから取り出して、まだ削除していないID
+        self._ready: list[int] = []
+        self.scheduled = 0
+        self.cancelled = 0
+        self.expired = 0
+
+    def now(self) -> int:
+        """現在時刻（エポックマイクロ秒）"""
+        return self._clock()
+
+    def _now_tick(self) -> int:
+        return self._clock() // self._tick_micros
+
+    @property
+    def max_ttl_seconds(self) -> float:
+        """設定できる最長の有効期限（tickの途中から数えても登録できる長さ）"""
+        return (self._wheel.max_ticks - 1) * self.tick_seconds
+
+    @property
+    def backlog(self) -> int:
+        """期限を待っている・削除を待っているアイテムの件数"""
+        return len(self._wheel) + len(self._ready)
+
+    def expires_at(self, ttl_seconds: float) -> int:
+        """今からttl_seconds後の有効期限（エポックマイクロ秒）"""
+        return self._clock() + round(ttl_seconds * 1_000_000)
+
+    def schedule(self, item_id: int, expires_at: int) -> None:
+        """item_idの削除をexpires_at（エポックマイクロ秒）に予約する（予約済みは置き換える）"""
+        # ホイールを今のtickまで進めてから登録する（進めずにいた間の分だけ遠くならない）
+        self._ready.extend(self._wheel.advance(self._now_tick() - 1))
+        # 期限より前に削除しないよう、tickの境界に切り上げる
+        self._wheel.schedule(item_id, -(-expires_at // self._tick_micros))
+        self.scheduled += 1
+
+    def cancel(self, item_id: int) -> None:
+        """削除されたアイテムの予約を取り消す"""
+        if self._wheel.cancel(item_id):
+            self.cancelled += 1
+
+    def has_due(self) -> bool:
+        """期限が来たアイテムがありうる場合True（ホイールは進めない）"""
+        return bool(self._ready) or (
+            len(self._wheel) > 0 and self._wheel.tick <= self._now_tick()
+        )
+
+    def due(self) -> list[int]:
+        """期限が来たアイテムのIDを取り出す"""
+        item_ids = self._ready + self._wheel.advance(self._now_tick())
+        self._ready = []
+        return item_ids
+
+    async def expire_due(self, delete: Callable[[list[int]], Awaitable[int]]) -> int:
+        """
+        期限が来たアイテムをdeleteで削除し、削除した件数を返す
+        取り出しはawaitを挟まないため、同時に呼ばれても同じIDを二重に渡さない。
+        deleteが失敗した・キャンセルされた場合は、IDを戻して次の呼び出しで削除し直す
+        """
+        item_ids = self.due()
+        if not item_ids:
+            return 0
+        try:
+            deleted = await delete(item_ids)
+        except BaseException:
+            self._ready.extend(item_ids)
+            raise
+        self.expired += deleted
+        return deleted
+
+    async def run(self, delete: Callable[[list[int]], Awaitable[int]]) -> None:
+        """キャンセルされるまで、1tickごとに期限が来たアイテムをdeleteで削除する"""
+        while True:
+            await self.expire_due(delete)
+            await asyncio.sleep(self.tick_seconds)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "backlog": self.backlog,
+            "scheduled": self.scheduled,
+            "cancelled": self.cancelled,
+            "expired": self.expired,
+        }
@@ -0,0 +1,318 @@
+"""
+Idempotency-Keyのレスポンスキャッシュ
+同じキーで再送されたリクエストに、検証・ストレージ操作をやり直さずに最初のレスポンスを返す
+
+- begin()でキーを予約し、処理が終わったらcomplete()で保存、失敗したらrelease()で解放する
+- 処理中のキーへの再送はIdempotencyKeyInUse、別の内容のリクエストでの再利用は
+  IdempotencyKeyMismatchになる（リクエストボディのハッシュで比較する）
+- エントリは最初のレスポンスからttl_seconds後に期限切れになる
+
+InMemoryIdempotencyCacheはワーカー（プロセス）ごと、SQLiteIdempotencyCacheは
+同じファイルを開いた全ワーカーで共有する。
+"""
+
+import asyncio
+import hashlib
+import sqlite3
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Callable
+
+from .sqlite import _write_transaction
+
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+DEFAULT_MAX_ENTRIES = 100_000
+# 予約したまま完了しないキー（処理中にワーカーが落ちた場合など）を解放するまでの秒数
+PENDING_TIMEOUT_SECONDS = 60.0
+
+# キーとボディ以外にエントリ1件が使うメモリの目安
+_ENTRY_OVERHEAD = 240
+
+
+def fingerprint(body: bytes) -> bytes:
+    """リクエストボディのハッシュ（同じキーの再利用で内容が同じかの比較に使う）"""
+    return hashlib.blake2b(body, digest_size=16).digest()
+
+
+class IdempotencyKeyInUse(Exception):
+    """同じキーのリクエストが処理中"""
+
+
+class IdempotencyKeyMismatch(Exception):
+    """キーが別の内容のリクエストで使用済み"""
+
+
+class StoredResponse:
+    """保存したレスポンス（ステータスコードとJSONのボディ）"""
+
+    __slots__ = ("status_code", "body")
+
+    def __init__(self, status_code: int, body: bytes) -> None:
+        self.status_code = status_code
+        self.body = body
+
+
+class IdempotencyCache(ABC):
+    """Idempotency-Keyのレスポンスキャッシュの抽象基底クラス"""
+
+    def __init__(self, ttl_seconds: float) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+
+    @abstractmethod
+    async def begin(self, key: str, digest: bytes) -> StoredResponse | None:
+        """
+        保存済みのレスポンスを返す。ない場合はキーを予約してNoneを返す
+        （呼び出し側はcomplete()かrelease()を必ず呼ぶこと）
+        """
+
+    @abstractmethod
+    async def complete(self, key: str, response: StoredResponse) -> None:
+        """予約したキーにレスポンスを保存する"""
+
+    @abstractmethod
+    async def release(self, key: str) -> None:
+        """予約したキーを保存せずに解放する（同じキーで再試行できるようにする）"""
+
+    @abstractmethod
+    def usage(self) -> tuple[int, int]:
+        """(保存済みのエントリ数, 使用バイト数の目安)"""
+
+    def stats(self) -> dict[str, int | float]:
+        lookups = self.hits + self.misses
+        entries, size = self.usage()
+        return {
+            "entries": entries,
+            "bytes": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    @abstractmethod
+    def close(self) -> None:
+        """保持しているリソースを解放する"""
+
+
+class InMemoryIdempotencyCache(IdempotencyCache):
+    """
+    ワーカー内のLRUキャッシュ
+    保持するバイト数（目安）がmax_bytesを超えたら最も古く使われたものから捨てる
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        super().__init__(ttl_seconds)
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._clock = clock
+        # key -> (期限, ボディのハッシュ, レスポンス)
+        self._entries: OrderedDict[str, tuple[float, bytes, StoredResponse]] = (
+            OrderedDict()
+        )
+        self._pending: dict[str, bytes] = {}
+        self._bytes = 0
+
+    async def begin(self, key: str, digest: bytes) -> StoredResponse | None:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] <= self._clock():
+            self._discard(key)
+            entry = None
+        if entry is not None:
+            if entry[1] != digest:
+                raise IdempotencyKeyMismatch(key)
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            raise (
+                IdempotencyKeyInUse(key)
+                if pending == digest
+                else IdempotencyKeyMismatch(key)
+            )
+        self._pending[key] = digest
+        self.misses += 1
+        return None
+
+    async def complete(self, key: str, response: StoredResponse) -> None:
+        digest = self._pending.pop(key)
+        self._discard(key)
+        cost = _cost(key, response)
+        if cost > self.max_bytes:
+            return
+        now = self._clock()
+        self._entries[key] = (now + self.ttl_seconds, digest, response)
+        self._bytes += cost
+        # 先頭（最も古く使われたもの）から期限切れのエントリを捨てる
+        while self._entries:
+            oldest, (expires_at, _, _) = next(iter(self._entries.items()))
+            if expires_at > now:
+                break
+            self._discard(oldest)
+        while self._bytes > self.max_bytes:
+            evicted, (_, _, evicted_response) = self._entries.popitem(last=False)
+            self._bytes -= _cost(evicted, evicted_response)
+            self.evictions += 1
+
+    async def release(self, key: str) -> None:
+        self._pending.pop(key, None)
+
+    def usage(self) -> tuple[int, int]:
+        return len(self._entries), self._bytes
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            **super().stats(),
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+        }
+
+    def close(self) -> None:
+        pass
+
+    def _discard(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= _cost(key, entry[2])
+
+
+def _cost(key: str, response: StoredResponse) -> int:
+    return sys.getsizeof(key) + sys.getsizeof(response.body) + _ENTRY_OVERHEAD
+
+
+_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key TEXT PRIMARY KEY,
+    digest BLOB NOT NULL,
+    status_code INTEGER,
+    body BLOB,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idempotency_keys_expires_at
+    ON idempotency_keys (expires_at);
+"""
+_SELECT_SQL = (
+    "SELECT digest, status_code, body, expires_at FROM idempotency_keys WHERE key = ?"
+)
+_RESERVE_SQL = (
+    "INSERT INTO idempotency_keys (key, digest, expires_at) VALUES (?, ?, ?) "
+    "ON CONFLICT (key) DO UPDATE SET digest = excluded.digest, "
+    "status_code = NULL, body = NULL, expires_at = excluded.expires_at "
+    "WHERE idempotency_keys.expires_at <= ?"
+)
+_COMPLETE_SQL = (
+    "UPDATE idempotency_keys SET status_code = ?, body = ?, expires_at = ? "
+    "WHERE key = ?"
+)
+_RELEASE_SQL = "DELETE FROM idempotency_keys WHERE key = ? AND status_code IS NULL"
+_PURGE_EXPIRED_SQL = "DELETE FROM idempotency_keys WHERE expires_at <= ?"
+_TRIM_SQL = (
+    "DELETE FROM idempotency_keys WHERE key IN (SELECT key FROM idempotency_keys "
+    "ORDER BY expires_at LIMIT max(0, (SELECT COUNT(*) FROM idempotency_keys) - ?))"
+)
+_USAGE_SQL = "SELECT COUNT(*), COALESCE(SUM(LENGTH(body)), 0) FROM idempotency_keys"
+
+
+class SQLiteIdempotencyCache(IdempotencyCache):
+    """
+    SQLiteファイルのテーブルに保存する、ワーカー間で共有するキャッシュ
+
+    予約はINSERTの一意制約で行うため、別のワーカーに届いた再送も重複しない。
+    期限はワーカー間で比較するため壁時計の時刻で持つ。件数がmax_entriesを
+    超えた分は期限の近いものから、TRIM_INTERVAL回の保存ごとにまとめて消す。
+    """
+
+    TRIM_INTERVAL = 100
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        super().__init__(ttl_seconds)
+        self.max_entries = max_entries
+        self._clock = clock
+        self._completed = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(_SCHEMA_SQL)
+
+    async def _run(self, func: Callable[[sqlite3.Connection], object]) -> object:
+        def execute() -> object:
+            with self._lock:
+                return func(self._conn)
+
+        return await asyncio.to_thread(execute)
+
+    async def begin(self, key: str, digest: bytes) -> StoredResponse | None:
+        now = self._clock()
+
+        def execute(conn: sqlite3.Connection) -> object:
+            with _write_transaction(conn):
+                reserved = conn.execute(
+                    _RESERVE_SQL, (key, digest, now + PENDING_TIMEOUT_SECONDS, now)
+                ).rowcount
+                row = None if reserved else conn.execute(_SELECT_SQL, (key,)).fetchone()
+            return row
+
+        row = await self._run(execute)
+        if row is None:
+            self.misses += 1
+            return None
+
+        stored_digest, status_code, body, _ = row
+        if stored_digest != digest:
+            raise IdempotencyKeyMismatch(key)
+        if status_code is None:
+            raise IdempotencyKeyInUse(key)
+        self.hits += 1
+        return StoredResponse(status_code, body)
+
+    async def complete(self, key: str, response: StoredResponse) -> None:
+        now = self._clock()
+        self._completed += 1
+        trim = self._completed % self.TRIM_INTERVAL == 0
+
+        def execute(conn: sqlite3.Connection) -> None:
+            conn.execute(
+                _COMPLETE_SQL,
+                (response.status_code, response.body, now + self.ttl_seconds, key),
+            )
+            if trim:
+                with _write_transaction(conn):
+                    conn.execute(_PURGE_EXPIRED_SQL, (now,))
+                    conn.execute(_TRIM_SQL, (self.max_entries,))
+
+        await self._run(execute)
+
+    async def release(self, key: str) -> None:
+        await self._run(lambda conn: conn.execute(_RELEASE_SQL, (key,)))
+
+    def usage(self) -> tuple[int, int]:
+        with self._lock:
+            entries, size = self._conn.execute(_USAGE_SQL).fetchone()
+        return entries, size
+
+    def stats(self) -> dict[str, int | float]:
+        return {**super().stats(), "max_entries": self.max_entries}
+
+    def close(self) -> None:
+        self._conn.close()
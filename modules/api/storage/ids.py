@@ -0,0 +1,182 @@
+"""
+アイテムIDの採番
+スレッドから同時に呼ばれても重複しない採番器を提供する
+
+- counter: プロセス内の連番（1, 2, 3, ...）
+- snowflake: 時刻 + ノードID + シーケンスの64bit ID。ノードIDが重複しなければ
+  複数のワーカー・タスクで同時に採番しても衝突しない
+"""
+
+import fcntl
+import os
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Sequence
+from typing import IO
+
+
+class IdAllocator(ABC):
+    """ID採番器の抽象基底クラス"""
+
+    @abstractmethod
+    def allocate(self) -> int:
+        """IDを1件採番する"""
+
+    @abstractmethod
+    def allocate_block(self, count: int) -> Sequence[int]:
+        """IDをcount件まとめて採番する（昇順）"""
+
+    @abstractmethod
+    def observe(self, item_id: int) -> None:
+        """復旧したIDより後の値を採番するよう状態を進める"""
+
+    @abstractmethod
+    def reset(self) -> None:
+        """採番状態を初期化する"""
+
+
+class CounterIdAllocator(IdAllocator):
+    """ロックで保護したプロセス内の連番採番器"""
+
+    def __init__(self, start: int = 1) -> None:
+        self._start = start
+        self._next = start
+        self._lock = threading.Lock()
+
+    def allocate(self) -> int:
+        with self._lock:
+            value = self._next
+            self._next += 1
+        return value
+
+    def allocate_block(self, count: int) -> range:
+        # 1回のロックで連続した範囲を確保する
+        with self._lock:
+            start = self._next
+            self._next += count
+        return range(start, start + count)
+
+    def observe(self, item_id: int) -> None:
+        with self._lock:
+            self._next = max(self._next, item_id + 1)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._next = self._start
+
+
+def _current_millis() -> int:
+    return time.time_ns() // 1_000_000
+
+
+class SnowflakeIdAllocator(IdAllocator):
+    """
+    Snowflake形式の採番器
+
+    | 41bit: エポックからのミリ秒 | 10bit: ノードID | 12bit: シーケンス |
+
+    同一ミリ秒内で4096件を超えた場合や時計が巻き戻った場合は、
+    論理時刻を進めて単調増加を保つ。
+    """
+
+    NODE_BITS = 10
+    SEQUENCE_BITS = 12
+    MAX_NODE_ID = (1 << NODE_BITS) - 1
+    MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+    # 2024-01-01T00:00:00Z
+    DEFAULT_EPOCH_MS = 1_704_067_200_000
+
+    def __init__(
+        self,
+        node_id: int,
+        epoch_ms: int = DEFAULT_EPOCH_MS,
+        clock: Callable[[], int] = _current_millis,
+    ) -> None:
+        if not 0 <= node_id <= self.MAX_NODE_ID:
+            raise ValueError(
+                f"ノードIDは0〜{self.MAX_NODE_ID}の範囲で指定してください: {node_id}"
+            )
+
+        self.node_id = node_id
+        self._epoch_ms = epoch_ms
+        self._clock = clock
+        self._last_ms = -1
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def allocate(self) -> int:
+        return self.allocate_block(1)[0]
+
+    def allocate_block(self, count: int) -> list[int]:
+        with self._lock:
+            now = max(self._clock() - self._epoch_ms, self._last_ms)
+            sequence = self._sequence if now == self._last_ms else 0
+            node_bits = self.node_id << self.SEQUENCE_BITS
+
+            ids = []
+            for _ in range(count):
+                if sequence > self.MAX_SEQUENCE:
+                    # シーケンスを使い切ったら次のミリ秒を先取りする
+                    now += 1
+                    sequence = 0
+                ids.append(
+                    (now << (self.NODE_BITS + self.SEQUENCE_BITS))
+                    | node_bits
+                    | sequence
+                )
+                sequence += 1
+
+            self._last_ms = now
+            self._sequence = sequence
+        return ids
+
+    def observe(self, item_id: int) -> None:
+        timestamp = item_id >> (self.NODE_BITS + self.SEQUENCE_BITS)
+        sequence = (item_id & self.MAX_SEQUENCE) + 1
+        with self._lock:
+            if timestamp > self._last_ms:
+                self._last_ms, self._sequence = timestamp, sequence
+            elif timestamp == self._last_ms:
+                self._sequence = max(self._sequence, sequence)
+
+    def reset(self) -> None:
+        # 時刻ベースのため、初期化しても過去のIDと重複しない
+        return None
+
+
+# 確保したノードIDとロックファイル（プロセス終了までロックを保持する）
+_claimed_node_id: int | None = None
+_node_lock_file: IO[str] | None = None
+
+
+def claim_node_id(lock_dir: str | None = None) -> int:
+    """
+    このプロセスのノードIDを決める
+
+    APP_NODE_IDが設定されていればその値を使う（ECSタスク間など、ホストを
+    またぐ場合はタスクごとに異なる値を設定すること）。
+    未設定の場合は、同一ホスト内で未使用の番号をファイルロックで確保する。
+    uvicornの複数ワーカーはそれぞれ別の番号を得る。
+    """
+    global _claimed_node_id, _node_lock_file
+
+    configured = os.getenv("APP_NODE_ID")
+    if configured is not None:
+        return int(configured)
+    if _claimed_node_id is not None:
+        return _claimed_node_id
+
+    directory = lock_dir or tempfile.gettempdir()
+    for node_id in range(SnowflakeIdAllocator.MAX_NODE_ID + 1):
+        lock_file = open(os.path.join(directory, f"items-node-{node_id}.lock"), "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            continue
+        _claimed_node_id, _node_lock_file = node_id, lock_file
+        return node_id
+
+    raise RuntimeError("利用可能なノードIDがありません")
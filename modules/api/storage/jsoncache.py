@@ -0,0 +1,92 @@
+"""
+アイテムごとのエンコード済みJSONのキャッシュ
+読み出しのたびにレスポンスを組み立て直さず、書き込み時に作ったバイト列を再利用する
+
+エントリはアイテムの最終変更日時（ETagと同じバージョン）と組にして保持し、
+読み出したレコードとバージョンが一致する場合のみ使う。他のワーカーでの更新など
+無効化されなかった古いエントリを返すことはない。
+"""
+
+import sys
+from collections import OrderedDict
+from collections.abc import Callable
+
+from .record import ItemRecord
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# バイト列以外にエントリ1件が使うメモリの目安（タプル・OrderedDictのノードなど）
+_ENTRY_OVERHEAD = 160
+
+Encoder = Callable[[ItemRecord], bytes]
+
+
+class ItemJsonCache:
+    """
+    IDからエンコード済みJSONへのLRUキャッシュ
+    保持するバイト数（目安）がmax_bytesを超えたら最も古く使われたものから捨てる
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[int, tuple[int, bytes]] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def get(self, record: ItemRecord, encode: Encoder) -> bytes:
+        """レコードのJSONを返す（キャッシュにない・古い場合はエンコードして保持する）"""
+        entry = self._entries.get(record.id)
+        if entry is not None and entry[0] == record.version:
+            self._entries.move_to_end(record.id)
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return self.put(record, encode)
+
+    def put(self, record: ItemRecord, encode: Encoder) -> bytes:
+        """書き込んだレコードのJSONをエンコードして保持する"""
+        data = encode(record)
+        self.discard(record.id)
+        cost = _cost(data)
+        if cost <= self.max_bytes:
+            self._entries[record.id] = (record.version, data)
+            self._bytes += cost
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= _cost(evicted)
+                self.evictions += 1
+        return data
+
+    def discard(self, item_id: int) -> None:
+        entry = self._entries.pop(item_id, None)
+        if entry is not None:
+            self._bytes -= _cost(entry[1])
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict[str, int | float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def _cost(data: bytes) -> int:
+    return sys.getsizeof(data) + _ENTRY_OVERHEAD
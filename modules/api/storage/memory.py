@@ -0,0 +1,795 @@
+"""
+インメモリストレージ
+プロセス内のdictにアイテムを保持する（再起動で消える）
+"""
+
+import asyncio
+import secrets
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import AsyncIterator, Callable, Collection, Iterator, Sequence
+from concurrent.futures import Future
+from heapq import heappop, heappush, merge
+from itertools import islice
+
+from .base import ItemStorage, VersionConflictError
+from .ids import CounterIdAllocator, IdAllocator
+from .record import ItemRecord, Tombstone, now_micros
+from .search import InvertedIndex, normalize
+from .snapshot import MappedSnapshot
+from .timeindex import (
+    UNBOUNDED,
+    SortedKeyIndex,
+    TimeRange,
+    in_range,
+    key_bounds,
+    make_key,
+    sort_value,
+)
+
+# 削除済みIDの詰め直しで、回収の残り時間を確認する間隔（件数）
+_PURGE_CHUNK = 10_000
+
+
+class _Snapshot:
+    """ストリーミング中の読み取りスナップショット"""
+
+    __slots__ = ("high_id", "position", "preimages")
+
+    def __init__(self, high_id: int, position: int) -> None:
+        # 開始時点で採番済みの最大ID（以降に作成されたアイテムは含めない）
+        self.high_id = high_id
+        # 返却済みの最後のID
+        self.position = position
+        # 未返却の範囲で更新・削除されたアイテムの変更前のレコード
+        self.preimages: dict[int, ItemRecord] = {}
+
+
+class InMemoryItemStorage(ItemStorage):
+    """
+    dictベースのインメモリストレージ
+
+    レコードは書き換えずに差し替えるため、呼び出し側へはコピーせずに返せる。
+    iter_itemsのスナップショットも、更新・削除の直前に変更前のレコードを
+    退避するだけで一貫性を保てる。
+    """
+
+    def __init__(self, id_allocator: IdAllocator | None = None) -> None:
+        self._items: dict[int, ItemRecord] = {}
+        # 採番器は単調増加のIDを返すため、_idsは追記するだけで昇順を保てる
+        self._id_allocator = id_allocator or CounterIdAllocator()
+        self._last_id = 0
+        # 採番順（昇順）のID一覧。削除済みIDはcompact()で詰め直すまで残す
+        self._ids: list[int] = []
+        self._stale_ids = 0
+        # 詰め直し中の新しいID一覧と、_idsのうち移し終えた位置
+        self._purge_kept: list[int] | None = None
+        self._purge_position = 0
+        # 墓標（削除日時の昇順）。削除日時は削除ごとに必ず進め、墓標の一意な位置にする
+        # 回収済みの先頭はcompact()で_tombstone_headを進め、半数を超えたら詰める
+        self._tombstone_times = array("q")
+        self._tombstone_ids = array("q")
+        self._tombstone_head = 0
+        # これより前の削除は墓標を保持していない（回収済み・スナップショットに含まれる削除）
+        self._tombstone_horizon = 0
+        self._snapshots: set[_Snapshot] = set()
+        # 起動時に読み込んだスナップショット。参照されたレコードから順に_itemsへ復元する
+        self._base: MappedSnapshot | None = None
+        self._base_loaded = bytearray()
+        self._base_remaining = 0
+        # 有効期限の索引（(期限, ID)のヒープ）。期限を変えた後の古い要素は取り出すときに除く
+        # スナップショットのレコードは、_base_scannedの位置まで索引に登録済み
+        self._expiring: list[tuple[int, int]] = []
+        self._base_scanned = 0
+        # 索引から取り出した期限切れのID（compact()で削除する）と、取り出した件数
+        # （期限切れのアイテムは一覧から消えるため、store_version()に含める）
+        self._expired_ids: list[int] = []
+        self._expired_count = 0
+        # 全文検索の転置インデックス（初回の検索時に作成し、以降は書き込みごとに更新する）
+        self._search_index: InvertedIndex | None = None
+        # バックグラウンドで作成中のインデックスと、作成中に行われた書き込み
+        self._index_build: Future[InvertedIndex] | None = None
+        self._index_pending: list[tuple[ItemRecord | None, ItemRecord | None]] = []
+        # 作成日時・最終変更日時の索引（初回の範囲指定の取得時に作成し、以降は書き込みごとに更新する）
+        self._created_index: SortedKeyIndex | None = None
+        self._modified_index: SortedKeyIndex | None = None
+        # ストレージ全体のバージョン（書き込みごとに進める）
+        # 再起動後に同じ値にならないよう、起動ごとのトークンと組み合わせる
+        self._epoch = secrets.token_hex(4)
+        self._version = 0
+
+    def load_snapshot(self, snapshot: MappedSnapshot) -> None:
+        """
+        スナップショットを読み込む（空のストレージのみ）
+        レコードは初回アクセス時に復元するため、件数によらず一定時間で完了する
+        """
+        if self._items or self._ids or self._base is not None:
+            raise RuntimeError("スナップショットは空のストレージにのみ読み込めます")
+
+        self._base = snapshot
+        # スナップショット作成前の削除は記録がない
+        self._tombstone_horizon = now_micros()
+        self._base_loaded = bytearray(len(snapshot))
+        self._base_remaining = len(snapshot)
+        self._base_scanned = 0
+        if len(snapshot):
+            self._last_id = snapshot.ids[-1]
+            self._id_allocator.observe(self._last_id)
+
+    def _lookup(self, item_id: int) -> ItemRecord | None:
+        """レコードを取得する（未復元のスナップショットのレコードはここで復元する）"""
+        record = self._items.get(item_id)
+        if record is not None or self._base is None:
+            return record
+
+        position = self._base.find(item_id)
+        if position is None or self._base_loaded[position]:
+            return None
+        record = self._items[item_id] = self._base.record_at(position)
+        # snapshot_readerが別スレッドで読むため、_itemsに登録してから復元済みにする
+        self._base_loaded[position] = 1
+        self._base_remaining -= 1
+        return record
+
+    def lookup(self, item_id: int) -> ItemRecord | None:
+        """awaitを挟まずにレコードを取得する"""
+        return self._lookup(item_id)
+
+    def _ids_after(self, after_id: int | None) -> Iterator[int]:
+        """after_idより大きいIDを昇順で返す（削除済みのIDを含む）"""
+        position = bisect_right(self._ids, after_id) if after_id is not None else 0
+        ids: Iterator[int] = islice(self._ids, position, None)
+        if self._base is None:
+            return ids
+
+        base_ids = self._base.ids
+        position = bisect_right(base_ids, after_id) if after_id is not None else 0
+        return merge(islice(base_ids, position, None), ids)
+
+    async def list_items(
+        self, after_id: int | None = None, limit: int | None = None
+    ) -> list[ItemRecord]:
+        records: list[ItemRecord] = []
+        if limit is not None and limit <= 0:
+            return records
+
+        now = now_micros()
+        for item_id in self._ids_after(after_id):
+            record = self._lookup(item_id)
+            if record is not None and not record.expired(now):
+                records.append(record)
+                if len(records) == limit:
+                    break
+        return records
+
+    async def iter_items(
+        self, after_id: int | None = None, batch_size: int = 500
+    ) -> AsyncIterator[ItemRecord]:
+        snapshot = _Snapshot(high_id=self._last_id, position=after_id or 0)
+        self._snapshots.add(snapshot)
+        try:
+            while batch := self._next_snapshot_batch(snapshot, batch_size):
+                for record in batch:
+                    yield record
+        finally:
+            self._snapshots.discard(snapshot)
+
+    def _next_snapshot_batch(self, snapshot: _Snapshot, size: int) -> list[ItemRecord]:
+        """スナップショットから次のバッチを取り出す（awaitを挟まずに実行する）"""
+        preimages = snapshot.preimages
+
+        now = now_micros()
+        records: list[ItemRecord] = []
+        for item_id in self._ids_after(snapshot.position):
+            if item_id > snapshot.high_id or len(records) >= size:
+                break
+            record = preimages.pop(item_id, None) or self._lookup(item_id)
+            if record is not None and not record.expired(now):
+                records.append(record)
+            snapshot.position = item_id
+        return records
+
+    def _preserve(self, record: ItemRecord) -> None:
+        """ストリーミング中のスナップショットに変更前のレコードを退避する"""
+        for snapshot in self._snapshots:
+            if (
+                snapshot.position < record.id <= snapshot.high_id
+                and record.id not in snapshot.preimages
+            ):
+                snapshot.preimages[record.id] = record
+
+    def _live(self, item_id: int, now: int) -> ItemRecord | None:
+        """有効期限内のレコードを取得する（期限切れは存在しない扱い）"""
+        record = self._lookup(item_id)
+        if record is None or record.expired(now):
+            return None
+        return record
+
+    async def get_item(self, item_id: int) -> ItemRecord | None:
+        return self._live(item_id, now_micros())
+
+    async def create_item(
+        self, name: str, description: str, expires_at: int | None = None
+    ) -> ItemRecord:
+        item_id = self._id_allocator.allocate()
+        self._last_id = item_id
+
+        record = ItemRecord(item_id, name, description, now_micros(), None, expires_at)
+        self._items[item_id] = record
+        self._track_expiry(None, record)
+        self._ids.append(item_id)
+        self._version += 1
+        if self._search_index is not None or self._index_build is not None:
+            self._index_write(None, record)
+        if self._created_index is not None:
+            self._time_index_write(None, record)
+        return record
+
+    async def create_items(
+        self,
+        items: list[tuple[str, str]],
+        expires_at: list[int | None] | None = None,
+    ) -> list[ItemRecord]:
+        # 件数分のIDを一度に確保する
+        item_ids = self._id_allocator.allocate_block(len(items))
+        self._last_id = item_ids[-1]
+
+        created_at = now_micros()
+        records = [
+            ItemRecord(item_id, name, description, created_at, None, expires)
+            for item_id, (name, description), expires in zip(
+                item_ids, items, expires_at or [None] * len(items), strict=True
+            )
+        ]
+        self._items.update((record.id, record) for record in records)
+        if expires_at is not None:
+            for record in records:
+                self._track_expiry(None, record)
+        self._ids.extend(item_ids)
+        self._version += 1
+        if self._search_index is not None or self._index_build is not None:
+            for record in records:
+                self._index_write(None, record)
+        if self._created_index is not None:
+            for record in records:
+                self._time_index_write(None, record)
+        return records
+
+    async def update_item(
+        self,
+        item_id: int,
+        name: str | None,
+        description: str | None,
+        if_match: Collection[int] | None = None,
+        expires_at: int | None = None,
+    ) -> ItemRecord | None:
+        return self._update_record(
+            item_id, name, description, now_micros(), if_match, expires_at
+        )
+
+    async def update_items(
+        self,
+        updates: list[tuple[int, str | None, str | None]],
+        expires_at: list[int | None] | None = None,
+    ) -> list[ItemRecord | None]:
+        updated_at = now_micros()
+        return [
+            self._update_record(item_id, name, description, updated_at, None, expires)
+            for (item_id, name, description), expires in zip(
+                updates, expires_at or [None] * len(updates), strict=True
+            )
+        ]
+
+    def _update_record(
+        self,
+        item_id: int,
+        name: str | None,
+        description: str | None,
+        updated_at: int,
+        if_match: Collection[int] | None = None,
+        expires_at: int | None = None,
+    ) -> ItemRecord | None:
+        """
+        1回の参照でレコードを取得し、更新後のレコードに差し替える
+        バージョンの比較から差し替えまでawaitを挟まないため、ロックなしで不可分になる
+        """
+        record = self._live(item_id, updated_at)
+        if record is None:
+            return None
+        if if_match is not None and record.version not in if_match:
+            raise VersionConflictError(item_id, record.version)
+        if self._snapshots:
+            self._preserve(record)
+
+        # 同じマイクロ秒内の更新でも最終変更日時が変わるようにする
+        updated_at = max(updated_at, record.modified_at + 1)
+        updated = record.replace(updated_at, name, description, expires_at)
+        self._items[item_id] = updated
+        self._track_expiry(record, updated)
+        self._version += 1
+        if self._search_index is not None or self._index_build is not None:
+            self._index_write(record, updated)
+        if self._created_index is not None:
+            self._time_index_write(record, updated)
+        return updated
+
+    async def delete_item(
+        self, item_id: int, if_match: Collection[int] | None = None
+    ) -> bool:
+        return self._delete_record(item_id, if_match, now=now_micros())
+
+    async def delete_items(self, item_ids: list[int]) -> list[bool]:
+        now = now_micros()
+        return [self._delete_record(item_id, now=now) for item_id in item_ids]
+
+    async def delete_expired(self, item_ids: list[int], now: int) -> list[bool]:
+        results = []
+        for item_id in item_ids:
+            record = self._lookup(item_id)
+            results.append(
+                record is not None
+                and record.expired(now)
+                and self._delete_record(item_id)
+            )
+        return results
+
+    def _delete_record(
+        self,
+        item_id: int,
+        if_match: Collection[int] | None = None,
+        tombstone: bool = True,
+        now: int | None = None,
+    ) -> bool:
+        """nowを指定した場合、その時点で期限切れのレコードは存在しない扱いにする"""
+        current = self._lookup(item_id)
+        if current is None or (now is not None and current.expired(now)):
+            return False
+        if if_match is not None and current.version not in if_match:
+            raise VersionConflictError(item_id, current.version)
+        record = self._items.pop(item_id)
+        self._version += 1
+        if tombstone:
+            times = self._tombstone_times
+            # 回収した範囲（_tombstone_horizonより前）には作らない
+            deleted_at = max(now_micros(), self._tombstone_horizon)
+            if times:
+                deleted_at = max(deleted_at, times[-1] + 1)
+            times.append(deleted_at)
+            self._tombstone_ids.append(item_id)
+        if self._snapshots:
+            self._preserve(record)
+        if self._search_index is not None or self._index_build is not None:
+            self._index_write(record, None)
+        if self._created_index is not None:
+            self._time_index_write(record, None)
+        if self._base is not None and self._base.find(item_id) is not None:
+            # スナップショットのIDは_idsに含まれないため、詰め直しの対象外
+            return True
+
+        # ID一覧からの削除はcompact()でまとめて行う
+        self._stale_ids += 1
+        return True
+
+    def restore_record(self, record: ItemRecord) -> None:
+        """復旧時に、採番済みのIDのままレコードを登録する（既存の場合は差し替える）"""
+        # 復旧時はインデックスを更新せず、次の検索時に作り直す
+        self._reset_search_index()
+        # ID一覧の途中に挿入しうるため、詰め直し中の一覧は作り直す
+        self._purge_kept = None
+        self._created_index = self._modified_index = None
+        self._version += 1
+        current = self._lookup(record.id)
+        self._track_expiry(current, record)
+        if current is not None:
+            if self._snapshots:
+                self._preserve(current)
+            self._items[record.id] = record
+            return
+
+        self._items[record.id] = record
+        if record.id > self._last_id:
+            self._ids.append(record.id)
+            self._last_id = record.id
+            self._id_allocator.observe(record.id)
+            return
+        position = bisect_left(self._ids, record.id)
+        if position < len(self._ids) and self._ids[position] == record.id:
+            # 削除済みとして残っていたIDを再利用する
+            self._stale_ids -= 1
+        else:
+            self._ids.insert(position, record.id)
+
+    def allocate_ids(self, count: int) -> Sequence[int]:
+        """IDを採番する（公開はput_recordで行う）"""
+        if count == 1:
+            return [self._id_allocator.allocate()]
+        return self._id_allocator.allocate_block(count)
+
+    def reset_ids(self) -> None:
+        """採番を初期化する（全件削除の公開より先に、以降の作成のIDを振り直す場合）"""
+        self._id_allocator.reset()
+
+    def put_record(self, record: ItemRecord) -> None:
+        """
+        allocate_idsで採番して作成したレコード、または更新後のレコードを公開する
+        新しいIDは採番順に公開するため、ID一覧の末尾に追加するだけで昇順を保てる
+        """
+        current = self._lookup(record.id)
+        if current is not None and self._snapshots:
+            self._preserve(current)
+        self._items[record.id] = record
+        self._track_expiry(current, record)
+        if current is None:
+            self._ids.append(record.id)
+            self._last_id = record.id
+        self._version += 1
+        if self._search_index is not None or self._index_build is not None:
+            self._index_write(current, record)
+        if self._created_index is not None:
+            self._time_index_write(current, record)
+
+    def remove_record(self, item_id: int) -> bool:
+        """削除を公開する（削除できた場合True）"""
+        return self._delete_record(item_id)
+
+    def snapshot_reader(self) -> Callable[[], Iterator[ItemRecord]]:
+        """
+        別スレッドから全レコードをID昇順で読む関数を返す（一覧はコピーしない）
+        読み取り中の書き込みは反映される場合とされない場合があるため、
+        以降の書き込みを再生して補正できる場合（WALのスナップショット）にのみ使う
+        """
+        items, ids = self._items, self._ids
+        base, loaded = self._base, self._base_loaded
+
+        def read() -> Iterator[ItemRecord]:
+            last_id = 0
+            all_ids: Iterator[int] = iter(ids) if base is None else merge(base.ids, ids)
+            for item_id in all_ids:
+                # 復旧時に削除後に再登録したIDは、両方の一覧に含まれる
+                if item_id == last_id:
+                    continue
+                last_id = item_id
+                record = items.get(item_id)
+                if record is None and base is not None:
+                    position = base.find(item_id)
+                    if position is not None:
+                        # 復元済みの印は_itemsへの登録後に付くため、印を先に見る
+                        # （印があって_itemsにない場合は削除済み）
+                        unloaded = not loaded[position]
+                        record = items.get(item_id)
+                        if record is None and unloaded:
+                            record = base.record_at(position)
+                if record is not None:
+                    yield record
+
+        return read
+
+    def discard_record(self, item_id: int) -> bool:
+        """復旧時に削除を反映する（削除できた場合True）"""
+        # 削除日時はわからないため墓標は作らず、それより前の削除を保持していない扱いにする
+        self._tombstone_horizon = max(self._tombstone_horizon, now_micros())
+        return self._delete_record(item_id, tombstone=False)
+
+    async def list_tombstones(
+        self, after: tuple[int, int], limit: int
+    ) -> list[Tombstone] | None:
+        if after[0] < self._tombstone_horizon:
+            return None
+        times, ids = self._tombstone_times, self._tombstone_ids
+        # 削除日時は一意のため、afterと同じ削除日時の墓標はIDが大きい場合のみ含める
+        position = bisect_right(times, after[0], lo=self._tombstone_head)
+        if position > self._tombstone_head and times[position - 1] == after[0]:
+            if ids[position - 1] > after[1]:
+                position -= 1
+        end = min(len(times), position + limit)
+        return [Tombstone(ids[i], times[i]) for i in range(position, end)]
+
+    async def compact(self, before: int, budget: float) -> int:
+        """
+        期限切れのアイテムは有効期限の索引から期限順に取り出して削除する
+        墓標は先頭の位置を進めるだけで回収する（O(log n)。詰めるのは半数を超えてから）
+        ID一覧の削除済みIDは、_PURGE_CHUNK件ごとに残り時間を確認しながら詰め直す
+        """
+        deadline = time.perf_counter() + budget
+        item_ids, expired_done = self.take_expired(now_micros(), deadline)
+        purged = sum(self._delete_record(item_id) for item_id in item_ids)
+        reclaimed, done = self.reclaim(before, deadline)
+        reclaimed += purged
+        return reclaimed if done and expired_done else max(reclaimed, 1)
+
+    def _track_expiry(self, old: ItemRecord | None, new: ItemRecord) -> None:
+        """変わった有効期限を索引に登録する"""
+        if new.expires_at is not None and (
+            old is None or old.expires_at != new.expires_at
+        ):
+            heappush(self._expiring, (new.expires_at, new.id))
+
+    def take_expired(self, now: int, deadline: float) -> tuple[list[int], bool]:
+        """
+        nowの時点で期限切れのアイテムのIDを索引から取り出し、(ID, 残りがないか)を返す
+        （awaitせずに実行する。削除は呼び出し側で行う）
+        スナップショットのレコードの期限は、ここで残り時間の範囲で索引に登録していく
+        """
+        done = self._scan_base_expiry(deadline)
+        done = self._collect_expired(now, deadline) and done
+        item_ids, self._expired_ids = self._expired_ids, []
+        return item_ids, done
+
+    def _collect_expired(self, now: int, deadline: float | None = None) -> bool:
+        """
+        nowの時点で期限切れのアイテムを索引から_expired_idsに移し、移し終えた場合Trueを返す
+        （期限を変えた後の古い要素は捨てる）
+        """
+        heap = self._expiring
+        popped = 0
+        while heap and heap[0][0] <= now:
+            expires_at, item_id = heappop(heap)
+            record = self._lookup(item_id)
+            if record is not None and record.expires_at == expires_at:
+                self._expired_ids.append(item_id)
+                self._expired_count += 1
+            popped += 1
+            if (
+                deadline is not None
+                and not popped % _PURGE_CHUNK
+                and time.perf_counter() >= deadline
+            ):
+                return not (heap and heap[0][0] <= now)
+        return True
+
+    def _scan_base_expiry(self, deadline: float) -> bool:
+        """
+        スナップショットのレコードの期限を_PURGE_CHUNK件ずつ索引に登録する
+        （レコードは復元せずに期限だけを読む。登録し終えた場合True）
+        """
+        base = self._base
+        if base is None:
+            return True
+        position, end = self._base_scanned, len(base)
+        while position < end:
+            stop = min(position + _PURGE_CHUNK, end)
+            for index in range(position, stop):
+                expires_at = base.expires_at(index)
+                if expires_at is not None:
+                    heappush(self._expiring, (expires_at, base.ids[index]))
+            position = stop
+            if position < end and time.perf_counter() >= deadline:
+                break
+        self._base_scanned = position
+        return position == end
+
+    def reclaim(self, before: int, deadline: float) -> tuple[int, bool]:
+        """
+        墓標とID一覧の削除済みIDを回収し、(回収した件数, 残りがないか)を返す
+        （awaitせずに実行する）
+        """
+        times, head = self._tombstone_times, self._tombstone_head
+        self._tombstone_horizon = max(self._tombstone_horizon, before)
+        position = bisect_left(times, before, lo=head)
+        self._tombstone_head = position
+        if position * 2 > len(times):
+            del times[:position]
+            del self._tombstone_ids[:position]
+            self._tombstone_head = 0
+        purged, done = self._purge_ids(deadline)
+        return position - head + purged, done
+
+    def _purge_ids(self, deadline: float) -> tuple[int, bool]:
+        """
+        ID一覧から削除済みIDを除いた一覧を作り、作り終えたら差し替える
+        (今回除いた件数, 詰め直しを終えたか)を返す
+        作成中の追加は_idsの末尾に足されるため、続けて移せば取りこぼさない
+        """
+        if self._purge_kept is None:
+            if self._stale_ids * 2 <= len(self._ids):
+                return 0, True
+            self._purge_kept, self._purge_position = [], 0
+
+        ids, kept, items = self._ids, self._purge_kept, self._items
+        dropped = 0
+        # 時間切れでも1回あたり_PURGE_CHUNK件は進める
+        while self._purge_position < len(ids):
+            end = self._purge_position + _PURGE_CHUNK
+            chunk = ids[self._purge_position : end]
+            live = [i for i in chunk if i in items]
+            kept.extend(live)
+            dropped += len(chunk) - len(live)
+            self._purge_position = min(end, len(ids))
+            if self._purge_position < len(ids) and time.perf_counter() >= deadline:
+                return dropped, False
+        # スナップショットが削除済みIDを参照するため、ストリーミング中は差し替えない
+        # （ストリーミングが終わるまで続けても進まないため、残りなしとして扱う）
+        if self._snapshots:
+            return dropped, True
+
+        # 移した後に削除されたIDはkeptに残るため、除いた件数だけ減らす
+        self._stale_ids -= len(ids) - len(kept)
+        self._ids = kept
+        self._purge_kept = None
+        return dropped, True
+
+    async def search(self, query: str, limit: int) -> tuple[list[ItemRecord], int]:
+        if not normalize(query):
+            return await super().search(query, limit)
+
+        index = self._search_index
+        if self._index_build is None and (index is None or index.needs_rebuild()):
+            await self._start_index_build()
+        if self._search_index is None and self._index_build is not None:
+            await asyncio.wrap_future(self._index_build)
+        if self._index_build is not None and self._index_build.done():
+            self._finish_index_build()
+
+        # 作り直し中は古いインデックスを使う（不要なエントリは照合で除外される）
+        assert self._search_index is not None
+        now = now_micros()
+        return self._search_index.search(
+            query, limit, lambda item_id: self._live(item_id, now)
+        )
+
+    async def _start_index_build(self) -> None:
+        """
+        インデックスをバックグラウンドのスレッドで作成する
+        レコードは書き換えずに差し替えるため、一覧を渡すだけで作成中の書き込みと
+        競合しない。作成中の書き込みは_index_pendingにためて完了後に反映する
+        """
+        # スナップショットの未復元のレコードもここで復元される
+        records = await self.list_items()
+        build: Future[InvertedIndex] = Future()
+
+        def run() -> None:
+            try:
+                build.set_result(InvertedIndex(records))
+            except BaseException as e:
+                build.set_exception(e)
+
+        self._index_build = build
+        self._index_pending = []
+        threading.Thread(target=run, name="search-index", daemon=True).start()
+
+    def _finish_index_build(self) -> None:
+        """作成したインデックスに作成中の書き込みを反映して切り替える"""
+        assert self._index_build is not None
+        index = self._index_build.result()
+        for old, new in self._index_pending:
+            if old is not None:
+                index.discard(old)
+            if new is not None:
+                index.add(new)
+        self._search_index = index
+        self._index_build = None
+        self._index_pending = []
+
+    def _index_write(self, old: ItemRecord | None, new: ItemRecord | None) -> None:
+        """書き込みを検索インデックスに反映する"""
+        if self._search_index is not None:
+            if old is not None:
+                self._search_index.discard(old)
+            if new is not None:
+                self._search_index.add(new)
+        if self._index_build is not None:
+            self._index_pending.append((old, new))
+
+    def _reset_search_index(self) -> None:
+        # 作成中のスレッドの結果は参照されずに破棄される
+        self._search_index = None
+        self._index_build = None
+        self._index_pending = []
+
+    async def list_items_by_time(
+        self,
+        order_by: str,
+        created: TimeRange = UNBOUNDED,
+        modified: TimeRange = UNBOUNDED,
+        after: tuple[int, int] | None = None,
+        limit: int | None = None,
+        descending: bool = False,
+    ) -> list[ItemRecord]:
+        if limit is not None and limit <= 0:
+            return []
+        if order_by == "id" and (
+            descending or (created == UNBOUNDED and modified == UNBOUNDED)
+        ):
+            if descending:
+                return await super().list_items_by_time(
+                    order_by, created, modified, after, limit, descending
+                )
+            return await self.list_items(
+                after_id=after[1] if after is not None else None, limit=limit
+            )
+
+        await self._ensure_time_indexes()
+        assert self._created_index is not None and self._modified_index is not None
+        if order_by == "created_at" or (order_by == "id" and created != UNBOUNDED):
+            index, bounds = self._created_index, created
+            other_field, other = "updated_at", modified
+        else:
+            index, bounds = self._modified_index, modified
+            other_field, other = "created_at", created
+
+        if order_by == "id":
+            # ID順の場合は範囲内の全件をID順に並べ直す（O(log n + k log k)）
+            low, high = key_bounds(bounds, None, False)
+            ids = sorted(index.ids(low, high))
+            if after is not None:
+                ids = ids[bisect_right(ids, after[1]) :]
+        else:
+            low, high = key_bounds(bounds, after, descending)
+            ids = index.ids(low, high, descending)
+
+        now = now_micros()
+        records: list[ItemRecord] = []
+        for item_id in ids:
+            record = self._live(item_id, now)
+            if record is None:
+                continue
+            if in_range(sort_value(record, other_field), other):
+                records.append(record)
+                if len(records) == limit:
+                    break
+        return records
+
+    async def _ensure_time_indexes(self) -> None:
+        """作成日時・最終変更日時の索引がなければ全件から作成する"""
+        if self._created_index is not None:
+            return
+        # スナップショットの未復元のレコードもここで復元される
+        records = await self.list_items()
+        self._created_index = SortedKeyIndex(
+            make_key(record.created_at, record.id) for record in records
+        )
+        self._modified_index = SortedKeyIndex(
+            make_key(record.modified_at, record.id) for record in records
+        )
+
+    def _time_index_write(self, old: ItemRecord | None, new: ItemRecord | None) -> None:
+        """書き込みを作成日時・最終変更日時の索引に反映する"""
+        assert self._created_index is not None and self._modified_index is not None
+        if old is not None:
+            self._modified_index.discard(old.modified_at, old.id)
+            if new is None:
+                self._created_index.discard(old.created_at, old.id)
+        if new is not None:
+            self._modified_index.add(new.modified_at, new.id)
+            if old is None:
+                self._created_index.add(new.created_at, new.id)
+
+    async def count(self) -> int:
+        return len(self._items) + self._base_remaining
+
+    async def store_version(self) -> str | None:
+        # 書き込みがなくても、期限切れで一覧から消えたアイテムがあれば変わる
+        self._collect_expired(now_micros())
+        return f"{self._epoch}-{self._version}-{self._expired_count}"
+
+    async def clear(self) -> None:
+        self.discard_all()
+
+    def discard_all(self, reset_ids: bool = True) -> None:
+        """
+        全アイテムを削除して採番を初期化する（復旧時はawaitせずに呼ぶ）
+        reset_ids=Falseの場合、reset_ids()で初期化済みの採番はそのまま使う
+        """
+        self._items.clear()
+        if reset_ids:
+            self._id_allocator.reset()
+        self._last_id = 0
+        self._ids.clear()
+        self._stale_ids = 0
+        self._purge_kept = None
+        # IDを振り直すため、以前の墓標は参照できなくなる
+        del self._tombstone_times[:]
+        del self._tombstone_ids[:]
+        self._tombstone_head = 0
+        self._tombstone_horizon = now_micros()
+        self._base = None
+        self._base_loaded = bytearray()
+        self._base_remaining = 0
+        self._expiring = []
+        self._base_scanned = 0
+        self._expired_ids = []
+        self._reset_search_index()
+        self._created_index = self._modified_index = None
+        self._version += 1
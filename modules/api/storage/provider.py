@@ -0,0 +1,250 @@
+"""
+ストレージの生成と取得
+環境変数でバックエンドを切り替える
+
+- APP_STORAGE_BACKEND: memory（デフォルト） / sqlite / shared
+- APP_ID_STRATEGY: counter（デフォルト） / snowflake（インメモリストレージの採番方式）
+- APP_NODE_ID: snowflake採番のノードID（未設定時はホスト内で自動確保）
+- APP_SQLITE_PATH: SQLiteファイルのパス（デフォルト: items.db）
+- APP_SQLITE_POOL_SIZE: SQLite接続プールのサイズ（デフォルト: 4）
+- APP_SHARED_PATH: 共有メモリストレージのファイル（デフォルト: /dev/shm/items.shm）
+- APP_SHARED_CAPACITY: 共有メモリストレージの最大件数（デフォルト: 100000）
+- APP_SNAPSHOT_PATH: 起動時に読み込むスナップショット（インメモリストレージの初期データ）
+- APP_WAL_DIR: インメモリストレージのWAL・スナップショットの保存先（未設定時は永続化しない）
+- APP_WAL_FSYNC: always / interval（デフォルト） / os
+- APP_WAL_FSYNC_INTERVAL_MS: intervalの場合のfsync間隔（デフォルト: 100）
+- APP_WAL_SNAPSHOT_BYTES: スナップショットを作成するWALのサイズ（デフォルト: 64MiB）
+- APP_JSON_CACHE_BYTES: アイテムのエンコード済みJSONのキャッシュサイズ（デフォルト: 64MiB。0で無効）
+- APP_CHANGE_FEED_SIZE: 変更フィードが保持する直近の変更の件数（デフォルト: 10000）
+- APP_WS_QUEUE_SIZE: WebSocketの購読者ごとの未送信の変更の上限（デフォルト: 256）
+- APP_TOMBSTONE_RETENTION_SECONDS: 削除したアイテムの墓標を保持する秒数（デフォルト: 86400）
+- APP_COMPACTION_INTERVAL_SECONDS: 回収するものがない場合に次の回収まで待つ秒数（デフォルト: 1）
+- APP_COMPACTION_SLICE_MS: 墓標の回収を1回で打ち切る時間（デフォルト: 5）
+- APP_TTL_TICK_MS: アイテムの有効期限を確認する間隔（デフォルト: 1000）
+- APP_IDEMPOTENCY_TTL_SECONDS: Idempotency-Keyのレスポンスを保持する秒数（デフォルト: 86400）
+- APP_IDEMPOTENCY_MAX_BYTES: ワーカー内のIdempotency-Keyキャッシュのサイズ（デフォルト: 16MiB）
+- APP_IDEMPOTENCY_MAX_ENTRIES: 共有するIdempotency-Keyキャッシュの最大件数（デフォルト: 100000）
+- APP_IDEMPOTENCY_PATH: 共有するIdempotency-KeyキャッシュのSQLiteファイル
+  （sqlite・sharedバックエンドのみ。デフォルト: sqliteはAPP_SQLITE_PATHと同じファイル、
+  sharedは共有メモリストレージのファイルと同じディレクトリのidempotency.db）
+"""
+
+import os
+
+from .base import ItemStorage
+from .changefeed import DEFAULT_CAPACITY as DEFAULT_CHANGE_FEED_SIZE
+from .changefeed import DEFAULT_QUEUE_SIZE, ChangeFeed
+from .compaction import (
+    DEFAULT_INTERVAL_SECONDS,
+    DEFAULT_RETENTION_SECONDS,
+    DEFAULT_SLICE_SECONDS,
+    TombstoneCompactor,
+)
+from .durable import DEFAULT_SNAPSHOT_BYTES, DurableItemStorage
+from .expiry import DEFAULT_TICK_SECONDS, ItemExpiry
+from .idempotency import DEFAULT_MAX_BYTES as DEFAULT_IDEMPOTENCY_MAX_BYTES
+from .idempotency import (
+    DEFAULT_MAX_ENTRIES,
+    DEFAULT_TTL_SECONDS,
+    IdempotencyCache,
+    InMemoryIdempotencyCache,
+    SQLiteIdempotencyCache,
+)
+from .ids import CounterIdAllocator, IdAllocator, SnowflakeIdAllocator, claim_node_id
+from .jsoncache import DEFAULT_MAX_BYTES, ItemJsonCache
+from .memory import InMemoryItemStorage
+from .shared import DEFAULT_CAPACITY, SharedItemStorage, default_shared_path
+from .snapshot import MappedSnapshot
+from .sqlite import SQLiteItemStorage
+
+_storage: ItemStorage | None = None
+_json_cache: ItemJsonCache | None = None
+_idempotency_cache: IdempotencyCache | None = None
+_change_feed: ChangeFeed | None = None
+_item_expiry: ItemExpiry | None = None
+
+
+def create_id_allocator() -> IdAllocator:
+    """環境変数の設定に従ってID採番器を生成する"""
+    strategy = os.getenv("APP_ID_STRATEGY", "counter").lower()
+
+    if strategy == "counter":
+        return CounterIdAllocator()
+    if strategy == "snowflake":
+        return SnowflakeIdAllocator(node_id=claim_node_id())
+
+    raise ValueError(f"未対応のID採番方式です: {strategy}")
+
+
+def create_storage() -> ItemStorage:
+    """環境変数の設定に従ってストレージを生成する"""
+    backend = os.getenv("APP_STORAGE_BACKEND", "memory").lower()
+
+    if backend == "memory":
+        store = InMemoryItemStorage(id_allocator=create_id_allocator())
+        snapshot_path = os.getenv("APP_SNAPSHOT_PATH")
+        wal_dir = os.getenv("APP_WAL_DIR")
+        if not wal_dir:
+            if snapshot_path:
+                store.load_snapshot(MappedSnapshot(snapshot_path))
+            return store
+        return DurableItemStorage(
+            wal_dir,
+            store=store,
+            fsync=os.getenv("APP_WAL_FSYNC", "interval").lower(),
+            interval_ms=int(os.getenv("APP_WAL_FSYNC_INTERVAL_MS", "100")),
+            snapshot_bytes=int(
+                os.getenv("APP_WAL_SNAPSHOT_BYTES", str(DEFAULT_SNAPSHOT_BYTES))
+            ),
+            seed_snapshot=snapshot_path,
+        )
+    if backend == "sqlite":
+        return SQLiteItemStorage(
+            path=os.getenv("APP_SQLITE_PATH", "items.db"),
+            pool_size=int(os.getenv("APP_SQLITE_POOL_SIZE", "4")),
+        )
+    if backend == "shared":
+        return SharedItemStorage(
+            path=os.getenv("APP_SHARED_PATH") or default_shared_path(),
+            capacity=int(os.getenv("APP_SHARED_CAPACITY", str(DEFAULT_CAPACITY))),
+        )
+
+    raise ValueError(f"未対応のストレージバックエンドです: {backend}")
+
+
+def get_storage() -> ItemStorage:
+    """
+    アプリケーションで共有するストレージを取得する
+    Lambdaではlifespanが動かないため、初回アクセス時に生成する
+    """
+    global _storage
+
+    if _storage is None:
+        _storage = create_storage()
+    return _storage
+
+
+def create_compactor() -> TombstoneCompactor:
+    """環境変数の設定に従って、共有ストレージの墓標を回収するタスクを生成する"""
+    return TombstoneCompactor(
+        get_storage,
+        retention_seconds=float(
+            os.getenv("APP_TOMBSTONE_RETENTION_SECONDS", str(DEFAULT_RETENTION_SECONDS))
+        ),
+        interval_seconds=float(
+            os.getenv("APP_COMPACTION_INTERVAL_SECONDS", str(DEFAULT_INTERVAL_SECONDS))
+        ),
+        slice_seconds=float(
+            os.getenv("APP_COMPACTION_SLICE_MS", str(DEFAULT_SLICE_SECONDS * 1000))
+        )
+        / 1000,
+    )
+
+
+def get_json_cache() -> ItemJsonCache:
+    """共有ストレージのアイテムのJSONキャッシュを取得する"""
+    global _json_cache
+
+    if _json_cache is None:
+        _json_cache = ItemJsonCache(
+            max_bytes=int(os.getenv("APP_JSON_CACHE_BYTES", str(DEFAULT_MAX_BYTES)))
+        )
+    return _json_cache
+
+
+def create_idempotency_cache() -> IdempotencyCache:
+    """
+    環境変数の設定に従ってIdempotency-Keyのキャッシュを生成する
+    ワーカー間でアイテムを共有するバックエンドでは、キャッシュもSQLiteファイルで共有する
+    """
+    backend = os.getenv("APP_STORAGE_BACKEND", "memory").lower()
+    ttl_seconds = float(
+        os.getenv("APP_IDEMPOTENCY_TTL_SECONDS", str(DEFAULT_TTL_SECONDS))
+    )
+
+    path = os.getenv("APP_IDEMPOTENCY_PATH")
+    if not path and backend == "sqlite":
+        path = os.getenv("APP_SQLITE_PATH", "items.db")
+    elif not path and backend == "shared":
+        shared_path = os.getenv("APP_SHARED_PATH") or default_shared_path()
+        path = os.path.join(os.path.dirname(shared_path), "idempotency.db")
+    if path and backend in ("sqlite", "shared"):
+        return SQLiteIdempotencyCache(
+            path,
+            max_entries=int(
+                os.getenv("APP_IDEMPOTENCY_MAX_ENTRIES", str(DEFAULT_MAX_ENTRIES))
+            ),
+            ttl_seconds=ttl_seconds,
+        )
+    return InMemoryIdempotencyCache(
+        max_bytes=int(
+            os.getenv("APP_IDEMPOTENCY_MAX_BYTES", str(DEFAULT_IDEMPOTENCY_MAX_BYTES))
+        ),
+        ttl_seconds=ttl_seconds,
+    )
+
+
+def get_idempotency_cache() -> IdempotencyCache:
+    """共有ストレージに対応するIdempotency-Keyのキャッシュを取得する"""
+    global _idempotency_cache
+
+    if _idempotency_cache is None:
+        _idempotency_cache = create_idempotency_cache()
+    return _idempotency_cache
+
+
+def get_change_feed() -> ChangeFeed:
+    """共有ストレージへの変更を記録する変更フィードを取得する"""
+    global _change_feed
+
+    if _change_feed is None:
+        _change_feed = ChangeFeed(
+            capacity=int(
+                os.getenv("APP_CHANGE_FEED_SIZE", str(DEFAULT_CHANGE_FEED_SIZE))
+            ),
+            queue_size=int(os.getenv("APP_WS_QUEUE_SIZE", str(DEFAULT_QUEUE_SIZE))),
+        )
+    return _change_feed
+
+
+def get_item_expiry() -> ItemExpiry:
+    """共有ストレージのアイテムの有効期限を管理するタイミングホイールを取得する"""
+    global _item_expiry
+
+    if _item_expiry is None:
+        _item_expiry = ItemExpiry(
+            tick_seconds=float(
+                os.getenv("APP_TTL_TICK_MS", str(DEFAULT_TICK_SECONDS * 1000))
+            )
+            / 1000
+        )
+    return _item_expiry
+
+
+def _reset_caches() -> None:
+    global _json_cache, _idempotency_cache, _change_feed, _item_expiry
+
+    _json_cache = None
+    _change_feed = None
+    _item_expiry = None
+    if _idempotency_cache is not None:
+        _idempotency_cache.close()
+        _idempotency_cache = None
+
+
+def set_storage(storage: ItemStorage | None) -> None:
+    """共有ストレージを差し替える（テスト・ベンチマーク用）"""
+    global _storage
+
+    _storage = storage
+    _reset_caches()
+
+
+async def close_storage() -> None:
+    """生成済みのストレージがあれば解放する"""
+    global _storage
+
+    if _storage is not None:
+        await _storage.close()
+        _storage = None
+    _reset_caches()
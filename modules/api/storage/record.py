@@ -0,0 +1,185 @@
+"""
+ストレージ内部のアイテム表現
+日時はエポックマイクロ秒の整数で保持し、datetimeへの変換はレスポンス生成時に行う
+"""
+
+import struct
+import time
+from datetime import UTC, datetime, timedelta
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+_MICROSECOND = timedelta(microseconds=1)
+
+# バイナリ形式の固定長部分（id, created_at, updated_at, nameの長さ, descriptionの長さ）
+# updated_atの0は未更新を表す。後ろにUTF-8のname・descriptionが続く
+# 有効期限がある場合はnameの長さの最上位ビットを立て、固定長部分の直後に期限を置く
+# （期限のないレコードは以前の形式と同じバイト列になる）
+_PACKED = struct.Struct("<qqqII")
+_EXPIRES_AT = struct.Struct("<q")
+_HAS_EXPIRY = 1 << 31
+
+
+def now_micros() -> int:
+    """現在時刻をエポックマイクロ秒で取得する"""
+    return time.time_ns() // 1000
+
+
+def to_micros(value: datetime) -> int:
+    """datetimeをエポックマイクロ秒に変換する"""
+    return (value - _EPOCH) // _MICROSECOND
+
+
+def from_micros(value: int) -> datetime:
+    """エポックマイクロ秒をUTCのdatetimeに変換する"""
+    return _EPOCH + timedelta(microseconds=value)
+
+
+class ItemRecord:
+    """
+    1件分のアイテム
+
+    __slots__でインスタンスdictを持たないため、dictで保持する場合より
+    1件あたりのメモリ使用量が小さい。ストレージ内のレコードは書き換えず、
+    更新時はreplace()で新しいレコードに差し替える。
+    有効期限（expires_at）を過ぎたレコードは、削除前でも存在しないものとして扱う。
+    """
+
+    __slots__ = ("id", "name", "description", "created_at", "updated_at", "expires_at")
+
+    def __init__(
+        self,
+        id: int,
+        name: str,
+        description: str,
+        created_at: int,
+        updated_at: int | None = None,
+        expires_at: int | None = None,
+    ) -> None:
+        self.id = id
+        self.name = name
+        self.description = description
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.expires_at = expires_at
+
+    @property
+    def modified_at(self) -> int:
+        """最終変更日時（未更新の場合は作成日時）"""
+        return self.created_at if self.updated_at is None else self.updated_at
+
+    @property
+    def version(self) -> int:
+        """
+        アイテムのバージョン（ETag・If-Matchで使う）
+        更新日時は更新ごとに必ず進むため、最終変更日時をそのまま使う
+        """
+        return self.modified_at
+
+    def expired(self, now: int) -> bool:
+        """有効期限がnow（エポックマイクロ秒）以前の場合True"""
+        return self.expires_at is not None and self.expires_at <= now
+
+    def replace(
+        self,
+        updated_at: int,
+        name: str | None = None,
+        description: str | None = None,
+        expires_at: int | None = None,
+    ) -> "ItemRecord":
+        """指定されたフィールドのみを差し替えた新しいレコードを返す"""
+        return ItemRecord(
+            self.id,
+            self.name if name is None else name,
+            self.description if description is None else description,
+            self.created_at,
+            updated_at,
+            self.expires_at if expires_at is None else expires_at,
+        )
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ItemRecord):
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in self.__slots__)
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{f}={getattr(self, f)!r}" for f in self.__slots__)
+        return f"ItemRecord({fields})"
+
+
+class Tombstone:
+    """削除したアイテムの記録（墓標）。保持期間が過ぎるまで削除を参照できる"""
+
+    __slots__ = ("id", "deleted_at")
+
+    def __init__(self, id: int, deleted_at: int) -> None:
+        self.id = id
+        self.deleted_at = deleted_at
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Tombstone):
+            return NotImplemented
+        return (self.id, self.deleted_at) == (other.id, other.deleted_at)
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"Tombstone(id={self.id!r}, deleted_at={self.deleted_at!r})"
+
+
+def pack_record(record: ItemRecord) -> bytes:
+    """レコードをWAL・スナップショット用のバイナリ形式に変換する"""
+    name = record.name.encode()
+    description = record.description.encode()
+    if record.expires_at is None:
+        header = _PACKED.pack(
+            record.id,
+            record.created_at,
+            record.updated_at or 0,
+            len(name),
+            len(description),
+        )
+    else:
+        header = _PACKED.pack(
+            record.id,
+            record.created_at,
+            record.updated_at or 0,
+            len(name) | _HAS_EXPIRY,
+            len(description),
+        ) + _EXPIRES_AT.pack(record.expires_at)
+    return header + name + description
+
+
+def unpack_expires_at(buffer: bytes | memoryview, offset: int = 0) -> int | None:
+    """バイナリ形式のレコードの有効期限だけを読み取る（name・descriptionは復元しない）"""
+    name_len = _PACKED.unpack_from(buffer, offset)[3]
+    if not name_len & _HAS_EXPIRY:
+        return None
+    return _EXPIRES_AT.unpack_from(buffer, offset + _PACKED.size)[0]
+
+
+def unpack_record(
+    buffer: bytes | memoryview, offset: int = 0
+) -> tuple[ItemRecord, int]:
+    """バイナリ形式のレコードを読み取り、(レコード, 次のオフセット)を返す"""
+    item_id, created_at, updated_at, name_len, description_len = _PACKED.unpack_from(
+        buffer, offset
+    )
+    start = offset + _PACKED.size
+    expires_at = None
+    if name_len & _HAS_EXPIRY:
+        name_len ^= _HAS_EXPIRY
+        (expires_at,) = _EXPIRES_AT.unpack_from(buffer, start)
+        start += _EXPIRES_AT.size
+    middle = start + name_len
+    end = middle + description_len
+    record = ItemRecord(
+        item_id,
+        bytes(buffer[start:middle]).decode(),
+        bytes(buffer[middle:end]).decode(),
+        created_at,
+        updated_at or None,
+        expires_at,
+    )
+    return record, end
@@ -0,0 +1,136 @@
+"""
+アイテムの全文検索
+name・descriptionを文字unigram・bigramに分割した転置インデックスで候補を絞り込む
+
+日本語は単語の区切りがないため、形態素解析の代わりに文字bigramを使う。
+1文字のクエリはunigramで引く。bigramの一致は部分文字列の一致を保証しないため、
+候補は元の文字列で照合する。
+"""
+
+import heapq
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections.abc import Callable, Iterable
+
+from .record import ItemRecord
+
+# 名前に含まれる場合は説明に含まれる場合より上位にする
+NAME_WEIGHT = 3
+
+
+def normalize(text: str) -> str:
+    """全角・半角や大文字・小文字の違いを吸収する"""
+    if not unicodedata.is_normalized("NFKC", text):
+        text = unicodedata.normalize("NFKC", text)
+    return text.casefold()
+
+
+def bigrams(text: str) -> set[str]:
+    """正規化済みの文字列を文字bigramに分割する"""
+    return {text[i : i + 2] for i in range(len(text) - 1)}
+
+
+def grams(text: str) -> set[str]:
+    """正規化済みの文字列を文字unigramとbigramに分割する"""
+    return set(text) | bigrams(text)
+
+
+def score(record: ItemRecord, query: str) -> int:
+    """正規化済みのクエリの出現回数から関連度を計算する（含まない場合は0）"""
+    return normalize(record.name).count(query) * NAME_WEIGHT + normalize(
+        record.description
+    ).count(query)
+
+
+def top_matches(
+    scored: Iterable[tuple[int, ItemRecord]], limit: int
+) -> tuple[list[ItemRecord], int]:
+    """関連度の高い順（同点はID順）に上位limit件と一致件数を返す"""
+    matches = [(value, record) for value, record in scored if value > 0]
+    top = heapq.nsmallest(limit, matches, key=lambda m: (-m[0], m[1].id))
+    return [record for _, record in top], len(matches)
+
+
+class InvertedIndex:
+    """
+    文字unigram・bigramからIDの一覧（昇順のarray）への転置インデックス
+
+    更新・削除時に古いbigramからIDを取り除かず、検索時の照合で除外する。
+    取り除いていないIDが全体の半数を超えたら作り直す（償却O(1)）。
+    """
+
+    def __init__(self, records: Iterable[ItemRecord] = ()) -> None:
+        self._postings: dict[str, array] = {}
+        self._entries = 0
+        self._stale_entries = 0
+        for record in records:
+            self.add(record)
+
+    @staticmethod
+    def _tokens(record: ItemRecord) -> set[str]:
+        return grams(normalize(record.name)) | grams(normalize(record.description))
+
+    def add(self, record: ItemRecord) -> None:
+        item_id = record.id
+        for token in self._tokens(record):
+            posting = self._postings.get(token)
+            if posting is None:
+                self._postings[token] = array("q", (item_id,))
+            elif posting[-1] < item_id:
+                # 作成順にIDが増えるため、ほとんどは末尾への追加になる
+                posting.append(item_id)
+            else:
+                position = bisect_left(posting, item_id)
+                if position < len(posting) and posting[position] == item_id:
+                    continue
+                posting.insert(position, item_id)
+            self._entries += 1
+
+    def discard(self, record: ItemRecord) -> None:
+        """削除されたレコードのbigramを不要なエントリとして数える"""
+        self._stale_entries += len(self._tokens(record))
+
+    def needs_rebuild(self) -> bool:
+        return self._stale_entries * 2 > self._entries
+
+    def search(
+        self,
+        query: str,
+        limit: int,
+        lookup: Callable[[int], ItemRecord | None],
+    ) -> tuple[list[ItemRecord], int]:
+        """
+        クエリを含むアイテムを関連度順に返す
+        候補はbigram（1文字のクエリはunigram）のIDの一覧の共通部分で、
+        件数の少ない一覧から順に絞り込む
+        """
+        query = normalize(query)
+        postings: list[array] = []
+        for token in bigrams(query) if len(query) > 1 else set(query):
+            posting = self._postings.get(token)
+            if posting is None:
+                return [], 0
+            postings.append(posting)
+        if not postings:
+            return [], 0
+
+        postings.sort(key=len)
+        candidates = [
+            item_id
+            for item_id in postings[0]
+            if all(_contains(posting, item_id) for posting in postings[1:])
+        ]
+
+        def scored() -> Iterable[tuple[int, ItemRecord]]:
+            for item_id in candidates:
+                record = lookup(item_id)
+                if record is not None:
+                    yield score(record, query), record
+
+        return top_matches(scored(), limit)
+
+
+def _contains(posting: array, item_id: int) -> bool:
+    position = bisect_left(posting, item_id)
+    return position < len(posting) and posting[position] == item_id
@@ -0,0 +1,964 @@
+"""
+共有メモリストレージ
+mmapしたファイルにアイテムを保持し、uvicornの複数ワーカーから同じデータを参照する
+
+ファイル構成:
+    | ヘッダー(136B) | レコード表(固定長64B x capacity) | 文字列ヒープ(heap_size) |
+
+- レコード表は固定長のスロットで、IDのアイテムは (id - 1) % capacity 番目のスロットに置く。
+  スロットにはIDを持ち、引いたスロットのIDが一致しなければ存在しない扱いにする
+- IDは連番で採番し、採番したIDのスロットが使用中（長く残っているアイテム）の場合は
+  空いているスロットに当たるIDまで飛ばす。削除で空いたスロットは後のIDで再利用される
+- name/descriptionはUTF-8でヒープに追記し、スロットにはオフセットと長さを持つ。
+  更新・削除で使われなくなった文字列の量を記録し、足りなくなったときと半分を超えたとき
+  （compact()）に、使用中の文字列を先頭に詰め直す。compact()ではロックを取り直しながら
+  区切って詰め、途中の位置はヘッダーに持つ
+- 有効期限はスロットに持ち、期限切れのスロットは読み取り・書き込みとも空きとして扱う。
+  スロットの解放はdelete_expired()・compact()で行うため、作成したワーカーが
+  再起動・終了していても他のワーカーが削除できる。compact()はヘッダーに持つ
+  「次に期限切れになりうる日時」を過ぎたときだけレコード表を区切りながら掃引する
+- 書き込みはファイルロック（flock）で全ワーカー間で直列化する。ロックが空いていれば
+  その場で、他のプロセスが保持している場合は別スレッドで待ち、イベントループを止めない
+- 読み取りはロックを取らず、スロットごとのシーケンスロック（seqlock）で
+  書き込み途中の値を読んでいないことを確認する。書き込み中のまま一定時間
+  （書き込み中にプロセスが異常終了した場合など）変わらなければRuntimeErrorにする
+"""
+
+import asyncio
+import fcntl
+import heapq
+import os
+import struct
+import tempfile
+import threading
+import time
+from collections.abc import AsyncIterator, Callable, Collection, Iterator
+from contextlib import contextmanager
+from mmap import mmap
+from typing import TypeVar
+
+from .base import ItemStorage, VersionConflictError
+from .record import ItemRecord, now_micros
+
+T = TypeVar("T")
+
+_MAGIC = b"ITEMSHM5"
+# magic, capacity, heap_size, seq,
+# last_id, count, heap_used, generation, heap_epoch, garbage,
+# next_expiry, purge_cursor, purge_earliest,
+# compaction_id, compact_cursor, compact_source, compact_end
+_HEADER = struct.Struct("<8sQQQQQQQQQQQQQQQQ")
+_HEADER_SEQ_OFFSET = 24
+_STATE = struct.Struct("<QQQQQQ")
+# 期限切れの掃引の状態（書き込みロック中にだけ読み書きする）
+# next_expiry: 次に期限切れになりうる日時の下限（0は有効期限のあるアイテムなし）
+# purge_cursor: 掃引中は次に見るスロットの番号+1（0は掃引していない）
+# purge_earliest: 掃引済みのスロットで最も早い有効期限
+_EXPIRY = struct.Struct("<QQQ")
+_EXPIRY_OFFSET = 80
+# compact()の詰め直しの状態（書き込みロック中にだけ読み書きする）
+# compaction_id: 詰め直しを始めるたび・一括で詰め直すたびに進める
+# compact_cursor: 詰め終えた文字列の末尾（次に移す先）
+# compact_source: これより前の使用中の文字列はcompact_cursorまでに詰め終えている
+# compact_end: 詰めている区間の末尾（0は詰め直していない）
+_COMPACTION = struct.Struct("<QQQQ")
+_COMPACTION_OFFSET = 104
+# seq, id, created_at, updated_at, name_offset, description_offset,
+# name_length, description_length, expires_at
+_SLOT = struct.Struct("<QqqqQQIIq")
+# seqを除いたスロットの値（pack_intoは書き込み前に範囲を0で埋めるため、seqと分けて書く）
+_SLOT_FIELDS = struct.Struct("<qqqQQIIq")
+_SLOT_ID = struct.Struct("<q")
+# スロット内のname_offset（description_offsetはその8バイト後）の位置
+_SLOT_NAME_OFFSET = 32
+_OFFSET = struct.Struct("<Q")
+_EMPTY_SLOT = (0, 0, 0, 0, 0, 0, 0, 0)
+# 期限切れの掃引・詰め直しで1回のロックの間に見るスロット・文字列の数
+_PURGE_CHUNK = 1000
+_COMPACT_CHUNK = 1000
+# created_at/updated_at/expires_atの0は「空きスロット」「未更新」「無期限」を表す
+_NULL = 0
+
+# 書き込み中のseqを読んだときの読み直し（空回りの回数・待ち時間の上限）
+_SPIN_RETRIES = 1000
+_MAX_BACKOFF_SECONDS = 0.001
+_RETRY_TIMEOUT_SECONDS = 1.0
+
+DEFAULT_CAPACITY = 100_000
+# 1件あたりの文字列ヒープの見積もり（更新時は追記するため余裕を持たせる）
+DEFAULT_HEAP_BYTES_PER_ITEM = 512
+
+
+def default_shared_path() -> str:
+    """共有ファイルのデフォルトパス（/dev/shmがあればメモリ上に置く）"""
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, "items.shm")
+
+
+def _check_version(
+    item_id: int, slot: tuple[int, ...], if_match: Collection[int] | None
+) -> None:
+    """スロットの最終変更日時（バージョン）がif_matchのいずれとも一致しなければ送出する"""
+    if if_match is None:
+        return
+    version = slot[2] if slot[3] == _NULL else slot[3]
+    if version not in if_match:
+        raise VersionConflictError(item_id, version)
+
+
+def _expired(slot: tuple[int, ...], now: int) -> bool:
+    """スロットの有効期限がnow以前の場合True"""
+    return slot[8] != _NULL and slot[8] <= now
+
+
+def _earliest(a: int, b: int) -> int:
+    """有効期限の早い方（0は無期限として扱う）"""
+    if a == _NULL or b == _NULL:
+        return a or b
+    return min(a, b)
+
+
+def _retries() -> Iterator[None]:
+    """
+    seqlockの読み直しの間隔
+    最初は空回りし、その後は待ち時間を倍にしながら読み直す。上限の時間を過ぎても
+    書き込み中のままなら、書き込んでいたプロセスが異常終了したとみなして送出する
+    """
+    for _ in range(_SPIN_RETRIES):
+        yield
+    delay = 1e-6
+    deadline = time.monotonic() + _RETRY_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(delay)
+        delay = min(delay * 2, _MAX_BACKOFF_SECONDS)
+        yield
+    raise RuntimeError(
+        "共有ストレージの書き込みが完了しません（書き込み中のプロセスが異常終了した可能性）"
+    )
+
+
+class _HeapCompaction:
+    """
+    compact()で詰めている区間について、このプロセスが集めた文字列
+    区間の開始後に追記される文字列は区間の外に置かれるため、集めた後に増えることはない
+    """
+
+    __slots__ = (
+        "compaction_id",
+        "source",
+        "end",
+        "slots",
+        "strings",
+        "ordered",
+        "position",
+    )
+
+    def __init__(self, compaction_id: int, source: int, end: int, slots: range) -> None:
+        self.compaction_id = compaction_id
+        self.source = source
+        self.end = end
+        # まだ見ていないスロットの位置
+        self.slots = slots
+        # (オフセット, 長さ, スロットの位置, フィールド)。見終えたらオフセット順に並べる
+        self.strings: list[tuple[int, int, int, int]] = []
+        self.ordered = False
+        # 次に移すstringsの位置
+        self.position = 0
+
+
+class SharedItemStorage(ItemStorage):
+    """
+    mmapしたファイルを使う共有メモリストレージ
+
+    同じpathを開いたプロセスはすべて同じアイテムを参照する。
+    IDはヘッダーの採番カウンターから確保するため、ワーカー間でも重複しない。
+    容量（件数・ヒープ）は作成時に固定し、同時に保持できる件数・文字列の量を
+    超えた場合はRuntimeErrorになる。
+    検索の索引は持たず、search()は常に全件を照合する（O(n)）。
+    """
+
+    def __init__(
+        self,
+        path: str,
+        capacity: int = DEFAULT_CAPACITY,
+        heap_size: int | None = None,
+    ) -> None:
+        if capacity < 1:
+            raise ValueError(f"capacityは1以上を指定してください: {capacity}")
+        if heap_size is None:
+            heap_size = capacity * DEFAULT_HEAP_BYTES_PER_ITEM
+
+        self._slots_offset = _HEADER.size
+        self._heap_offset = self._slots_offset + capacity * _SLOT.size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._lock = threading.Lock()
+        self._compaction: _HeapCompaction | None = None
+        try:
+            self._capacity, self._heap_size = self._open(capacity, heap_size)
+            self._mm = mmap(self._fd, self._heap_offset + self._heap_size)
+            # seqはネイティブのバイト順の8バイト単位で1回で読み書きする
+            # （structでは1バイトずつ読み書きされ、途中の値が見えうる）
+            self._words = memoryview(self._mm)[: self._heap_offset].cast("Q")
+        except BaseException:
+            os.close(self._fd)
+            raise
+
+    def _open(self, capacity: int, heap_size: int) -> tuple[int, int]:
+        """ファイルを初期化する（既存の場合はレイアウトを検証する）"""
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size == 0:
+                # 未使用領域は書き込むまで実メモリを消費しない（スパースファイル）
+                os.ftruncate(self._fd, self._heap_offset + heap_size)
+                header = _HEADER.pack(_MAGIC, capacity, heap_size, *[0] * 14)
+                os.pwrite(self._fd, header, 0)
+                return capacity, heap_size
+
+            magic, stored_capacity, stored_heap_size, *_ = _HEADER.unpack(
+                os.pread(self._fd, _HEADER.size, 0)
+            )
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+        if magic != _MAGIC:
+            raise ValueError("共有ストレージのファイルではありません")
+        if stored_capacity != capacity:
+            raise ValueError(
+                f"既存ファイルのcapacity({stored_capacity})と一致しません: {capacity}"
+            )
+        return stored_capacity, stored_heap_size
+
+    # --- 読み取り（ロックなし） ---
+
+    def _load_seq(self, offset: int) -> int:
+        return self._words[offset >> 3]
+
+    def _store_seq(self, offset: int, value: int) -> None:
+        self._words[offset >> 3] = value
+
+    def _read_state(self) -> tuple[int, int, int, int, int, int]:
+        """
+        ヘッダーの(last_id, count, heap_used, generation, heap_epoch, garbage)を
+        一貫した状態で読む
+        """
+        mm = self._mm
+        for _ in _retries():
+            seq = self._load_seq(_HEADER_SEQ_OFFSET)
+            if seq & 1:
+                continue
+            state = _STATE.unpack_from(mm, _HEADER_SEQ_OFFSET + 8)
+            if self._load_seq(_HEADER_SEQ_OFFSET) == seq:
+                return state  # type: ignore[return-value]
+        raise AssertionError("unreachable")
+
+    def _slot_offset(self, item_id: int) -> int:
+        return self._slots_offset + (item_id - 1) % self._capacity * _SLOT.size
+
+    def _used_slots(self, last_id: int) -> range:
+        """使われたことのあるスロットの位置（IDが一周するまでは先頭からlast_id個）"""
+        return range(
+            self._slots_offset,
+            self._slots_offset + min(last_id, self._capacity) * _SLOT.size,
+            _SLOT.size,
+        )
+
+    def _read_slot(self, offset: int) -> ItemRecord | None:
+        """スロットを読む。書き込み中・読み取り中に書き換えられた場合は読み直す"""
+        # 書き込みと重ならない大半の読み取りは1回で済ませる（読み直しの準備をしない）
+        seq = self._load_seq(offset)
+        if not seq & 1:
+            try:
+                record = self._decode(_SLOT.unpack_from(self._mm, offset))
+            except UnicodeDecodeError:
+                pass
+            else:
+                if self._load_seq(offset) == seq:
+                    return record
+        return self._reread_slot(offset)
+
+    def _reread_slot(self, offset: int) -> ItemRecord | None:
+        mm = self._mm
+        for _ in _retries():
+            # seqはスロットの値とは別に読む（スロットのコピーは先頭から順に読まれるとは限らない）
+            seq = self._load_seq(offset)
+            if seq & 1:
+                continue
+            try:
+                record = self._decode(_SLOT.unpack_from(mm, offset))
+            except UnicodeDecodeError:
+                # 読み取り中に書き換えられたスロットは文字列の範囲も不正になりうる
+                if self._load_seq(offset) == seq:
+                    raise
+                continue
+            if self._load_seq(offset) == seq:
+                return record
+        raise AssertionError("unreachable")
+
+    def _read_record(self, item_id: int, now: int) -> ItemRecord | None:
+        """IDのレコードを読む（期限切れは存在しない扱い）"""
+        record = self._read_slot(self._slot_offset(item_id))
+        if record is None or record.id != item_id or record.expired(now):
+            return None
+        return record
+
+    def _decode(self, slot: tuple[int, ...]) -> ItemRecord | None:
+        """スロットの値からレコードを組み立てる（空きスロットはNone）"""
+        created_at, updated_at = slot[2], slot[3]
+        if created_at == _NULL:
+            return None
+
+        return ItemRecord(
+            slot[1],
+            self._read_text(slot[4], slot[6]),
+            self._read_text(slot[5], slot[7]),
+            created_at,
+            None if updated_at == _NULL else updated_at,
+            None if slot[8] == _NULL else slot[8],
+        )
+
+    def _read_text(self, offset: int, length: int) -> str:
+        start = self._heap_offset + offset
+        return self._mm[start : start + length].decode()
+
+    def _ids_after(self, start: int, last_id: int, limit: int) -> list[int]:
+        """startより大きい使用中のIDを昇順に最大limit件（ロックなし・読み直しは呼び出し側）"""
+        if last_id - start <= self._capacity:
+            # IDの範囲がスロット数以下なら、IDの順にスロットを引けば並び順になる
+            return list(range(start + 1, min(last_id, start + limit) + 1))
+        # IDが一周している場合はスロットのIDを集めて並べる
+        mm = self._mm
+        ids = [
+            item_id
+            for offset in self._used_slots(last_id)
+            if (item_id := _SLOT_ID.unpack_from(mm, offset + 8)[0]) > start
+        ]
+        return heapq.nsmallest(limit, ids)
+
+    async def list_items(
+        self, after_id: int | None = None, limit: int | None = None
+    ) -> list[ItemRecord]:
+        last_id = self._read_state()[0]
+        if limit is None:
+            limit = last_id
+        start = max(after_id or 0, 0)
+        now = now_micros()
+
+        records: list[ItemRecord] = []
+        while len(records) < limit and start < last_id:
+            ids = self._ids_after(start, last_id, limit - len(records))
+            if not ids:
+                break
+            for item_id in ids:
+                record = self._read_record(item_id, now)
+                if record is not None:
+                    records.append(record)
+                    if len(records) == limit:
+                        break
+            start = ids[-1]
+        return records
+
+    async def iter_items(
+        self, after_id: int | None = None, batch_size: int = 500
+    ) -> AsyncIterator[ItemRecord]:
+        # 書き込みロック中にレコード表だけを複製してスナップショットとする
+        # 文字列は詰め直されるまでヒープの同じ位置にあるため、複製は不要
+        start = max(after_id or 0, 0)
+        table, generation, heap_epoch = await self._locked(self._copy_table)
+
+        now = now_micros()
+        entries = sorted(
+            (slot[1], index)
+            for index in range(len(table) // _SLOT.size)
+            if (slot := _SLOT.unpack_from(table, index * _SLOT.size))[2] != _NULL
+            and slot[1] > start
+            and not _expired(slot, now)
+        )
+        compacted = False
+        for first in range(0, len(entries), batch_size):
+            chunk = entries[first : first + batch_size]
+            batch: list[ItemRecord | None] | None = None
+            if not compacted:
+                try:
+                    batch = [
+                        self._decode(_SLOT.unpack_from(table, index * _SLOT.size))
+                        for _, index in chunk
+                    ]
+                except UnicodeDecodeError:
+                    # 読み取り中に詰め直された文字列は範囲が不正になりうる
+                    pass
+            state = self._read_state()
+            # clearでヒープが再利用された場合、複製したオフセットは無効になる
+            if state[3] != generation:
+                raise RuntimeError("ストリーミング中にストレージがクリアされました")
+            if batch is None or state[4] != heap_epoch:
+                # 文字列が詰め直された場合、複製したオフセットは使えないため、
+                # 残りは1件ずつ現在の値を読む（その間の更新・削除が反映される）
+                compacted = True
+                batch = [self._read_record(item_id, now) for item_id, _ in chunk]
+            for record in batch:
+                if record is not None:
+                    yield record
+
+    def _copy_table(self) -> tuple[bytes, int, int]:
+        last_id, _, _, generation, heap_epoch, _ = self._locked_state()
+        used = self._used_slots(last_id)
+        return self._mm[used.start : used.stop], generation, heap_epoch
+
+    async def get_item(self, item_id: int) -> ItemRecord | None:
+        if item_id < 1:
+            return None
+        return self._read_record(item_id, now_micros())
+
+    async def count(self) -> int:
+        return self._read_state()[1]
+
+    # --- 書き込み（ファイルロックで直列化） ---
+
+    @contextmanager
+    def _write_lock(self) -> Iterator[None]:
+        """全プロセスで共通の書き込みロック（flockはスレッド間を区別しないため併用）"""
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _run_locked(self, func: Callable[..., T], *args: object) -> T:
+        with self._write_lock():
+            return func(*args)
+
+    async def _locked(self, func: Callable[..., T], *args: object) -> T:
+        """
+        書き込みロックを取ってfuncを実行する
+        ロックが空いていればその場で実行し、他のスレッド・プロセスが保持している場合は
+        ロックを待つ間イベントループを止めないよう、別スレッドで待って実行する
+        """
+        if self._lock.acquire(blocking=False):
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                self._lock.release()
+            else:
+                try:
+                    return func(*args)
+                finally:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+                    self._lock.release()
+        return await asyncio.to_thread(self._run_locked, func, *args)
+
+    def _locked_state(self) -> tuple[int, int, int, int, int, int]:
+        """書き込みロック中にヘッダーを読む（書き込み中のプロセスはないためseqは見ない）"""
+        return _STATE.unpack_from(self._mm, _HEADER_SEQ_OFFSET + 8)  # type: ignore[return-value]
+
+    def _begin_write(self, offset: int) -> int:
+        """
+        seqを奇数にして書き込み中にし、書き込み後に設定する値を返す
+        異常終了したプロセスが奇数のまま残したseqも、次の書き込みで偶数に戻る
+        """
+        seq = self._load_seq(offset) | 1
+        self._store_seq(offset, seq)
+        return seq + 1
+
+    def _write_state(
+        self,
+        last_id: int,
+        count: int,
+        heap_used: int,
+        generation: int,
+        heap_epoch: int,
+        garbage: int,
+    ) -> None:
+        seq = self._begin_write(_HEADER_SEQ_OFFSET)
+        _STATE.pack_into(
+            self._mm,
+            _HEADER_SEQ_OFFSET + 8,
+            last_id,
+            count,
+            heap_used,
+            generation,
+            heap_epoch,
+            garbage,
+        )
+        self._store_seq(_HEADER_SEQ_OFFSET, seq)
+
+    def _locked_expiry(self) -> tuple[int, int, int]:
+        """書き込みロック中に(next_expiry, purge_cursor, purge_earliest)を読む"""
+        return _EXPIRY.unpack_from(self._mm, _EXPIRY_OFFSET)  # type: ignore[return-value]
+
+    def _write_expiry(
+        self, next_expiry: int, purge_cursor: int, purge_earliest: int
+    ) -> None:
+        _EXPIRY.pack_into(
+            self._mm, _EXPIRY_OFFSET, next_expiry, purge_cursor, purge_earliest
+        )
+
+    def _locked_compaction(self) -> tuple[int, int, int, int]:
+        """書き込みロック中に(compaction_id, cursor, source, end)を読む"""
+        return _COMPACTION.unpack_from(self._mm, _COMPACTION_OFFSET)  # type: ignore[return-value]
+
+    def _write_compaction(
+        self, compaction_id: int, cursor: int, source: int, end: int
+    ) -> None:
+        _COMPACTION.pack_into(
+            self._mm, _COMPACTION_OFFSET, compaction_id, cursor, source, end
+        )
+
+    def _note_expiry(self, expires_at: int) -> None:
+        """書き込みロック中に、設定した有効期限で次に期限切れになりうる日時を早める"""
+        next_expiry, purge_cursor, purge_earliest = self._locked_expiry()
+        earliest = _earliest(next_expiry, expires_at)
+        if earliest != next_expiry:
+            self._write_expiry(earliest, purge_cursor, purge_earliest)
+
+    def _write_slot(self, offset: int, *fields: int) -> None:
+        """seqを奇数にしてから書き込み、偶数に戻して公開する"""
+        seq = self._begin_write(offset)
+        _SLOT_FIELDS.pack_into(self._mm, offset + 8, *fields)
+        self._store_seq(offset, seq)
+
+    def _reserve(self, size: int) -> tuple[int, int, int, int, int, int]:
+        """
+        書き込み前に文字列領域の空きを確認し、現在の状態を返す（途中で失敗させないため）
+        使われなくなった文字列を詰めれば足りる場合は詰め直す
+        """
+        state = self._locked_state()
+        heap_used, garbage = state[2], state[5]
+        if heap_used + size <= self._heap_size:
+            return state
+        if heap_used - garbage + size > self._heap_size:
+            raise RuntimeError("共有ストレージの文字列領域が不足しています")
+        self._compact_heap()
+        return self._locked_state()
+
+    def _append(self, heap_used: int, data: bytes) -> int:
+        """ヒープの末尾に追記して新しい使用量を返す"""
+        start = self._heap_offset + heap_used
+        self._mm[start : start + len(data)] = data
+        return heap_used + len(data)
+
+    def _compact_heap(self) -> int:
+        """
+        使用中の文字列をオフセット順に先頭へ詰め直し、移した文字列の件数を返す
+        移す文字列は移動先がそれより前にしかないため、まだ移していない文字列を上書きしない。
+        移す間はスロットのseqを奇数にし、読み取り側には読み直させる。
+        compact()が区切って詰めている途中であれば、その詰め直しは打ち切る
+        """
+        mm = self._mm
+        last_id, count, _, generation, heap_epoch, _ = self._locked_state()
+        strings = []
+        for offset in self._used_slots(last_id):
+            slot = _SLOT.unpack_from(mm, offset)
+            if slot[2] == _NULL:
+                continue
+            for field in (0, 1):
+                if slot[6 + field]:
+                    strings.append((slot[4 + field], slot[6 + field], offset, field))
+        strings.sort()
+
+        cursor = moved = 0
+        for heap_at, length, offset, field in strings:
+            if heap_at != cursor:
+                seq = self._begin_write(offset)
+                mm.move(self._heap_offset + cursor, self._heap_offset + heap_at, length)
+                _OFFSET.pack_into(mm, offset + _SLOT_NAME_OFFSET + 8 * field, cursor)
+                self._store_seq(offset, seq)
+                moved += 1
+            cursor += length
+        self._write_state(last_id, count, cursor, generation, heap_epoch + 1, 0)
+        self._write_compaction(self._locked_compaction()[0] + 1, 0, 0, 0)
+        return moved
+
+    async def create_item(
+        self, name: str, description: str, expires_at: int | None = None
+    ) -> ItemRecord:
+        return (await self.create_items([(name, description)], [expires_at]))[0]
+
+    async def create_items(
+        self,
+        items: list[tuple[str, str]],
+        expires_at: list[int | None] | None = None,
+    ) -> list[ItemRecord]:
+        expires = expires_at or [None] * len(items)
+        encoded = [
+            (name.encode(), description.encode(), item_expires or _NULL)
+            for (name, description), item_expires in zip(items, expires, strict=True)
+        ]
+        created_at = now_micros()
+        ids = await self._locked(self._create_records, encoded, created_at)
+        return [
+            ItemRecord(item_id, name, description, created_at, None, item_expires)
+            for item_id, (name, description), item_expires in zip(
+                ids, items, expires, strict=True
+            )
+        ]
+
+    def _create_records(
+        self, encoded: list[tuple[bytes, bytes, int]], created_at: int
+    ) -> list[int]:
+        last_id, count, _, _, _, _ = self._locked_state()
+        if count + len(encoded) > self._capacity:
+            raise RuntimeError(
+                f"共有ストレージの容量({self._capacity}件)を超えています"
+            )
+        last_id, count, heap_used, generation, heap_epoch, garbage = self._reserve(
+            sum(len(n) + len(d) for n, d, _ in encoded)
+        )
+
+        # 文字列をヒープに書いてからスロットを公開する
+        ids = []
+        mm = self._mm
+        for name, description, expires_at in encoded:
+            # 使用中のスロットに当たるIDは飛ばす（空きはcountから必ずある）
+            last_id += 1
+            while _SLOT.unpack_from(mm, self._slot_offset(last_id))[2] != _NULL:
+                last_id += 1
+            name_at = heap_used
+            heap_used = self._append(heap_used, name)
+            description_at = heap_used
+            heap_used = self._append(heap_used, description)
+            self._write_slot(
+                self._slot_offset(last_id),
+                last_id,
+                created_at,
+                _NULL,
+                name_at,
+                description_at,
+                len(name),
+                len(description),
+                expires_at,
+            )
+            ids.append(last_id)
+            self._note_expiry(expires_at)
+        self._write_state(
+            last_id,
+            count + len(encoded),
+            heap_used,
+            generation,
+            heap_epoch,
+            garbage,
+        )
+        return ids
+
+    def _find_slot(self, item_id: int) -> tuple[int, tuple[int, ...]] | None:
+        """書き込みロック中にIDのスロットを引く（存在しない場合はNone。期限切れを含む）"""
+        if item_id < 1:
+            return None
+        offset = self._slot_offset(item_id)
+        slot = _SLOT.unpack_from(self._mm, offset)
+        if slot[2] == _NULL or slot[1] != item_id:
+            return None
+        return offset, slot
+
+    async def update_item(
+        self,
+        item_id: int,
+        name: str | None,
+        description: str | None,
+        if_match: Collection[int] | None = None,
+        expires_at: int | None = None,
+    ) -> ItemRecord | None:
+        updates = [(item_id, name, description)]
+        return (await self._update(updates, [expires_at], if_match))[0]
+
+    async def update_items(
+        self,
+        updates: list[tuple[int, str | None, str | None]],
+        expires_at: list[int | None] | None = None,
+    ) -> list[ItemRecord | None]:
+        return await self._update(updates, expires_at)
+
+    async def _update(
+        self,
+        updates: list[tuple[int, str | None, str | None]],
+        expires_at: list[int | None] | None,
+        if_match: Collection[int] | None = None,
+    ) -> list[ItemRecord | None]:
+        encoded = [
+            (
+                item_id,
+                None if name is None else name.encode(),
+                None if description is None else description.encode(),
+                item_expires,
+            )
+            for (item_id, name, description), item_expires in zip(
+                updates, expires_at or [None] * len(updates), strict=True
+            )
+        ]
+        return await self._locked(self._update_records, encoded, now_micros(), if_match)
+
+    def _update_records(
+        self,
+        encoded: list[tuple[int, bytes | None, bytes | None, int | None]],
+        updated_at: int,
+        if_match: Collection[int] | None,
+    ) -> list[ItemRecord | None]:
+        """if_matchはバージョンの比較を書き込みロック内で行う（1件の更新のみで使う）"""
+        last_id, count, heap_used, generation, heap_epoch, garbage = self._reserve(
+            sum(len(n or b"") + len(d or b"") for _, n, d, _ in encoded)
+        )
+        results: list[ItemRecord | None] = []
+        for item_id, name, description, expires_at in encoded:
+            found = self._find_slot(item_id)
+            if found is None or _expired(found[1], updated_at):
+                results.append(None)
+                continue
+            offset, current = found
+            _check_version(item_id, current, if_match)
+            slot = list(current)
+
+            # 変更しないフィールドは既存の文字列をそのまま参照する
+            if name is not None:
+                garbage += slot[6]
+                slot[4], slot[6] = heap_used, len(name)
+                heap_used = self._append(heap_used, name)
+            if description is not None:
+                garbage += slot[7]
+                slot[5], slot[7] = heap_used, len(description)
+                heap_used = self._append(heap_used, description)
+            # 同じマイクロ秒内の更新でも最終変更日時が変わるようにする
+            slot[3] = max(updated_at, max(slot[2], slot[3]) + 1)
+            if expires_at is not None:
+                slot[8] = expires_at
+                self._note_expiry(expires_at)
+
+            self._write_slot(offset, *slot[1:])
+            results.append(self._decode(slot))
+        self._write_state(last_id, count, heap_used, generation, heap_epoch, garbage)
+        return results
+
+    async def delete_item(
+        self, item_id: int, if_match: Collection[int] | None = None
+    ) -> bool:
+        deleted = await self._locked(
+            self._delete_records, [item_id], if_match, now_micros(), False
+        )
+        return deleted[0]
+
+    async def delete_items(self, item_ids: list[int]) -> list[bool]:
+        return await self._locked(
+            self._delete_records, item_ids, None, now_micros(), False
+        )
+
+    async def delete_expired(self, item_ids: list[int], now: int) -> list[bool]:
+        return await self._locked(self._delete_records, item_ids, None, now, True)
+
+    def _delete_records(
+        self,
+        item_ids: list[int],
+        if_match: Collection[int] | None,
+        now: int,
+        expired: bool,
+    ) -> list[bool]:
+        """
+        expiredがFalseの場合は有効期限内のアイテムを、Trueの場合はnowの時点で
+        期限切れのアイテムだけを削除する
+        """
+        last_id, count, heap_used, generation, heap_epoch, garbage = (
+            self._locked_state()
+        )
+        results: list[bool] = []
+        for item_id in item_ids:
+            found = self._find_slot(item_id)
+            if found is None or _expired(found[1], now) != expired:
+                results.append(False)
+                continue
+            offset, slot = found
+            _check_version(item_id, slot, if_match)
+            self._write_slot(offset, *_EMPTY_SLOT)
+            count -= 1
+            garbage += slot[6] + slot[7]
+            results.append(True)
+        self._write_state(last_id, count, heap_used, generation, heap_epoch, garbage)
+        return results
+
+    async def compact(self, before: int, budget: float) -> int:
+        """
+        墓標は保持しないため、期限切れのアイテムを削除し、使われなくなった文字列が
+        半分を超えたらヒープを詰め直す
+        どちらも_PURGE_CHUNK・_COMPACT_CHUNKごとにロックを取り直し、budgetを
+        過ぎたら続きを次の呼び出しに回す。ロックを待つことがあるため別スレッドで実行する
+        """
+        deadline = time.perf_counter() + budget
+        return await asyncio.to_thread(self._compact, now_micros(), deadline)
+
+    def _compact(self, now: int, deadline: float) -> int:
+        purged, done = self._purge_expired(now, deadline)
+        if not done:
+            return max(purged, 1)
+        moved, done = self._compact_heap_slices(deadline)
+        return purged + moved if done else max(purged + moved, 1)
+
+    def _compact_heap_slices(self, deadline: float) -> tuple[int, bool]:
+        """ヒープの詰め直しを区切って進め、(移した文字列の件数, 終えたか)を返す"""
+        moved = 0
+        while True:
+            with self._write_lock():
+                step_moved, done = self._compact_heap_step()
+            compaction = self._compaction
+            if (
+                compaction is not None
+                and not compaction.slots
+                and not compaction.ordered
+            ):
+                # 集め終えた文字列の並べ替えはロックの外で行う
+                compaction.strings.sort()
+                compaction.ordered = True
+            moved += step_moved
+            if done or time.perf_counter() >= deadline:
+                return moved, done
+
+    def _compact_heap_step(self) -> tuple[int, bool]:
+        """
+        詰め直しを1区切り進める
+        区間内の使用中の文字列を集め終えるまではスロットを見て回り、集め終えたら
+        オフセット順に移す。他のプロセスが進めた分や、集めた後に更新・削除された
+        文字列は、ヘッダーの位置とスロットの値を見て飛ばす。区間を詰め終えたとき、
+        その間に追記された文字列があれば次の区間にし、なければヒープの末尾を戻す
+        """
+        compaction_id, cursor, source, end = self._locked_compaction()
+        last_id, count, heap_used, generation, heap_epoch, garbage = (
+            self._locked_state()
+        )
+        if end == 0:
+            if not garbage or garbage * 2 <= heap_used:
+                self._compaction = None
+                return 0, True
+            compaction_id, cursor, source, end = compaction_id + 1, 0, 0, heap_used
+        elif source == end:
+            if heap_used == end:
+                self._write_state(
+                    last_id,
+                    count,
+                    cursor,
+                    generation,
+                    heap_epoch + 1,
+                    garbage - (end - cursor),
+                )
+                self._write_compaction(compaction_id, 0, 0, 0)
+                self._compaction = None
+                return 0, True
+            end = heap_used
+        self._write_compaction(compaction_id, cursor, source, end)
+
+        compaction = self._compaction
+        if compaction is None or (compaction.compaction_id, compaction.end) != (
+            compaction_id,
+            end,
+        ):
+            compaction = self._compaction = _HeapCompaction(
+                compaction_id, source, end, self._used_slots(last_id)
+            )
+        mm = self._mm
+        if compaction.slots:
+            for offset in compaction.slots[:_COMPACT_CHUNK]:
+                slot = _SLOT.unpack_from(mm, offset)
+                if slot[2] == _NULL:
+                    continue
+                for field in (0, 1):
+                    heap_at, length = slot[4 + field], slot[6 + field]
+                    if length and compaction.source <= heap_at < end:
+                        compaction.strings.append((heap_at, length, offset, field))
+            compaction.slots = compaction.slots[_COMPACT_CHUNK:]
+            return 0, False
+
+        moved = 0
+        strings = compaction.strings
+        stop = min(compaction.position + _COMPACT_CHUNK, len(strings))
+        for heap_at, length, offset, field in strings[compaction.position : stop]:
+            if heap_at < source:
+                continue
+            slot = _SLOT.unpack_from(mm, offset)
+            if (
+                slot[2] != _NULL
+                and slot[4 + field] == heap_at
+                and slot[6 + field] == length
+            ):
+                if heap_at != cursor:
+                    seq = self._begin_write(offset)
+                    mm.move(
+                        self._heap_offset + cursor, self._heap_offset + heap_at, length
+                    )
+                    _OFFSET.pack_into(
+                        mm, offset + _SLOT_NAME_OFFSET + 8 * field, cursor
+                    )
+                    self._store_seq(offset, seq)
+                    moved += 1
+                cursor += length
+            source = heap_at + length
+        compaction.position = stop
+        if stop == len(strings):
+            source = end
+        self._write_compaction(compaction_id, cursor, source, end)
+        if moved:
+            # ストリーミング中のレコード表の写しが古い文字列の位置を読まないようにする
+            self._write_state(
+                last_id, count, heap_used, generation, heap_epoch + 1, garbage
+            )
+        return moved, False
+
+    def _purge_expired(self, now: int, deadline: float) -> tuple[int, bool]:
+        """期限切れのスロットを空きにし、(削除した件数, 掃引を終えたか)を返す"""
+        purged = 0
+        while True:
+            chunk_purged, done = self._run_locked(self._purge_chunk, now)
+            purged += chunk_purged
+            if done or time.perf_counter() >= deadline:
+                return purged, done
+
+    def _purge_chunk(self, now: int) -> tuple[int, bool]:
+        """
+        掃引の続きから_PURGE_CHUNK個のスロットを見て、期限切れを空きにする
+        掃引の位置はヘッダーに持つため、途中で止めた掃引は他のプロセスも続きから行う。
+        next_expiryは掃引の開始時に消し、掃引中に設定された有効期限と掃引で見つけた
+        最も早い有効期限から付け直す
+        """
+        next_expiry, purge_cursor, purge_earliest = self._locked_expiry()
+        if purge_cursor == 0:
+            if next_expiry == _NULL or next_expiry > now:
+                return 0, True
+            next_expiry, purge_cursor, purge_earliest = _NULL, 1, _NULL
+
+        last_id, count, heap_used, generation, heap_epoch, garbage = (
+            self._locked_state()
+        )
+        used = self._used_slots(last_id)
+        purged = 0
+        for offset in used[purge_cursor - 1 : purge_cursor - 1 + _PURGE_CHUNK]:
+            slot = _SLOT.unpack_from(self._mm, offset)
+            if slot[2] == _NULL or slot[8] == _NULL:
+                continue
+            if slot[8] > now:
+                purge_earliest = _earliest(purge_earliest, slot[8])
+                continue
+            self._write_slot(offset, *_EMPTY_SLOT)
+            garbage += slot[6] + slot[7]
+            purged += 1
+        if purged:
+            self._write_state(
+                last_id, count - purged, heap_used, generation, heap_epoch, garbage
+            )
+
+        purge_cursor += _PURGE_CHUNK
+        if purge_cursor <= len(used):
+            self._write_expiry(next_expiry, purge_cursor, purge_earliest)
+            return purged, False
+        self._write_expiry(_earliest(next_expiry, purge_earliest), 0, _NULL)
+        return purged, True
+
+    async def clear(self) -> None:
+        await self._locked(self._clear)
+
+    def _clear(self) -> None:
+        last_id, _, _, generation, heap_epoch, _ = self._locked_state()
+        for offset in self._used_slots(last_id):
+            self._write_slot(offset, *_EMPTY_SLOT)
+        self._write_state(0, 0, 0, generation + 1, heap_epoch, 0)
+        self._write_expiry(_NULL, 0, _NULL)
+        self._write_compaction(self._locked_compaction()[0] + 1, 0, 0, 0)
+
+    async def close(self) -> None:
+        if not self._mm.closed:
+            self._words.release()
+            self._mm.close()
+            os.close(self._fd)
@@ -0,0 +1,103 @@
+"""
+インメモリストレージのスナップショット
+ある時点の全アイテムを1ファイルに書き出し、起動時の復旧に使う
+
+ファイル形式:
+    | ヘッダー(24B) | 索引(16B x 件数) | レコード本体 |
+
+- ヘッダー: マジック、続きとなるWALのセグメント番号、件数
+- 索引: ID昇順の(id, レコード本体の先頭からのオフセット)
+- レコード本体: record.pack_recordの形式
+"""
+
+import mmap
+import os
+import struct
+from bisect import bisect_left
+
+from .record import ItemRecord, pack_record, unpack_expires_at, unpack_record
+
+SNAPSHOT_NAME = "snapshot.bin"
+
+_MAGIC = b"ITEMSNP1"
+# magic, wal_segment, count
+_HEADER = struct.Struct("<8sQQ")
+# id, offset
+_INDEX = struct.Struct("<qQ")
+
+
+def write_snapshot(path: str, records: list[ItemRecord], wal_segment: int) -> None:
+    """
+    ID昇順のレコードをスナップショットとして書き出す
+    一時ファイルに書いてからリネームするため、途中で停止しても既存のファイルは壊れない
+    """
+    packed = [pack_record(record) for record in records]
+    index = bytearray()
+    offset = 0
+    for record, data in zip(records, packed, strict=True):
+        index += _INDEX.pack(record.id, offset)
+        offset += len(data)
+
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, wal_segment, len(records)))
+        f.write(index)
+        f.writelines(packed)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+    # リネームを永続化する
+    directory = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
+
+
+class MappedSnapshot:
+    """
+    mmapで開いたスナップショット
+
+    開くときはヘッダーを読むだけで、レコードは参照されたときに1件ずつ復元する。
+    索引はID昇順のため、IDからの検索は二分探索で行う。
+    """
+
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.wal_segment, self._count = _HEADER.unpack_from(self._mm)
+        if magic != _MAGIC:
+            self._mm.close()
+            raise ValueError(f"スナップショットの形式が正しくありません: {path}")
+
+        self._data_offset = _HEADER.size + self._count * _INDEX.size
+        self._index = memoryview(self._mm)[_HEADER.size : self._data_offset].cast("q")
+        # 索引は(id, offset)の繰り返しのため、1つおきに取り出す（コピーしない）
+        self.ids = self._index[0::2]
+        self._offsets = self._index[1::2]
+
+    def __len__(self) -> int:
+        return self._count
+
+    def find(self, item_id: int) -> int | None:
+        """IDの索引上の位置を返す（含まれない場合はNone）"""
+        position = bisect_left(self.ids, item_id)
+        if position < self._count and self.ids[position] == item_id:
+            return position
+        return None
+
+    def record_at(self, position: int) -> ItemRecord:
+        """索引上の位置のレコードを復元する"""
+        return unpack_record(self._mm, self._data_offset + self._offsets[position])[0]
+
+    def expires_at(self, position: int) -> int | None:
+        """索引上の位置のレコードの有効期限（レコードは復元しない）"""
+        return unpack_expires_at(self._mm, self._data_offset + self._offsets[position])
+
+    def close(self) -> None:
+        self.ids.release()
+        self._offsets.release()
+        self._index.release()
+        self._mm.close()
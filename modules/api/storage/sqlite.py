@@ -0,0 +1,695 @@
+"""
+SQLiteストレージ
+WALモードのSQLiteファイルにアイテムを永続化する
+"""
+
+import asyncio
+import sqlite3
+import threading
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Callable, Collection, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, TypeVar
+
+from .base import ItemStorage, VersionConflictError
+from .record import ItemRecord, Tombstone, now_micros
+from .search import NAME_WEIGHT, normalize
+from .timeindex import UNBOUNDED, TimeRange
+
+T = TypeVar("T")
+
+# 現在時刻のエポックマイクロ秒（SQLiteの'now'はミリ秒単位）
+_NOW_MICROS_SQL = "CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER) * 1000"
+
+# SQL文は定数として固定し、接続ごとのステートメントキャッシュで再利用する
+_SCHEMA_SQL = f"""
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    description TEXT NOT NULL,
+    created_at INTEGER NOT NULL,
+    updated_at INTEGER,
+    expires_at INTEGER
+);
+CREATE TABLE IF NOT EXISTS item_counter (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    total INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO item_counter (id, total) VALUES (1, (SELECT COUNT(*) FROM items));
+CREATE TRIGGER IF NOT EXISTS items_count_insert AFTER INSERT ON items
+BEGIN
+    UPDATE item_counter SET total = total + 1 WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS items_count_delete AFTER DELETE ON items
+BEGIN
+    UPDATE item_counter SET total = total - 1 WHERE id = 1;
+END;
+CREATE TABLE IF NOT EXISTS item_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    value INTEGER NOT NULL,
+    epoch TEXT NOT NULL
+);
+INSERT OR IGNORE INTO item_version (id, value, epoch)
+    VALUES (1, 0, lower(hex(randomblob(4))));
+CREATE TRIGGER IF NOT EXISTS items_version_insert AFTER INSERT ON items
+BEGIN
+    UPDATE item_version SET value = value + 1 WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS items_version_update AFTER UPDATE ON items
+BEGIN
+    UPDATE item_version SET value = value + 1 WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS items_version_delete AFTER DELETE ON items
+BEGIN
+    UPDATE item_version SET value = value + 1 WHERE id = 1;
+END;
+-- 削除したアイテムの墓標は削除のトリガーで記録し、保持期間を過ぎたらcompact()で消す
+CREATE TABLE IF NOT EXISTS item_tombstones (
+    id INTEGER PRIMARY KEY,
+    deleted_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS item_tombstones_deleted_at
+    ON item_tombstones (deleted_at, id);
+-- これより前の削除は墓標を保持していない（回収済み・墓標の記録を始める前の削除）
+CREATE TABLE IF NOT EXISTS tombstone_horizon (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO tombstone_horizon (id, value) VALUES (1, CASE
+    WHEN EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'items')
+    THEN {_NOW_MICROS_SQL} ELSE 0 END);
+-- 回収した範囲に新しい墓標を作らないよう、削除日時は境界より前にしない
+CREATE TRIGGER IF NOT EXISTS items_tombstone AFTER DELETE ON items
+BEGIN
+    INSERT OR REPLACE INTO item_tombstones (id, deleted_at) VALUES (old.id, MAX(
+        {_NOW_MICROS_SQL}, (SELECT value FROM tombstone_horizon WHERE id = 1)));
+END;
+CREATE INDEX IF NOT EXISTS items_created_at ON items (created_at, id);
+CREATE INDEX IF NOT EXISTS items_modified_at
+    ON items (COALESCE(updated_at, created_at), id);
+"""
+# 全文検索の索引（正規化したname・descriptionのtrigram）。正規化はPythonの関数で行うため、
+# 書き込む接続はすべてitem_normalizeを登録しておく（_connect）
+# trigramトークナイザーがないSQLite（3.34未満）では作成せず、検索は全件を照合する
+_FTS_SCHEMA_SQL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+    name, description, tokenize = 'trigram'
+);
+INSERT INTO items_fts (rowid, name, description)
+    SELECT id, item_normalize(name), item_normalize(description) FROM items
+    WHERE NOT EXISTS (SELECT 1 FROM items_fts);
+CREATE TRIGGER IF NOT EXISTS items_fts_insert AFTER INSERT ON items
+BEGIN
+    INSERT INTO items_fts (rowid, name, description)
+        VALUES (new.id, item_normalize(new.name), item_normalize(new.description));
+END;
+CREATE TRIGGER IF NOT EXISTS items_fts_update AFTER UPDATE OF name, description ON items
+BEGIN
+    UPDATE items_fts SET name = item_normalize(new.name),
+        description = item_normalize(new.description) WHERE rowid = old.id;
+END;
+CREATE TRIGGER IF NOT EXISTS items_fts_delete AFTER DELETE ON items
+BEGIN
+    DELETE FROM items_fts WHERE rowid = old.id;
+END;
+"""
+# expires_at列がない（追加前に作成した）DBは列を追加してから索引を作る
+_EXPIRES_COLUMN_SQL = "ALTER TABLE items ADD COLUMN expires_at INTEGER"
+_EXPIRES_INDEX_SQL = (
+    "CREATE INDEX IF NOT EXISTS items_expires_at ON items (expires_at) "
+    "WHERE expires_at IS NOT NULL"
+)
+_COLUMNS = "id, name, description, created_at, updated_at, expires_at"
+# 有効期限内の行だけを対象にする条件（パラメータは現在時刻）
+_LIVE = "(expires_at IS NULL OR expires_at > ?)"
+_SELECT_PAGE_SQL = (
+    f"SELECT {_COLUMNS} FROM items WHERE id > ? AND {_LIVE} ORDER BY id LIMIT ?"
+)
+_SELECT_ONE_SQL = f"SELECT {_COLUMNS} FROM items WHERE id = ? AND {_LIVE}"
+_INSERT_SQL = (
+    "INSERT INTO items (name, description, created_at, expires_at) VALUES (?, ?, ?, ?)"
+)
+_LAST_ID_SQL = "SELECT last_insert_rowid()"
+# 同じマイクロ秒内の更新でも最終変更日時が変わるようにする
+_UPDATE_WHERE_SQL = (
+    "UPDATE items SET name = COALESCE(?, name), "
+    "description = COALESCE(?, description), "
+    "updated_at = MAX(?, COALESCE(updated_at, created_at) + 1), "
+    "expires_at = COALESCE(?, expires_at) "
+    f"WHERE id = ? AND {_LIVE}"
+)
+_UPDATE_SQL = f"{_UPDATE_WHERE_SQL} RETURNING {_COLUMNS}"
+_DELETE_SQL = f"DELETE FROM items WHERE id = ? AND {_LIVE}"
+_DELETE_EXPIRED_SQL = "DELETE FROM items WHERE id = ? AND expires_at <= ?"
+# If-Match付きの更新・削除はバージョンの条件をWHEREに加え、比較と書き込みを1文で行う
+_VERSION_CONDITION = " AND COALESCE(updated_at, created_at) IN ({})"
+_ITEM_VERSION_SQL = (
+    f"SELECT COALESCE(updated_at, created_at) FROM items WHERE id = ? AND {_LIVE}"
+)
+# 件数はトリガーで維持するカウンターから取得する（COUNT(*)は全件走査になる）
+_COUNT_SQL = "SELECT total FROM item_counter WHERE id = 1"
+# 書き込みごとにトリガーで進めるバージョン（DBファイルごとのepochと組み合わせる）
+# 次に期限切れになるアイテムの期限も含め、書き込みがなくても期限切れで変わるようにする
+_VERSION_SQL = (
+    "SELECT epoch || '-' || value || '-' || COALESCE("
+    "(SELECT MIN(expires_at) FROM items WHERE expires_at > ?), '') "
+    "FROM item_version WHERE id = 1"
+)
+_CLEAR_SQL = "DELETE FROM items"
+_CLEAR_TOMBSTONES_SQL = "DELETE FROM item_tombstones"
+_HORIZON_SQL = "SELECT value FROM tombstone_horizon WHERE id = 1"
+_RAISE_HORIZON_SQL = "UPDATE tombstone_horizon SET value = MAX(value, ?) WHERE id = 1"
+_SELECT_TOMBSTONES_SQL = (
+    "SELECT id, deleted_at FROM item_tombstones WHERE (deleted_at, id) > (?, ?) "
+    "ORDER BY deleted_at, id LIMIT ?"
+)
+_PURGE_TOMBSTONES_SQL = (
+    "DELETE FROM item_tombstones WHERE id IN (SELECT id FROM item_tombstones "
+    "WHERE deleted_at < ? ORDER BY deleted_at LIMIT ?)"
+)
+_PURGE_EXPIRED_SQL = (
+    "DELETE FROM items WHERE id IN (SELECT id FROM items WHERE expires_at <= ? LIMIT ?)"
+)
+_RESET_SEQUENCE_SQL = "DELETE FROM sqlite_sequence WHERE name = 'items'"
+# trigramは3文字以上のクエリを索引で引ける。短いクエリは索引の本文をLIKEで照合する
+# 関連度（search.score()と同じ、正規化した本文でのクエリの出現回数）もSQLで計算し、
+# 上位limit件だけを読み出す。パラメータはクエリ4回、照合の条件、現在時刻
+_SEARCH_MATCHES_SQL = (
+    "SELECT items.*, matches.score FROM items JOIN (SELECT rowid, "
+    "(length(name) - length(replace(name, ?, ''))) / length(?) * "
+    f"{NAME_WEIGHT} + "
+    "(length(description) - length(replace(description, ?, ''))) / length(?) "
+    "AS score FROM items_fts WHERE {}) AS matches ON items.id = matches.rowid "
+    f"WHERE matches.score > 0 AND {_LIVE}"
+)
+_SEARCH_CONDITIONS = {
+    "match": "items_fts MATCH ?",
+    "like": "name LIKE ? ESCAPE '\\' OR description LIKE ? ESCAPE '\\'",
+}
+_SEARCH_TOP_SQL = {
+    key: f"SELECT {_COLUMNS} FROM ({_SEARCH_MATCHES_SQL.format(condition)}) "
+    "ORDER BY score DESC, id LIMIT ?"
+    for key, condition in _SEARCH_CONDITIONS.items()
+}
+_SEARCH_COUNT_SQL = {
+    key: f"SELECT COUNT(*) FROM ({_SEARCH_MATCHES_SQL.format(condition)})"
+    for key, condition in _SEARCH_CONDITIONS.items()
+}
+# 日時の範囲での取得に使う列（updated_atはインデックスと同じ式にする）
+_ORDER_COLUMNS = {
+    "id": "id",
+    "created_at": "created_at",
+    "updated_at": "COALESCE(updated_at, created_at)",
+}
+
+
+@contextmanager
+def _write_transaction(conn: sqlite3.Connection) -> Iterator[None]:
+    """書き込みロックを先に取得するトランザクション"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def _to_record(row: tuple[Any, ...]) -> ItemRecord:
+    """SELECT結果の1行をレコードに変換する（列順はItemRecordと同じ）"""
+    return ItemRecord(*row)
+
+
+def _with_versions(sql: str, versions: list[int]) -> str:
+    """WHERE id = ?の文にバージョンの条件を加える"""
+    return sql + _VERSION_CONDITION.format(", ".join("?" * len(versions)))
+
+
+def _like_pattern(query: str) -> str:
+    """部分一致のLIKEパターン（%・_とエスケープ文字自体はエスケープする）"""
+    escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _raise_if_exists(conn: sqlite3.Connection, item_id: int, now: int) -> None:
+    """
+    条件付きの更新・削除で行が変わらなかった場合に、存在しない（期限切れを含む）のか
+    バージョンが一致しないのかを区別する（後者はVersionConflictError）
+    """
+    row = conn.execute(_ITEM_VERSION_SQL, (item_id, now)).fetchone()
+    if row is not None:
+        raise VersionConflictError(item_id, row[0])
+
+
+def _wake(waiter: "asyncio.Future[None]") -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class SQLiteItemStorage(ItemStorage):
+    """
+    WALモードのSQLiteストレージ
+
+    接続数はpool_sizeで上限を設け、各接続は専用のワーカースレッドが保持する。
+    クエリは全てワーカースレッド上で実行され、イベントループをブロックしない。
+
+    iter_items()のストリーミングは読み取りトランザクションを保持し続け、その間は
+    WALのチェックポイントが先に進めない。ストリーミング用の接続も同時にpool_size本までとし、
+    使い終わった接続は閉じずに次のストリーミングで使い回す（空くまで待つ）。
+    """
+
+    # compact()で1回のトランザクションで消す墓標の件数
+    COMPACT_BATCH = 1000
+
+    def __init__(self, path: str, pool_size: int = 4) -> None:
+        if pool_size < 1:
+            raise ValueError("pool_sizeは1以上を指定してください")
+
+        self._path = path
+        self._executor = ThreadPoolExecutor(
+            max_workers=pool_size, thread_name_prefix="sqlite-storage"
+        )
+        self._local = threading.local()
+        self._connections: list[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        # ストリーミング用の接続（別のスレッドのイベントループからも使われる）
+        self._max_streams = pool_size
+        self._open_streams = 0
+        self._idle_streams: list[sqlite3.Connection] = []
+        self._stream_waiters: deque[asyncio.Future[None]] = deque()
+        self._streams_lock = threading.Lock()
+
+        # スキーマ作成とWAL設定は最初の接続で一度だけ行う
+        connection = self._connect()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(_SCHEMA_SQL)
+        columns = {row[1] for row in connection.execute("PRAGMA table_info(items)")}
+        if "expires_at" not in columns:
+            connection.execute(_EXPIRES_COLUMN_SQL)
+        connection.execute(_EXPIRES_INDEX_SQL)
+        try:
+            connection.executescript(_FTS_SCHEMA_SQL)
+            self._fts = True
+        except sqlite3.OperationalError:
+            self._fts = False
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(
+            self._path,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=64,
+        )
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("PRAGMA busy_timeout=5000")
+        connection.create_function("item_normalize", 1, normalize, deterministic=True)
+        with self._connections_lock:
+            self._connections.append(connection)
+        return connection
+
+    def _connection(self) -> sqlite3.Connection:
+        """ワーカースレッドごとの接続を取得する"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._connect()
+            self._local.connection = connection
+        return connection
+
+    async def _run(self, func: Callable[[sqlite3.Connection], T]) -> T:
+        """接続プールのワーカースレッド上で処理を実行する"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, lambda: func(self._connection())
+        )
+
+    async def list_items(
+        self, after_id: int | None = None, limit: int | None = None
+    ) -> list[ItemRecord]:
+        # SQLiteではLIMIT -1が無制限を表す
+        params = (
+            after_id if after_id is not None else 0,
+            now_micros(),
+            -1 if limit is None else limit,
+        )
+
+        def query(conn: sqlite3.Connection) -> list[ItemRecord]:
+            return [_to_record(row) for row in conn.execute(_SELECT_PAGE_SQL, params)]
+
+        return await self._run(query)
+
+    async def iter_items(
+        self, after_id: int | None = None, batch_size: int = 500
+    ) -> AsyncIterator[ItemRecord]:
+        # 読み取りトランザクション中はWALのスナップショットが固定されるため、
+        # ストリーミング専用の接続で開始時点のデータを読み続ける
+        loop = asyncio.get_running_loop()
+        params = (after_id if after_id is not None else 0, now_micros(), -1)
+        connection = await self._acquire_stream()
+
+        def open_cursor() -> sqlite3.Cursor:
+            connection.execute("BEGIN")
+            return connection.execute(_SELECT_PAGE_SQL, params)
+
+        try:
+            cursor = await loop.run_in_executor(self._executor, open_cursor)
+            while rows := await loop.run_in_executor(
+                self._executor, cursor.fetchmany, batch_size
+            ):
+                for row in rows:
+                    yield _to_record(row)
+        finally:
+            await loop.run_in_executor(self._executor, self._release_stream, connection)
+
+    async def _acquire_stream(self) -> sqlite3.Connection:
+        """ストリーミング用の接続を取得する（pool_size本とも使用中の場合は空くまで待つ）"""
+        while True:
+            with self._streams_lock:
+                if self._idle_streams:
+                    return self._idle_streams.pop()
+                if self._open_streams < self._max_streams:
+                    self._open_streams += 1
+                    break
+                waiter = asyncio.get_running_loop().create_future()
+                self._stream_waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                with self._streams_lock:
+                    if waiter in self._stream_waiters:
+                        self._stream_waiters.remove(waiter)
+                        waiter = None
+                # 起こされた後に取り消された場合は、次に待っているものを起こす
+                if waiter is not None:
+                    self._wake_stream_waiter()
+                raise
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._connect
+            )
+        except BaseException:
+            with self._streams_lock:
+                self._open_streams -= 1
+            self._wake_stream_waiter()
+            raise
+
+    def _release_stream(self, connection: sqlite3.Connection) -> None:
+        """ストリーミング用の接続のトランザクションを終え、次のストリーミングに回す"""
+        try:
+            connection.rollback()
+        except sqlite3.Error:
+            # 閉じた後（close()後など）の接続は使い回さない
+            with self._streams_lock:
+                self._open_streams -= 1
+        else:
+            with self._streams_lock:
+                self._idle_streams.append(connection)
+        self._wake_stream_waiter()
+
+    def _wake_stream_waiter(self) -> None:
+        with self._streams_lock:
+            waiter = self._stream_waiters.popleft() if self._stream_waiters else None
+        if waiter is not None:
+            waiter.get_loop().call_soon_threadsafe(_wake, waiter)
+
+    async def get_item(self, item_id: int) -> ItemRecord | None:
+        now = now_micros()
+
+        def query(conn: sqlite3.Connection) -> ItemRecord | None:
+            row = conn.execute(_SELECT_ONE_SQL, (item_id, now)).fetchone()
+            return _to_record(row) if row is not None else None
+
+        return await self._run(query)
+
+    async def create_item(
+        self, name: str, description: str, expires_at: int | None = None
+    ) -> ItemRecord:
+        created_at = now_micros()
+        params = (name, description, created_at, expires_at)
+
+        def execute(conn: sqlite3.Connection) -> ItemRecord:
+            cursor = conn.execute(_INSERT_SQL, params)
+            return ItemRecord(
+                cursor.lastrowid, name, description, created_at, None, expires_at
+            )
+
+        return await self._run(execute)
+
+    async def create_items(
+        self,
+        items: list[tuple[str, str]],
+        expires_at: list[int | None] | None = None,
+    ) -> list[ItemRecord]:
+        created_at = now_micros()
+        expires = expires_at or [None] * len(items)
+        params = [
+            (name, description, created_at, item_expires)
+            for (name, description), item_expires in zip(items, expires, strict=True)
+        ]
+
+        def execute(conn: sqlite3.Connection) -> list[ItemRecord]:
+            # 書き込みロックを取ってから登録するため、IDは連続した範囲になる
+            with _write_transaction(conn):
+                conn.executemany(_INSERT_SQL, params)
+                last_id = conn.execute(_LAST_ID_SQL).fetchone()[0]
+
+            first_id = last_id - len(items) + 1
+            return [
+                ItemRecord(item_id, name, description, created_at, None, item_expires)
+                for item_id, (name, description, _, item_expires) in enumerate(
+                    params, start=first_id
+                )
+            ]
+
+        return await self._run(execute)
+
+    async def update_item(
+        self,
+        item_id: int,
+        name: str | None,
+        description: str | None,
+        if_match: Collection[int] | None = None,
+        expires_at: int | None = None,
+    ) -> ItemRecord | None:
+        updated_at = now_micros()
+        params = (name, description, updated_at, expires_at, item_id, updated_at)
+
+        def execute(conn: sqlite3.Connection) -> ItemRecord | None:
+            if if_match is None:
+                row = conn.execute(_UPDATE_SQL, params).fetchone()
+                return _to_record(row) if row is not None else None
+
+            versions = list(if_match)
+            sql = f"{_with_versions(_UPDATE_WHERE_SQL, versions)} RETURNING {_COLUMNS}"
+            row = conn.execute(sql, (*params, *versions)).fetchone()
+            if row is not None:
+                return _to_record(row)
+            _raise_if_exists(conn, item_id, updated_at)
+            return None
+
+        return await self._run(execute)
+
+    async def update_items(
+        self,
+        updates: list[tuple[int, str | None, str | None]],
+        expires_at: list[int | None] | None = None,
+    ) -> list[ItemRecord | None]:
+        updated_at = now_micros()
+        expires = expires_at or [None] * len(updates)
+        params = [
+            (name, description, updated_at, item_expires, item_id, updated_at)
+            for (item_id, name, description), item_expires in zip(
+                updates, expires, strict=True
+            )
+        ]
+
+        def execute(conn: sqlite3.Connection) -> list[ItemRecord | None]:
+            results: list[ItemRecord | None] = []
+            with _write_transaction(conn):
+                for item_params in params:
+                    row = conn.execute(_UPDATE_SQL, item_params).fetchone()
+                    results.append(_to_record(row) if row is not None else None)
+            return results
+
+        return await self._run(execute)
+
+    async def delete_item(
+        self, item_id: int, if_match: Collection[int] | None = None
+    ) -> bool:
+        now = now_micros()
+
+        def execute(conn: sqlite3.Connection) -> bool:
+            if if_match is None:
+                return conn.execute(_DELETE_SQL, (item_id, now)).rowcount > 0
+
+            versions = list(if_match)
+            sql = _with_versions(_DELETE_SQL, versions)
+            if conn.execute(sql, (item_id, now, *versions)).rowcount > 0:
+                return True
+            _raise_if_exists(conn, item_id, now)
+            return False
+
+        return await self._run(execute)
+
+    async def delete_items(self, item_ids: list[int]) -> list[bool]:
+        return await self._delete_each(_DELETE_SQL, item_ids, now_micros())
+
+    async def delete_expired(self, item_ids: list[int], now: int) -> list[bool]:
+        return await self._delete_each(_DELETE_EXPIRED_SQL, item_ids, now)
+
+    async def _delete_each(self, sql: str, item_ids: list[int], now: int) -> list[bool]:
+        """IDごとに(id, now)を渡してsqlを実行し、1回のトランザクションで削除する"""
+
+        def execute(conn: sqlite3.Connection) -> list[bool]:
+            with _write_transaction(conn):
+                return [
+                    conn.execute(sql, (item_id, now)).rowcount > 0
+                    for item_id in item_ids
+                ]
+
+        return await self._run(execute)
+
+    async def search(self, query: str, limit: int) -> tuple[list[ItemRecord], int]:
+        """
+        全文検索の索引で候補を絞り込み、索引の正規化した本文で関連度を計算する
+        3文字未満のクエリは索引を引けず、索引の本文をLIKEで全件照合する。
+        並べ替えと件数の集計はSQLで行い、上位limit件の行だけを読み出す
+        """
+        query = normalize(query)
+        if not self._fts or not query:
+            return await super().search(query, limit)
+
+        if len(query) >= 3:
+            key, condition = "match", ('"{}"'.format(query.replace('"', '""')),)
+        else:
+            key, condition = "like", (_like_pattern(query),) * 2
+        params = (query,) * 4 + condition + (now_micros(),)
+
+        def query_top(conn: sqlite3.Connection) -> tuple[list[ItemRecord], int]:
+            # 上位と件数を同じ読み取りトランザクションで読む
+            conn.execute("BEGIN")
+            try:
+                rows = conn.execute(_SEARCH_TOP_SQL[key], (*params, limit))
+                records = [_to_record(row) for row in rows]
+                total = conn.execute(_SEARCH_COUNT_SQL[key], params).fetchone()[0]
+            finally:
+                conn.execute("COMMIT")
+            return records, total
+
+        return await self._run(query_top)
+
+    async def list_items_by_time(
+        self,
+        order_by: str,
+        created: TimeRange = UNBOUNDED,
+        modified: TimeRange = UNBOUNDED,
+        after: tuple[int, int] | None = None,
+        limit: int | None = None,
+        descending: bool = False,
+    ) -> list[ItemRecord]:
+        conditions = [_LIVE]
+        params = [now_micros()]
+        for column, (start, end) in (
+            (_ORDER_COLUMNS["created_at"], created),
+            (_ORDER_COLUMNS["updated_at"], modified),
+        ):
+            if start is not None:
+                conditions.append(f"{column} >= ?")
+                params.append(start)
+            if end is not None:
+                conditions.append(f"{column} < ?")
+                params.append(end)
+
+        column = _ORDER_COLUMNS[order_by]
+        direction = "DESC" if descending else "ASC"
+        if after is not None:
+            conditions.append(f"({column}, id) {'<' if descending else '>'} (?, ?)")
+            params.extend(after)
+        sql = (
+            f"SELECT {_COLUMNS} FROM items WHERE {' AND '.join(conditions)} "
+            f"ORDER BY {column} {direction}, id {direction} LIMIT ?"
+        )
+        params.append(-1 if limit is None else limit)
+
+        def query(conn: sqlite3.Connection) -> list[ItemRecord]:
+            return [_to_record(row) for row in conn.execute(sql, params)]
+
+        return await self._run(query)
+
+    async def list_tombstones(
+        self, after: tuple[int, int], limit: int
+    ) -> list[Tombstone] | None:
+        def query(conn: sqlite3.Connection) -> list[Tombstone] | None:
+            # 境界の確認と読み出しを同じ読み取りトランザクションで行う
+            conn.execute("BEGIN")
+            try:
+                if after[0] < conn.execute(_HORIZON_SQL).fetchone()[0]:
+                    return None
+                rows = conn.execute(_SELECT_TOMBSTONES_SQL, (*after, limit))
+                return [Tombstone(*row) for row in rows]
+            finally:
+                conn.execute("COMMIT")
+
+        return await self._run(query)
+
+    async def compact(self, before: int, budget: float) -> int:
+        """
+        期限切れのアイテムと墓標をCOMPACT_BATCH件ずつ別々のトランザクションで消す
+        書き込みロックを持つ時間は1回分に収まり、他の書き込みを長く待たせない
+        期限切れのアイテムは、作成したプロセスが再起動・終了していてもここで削除される
+        """
+        deadline = time.perf_counter() + budget
+        now = now_micros()
+
+        def purge(conn: sqlite3.Connection, sql: str, params: tuple[int, ...]) -> int:
+            reclaimed = 0
+            while True:
+                with _write_transaction(conn):
+                    conn.execute(_RAISE_HORIZON_SQL, (before,))
+                    deleted = conn.execute(sql, (*params, self.COMPACT_BATCH)).rowcount
+                reclaimed += deleted
+                if deleted < self.COMPACT_BATCH or time.perf_counter() >= deadline:
+                    return reclaimed
+
+        def execute(conn: sqlite3.Connection) -> int:
+            # 期限切れのアイテムの削除で作られる墓標も、同じ保持期間で回収する
+            expired = purge(conn, _PURGE_EXPIRED_SQL, (now,))
+            if time.perf_counter() >= deadline:
+                return expired
+            return expired + purge(conn, _PURGE_TOMBSTONES_SQL, (before,))
+
+        return await self._run(execute)
+
+    async def count(self) -> int:
+        def query(conn: sqlite3.Connection) -> int:
+            return conn.execute(_COUNT_SQL).fetchone()[0]
+
+        return await self._run(query)
+
+    async def store_version(self) -> str | None:
+        def query(conn: sqlite3.Connection) -> str:
+            return conn.execute(_VERSION_SQL, (now_micros(),)).fetchone()[0]
+
+        return await self._run(query)
+
+    async def clear(self) -> None:
+        def execute(conn: sqlite3.Connection) -> None:
+            with _write_transaction(conn):
+                conn.execute(_CLEAR_SQL)
+                conn.execute(_RESET_SEQUENCE_SQL)
+                # IDを振り直すため、以前の墓標は参照できなくなる
+                conn.execute(_CLEAR_TOMBSTONES_SQL)
+                conn.execute(_RAISE_HORIZON_SQL, (now_micros(),))
+
+        await self._run(execute)
+
+    async def close(self) -> None:
+        with self._streams_lock:
+            self._idle_streams.clear()
+        self._executor.shutdown(wait=True)
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
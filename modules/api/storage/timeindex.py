@@ -0,0 +1,140 @@
+"""
+作成日時・更新日時の範囲での一覧取得
+(時刻, ID)の昇順の索引で、範囲内のアイテムをO(log n + k)で取り出す
+"""
+
+from bisect import bisect_left, insort
+from collections.abc import Iterable, Iterator
+
+from .record import ItemRecord
+
+# (時刻の開始（含む）, 終了（含まない）)。Noneは制限なし
+TimeRange = tuple[int | None, int | None]
+UNBOUNDED: TimeRange = (None, None)
+
+# 索引のキーは時刻を上位、IDを下位に詰めた1つの整数にする（タプルより小さく比較も速い）
+_ID_BITS = 64
+_ID_MASK = (1 << _ID_BITS) - 1
+
+
+def sort_value(record: ItemRecord, order_by: str) -> int:
+    """
+    並び順の値を返す（同じ値の場合はID順に並べる）
+    updated_atは未更新の場合に作成日時を使い、作成も変更として扱う
+    """
+    if order_by == "created_at":
+        return record.created_at
+    if order_by == "updated_at":
+        return record.modified_at
+    return record.id
+
+
+def in_range(value: int, bounds: TimeRange) -> bool:
+    start, end = bounds
+    return (start is None or value >= start) and (end is None or value < end)
+
+
+def make_key(value: int, item_id: int) -> int:
+    return value << _ID_BITS | item_id
+
+
+class SortedKeyIndex:
+    """
+    (時刻, ID)のキーを昇順に保持する索引
+
+    ソート済みのリストを最大CHUNK_SIZE * 2件のチャンクに分けて持つ。
+    1つのリストに比べて、中間への挿入・削除で移動する要素がチャンク内に限られる。
+    チャンクの位置は各チャンクの最大値を二分探索して求める。
+    """
+
+    CHUNK_SIZE = 1000
+
+    def __init__(self, keys: Iterable[int] = ()) -> None:
+        ordered = sorted(keys)
+        self._chunks: list[list[int]] = [
+            ordered[i : i + self.CHUNK_SIZE]
+            for i in range(0, len(ordered), self.CHUNK_SIZE)
+        ]
+        self._maxes: list[int] = [chunk[-1] for chunk in self._chunks]
+        self._len = len(ordered)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def add(self, value: int, item_id: int) -> None:
+        key = make_key(value, item_id)
+        if not self._chunks:
+            self._chunks.append([key])
+            self._maxes.append(key)
+        else:
+            # 最大値より大きいキーは最後のチャンクに追加する（作成順の追加はほぼこれになる）
+            index = min(bisect_left(self._maxes, key), len(self._chunks) - 1)
+            chunk = self._chunks[index]
+            insort(chunk, key)
+            self._maxes[index] = chunk[-1]
+            if len(chunk) > self.CHUNK_SIZE * 2:
+                self._chunks.insert(index + 1, chunk[self.CHUNK_SIZE :])
+                del chunk[self.CHUNK_SIZE :]
+                self._maxes.insert(index, chunk[-1])
+        self._len += 1
+
+    def discard(self, value: int, item_id: int) -> None:
+        key = make_key(value, item_id)
+        index = bisect_left(self._maxes, key)
+        if index == len(self._chunks):
+            return
+        chunk = self._chunks[index]
+        position = bisect_left(chunk, key)
+        if chunk[position] != key:
+            return
+        del chunk[position]
+        self._len -= 1
+        if chunk:
+            self._maxes[index] = chunk[-1]
+        else:
+            del self._chunks[index]
+            del self._maxes[index]
+
+    def ids(
+        self, low: int | None, high: int | None, descending: bool = False
+    ) -> Iterator[int]:
+        """キーがlow以上high未満のIDを並び順に返す"""
+        chunks = self._chunks
+        first = bisect_left(self._maxes, low) if low is not None else 0
+        last = bisect_left(self._maxes, high) if high is not None else len(chunks) - 1
+        last = min(last, len(chunks) - 1)
+        if first > last:
+            return
+
+        positions = range(first, last + 1)
+        for index in reversed(positions) if descending else positions:
+            chunk = chunks[index]
+            start = bisect_left(chunk, low) if index == first and low is not None else 0
+            end = (
+                bisect_left(chunk, high)
+                if index == last and high is not None
+                else len(chunk)
+            )
+            keys = chunk[start:end]
+            if descending:
+                keys.reverse()
+            for key in keys:
+                yield key & _ID_MASK
+
+
+def key_bounds(
+    bounds: TimeRange,
+    after: tuple[int, int] | None,
+    descending: bool,
+) -> tuple[int | None, int | None]:
+    """時刻の範囲とカーソルを索引のキーの範囲（low以上high未満）に変換する"""
+    start, end = bounds
+    low = make_key(start, 0) if start is not None else None
+    high = make_key(end, 0) if end is not None else None
+    if after is not None:
+        key = make_key(*after)
+        if descending:
+            high = key if high is None else min(high, key)
+        else:
+            low = key + 1 if low is None else max(low, key + 1)
+    return low, high
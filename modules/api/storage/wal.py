@@ -0,0 +1,231 @@
+"""
+追記専用のバイナリWAL（Write-Ahead Log）
+インメモリストレージの変更操作を記録し、再起動時に再生する
+
+エントリ形式:
+    | 本体の長さ(4B) | 本体のCRC32(4B) | 操作種別(1B) | 操作ごとのデータ |
+
+ファイルはセグメント（wal-000001.log, ...）に分かれ、スナップショット作成時に
+新しいセグメントへ切り替える。スナップショットより前のセグメントは削除する。
+
+fsyncの方針:
+- always: 書き込みごとにfsyncしてから応答する。同時に待っている書き込みは
+  1回のfsyncにまとめる（グループコミット）
+- interval: 一定間隔（ミリ秒）でバックグラウンドにfsyncする
+- os: fsyncせずOSのページキャッシュに任せる
+"""
+
+import asyncio
+import os
+import re
+import struct
+import threading
+import zlib
+from collections.abc import Iterator
+
+from .record import ItemRecord, pack_record, unpack_record
+
+FSYNC_ALWAYS = "always"
+FSYNC_INTERVAL = "interval"
+FSYNC_OS = "os"
+FSYNC_POLICIES = (FSYNC_ALWAYS, FSYNC_INTERVAL, FSYNC_OS)
+
+OP_PUT = 1
+OP_DELETE = 2
+OP_CLEAR = 3
+
+_ENTRY_HEADER = struct.Struct("<II")
+_ITEM_ID = struct.Struct("<q")
+_SEGMENT_PATTERN = re.compile(r"^wal-(\d{6})\.log$")
+
+# 再生時の操作: (OP_PUT, ItemRecord) / (OP_DELETE, id) / (OP_CLEAR, None)
+WalOperation = tuple[int, ItemRecord | int | None]
+
+
+def _entry(op: int, payload: bytes = b"") -> bytes:
+    body = bytes((op,)) + payload
+    return _ENTRY_HEADER.pack(len(body), zlib.crc32(body)) + body
+
+
+def encode_put(record: ItemRecord) -> bytes:
+    """作成・更新後のレコードを記録するエントリ"""
+    return _entry(OP_PUT, pack_record(record))
+
+
+def encode_delete(item_id: int) -> bytes:
+    """削除を記録するエントリ"""
+    return _entry(OP_DELETE, _ITEM_ID.pack(item_id))
+
+
+def encode_clear() -> bytes:
+    """全件削除を記録するエントリ"""
+    return _entry(OP_CLEAR)
+
+
+def _decode(body: bytes) -> WalOperation:
+    op = body[0]
+    if op == OP_PUT:
+        return op, unpack_record(body, 1)[0]
+    if op == OP_DELETE:
+        return op, _ITEM_ID.unpack_from(body, 1)[0]
+    return op, None
+
+
+def segment_name(segment: int) -> str:
+    return f"wal-{segment:06d}.log"
+
+
+def list_segments(directory: str) -> list[int]:
+    """ディレクトリ内のセグメント番号を昇順で返す"""
+    segments = []
+    for name in os.listdir(directory):
+        match = _SEGMENT_PATTERN.match(name)
+        if match:
+            segments.append(int(match.group(1)))
+    return sorted(segments)
+
+
+def read_segment(path: str) -> Iterator[WalOperation]:
+    """
+    セグメントのエントリを順に返す
+    書き込み途中で停止した末尾（長さ不足・CRC不一致）を見つけたら、
+    そこでファイルを切り詰めて終了する
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    offset = 0
+    while offset + _ENTRY_HEADER.size <= len(data):
+        length, crc = _ENTRY_HEADER.unpack_from(data, offset)
+        start = offset + _ENTRY_HEADER.size
+        body = data[start : start + length]
+        if length == 0 or len(body) < length or zlib.crc32(body) != crc:
+            break
+        yield _decode(body)
+        offset = start + length
+
+    if offset < len(data):
+        os.truncate(path, offset)
+
+
+class WriteAheadLog:
+    """
+    セグメント単位の追記専用ログ
+
+    位置（LSN）は開いてから書き込んだ累計バイト数で表し、
+    commit(lsn)はその位置までの永続化をfsyncの方針に従って待つ。
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment: int,
+        fsync: str = FSYNC_INTERVAL,
+        interval_ms: int = 100,
+    ) -> None:
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"未対応のfsync方針です: {fsync}")
+
+        self.directory = directory
+        self.fsync = fsync
+        self.segment = segment
+        self.segment_bytes = 0
+        self._fd = self._open_segment(segment)
+        self._written = 0
+        self._synced = 0
+        # fsyncを直列化する
+        self._sync_lock = threading.Lock()
+        # 書き込み先・書き込み位置・切り替え前のセグメントの参照を揃える（fsync中は持たない）
+        self._fd_lock = threading.Lock()
+        # 切り替え前のセグメント（次のfsyncで永続化して閉じる）
+        self._rotated: list[int] = []
+        self._stop = threading.Event()
+        self._syncer: threading.Thread | None = None
+        if fsync == FSYNC_INTERVAL:
+            self._syncer = threading.Thread(
+                target=self._sync_periodically,
+                args=(interval_ms / 1000,),
+                name="wal-fsync",
+                daemon=True,
+            )
+            self._syncer.start()
+
+    def _open_segment(self, segment: int) -> int:
+        path = os.path.join(self.directory, segment_name(segment))
+        return os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+
+    def append(self, data: bytes) -> int:
+        """エントリを追記し、書き込み後の位置を返す（fsyncは待たない）"""
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self._fd, view) :]
+        self.segment_bytes += len(data)
+        self._written += len(data)
+        return self._written
+
+    async def commit(self, lsn: int) -> None:
+        """fsyncの方針に従い、lsnまでの永続化を待つ"""
+        if self.fsync == FSYNC_ALWAYS and self._synced < lsn:
+            # fsync中にイベントループを止めないよう、スレッドで待つ
+            await asyncio.to_thread(self._sync_until, lsn)
+
+    def _sync_until(self, lsn: int) -> None:
+        """
+        lsnまでをfsyncする
+        ロック待ちの間に他の書き込みのfsyncで永続化済みになっていれば何もしない。
+        fsyncは呼び出し時点の書き込み位置までをまとめて永続化する（グループコミット）
+        """
+        with self._sync_lock:
+            if self._synced >= lsn:
+                return
+            with self._fd_lock:
+                target, fd = self._written, self._fd
+                rotated, self._rotated = self._rotated, []
+            for old in rotated:
+                os.fsync(old)
+                os.close(old)
+            os.fsync(fd)
+            self._synced = max(self._synced, target)
+
+    def _sync_periodically(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            if self._synced < self._written:
+                self._sync_until(self._written)
+
+    def rotate(self) -> int:
+        """
+        新しいセグメントに切り替える（append()と同じスレッドから呼ぶ）
+        fsyncは待たない。前のセグメントは次のfsyncかsync_rotated()で永続化して閉じる
+        """
+        fd = self._open_segment(self.segment + 1)
+        with self._fd_lock:
+            self._rotated.append(self._fd)
+            self._fd = fd
+            self.segment += 1
+            self.segment_bytes = 0
+        return self.segment
+
+    def sync_rotated(self) -> None:
+        """切り替え前のセグメントを永続化して閉じる（ブロックするためスレッドで呼ぶ）"""
+        with self._sync_lock:
+            with self._fd_lock:
+                rotated, self._rotated = self._rotated, []
+            for old in rotated:
+                os.fsync(old)
+                os.close(old)
+
+    def remove_segments_before(self, segment: int) -> None:
+        """スナップショットに取り込まれたセグメントを削除する"""
+        for number in list_segments(self.directory):
+            if number < segment:
+                os.remove(os.path.join(self.directory, segment_name(number)))
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._syncer is not None:
+            self._syncer.join()
+        self.sync_rotated()
+        with self._sync_lock:
+            os.fsync(self._fd)
+            os.close(self._fd)
+            self._synced = self._written
@@ -12,7 +12,8 @@ import pytest
 from fastapi.testclient import TestClient
 
 from ..main import app
-from ..routers.items import items_storage
+from ..storage.memory import InMemoryItemStorage
+from ..storage.provider import get_storage, set_storage
 
 
 @pytest.fixture
@@ -30,24 +31,16 @@ def clean_items_storage() -> Generator[None]:
     テスト実行前後でストレージを初期化する
     """
     # テスト前の状態を保存
-    original_storage = items_storage.copy()
+    original_storage = get_storage()
 
-    # next_idをリセット
-    from ..routers import items
-
-    original_next_id = items.next_id
-    items.next_id = 1
-
-    # ストレージをクリア
-    items_storage.clear()
+    # 空のストレージに差し替え（IDも1から採番される）
+    set_storage(InMemoryItemStorage())
 
     # テスト実行
     yield
 
     # テスト後に元の状態に復元
-    items_storage.clear()
-    items_storage.update(original_storage)
-    items.next_id = original_next_id
+    set_storage(original_storage)
 
 
 @pytest.fixture
@@ -94,22 +87,18 @@ def mock_environment_variables():
 
 
 @pytest.fixture(autouse=True)
-def reset_items_storage():
+def reset_items_storage() -> Generator[None]:
     """
     各テスト実行前にアイテムストレージをリセットする
     autouse=Trueにより、全てのテストで自動実行される
     """
     # テスト開始前にリセット
-    items_storage.clear()
-    import modules.api.routers.items as items_module
-
-    items_module.next_id = 1
+    set_storage(InMemoryItemStorage())
 
     yield
 
     # テスト終了後にもクリア
-    items_storage.clear()
-    items_module.next_id = 1
+    set_storage(None)
 
 
 class TestDataFactory:
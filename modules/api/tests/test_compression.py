@@ -0,0 +1,257 @@
+"""
+レスポンス圧縮ミドルウェアのテスト
+"""
+
+import asyncio
+import gzip
+import json
+import zlib
+
+import pytest
+from fastapi import Depends, FastAPI, Response
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from .. import compression
+from ..compression import (
+    CompressionMiddleware,
+    available_codecs,
+    disable_compression,
+    negotiate,
+)
+
+LARGE = ("日本語のテキスト" * 200).encode()
+
+
+def _test_app(**options) -> CompressionMiddleware:
+    app = FastAPI()
+
+    @app.get("/large")
+    async def large() -> Response:
+        return Response(LARGE, media_type="application/json", headers={"ETag": '"1"'})
+
+    @app.get("/small")
+    async def small() -> Response:
+        return Response(b"{}", media_type="application/json")
+
+    @app.get("/image")
+    async def image() -> Response:
+        return Response(LARGE, media_type="image/png")
+
+    @app.get("/opt-out", dependencies=[Depends(disable_compression)])
+    async def opt_out() -> Response:
+        return Response(LARGE, media_type="application/json")
+
+    @app.get("/not-modified")
+    async def not_modified() -> Response:
+        return Response(status_code=304, headers={"ETag": '"1"'})
+
+    @app.get("/stream")
+    async def stream() -> StreamingResponse:
+        async def lines():
+            for i in range(3):
+                yield f'{{"id":{i}}}\n'.encode()
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    return CompressionMiddleware(app, **options)
+
+
+def _request(app, path: str, accept_encoding: str = "gzip"):
+    """ASGIアプリを直接呼び出し、(開始メッセージのヘッダー, ボディのメッセージ)を返す"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"accept-encoding", accept_encoding.encode())],
+        "server": ("test", 80),
+        "client": ("test", 1),
+    }
+    messages = []
+    requests = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        # レスポンスの送信が終わるまで切断しない
+        await asyncio.Event().wait()
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    headers = {key.decode(): value.decode() for key, value in messages[0]["headers"]}
+    return headers, messages[1:]
+
+
+class TestNegotiate:
+    """Accept-Encodingの解釈のテストクラス"""
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize(
+        "accept_encoding, expected",
+        [
+            ("gzip", "gzip"),
+            ("gzip;q=0.5, deflate", "gzip"),
+            ("*", "gzip"),
+            ("gzip;q=0", None),
+            ("*;q=0", None),
+            ("identity", None),
+            ("", None),
+            ("GZIP ; q=0.8", "gzip"),
+        ],
+    )
+    def test_gzip_only(self, accept_encoding: str, expected: str | None):
+        """q値・*・q=0を解釈して圧縮方式を選ぶことを確認"""
+        codecs = [codec for codec in available_codecs() if codec.name == "gzip"]
+        codec = negotiate(accept_encoding, codecs)
+
+        assert (codec.name if codec else None) == expected
+
+    @pytest.mark.unit
+    def test_preference_and_weight(self):
+        """同じq値では優先順、q値が異なれば大きい方を選ぶことを確認"""
+        codecs = [
+            compression.Codec(name, bytes, None) for name in ("zstd", "br", "gzip")
+        ]
+
+        assert negotiate("gzip, br, zstd", codecs).name == "zstd"
+        assert negotiate("gzip, br;q=0.9, zstd;q=0.1", codecs).name == "gzip"
+        assert negotiate("br, *;q=0.5", codecs).name == "br"
+
+
+class TestCompressionMiddleware:
+    """CompressionMiddlewareのテストクラス"""
+
+    @pytest.mark.unit
+    def test_compress_large_body(self):
+        """最小サイズ以上のボディをgzipで圧縮し、ヘッダーを付け替えることを確認"""
+        headers, messages = _request(_test_app(), "/large")
+
+        body = messages[0]["body"]
+        assert headers["content-encoding"] == "gzip"
+        assert headers["content-length"] == str(len(body))
+        assert headers["vary"] == "Accept-Encoding"
+        assert headers["etag"] == 'W/"1"'
+        assert gzip.decompress(body) == LARGE
+        assert len(body) < len(LARGE) / 10
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("path", ["/small", "/image", "/opt-out"])
+    def test_not_compressed(self, path: str):
+        """小さいボディ・圧縮に向かない形式・除外したルートは圧縮しないことを確認"""
+        headers, messages = _request(_test_app(), path)
+
+        assert "content-encoding" not in headers
+        assert messages[0]["body"] in (LARGE, b"{}")
+
+    @pytest.mark.unit
+    def test_not_accepted(self):
+        """圧縮を受け付けないクライアントにはそのまま返し、Varyを付けることを確認"""
+        headers, messages = _request(_test_app(), "/large", "identity")
+
+        assert "content-encoding" not in headers
+        assert headers["vary"] == "Accept-Encoding"
+        assert messages[0]["body"] == LARGE
+
+    @pytest.mark.unit
+    def test_streaming(self):
+        """ストリーミングは最初のチャンクをすぐに送り、残りはまとめて送ることを確認"""
+        headers, messages = _request(_test_app(), "/stream")
+
+        assert headers["content-encoding"] == "gzip"
+        assert "content-length" not in headers
+        decompressor = zlib.decompressobj(31)
+        received = [decompressor.decompress(message["body"]) for message in messages]
+        assert received == [b'{"id":0}\n', b'{"id":1}\n{"id":2}\n']
+        assert messages[-1]["more_body"] is False
+        assert decompressor.eof
+
+    @pytest.mark.unit
+    def test_streaming_flush_thresholds(self):
+        """フラッシュする量・間隔を超えたチャンクは、届いた時点で展開できることを確認"""
+        for options in ({"stream_flush_size": 1}, {"stream_flush_seconds": 0}):
+            _, messages = _request(_test_app(**options), "/stream")
+
+            decompressor = zlib.decompressobj(31)
+            received = [decompressor.decompress(m["body"]) for m in messages]
+            assert received[:3] == [b'{"id":0}\n', b'{"id":1}\n', b'{"id":2}\n']
+            assert decompressor.eof
+
+    @pytest.mark.unit
+    def test_not_modified_etag(self):
+        """圧縮方式を選べた場合、304も200と同じ弱いETagにすることを確認"""
+        compressed, _ = _request(_test_app(), "/large")
+        headers, _ = _request(_test_app(), "/not-modified")
+        assert headers["etag"] == compressed["etag"] == 'W/"1"'
+        assert headers["vary"] == "Accept-Encoding"
+
+        headers, _ = _request(_test_app(), "/not-modified", "identity")
+        assert headers["etag"] == '"1"'
+        # 小さくて圧縮しないボディも、304と同じETagにする
+        headers, _ = _request(_test_app(minimum_size=len(LARGE) + 1), "/large")
+        assert "content-encoding" not in headers
+        assert headers["etag"] == 'W/"1"'
+
+    @pytest.mark.unit
+    def test_large_body_in_thread(self, monkeypatch):
+        """大きなボディはワーカースレッドで圧縮することを確認"""
+        calls = []
+
+        async def run_in_threadpool(func, *args):
+            calls.append(len(args[0]))
+            return func(*args)
+
+        monkeypatch.setattr(compression, "run_in_threadpool", run_in_threadpool)
+
+        _request(_test_app(thread_min_size=len(LARGE)), "/large")
+        _request(_test_app(thread_min_size=len(LARGE) + 1), "/large")
+
+        assert calls == [len(LARGE)]
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("module, name", [("zstandard", "zstd"), ("brotli", "br")])
+    def test_optional_codecs(self, module: str, name: str):
+        """zstd・brotliのパッケージがある場合は一括・ストリーミングとも圧縮できることを確認"""
+        library = pytest.importorskip(module)
+        app = _test_app()
+
+        headers, messages = _request(app, "/large", name)
+        assert headers["content-encoding"] == name
+        decompress = (
+            library.ZstdDecompressor().decompress
+            if name == "zstd"
+            else library.decompress
+        )
+        assert decompress(messages[0]["body"]) == LARGE
+
+        headers, messages = _request(app, "/stream", name)
+        assert headers["content-encoding"] == name
+
+
+class TestApplicationCompression:
+    """アプリケーションのレスポンス圧縮のテストクラス"""
+
+    @pytest.mark.unit
+    def test_item_list_compressed(self, client: TestClient, clean_items_storage):
+        """アイテム一覧がgzipで返り、クライアントで展開できることを確認"""
+        client.post(
+            "/api/items/bulk",
+            json=[
+                {"name": f"アイテム{i}", "description": "説明" * 50} for i in range(50)
+            ],
+        )
+
+        response = client.get("/api/items", headers={"Accept-Encoding": "gzip"})
+
+        assert response.headers["content-encoding"] == "gzip"
+        assert len(response.json()["items"]) == 50
+        assert int(response.headers["content-length"]) < len(
+            json.dumps(response.json(), ensure_ascii=False).encode()
+        )
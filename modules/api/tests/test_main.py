@@ -2,10 +2,15 @@
 メインアプリケーションのテスト
 """
 
+import time
 from datetime import datetime
 
 from fastapi.testclient import TestClient
 
+from .. import main as main_module
+from ..main import app, lambda_handler
+from ..storage.record import from_micros, now_micros
+
 
 class TestMainApplication:
     """メインアプリケーションのテストクラス"""
@@ -51,3 +56,53 @@ class TestMainApplication:
         assert "info" in schema
         assert schema["info"]["title"] == "CI/CD Comparison API"
         assert schema["info"]["version"] == "1.0.0"
+
+    def test_lifespan_compacts_tombstones(self, monkeypatch):
+        """起動中はバックグラウンドで墓標を回収し、終了時に止まることを確認"""
+        monkeypatch.setenv("APP_TOMBSTONE_RETENTION_SECONDS", "0")
+        monkeypatch.setenv("APP_COMPACTION_INTERVAL_SECONDS", "0.01")
+        since = from_micros(now_micros()).isoformat()
+
+        with TestClient(app) as client:
+            client.post("/api/items", json={"name": "A", "description": "説明"})
+            client.delete("/api/items/1")
+
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline:
+                response = client.get("/api/items/deleted", params={"since": since})
+                if response.status_code == 410:
+                    break
+                time.sleep(0.01)
+
+        assert response.status_code == 410
+
+    def test_lambda_adapter_reused(self, monkeypatch):
+        """Lambdaハンドラーは起動時の処理とアダプターの作成を1回だけ行うことを確認"""
+        calls = []
+        monkeypatch.setattr(main_module, "_mangum", None)
+        monkeypatch.setattr(main_module, "startup", lambda: calls.append(None))
+        event = {
+            "resource": "/{proxy+}",
+            "path": "/health",
+            "httpMethod": "GET",
+            "headers": {"Host": "example.com"},
+            "multiValueHeaders": {},
+            "queryStringParameters": None,
+            "multiValueQueryStringParameters": None,
+            "requestContext": {
+                "resourcePath": "/{proxy+}",
+                "httpMethod": "GET",
+                "path": "/health",
+                "stage": "prod",
+                "identity": {"sourceIp": "127.0.0.1"},
+            },
+            "body": None,
+            "isBase64Encoded": False,
+        }
+
+        assert lambda_handler(event, None)["statusCode"] == 200
+        adapter = main_module.get_lambda_adapter()
+        assert lambda_handler(event, None)["statusCode"] == 200
+
+        assert main_module.get_lambda_adapter() is adapter
+        assert len(calls) == 1
@@ -0,0 +1,155 @@
+"""
+JSONレスポンスの互換性テスト
+FastJSONResponseの出力が標準のJSONResponse（jsonable_encoder経由）と
+バイト単位で一致することを確認する
+"""
+
+import json
+from datetime import UTC, datetime, timedelta, timezone
+from typing import Any
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+from .. import responses
+from ..models.schemas import (
+    ErrorResponse,
+    HealthResponse,
+    Item,
+    ItemBulkStatusResponse,
+    ItemList,
+    VersionResponse,
+)
+from ..responses import FastJSONResponse, dump_json, model_response
+
+DATETIMES = [
+    datetime(2024, 1, 1, tzinfo=UTC),
+    datetime(2024, 1, 1, 12, 34, 56, 789, tzinfo=UTC),
+    datetime(2024, 1, 1, 12, 34, 56, tzinfo=timezone(timedelta(hours=9))),
+    datetime(2024, 1, 1, 12, 34, 56, 120000),
+]
+
+VALUES: list[Any] = [
+    {"name": "日本語😀", "description": 'エスケープ " \\ / \n\r\t\b\f'},
+    {"control": "\x00\x1f\x7f  "},
+    {"b": 1, "a": [True, False, None], "c": {"nested": []}},
+    {"id": 2**63 - 1, "negative": -1, "zero": 0},
+    {1: "int key", "list": [{}, [], ""]},
+    [],
+    None,
+]
+
+
+def _legacy_body(content: Any) -> bytes:
+    """FastJSONResponse導入前のレスポンスのボディ"""
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def _models(moment: datetime) -> list[BaseModel]:
+    item = Item(
+        id=1,
+        name=" 名前 ",
+        description="説明\n",
+        created_at=moment,
+        updated_at=moment,
+    )
+    return [
+        HealthResponse(timestamp=moment),
+        VersionResponse(version="1.0.0", build_time=moment, environment="test"),
+        item,
+        Item(id=2, name="名前", description="説明", created_at=moment),
+        ItemList(items=[item, item], total=2, next_cursor="aWQ6Mg"),
+        ItemBulkStatusResponse(statuses=[200, 404], succeeded=1),
+        ErrorResponse(error="ERROR", message="メッセージ", timestamp=moment),
+    ]
+
+
+class TestDumpJson:
+    """dump_jsonのテストクラス"""
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("value", VALUES)
+    def test_same_as_json_response(self, value: Any):
+        """標準のJSONResponseと同じバイト列になることを確認"""
+        assert dump_json(value) == JSONResponse(value).body
+        assert FastJSONResponse(value).body == JSONResponse(value).body
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("value", VALUES)
+    def test_without_orjson(self, value: Any, monkeypatch):
+        """orjsonがない環境でも同じバイト列になることを確認"""
+        monkeypatch.setattr(responses, "orjson", None)
+
+        assert dump_json(value) == JSONResponse(value).body
+
+
+class TestModelResponse:
+    """model_responseのテストクラス"""
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("moment", DATETIMES)
+    def test_same_as_response_model(self, moment: datetime):
+        """日時の形式・フィールドの順がjsonable_encoder経由と同じになることを確認"""
+        for model in _models(moment):
+            assert model_response(model).body == _legacy_body(model), model
+
+    @pytest.mark.unit
+    def test_status_and_headers(self):
+        """ステータスコード・ヘッダーを指定できることを確認"""
+        response = model_response(
+            ItemBulkStatusResponse(statuses=[201], succeeded=1),
+            status_code=201,
+            headers={"ETag": '"1"'},
+        )
+
+        assert response.status_code == 201
+        assert response.headers["ETag"] == '"1"'
+        assert response.headers["content-type"] == "application/json"
+
+
+class TestEndpointsFormat:
+    """各エンドポイントのレスポンス形式のテストクラス"""
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize(
+        "method, path, body",
+        [
+            ("GET", "/", None),
+            ("GET", "/health", None),
+            ("GET", "/version", None),
+            ("GET", "/api/items", None),
+            ("GET", "/api/items?fields=id,name", None),
+            ("GET", "/api/items/1", None),
+            ("GET", "/api/items/1?fields=created_at", None),
+            ("GET", "/api/items/search?q=名前", None),
+            ("PATCH", "/api/items/bulk", [{"id": 1, "name": "更新"}, {"id": 9}]),
+            ("DELETE", "/api/items/bulk", [2, 9]),
+            ("GET", "/api/items/999", None),
+            ("GET", "/api/items?cursor=!", None),
+            ("POST", "/api/items", {"name": ""}),
+        ],
+    )
+    def test_compact_json(
+        self, client: TestClient, clean_items_storage, method, path, body
+    ):
+        """区切りの空白なし・非ASCII文字のエスケープなしのJSONを返すことを確認"""
+        client.post(
+            "/api/items/bulk",
+            json=[
+                {"name": "名前1", "description": "説明"},
+                {"name": "名前2", "description": "説明"},
+            ],
+        )
+
+        response = client.request(method, path, json=body)
+
+        assert response.headers["content-type"] == "application/json"
+        assert (
+            response.content
+            == json.dumps(
+                response.json(), ensure_ascii=False, separators=(",", ":")
+            ).encode()
+        )
@@ -2,11 +2,35 @@
 アイテムCRUDエンドポイントのテスト
 """
 
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse
 from fastapi.testclient import TestClient
 
+from ...exceptions import http_exception_handler, validation_exception_handler
+from ...main import lambda_handler
+from ...models.schemas import Item, ItemChanges, ItemCreate, ItemList, ItemUpdate
+from ...routers.items import delete_expired_items
+from ...storage import memory as memory_module
+from ...storage import provider as provider_module
+from ...storage.expiry import ItemExpiry
+from ...storage.memory import InMemoryItemStorage
+from ...storage.provider import (
+    get_change_feed,
+    get_json_cache,
+    get_storage,
+    set_storage,
+)
+from ...storage.record import from_micros, now_micros
+
 
 class TestItemsEndpoint:
     """アイテムCRUDエンドポイントのテストクラス"""
@@ -299,3 +323,1272 @@ class TestItemsErrorCases:
         """ゼロのアイテムIDのテスト"""
         response = client.get("/api/items/0")
         assert response.status_code == 404  # Not Found
+
+
+class TestItemsPagination:
+    """アイテム一覧のカーソルページネーションのテスト"""
+
+    @pytest.mark.unit
+    def test_paginate_with_cursor(
+        self, client: TestClient, clean_items_storage, test_data_factory
+    ):
+        """カーソルで全ページを辿れることを確認"""
+        for i in range(5):
+            client.post(
+                "/api/items", json=test_data_factory.create_item_data(f"アイテム{i}")
+            )
+
+        ids = []
+        cursor = None
+        pages = 0
+        while True:
+            params = {"limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            response = client.get("/api/items", params=params)
+            assert response.status_code == 200
+            data = response.json()
+
+            assert data["total"] == 5
+            ids.extend(item["id"] for item in data["items"])
+            pages += 1
+            cursor = data["next_cursor"]
+            if cursor is None:
+                break
+
+        assert ids == [1, 2, 3, 4, 5]
+        assert pages == 3
+
+    @pytest.mark.unit
+    def test_last_page_has_no_cursor(
+        self, client: TestClient, clean_items_storage, sample_item_data
+    ):
+        """件数がlimit以下の場合next_cursorがnullになることを確認"""
+        client.post("/api/items", json=sample_item_data)
+
+        response = client.get("/api/items", params={"limit": 1})
+
+        assert response.status_code == 200
+        assert response.json()["next_cursor"] is None
+
+    @pytest.mark.unit
+    def test_cursor_skips_deleted_items(
+        self, client: TestClient, clean_items_storage, test_data_factory
+    ):
+        """削除済みアイテムがページに含まれないことを確認"""
+        for i in range(4):
+            client.post(
+                "/api/items", json=test_data_factory.create_item_data(f"アイテム{i}")
+            )
+        client.delete("/api/items/2")
+        client.delete("/api/items/3")
+
+        first = client.get("/api/items", params={"limit": 1}).json()
+        second = client.get(
+            "/api/items", params={"limit": 1, "cursor": first["next_cursor"]}
+        ).json()
+
+        assert [item["id"] for item in first["items"]] == [1]
+        assert [item["id"] for item in second["items"]] == [4]
+        assert second["total"] == 2
+        assert second["next_cursor"] is None
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("cursor", ["invalid!", "Zm9vOmJhcg"])
+    def test_invalid_cursor(self, client: TestClient, cursor: str):
+        """不正なカーソルで400エラーになることを確認"""
+        response = client.get("/api/items", params={"cursor": cursor})
+
+        assert response.status_code == 400
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("limit", [0, 1001])
+    def test_limit_out_of_range(self, client: TestClient, limit: int):
+        """範囲外のlimitで422エラーになることを確認"""
+        response = client.get("/api/items", params={"limit": limit})
+
+        assert response.status_code == 422
+
+
+class TestItemsNdjsonStream:
+    """アイテム一覧のNDJSONストリーミングのテスト"""
+
+    @pytest.mark.unit
+    def test_stream_all_items(
+        self, client: TestClient, clean_items_storage, test_data_factory
+    ):
+        """Accept: application/x-ndjsonで全件が1行ずつ返ることを確認"""
+        for i in range(3):
+            client.post(
+                "/api/items", json=test_data_factory.create_item_data(f"アイテム{i}")
+            )
+
+        response = client.get(
+            "/api/items",
+            params={"limit": 1},
+            headers={"Accept": "application/x-ndjson"},
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [item["id"] for item in lines] == [1, 2, 3]
+        assert lines[0]["name"] == "アイテム0"
+        assert set(lines[0]) == {
+            "id",
+            "name",
+            "description",
+            "created_at",
+            "updated_at",
+        }
+
+    @pytest.mark.unit
+    def test_stream_empty(self, client: TestClient, clean_items_storage):
+        """アイテムがない場合は空のボディになることを確認"""
+        response = client.get("/api/items", headers={"Accept": "application/x-ndjson"})
+
+        assert response.status_code == 200
+        assert response.text == ""
+
+
+class TestItemsBulkCreate:
+    """アイテム一括作成エンドポイントのテスト"""
+
+    @pytest.mark.unit
+    def test_bulk_create_success(
+        self, client: TestClient, clean_items_storage, test_data_factory
+    ):
+        """連続したIDで一括作成されることを確認"""
+        client.post("/api/items", json=test_data_factory.create_item_data())
+        payload = [
+            test_data_factory.create_item_data(f"  アイテム{i}  ", f"説明{i}")
+            for i in range(3)
+        ]
+
+        response = client.post("/api/items/bulk", json=payload)
+
+        assert response.status_code == 201
+        data = response.json()
+        assert data["created"] == 3
+        assert [item["id"] for item in data["items"]] == [2, 3, 4]
+        assert data["items"][0]["name"] == "アイテム0"
+
+        list_data = client.get("/api/items").json()
+        assert list_data["total"] == 4
+
+    @pytest.mark.unit
+    def test_bulk_create_is_atomic(
+        self, client: TestClient, clean_items_storage, test_data_factory
+    ):
+        """1件でも不正なデータがあれば何も作成されないことを確認"""
+        payload = [
+            test_data_factory.create_item_data("アイテム", "説明"),
+            {"name": "   ", "description": "説明"},
+        ]
+
+        response = client.post("/api/items/bulk", json=payload)
+
+        assert response.status_code == 422
+        data = response.json()
+        assert data["error"] == "VALIDATION_ERROR"
+        assert data["detail"][0]["loc"] == ["body", 1, "name"]
+        assert client.get("/api/items").json()["total"] == 0
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("size", [0, 1001])
+    def test_bulk_create_size_limit(
+        self, client: TestClient, clean_items_storage, test_data_factory, size: int
+    ):
+        """件数が範囲外の場合422エラーになることを確認"""
+        payload = [test_data_factory.create_item_data()] * size
+
+        response = client.post("/api/items/bulk", json=payload)
+
+        assert response.status_code == 422
+
+    @pytest.mark.unit
+    def test_bulk_create_invalid_json(self, client: TestClient, clean_items_storage):
+        """JSONとして不正なボディで422エラーになることを確認"""
+        response = client.post(
+            "/api/items/bulk",
+            content=b"[{",
+            headers={"Content-Type": "application/json"},
+        )
+
+        assert response.status_code == 422
+
+
+class TestItemsBulkUpdateDelete:
+    """アイテム一括更新・一括削除エンドポイントのテスト"""
+
+    @pytest.fixture
+    def three_items(self, client: TestClient, clean_items_storage, test_data_factory):
+        """3件のアイテムを作成するフィクスチャ"""
+        payload = [
+            test_data_factory.create_item_data(f"アイテム{i}", f"説明{i}")
+            for i in range(3)
+        ]
+        assert client.post("/api/items/bulk", json=payload).status_code == 201
+
+    @pytest.mark.unit
+    def test_bulk_update_statuses(self, client: TestClient, three_items):
+        """IDごとの更新結果がリクエスト順で返ることを確認"""
+        payload = [
+            {"id": 3, "name": "更新3"},
+            {"id": 999, "name": "存在しない"},
+            {"id": 1, "description": "更新された説明"},
+        ]
+
+        response = client.patch("/api/items/bulk", json=payload)
+
+        assert response.status_code == 200
+        assert response.json() == {"statuses": [200, 404, 200], "succeeded": 2}
+
+        item1 = client.get("/api/items/1").json()
+        assert item1["name"] == "アイテム0"
+        assert item1["description"] == "更新された説明"
+        assert item1["updated_at"] is not None
+        assert client.get("/api/items/3").json()["name"] == "更新3"
+
+    @pytest.mark.unit
+    def test_bulk_update_validation_error(self, client: TestClient, three_items):
+        """1件でも不正な更新データがあれば何も更新されないことを確認"""
+        payload = [{"id": 1, "name": "更新"}, {"id": 2, "name": "   "}]
+
+        response = client.patch("/api/items/bulk", json=payload)
+
+        assert response.status_code == 422
+        assert client.get("/api/items/1").json()["name"] == "アイテム0"
+
+    @pytest.mark.unit
+    def test_bulk_delete_statuses(self, client: TestClient, three_items):
+        """IDごとの削除結果がリクエスト順で返ることを確認"""
+        response = client.request("DELETE", "/api/items/bulk", json=[2, 999, 2, 1])
+
+        assert response.status_code == 200
+        assert response.json() == {"statuses": [204, 404, 404, 204], "succeeded": 2}
+
+        data = client.get("/api/items").json()
+        assert [item["id"] for item in data["items"]] == [3]
+        assert data["total"] == 1
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("payload", [[], ["abc"], {"ids": [1]}])
+    def test_bulk_delete_invalid_body(self, client: TestClient, three_items, payload):
+        """不正なID一覧で422エラーになることを確認"""
+        response = client.request("DELETE", "/api/items/bulk", json=payload)
+
+        assert response.status_code == 422
+        assert client.get("/api/items").json()["total"] == 3
+
+
+class TestItemsSearch:
+    """アイテム検索エンドポイントのテスト"""
+
+    @pytest.fixture
+    def catalog(self, client: TestClient, clean_items_storage):
+        """検索対象のアイテムを作成するフィクスチャ"""
+        payload = [
+            {"name": "ノートパソコン", "description": "軽量な薄型モデル"},
+            {"name": "マウス", "description": "ノートパソコン向けの小型マウス"},
+            {"name": "キーボード", "description": "静音タイプ"},
+        ]
+        assert client.post("/api/items/bulk", json=payload).status_code == 201
+
+    @pytest.mark.unit
+    def test_search_ranked(self, client: TestClient, catalog):
+        """名前に含むアイテムが説明に含むアイテムより上位になることを確認"""
+        response = client.get("/api/items/search", params={"q": "パソコン"})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [item["id"] for item in data["items"]] == [1, 2]
+        assert data["total"] == 2
+
+    @pytest.mark.unit
+    def test_search_follows_writes(self, client: TestClient, catalog):
+        """作成・更新・削除が検索結果に反映されることを確認"""
+        assert (
+            client.get("/api/items/search", params={"q": "静音"}).json()["total"] == 1
+        )
+
+        client.put("/api/items/3", json={"description": "メカニカル"})
+        client.delete("/api/items/1")
+        client.post("/api/items", json={"name": "静音マウス", "description": "説明"})
+
+        data = client.get("/api/items/search", params={"q": "静音"}).json()
+        assert [item["id"] for item in data["items"]] == [4]
+        data = client.get("/api/items/search", params={"q": "パソコン"}).json()
+        assert [item["id"] for item in data["items"]] == [2]
+
+    @pytest.mark.unit
+    def test_search_limit_and_single_character(self, client: TestClient, catalog):
+        """1文字の検索とlimitを確認"""
+        response = client.get("/api/items/search", params={"q": "ス", "limit": 1})
+
+        data = response.json()
+        assert [item["id"] for item in data["items"]] == [2]
+        assert data["total"] == 1
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("params", [{}, {"q": ""}, {"q": "マウス", "limit": 0}])
+    def test_search_invalid_params(self, client: TestClient, catalog, params):
+        """不正なパラメータで422エラーになることを確認"""
+        assert client.get("/api/items/search", params=params).status_code == 422
+
+
+class TestItemsTimeRange:
+    """アイテム一覧の日時の範囲指定・並び順のテスト"""
+
+    @pytest.fixture
+    def timeline(self, client: TestClient, clean_items_storage) -> list[dict]:
+        """作成日時の異なる3件を作成し、1件目を更新するフィクスチャ"""
+        items = []
+        for i in range(3):
+            response = client.post(
+                "/api/items", json={"name": f"アイテム{i}", "description": "説明"}
+            )
+            items.append(response.json())
+            time.sleep(0.002)
+        items[0] = client.put("/api/items/1", json={"name": "更新"}).json()
+        return items
+
+    @pytest.mark.unit
+    def test_sort_and_paginate(self, client: TestClient, timeline: list[dict]):
+        """日時の降順で、カーソルを使って全ページを辿れることを確認"""
+        ids = []
+        params = {"sort": "-created_at", "limit": 2}
+        while True:
+            data = client.get("/api/items", params=params).json()
+            ids.extend(item["id"] for item in data["items"])
+            if data["next_cursor"] is None:
+                break
+            params["cursor"] = data["next_cursor"]
+
+        assert ids == [3, 2, 1]
+        assert data["total"] == 3
+
+    @pytest.mark.unit
+    def test_updated_since(self, client: TestClient, timeline: list[dict]):
+        """更新されたアイテムと、以降に作成されたアイテムが返ることを確認"""
+        response = client.get(
+            "/api/items",
+            params={"updated_since": timeline[2]["created_at"], "sort": "updated_at"},
+        )
+
+        assert response.status_code == 200
+        assert [item["id"] for item in response.json()["items"]] == [3, 1]
+
+    @pytest.mark.unit
+    def test_created_window(self, client: TestClient, timeline: list[dict]):
+        """created_after・created_beforeの両端を含まないことを確認"""
+        response = client.get(
+            "/api/items",
+            params={
+                "created_after": timeline[0]["created_at"],
+                "created_before": timeline[2]["created_at"],
+            },
+        )
+
+        assert [item["id"] for item in response.json()["items"]] == [2]
+
+    @pytest.mark.unit
+    def test_stream_with_range(self, client: TestClient, timeline: list[dict]):
+        """NDJSONでも範囲指定・並び順が反映されることを確認"""
+        response = client.get(
+            "/api/items",
+            params={"created_after": timeline[0]["created_at"], "sort": "-created_at"},
+            headers={"Accept": "application/x-ndjson"},
+        )
+
+        lines = response.text.splitlines()
+        assert [json.loads(line)["id"] for line in lines] == [3, 2]
+
+    @pytest.mark.unit
+    def test_cursor_must_match_sort(self, client: TestClient, timeline: list[dict]):
+        """別の並び順のカーソルで400エラーになることを確認"""
+        cursor = client.get("/api/items", params={"limit": 1}).json()["next_cursor"]
+
+        response = client.get(
+            "/api/items", params={"cursor": cursor, "sort": "created_at"}
+        )
+
+        assert response.status_code == 400
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize(
+        "params", [{"sort": "-id"}, {"sort": "name"}, {"updated_since": "昨日"}]
+    )
+    def test_invalid_params(self, client: TestClient, params: dict):
+        """不正な並び順・日時で422エラーになることを確認"""
+        assert client.get("/api/items", params=params).status_code == 422
+
+
+class TestItemsSparseFields:
+    """fieldsによるフィールドの絞り込みのテスト"""
+
+    ALL_FIELDS = "id,name,description,created_at,updated_at"
+
+    @pytest.fixture
+    def two_items(self, client: TestClient, clean_items_storage):
+        """2件作成し、2件目を更新するフィクスチャ"""
+        payload = [
+            {"name": "アイテム1", "description": "説明1"},
+            {"name": "アイテム2", "description": "説明2"},
+        ]
+        assert client.post("/api/items/bulk", json=payload).status_code == 201
+        client.put("/api/items/2", json={"description": "更新"})
+
+    @pytest.mark.unit
+    def test_list_fields(self, client: TestClient, two_items):
+        """一覧の各アイテムが指定したフィールドのみになることを確認"""
+        response = client.get("/api/items", params={"fields": "name,id", "limit": 1})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["items"] == [{"name": "アイテム1", "id": 1}]
+        assert data["total"] == 2
+        assert data["next_cursor"] is not None
+
+    @pytest.mark.unit
+    def test_detail_fields(self, client: TestClient, two_items):
+        """詳細取得で指定したフィールドのみを返すことを確認"""
+        response = client.get("/api/items/2", params={"fields": "id, updated_at"})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert list(data) == ["id", "updated_at"]
+        assert data["updated_at"] == client.get("/api/items/2").json()["updated_at"]
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("path", ["/api/items", "/api/items/2"])
+    def test_all_fields_match_full_response(
+        self, client: TestClient, two_items, path: str
+    ):
+        """全フィールドを指定した場合、未指定の場合と同じバイト列になることを確認"""
+        full = client.get(path)
+        projected = client.get(path, params={"fields": self.ALL_FIELDS})
+
+        assert projected.content == full.content
+
+    @pytest.mark.unit
+    def test_stream_fields(self, client: TestClient, two_items):
+        """NDJSONでも指定したフィールドのみになることを確認"""
+        response = client.get(
+            "/api/items",
+            params={"fields": "id"},
+            headers={"Accept": "application/x-ndjson"},
+        )
+
+        assert [json.loads(line) for line in response.text.splitlines()] == [
+            {"id": 1},
+            {"id": 2},
+        ]
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("fields", ["", "id,price", "ID"])
+    def test_unknown_field(self, client: TestClient, two_items, fields: str):
+        """不明なフィールドで422エラーになることを確認"""
+        response = client.get("/api/items", params={"fields": fields})
+
+        assert response.status_code == 422
+        assert response.json()["detail"][0]["loc"] == ["query", "fields"]
+
+
+# 圧縮しない（強いETagのままの）レスポンスを受け取るヘッダー
+IDENTITY = {"Accept-Encoding": "identity"}
+
+
+class TestItemsConditionalGet:
+    """ETag・If-None-Matchによる条件付きGETのテスト"""
+
+    @pytest.fixture
+    def item(self, client: TestClient, clean_items_storage) -> dict:
+        """1件作成するフィクスチャ"""
+        return client.post(
+            "/api/items", json={"name": "アイテム", "description": "説明"}
+        ).json()
+
+    @pytest.mark.unit
+    def test_item_not_modified(self, client: TestClient, item: dict, monkeypatch):
+        """ETagが一致した場合、レスポンスを組み立てずに304を返すことを確認"""
+        etag = client.get("/api/items/1").headers["ETag"]
+
+        def fail():
+            raise AssertionError("304ではJSONを組み立てない")
+
+        monkeypatch.setattr("modules.api.routers.items.get_json_cache", fail)
+        response = client.get("/api/items/1", headers={"If-None-Match": etag})
+
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["ETag"] == etag
+
+    @pytest.mark.unit
+    def test_item_etag_changes_on_update(self, client: TestClient, item: dict):
+        """更新後は古いETagで200と新しいETagを返すことを確認"""
+        etag = client.get("/api/items/1").headers["ETag"]
+        client.put("/api/items/1", json={"name": "更新"})
+
+        response = client.get("/api/items/1", headers={"If-None-Match": etag})
+
+        assert response.status_code == 200
+        assert response.json()["name"] == "更新"
+        assert response.headers["ETag"] != etag
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("header", ['"other", {etag}', "W/{etag}", "*"])
+    def test_if_none_match_forms(self, client: TestClient, item: dict, header: str):
+        """複数指定・弱いETag・*でも一致と判定することを確認"""
+        etag = client.get("/api/items/1", headers=IDENTITY).headers["ETag"]
+
+        response = client.get(
+            "/api/items/1", headers={"If-None-Match": header.format(etag=etag)}
+        )
+
+        assert response.status_code == 304
+
+    @pytest.mark.unit
+    def test_list_not_modified(self, client: TestClient, item: dict, monkeypatch):
+        """一覧はストレージのバージョンが同じ間、アイテムを読まずに304を返すことを確認"""
+        etag = client.get("/api/items", params={"fields": "id"}).headers["ETag"]
+
+        async def fail(*args, **kwargs):
+            raise AssertionError("304ではアイテムを読み出さない")
+
+        monkeypatch.setattr(InMemoryItemStorage, "list_items", fail)
+        response = client.get(
+            "/api/items", params={"fields": "id"}, headers={"If-None-Match": etag}
+        )
+        monkeypatch.undo()
+
+        assert response.status_code == 304
+        client.post("/api/items", json={"name": "追加", "description": "説明"})
+        response = client.get(
+            "/api/items", params={"fields": "id"}, headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 200
+        assert [entry["id"] for entry in response.json()["items"]] == [1, 2]
+
+    @pytest.mark.unit
+    def test_lambda_handler_not_modified(self, client: TestClient, item: dict):
+        """Lambdaハンドラー経由でも304を返すことを確認"""
+        etag = client.get("/api/items/1", headers=IDENTITY).headers["ETag"]
+        event = {
+            "resource": "/{proxy+}",
+            "path": "/api/items/1",
+            "httpMethod": "GET",
+            "headers": {"Host": "example.com", "If-None-Match": etag},
+            "multiValueHeaders": {},
+            "queryStringParameters": None,
+            "multiValueQueryStringParameters": None,
+            "requestContext": {
+                "resourcePath": "/{proxy+}",
+                "httpMethod": "GET",
+                "path": "/api/items/1",
+                "stage": "prod",
+                "identity": {"sourceIp": "127.0.0.1"},
+            },
+            "body": None,
+            "isBase64Encoded": False,
+        }
+
+        response = lambda_handler(event, None)
+
+        assert response["statusCode"] == 304
+        assert response["body"] == ""
+        assert response["headers"]["etag"] == etag
+
+
+class TestItemsIfMatch:
+    """If-Matchによる楽観的排他制御のテスト"""
+
+    @pytest.fixture
+    def etag(self, client: TestClient, clean_items_storage) -> str:
+        """1件作成してETagを返すフィクスチャ"""
+        client.post("/api/items", json={"name": "アイテム", "description": "説明"})
+        return client.get("/api/items/1", headers=IDENTITY).headers["ETag"]
+
+    @pytest.mark.unit
+    def test_update_with_current_etag(self, client: TestClient, etag: str):
+        """ETagが一致する場合に更新し、新しいETagを返すことを確認"""
+        response = client.put(
+            "/api/items/1", json={"name": "更新"}, headers={"If-Match": etag}
+        )
+
+        assert response.status_code == 200
+        assert response.json()["name"] == "更新"
+        assert response.headers["ETag"] != etag
+        assert response.headers["ETag"] == client.get("/api/items/1").headers["ETag"]
+
+    @pytest.mark.unit
+    def test_stale_etag_rejected(self, client: TestClient, etag: str):
+        """古いETagでの更新・削除は412と現在のETagを返し、アイテムを変更しないことを確認"""
+        current = client.put("/api/items/1", json={"name": "先に更新"}).headers["ETag"]
+
+        response = client.put(
+            "/api/items/1", json={"name": "後から更新"}, headers={"If-Match": etag}
+        )
+        assert response.status_code == 412
+        assert response.headers["ETag"] == current
+        assert response.json()["error"] == "HTTP_412"
+
+        response = client.delete("/api/items/1", headers={"If-Match": etag})
+        assert response.status_code == 412
+        assert client.get("/api/items/1").json()["name"] == "先に更新"
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("header", ['"other", {etag}', "W/{etag}", "*"])
+    def test_if_match_forms(self, client: TestClient, etag: str, header: str):
+        """複数指定・圧縮で弱くなったETag・*でも一致と判定することを確認"""
+        response = client.delete(
+            "/api/items/1", headers={"If-Match": header.format(etag=etag)}
+        )
+
+        assert response.status_code == 204
+        assert client.get("/api/items/1").status_code == 404
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("header", ['"abc"', "1", ""])
+    def test_invalid_etag_never_matches(
+        self, client: TestClient, etag: str, header: str
+    ):
+        """数値でない・引用符のないETagは一致しないことを確認"""
+        response = client.put(
+            "/api/items/1", json={"name": "更新"}, headers={"If-Match": header}
+        )
+
+        assert response.status_code == 412
+
+    @pytest.mark.unit
+    def test_missing_item(self, client: TestClient, clean_items_storage):
+        """存在しないアイテムはIf-Matchがあれば412、なければ404を返すことを確認"""
+        response = client.put(
+            "/api/items/999", json={"name": "更新"}, headers={"If-Match": "*"}
+        )
+        assert response.status_code == 412
+        assert "ETag" not in response.headers
+        assert (
+            client.delete("/api/items/999", headers={"If-Match": "*"}).status_code
+            == 412
+        )
+        assert client.delete("/api/items/999").status_code == 404
+
+    @pytest.mark.unit
+    def test_concurrent_updates_single_winner(self, client: TestClient, etag: str):
+        """同じETagでの同時更新は1件のみ成功することを確認"""
+
+        def update(i: int) -> int:
+            return client.put(
+                "/api/items/1", json={"name": f"更新{i}"}, headers={"If-Match": etag}
+            ).status_code
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            codes = sorted(executor.map(update, range(16)))
+
+        assert codes == [200] + [412] * 15
+
+
+class TestItemsIdempotencyKey:
+    """Idempotency-Keyによる作成の重複防止のテスト"""
+
+    @pytest.mark.unit
+    def test_retry_returns_original_response(
+        self, client: TestClient, clean_items_storage, monkeypatch
+    ):
+        """再送には検証・作成をやり直さずに最初のレスポンスを返すことを確認"""
+        headers = {"Idempotency-Key": "retry-1"}
+        payload = {"name": "アイテム", "description": "説明"}
+        first = client.post("/api/items", json=payload, headers=headers)
+
+        async def fail(*args, **kwargs):
+            raise AssertionError("再送ではアイテムを作成しない")
+
+        monkeypatch.setattr(InMemoryItemStorage, "create_item", fail)
+        monkeypatch.setattr("modules.api.routers.items.item_create_body", fail)
+        retry = client.post("/api/items", json=payload, headers=headers)
+        monkeypatch.undo()
+
+        assert first.status_code == retry.status_code == 201
+        assert retry.content == first.content
+        assert retry.headers["Idempotent-Replayed"] == "true"
+        assert "Idempotent-Replayed" not in first.headers
+        assert client.get("/api/items").json()["total"] == 1
+
+    @pytest.mark.unit
+    def test_key_reused_with_other_body(self, client: TestClient, clean_items_storage):
+        """別の内容のリクエストでキーを再利用すると422を返すことを確認"""
+        headers = {"Idempotency-Key": "reused"}
+        client.post(
+            "/api/items", json={"name": "A", "description": "説明"}, headers=headers
+        )
+
+        response = client.post(
+            "/api/items", json={"name": "B", "description": "説明"}, headers=headers
+        )
+
+        assert response.status_code == 422
+        assert client.get("/api/items").json()["total"] == 1
+
+    @pytest.mark.unit
+    def test_failed_request_not_stored(self, client: TestClient, clean_items_storage):
+        """検証エラーのレスポンスは保存せず、同じキーで送り直せることを確認"""
+        headers = {"Idempotency-Key": "invalid-first"}
+        invalid = client.post("/api/items", json={"name": ""}, headers=headers)
+        valid = client.post(
+            "/api/items", json={"name": "A", "description": "説明"}, headers=headers
+        )
+
+        assert invalid.status_code == 422
+        assert valid.status_code == 201
+
+    @pytest.mark.unit
+    def test_without_key(self, client: TestClient, clean_items_storage):
+        """キーがなければ毎回作成することを確認"""
+        payload = {"name": "A", "description": "説明"}
+
+        first = client.post("/api/items", json=payload).json()
+        second = client.post("/api/items", json=payload).json()
+
+        assert first["id"] != second["id"]
+
+    @pytest.mark.unit
+    def test_key_too_long(self, client: TestClient, clean_items_storage):
+        """長すぎるキーは422を返すことを確認"""
+        response = client.post(
+            "/api/items",
+            json={"name": "A", "description": "説明"},
+            headers={"Idempotency-Key": "k" * 256},
+        )
+
+        assert response.status_code == 422
+
+
+class TestItemsChangeFeed:
+    """変更フィードのテスト"""
+
+    @pytest.mark.unit
+    def test_mutations_recorded(self, client: TestClient, clean_items_storage):
+        """作成・更新・削除（一括を含む）が連番で変更フィードに記録されることを確認"""
+        client.post("/api/items", json={"name": "A", "description": "説明"})
+        client.post("/api/items/bulk", json=[{"name": "B", "description": "説明"}])
+        client.put("/api/items/1", json={"name": "A2"})
+        client.patch("/api/items/bulk", json=[{"id": 2, "name": "B2"}])
+        client.delete("/api/items/1")
+        client.request("DELETE", "/api/items/bulk", json=[2])
+
+        response = client.get("/api/items/changes")
+
+        assert response.status_code == 200
+        changes = ItemChanges.model_validate(response.json())
+        assert [(e.seq, e.op, e.id) for e in changes.events] == [
+            (1, "created", 1),
+            (2, "created", 2),
+            (3, "updated", 1),
+            (4, "updated", 2),
+            (5, "deleted", 1),
+            (6, "deleted", 2),
+        ]
+        assert changes.events[2].item is not None
+        assert changes.events[2].item.name == "A2"
+        assert changes.events[4].item is None
+        assert changes.last_seq == 6
+        assert changes.cursor == changes.events[-1].cursor
+        assert not changes.resync_required
+
+    @pytest.mark.unit
+    def test_resume_from_cursor(self, client: TestClient, clean_items_storage):
+        """cursorから再開すると新しい変更のみを返すことを確認"""
+        client.post("/api/items", json={"name": "A", "description": "説明"})
+        first = client.get("/api/items/changes", params={"limit": 1}).json()
+        client.post("/api/items", json={"name": "B", "description": "説明"})
+
+        second = client.get(
+            "/api/items/changes", params={"since": first["cursor"]}
+        ).json()
+        empty = client.get(
+            "/api/items/changes", params={"since": second["cursor"]}
+        ).json()
+
+        assert [event["id"] for event in second["events"]] == [2]
+        assert empty == {
+            "events": [],
+            "last_seq": 2,
+            "cursor": second["cursor"],
+            "resync_required": False,
+        }
+
+    @pytest.mark.unit
+    def test_cursor_from_other_process(
+        self, client: TestClient, clean_items_storage, monkeypatch
+    ):
+        """別のプロセス・再起動前のカーソルには410と再同期の要求を返すことを確認"""
+        client.post("/api/items", json={"name": "A", "description": "説明"})
+        cursor = client.get("/api/items/changes").json()["cursor"]
+        # 再起動で変更フィードが作り直された状態
+        monkeypatch.setattr(get_change_feed(), "epoch", "restarted")
+
+        response = client.get("/api/items/changes", params={"since": cursor})
+
+        assert response.status_code == 410
+        assert response.json()["resync_required"] is True
+        assert response.json()["cursor"] == "restarted:1"
+        assert (
+            client.get("/api/items/changes", params={"since": "1"}).status_code == 410
+        )
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("since", ["abc", "x:y", "e:-1"])
+    def test_invalid_cursor(self, client: TestClient, since):
+        """形式が正しくないカーソルで400エラーになることを確認"""
+        response = client.get("/api/items/changes", params={"since": since})
+
+        assert response.status_code == 400
+
+    @pytest.mark.unit
+    def test_long_poll(self, client: TestClient, clean_items_storage):
+        """変更がない間は待ち、変更が届いたらすぐに返すことを確認"""
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(
+                client.get, "/api/items/changes", params={"timeout": 10}
+            )
+            time.sleep(0.2)
+            assert not future.done()
+            started = time.monotonic()
+            client.post("/api/items", json={"name": "A", "description": "説明"})
+            response = future.result(timeout=5)
+
+        assert time.monotonic() - started < 5
+        assert [event["id"] for event in response.json()["events"]] == [1]
+
+    @pytest.mark.unit
+    def test_long_poll_timeout(self, client: TestClient, clean_items_storage):
+        """タイムアウトまで変更がなければ空の結果を返すことを確認"""
+        response = client.get("/api/items/changes", params={"timeout": 0.05})
+
+        assert response.status_code == 200
+        assert response.json()["events"] == []
+
+    @pytest.mark.unit
+    def test_resync_required(
+        self, client: TestClient, clean_items_storage, monkeypatch
+    ):
+        """押し出された位置からの読み出しは410とresync_requiredを返すことを確認"""
+        monkeypatch.setenv("APP_CHANGE_FEED_SIZE", "2")
+        set_storage(get_storage())
+        for name in ("A", "B", "C"):
+            client.post("/api/items", json={"name": name, "description": "説明"})
+
+        response = client.get("/api/items/changes", params={"since": 0})
+
+        assert response.status_code == 410
+        feed = get_change_feed()
+        assert response.json() == {
+            "events": [],
+            "last_seq": 3,
+            "cursor": feed.cursor(3),
+            "resync_required": True,
+        }
+        resumed = client.get(
+            "/api/items/changes", params={"since": feed.cursor(1)}
+        ).json()
+        assert [event["id"] for event in resumed["events"]] == [2, 3]
+
+
+class TestItemsWebSocket:
+    """変更のWebSocket配信のテスト"""
+
+    @pytest.mark.unit
+    def test_push_mutations(self, client: TestClient, clean_items_storage):
+        """接続後の作成・更新・削除が変更フィードと同じ形式で届くことを確認"""
+        with client.websocket_connect("/api/items/ws") as websocket:
+            client.post("/api/items", json={"name": "A", "description": "説明"})
+            client.put("/api/items/1", json={"name": "A2"})
+            client.delete("/api/items/1")
+
+            events = [websocket.receive_json() for _ in range(3)]
+
+        assert [(e["seq"], e["op"], e["id"]) for e in events] == [
+            (1, "created", 1),
+            (2, "updated", 1),
+            (3, "deleted", 1),
+        ]
+        assert events[1]["item"]["name"] == "A2"
+        assert events == client.get("/api/items/changes").json()["events"]
+
+    @pytest.mark.unit
+    def test_disconnect_unsubscribes(self, client: TestClient, clean_items_storage):
+        """切断すると購読者から外れることを確認"""
+        feed = get_change_feed()
+        with client.websocket_connect("/api/items/ws"):
+            assert feed.subscribers == 1
+
+        deadline = time.monotonic() + 5
+        while feed.subscribers and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert feed.subscribers == 0
+
+
+class TestItemsDeleted:
+    """削除したアイテム（墓標）の一覧のテスト"""
+
+    @pytest.mark.unit
+    def test_list_deleted(self, client: TestClient, clean_items_storage):
+        """sinceの日時以降の削除を削除日時の順にページングして返すことを確認"""
+        since = from_micros(now_micros()).isoformat()
+        for name in ("A", "B", "C"):
+            client.post("/api/items", json={"name": name, "description": "説明"})
+        client.delete("/api/items/3")
+        client.delete("/api/items/1")
+
+        first = client.get("/api/items/deleted", params={"since": since, "limit": 1})
+        assert first.status_code == 200
+        assert [item["id"] for item in first.json()["items"]] == [3]
+        assert first.json()["resync_required"] is False
+
+        second = client.get(
+            "/api/items/deleted",
+            params={"since": since, "cursor": first.json()["next_cursor"]},
+        ).json()
+        assert [item["id"] for item in second["items"]] == [1]
+        assert second["next_cursor"] is None
+        assert datetime.fromisoformat(second["items"][0]["deleted_at"]) >= (
+            datetime.fromisoformat(first.json()["items"][0]["deleted_at"])
+        )
+
+    @pytest.mark.unit
+    def test_reclaimed_requires_resync(self, client: TestClient, clean_items_storage):
+        """回収済みの範囲を含むsinceには410と再同期の要求を返すことを確認"""
+        since = from_micros(now_micros()).isoformat()
+        client.post("/api/items", json={"name": "A", "description": "説明"})
+        client.delete("/api/items/1")
+        asyncio.run(get_storage().compact(now_micros() + 1, 1.0))
+
+        response = client.get("/api/items/deleted", params={"since": since})
+
+        assert response.status_code == 410
+        assert response.json() == {
+            "items": [],
+            "next_cursor": None,
+            "resync_required": True,
+        }
+
+
+class TestItemsExpiry:
+    """アイテムの有効期限（ttl_seconds）のテスト"""
+
+    @pytest.fixture
+    def clock(self, monkeypatch) -> list[float]:
+        """
+        有効期限とストレージの時計を差し替えるフィクスチャ
+        （[0]に秒数を足すと、その分だけ時間が進む）
+        """
+        offset = [0.0]
+
+        def now() -> int:
+            return now_micros() + round(offset[0] * 1_000_000)
+
+        monkeypatch.setattr(provider_module, "_item_expiry", ItemExpiry(clock=now))
+        monkeypatch.setattr(memory_module, "now_micros", now)
+        return offset
+
+    @pytest.mark.unit
+    def test_create_with_ttl(self, client: TestClient, clean_items_storage, clock):
+        """ttl_secondsが過ぎたアイテムは、次のリクエストで削除されることを確認"""
+        client.post("/api/items", json={"name": "A", "description": "説明"})
+        created = client.post(
+            "/api/items", json={"name": "B", "description": "説明", "ttl_seconds": 5}
+        )
+        assert created.status_code == 201
+        assert "ttl_seconds" not in created.json()
+
+        clock[0] += 5
+        # 削除される前でも期限が過ぎたアイテムは404
+        assert client.get("/api/items/2").status_code == 404
+        changes = len(get_change_feed().since(0, 100))
+
+        # 削除はtickの境界に切り上げた時刻以降のリクエストで行う
+        # （lifespanの削除のタスクが動かないLambdaでも削除される）
+        clock[0] += 1
+        assert [item["id"] for item in client.get("/api/items").json()["items"]] == [1]
+        assert len(get_change_feed().since(0, 100)) == changes + 1
+        assert client.get("/api/items/expiry").json() == {
+            "backlog": 0,
+            "scheduled": 1,
+            "cancelled": 0,
+            "expired": 1,
+        }
+
+    @pytest.mark.unit
+    def test_expired_without_schedule(
+        self, client: TestClient, clean_items_storage, clock, monkeypatch
+    ):
+        """削除を予約していないワーカーでも、期限切れのアイテムは存在しない扱いになることを確認"""
+        client.post(
+            "/api/items", json={"name": "A", "description": "説明", "ttl_seconds": 5}
+        )
+        # 再起動後・別のワーカーなど、期限を予約していないホイールに差し替える
+        monkeypatch.setattr(provider_module, "_item_expiry", None)
+
+        clock[0] += 5
+        assert client.get("/api/items/1").status_code == 404
+        assert client.get("/api/items").json()["items"] == []
+        assert client.put("/api/items/1", json={"name": "B"}).status_code == 404
+        assert client.delete("/api/items/1").status_code == 404
+        assert client.get("/api/items/expiry").json()["expired"] == 0
+
+    @pytest.mark.unit
+    def test_update_resets_ttl(self, client: TestClient, clean_items_storage, clock):
+        """更新でttl_secondsを指定すると期限を今から設定し直すことを確認"""
+        client.post(
+            "/api/items", json={"name": "A", "description": "説明", "ttl_seconds": 5}
+        )
+        clock[0] += 4
+        client.put("/api/items/1", json={"ttl_seconds": 10})
+
+        clock[0] += 4
+        assert client.get("/api/items/1").status_code == 200
+
+        clock[0] += 7
+        assert client.get("/api/items/1").status_code == 404
+        assert client.get("/api/items/expiry").json()["expired"] == 1
+
+    @pytest.mark.unit
+    def test_bulk_with_ttl(self, client: TestClient, clean_items_storage, clock):
+        """一括作成・一括更新のttl_secondsもアイテムごとに設定することを確認"""
+        client.post(
+            "/api/items/bulk",
+            json=[
+                {"name": "A", "description": "説明", "ttl_seconds": 5},
+                {"name": "B", "description": "説明"},
+                {"name": "C", "description": "説明", "ttl_seconds": 5},
+            ],
+        )
+        client.patch("/api/items/bulk", json=[{"id": 2, "ttl_seconds": 5}])
+        client.patch("/api/items/bulk", json=[{"id": 3, "name": "C2"}])
+
+        clock[0] += 6
+        assert client.get("/api/items").json()["items"] == []
+        assert client.get("/api/items/expiry").json()["expired"] == 3
+
+    @pytest.mark.unit
+    def test_delete_cancels_ttl(self, client: TestClient, clean_items_storage, clock):
+        """削除したアイテムの期限は取り消すことを確認"""
+        client.post(
+            "/api/items", json={"name": "A", "description": "説明", "ttl_seconds": 5}
+        )
+        client.delete("/api/items/1")
+
+        stats = client.get("/api/items/expiry").json()
+        assert stats["backlog"] == 0
+        assert stats["cancelled"] == 1
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_delete_expired_skips_rescheduled(self, clean_items_storage, clock):
+        """期限を延ばしたアイテムは、古い予約で渡されても削除しないことを確認"""
+        storage = provider_module.get_storage()
+        expiry = provider_module.get_item_expiry()
+        record = await storage.create_item("A", "説明", expiry.expires_at(5))
+        await storage.update_item(record.id, None, None, None, expiry.expires_at(60))
+
+        clock[0] += 10
+        assert await delete_expired_items([record.id]) == 0
+        assert await storage.get_item(record.id) is not None
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("ttl_seconds", [0, -1, 30 * 24 * 60 * 60 + 1])
+    def test_invalid_ttl(self, client: TestClient, clean_items_storage, ttl_seconds):
+        """範囲外のttl_secondsは422になることを確認"""
+        response = client.post(
+            "/api/items",
+            json={"name": "A", "description": "説明", "ttl_seconds": ttl_seconds},
+        )
+
+        assert response.status_code == 422
+
+    @pytest.mark.unit
+    def test_ttl_beyond_wheel(
+        self, client: TestClient, clean_items_storage, monkeypatch
+    ):
+        """ホイールで予約できない長さのttl_secondsは、作成せずに422になることを確認"""
+        # 1tickが1ミリ秒のホイールは約12日までしか予約できない
+        monkeypatch.setattr(
+            provider_module, "_item_expiry", ItemExpiry(tick_seconds=0.001)
+        )
+        ttl_seconds = 30 * 24 * 60 * 60
+
+        response = client.post(
+            "/api/items",
+            json={"name": "A", "description": "説明", "ttl_seconds": ttl_seconds},
+        )
+        assert response.status_code == 422
+        bulk = client.post(
+            "/api/items/bulk",
+            json=[
+                {"name": "A", "description": "説明"},
+                {"name": "B", "description": "説明", "ttl_seconds": ttl_seconds},
+            ],
+        )
+        assert bulk.status_code == 422
+        assert client.get("/api/items").json()["items"] == []
+
+
+class TestItemsJsonCache:
+    """アイテムのエンコード済みJSONのキャッシュのテスト"""
+
+    @pytest.fixture
+    def items(self, client: TestClient, clean_items_storage) -> list[dict]:
+        """3件作成するフィクスチャ（作成時にキャッシュされる）"""
+        return client.post(
+            "/api/items/bulk",
+            json=[
+                {"name": "アイテム1", "description": '説明\n"引用" \\  '},
+                {"name": "アイテム2", "description": "説明"},
+                {"name": "アイテム3", "description": "説明"},
+            ],
+        ).json()["items"]
+
+    @pytest.mark.unit
+    def test_same_bytes_as_model(self, client: TestClient, items: list[dict]):
+        """連結したレスポンスがPydanticモデル経由のレスポンスと同じバイト列になることを確認"""
+        client.put("/api/items/2", json={"name": "更新"})
+        records = asyncio.run(get_storage().list_items())
+        expected = ItemList(
+            items=[
+                Item(
+                    id=record.id,
+                    name=record.name,
+                    description=record.description,
+                    created_at=from_micros(record.created_at),
+                    updated_at=(
+                        from_micros(record.updated_at)
+                        if record.updated_at is not None
+                        else None
+                    ),
+                )
+                for record in records
+            ],
+            total=3,
+        )
+
+        response = client.get("/api/items")
+
+        assert response.content == JSONResponse(jsonable_encoder(expected)).body
+        assert response.headers["content-type"] == "application/json"
+        detail = client.get("/api/items/2")
+        assert detail.content == JSONResponse(jsonable_encoder(expected.items[1])).body
+
+    @pytest.mark.unit
+    def test_reads_hit_cache(self, client: TestClient, items: list[dict]):
+        """作成時にキャッシュされ、詳細・一覧の読み出しがヒットすることを確認"""
+        cache = get_json_cache()
+
+        client.get("/api/items/1")
+        client.get("/api/items")
+
+        assert (cache.hits, cache.misses) == (4, 0)
+
+    @pytest.mark.unit
+    def test_update_and_delete_invalidate(self, client: TestClient, items: list[dict]):
+        """更新・削除後に古いJSONを返さないことを確認"""
+        client.put("/api/items/1", json={"name": "更新"})
+        client.patch("/api/items/bulk", json=[{"id": 2, "name": "一括更新"}])
+        client.delete("/api/items/3")
+
+        response = client.get("/api/items")
+
+        assert [item["name"] for item in response.json()["items"]] == [
+            "更新",
+            "一括更新",
+        ]
+        assert len(get_json_cache()) == 2
+        assert client.get("/api/items/3").status_code == 404
+
+
+JSON = "application/json"
+
+# FastAPIのボディ引数で検証する参照用アプリケーション（リクエストボディの高速な検証と比較する）
+_reference_app = FastAPI()
+_reference_app.add_exception_handler(HTTPException, http_exception_handler)
+_reference_app.add_exception_handler(
+    RequestValidationError, validation_exception_handler
+)
+
+
+@_reference_app.post("/api/items", status_code=201)
+async def _reference_create(item: ItemCreate) -> dict:
+    # ttl_secondsはレスポンスに含めない
+    return item.model_dump(exclude={"ttl_seconds"})
+
+
+@_reference_app.put("/api/items/{item_id}")
+async def _reference_update(item_id: int, item: ItemUpdate) -> dict:
+    return item.model_dump(exclude_none=True)
+
+
+class TestItemsBodyDecoding:
+    """作成・更新のリクエストボディの検証がFastAPIのボディ引数と同じ結果になることのテスト"""
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize(
+        "method, path, content, content_type",
+        [
+            ("POST", "/api/items", b'{"name":" a ","description":"b"}', JSON),
+            ("POST", "/api/items", b'{"name":"a","description":"b"', JSON),
+            ("POST", "/api/items", b'{"name":"a"} trailing', JSON),
+            ("POST", "/api/items", b"\xff", JSON),
+            (
+                "POST",
+                "/api/items",
+                b'{"name":"a","description":"b"}',
+                "Application/JSON",
+            ),
+            ("POST", "/api/items", b'{"name":"a","description":"b"}', "json"),
+            ("POST", "/api/items", b"", JSON),
+            ("POST", "/api/items", b"null", JSON),
+            ("POST", "/api/items", b"[]", JSON),
+            ("POST", "/api/items", b'{"name":"   ","description":""}', JSON),
+            ("POST", "/api/items", b'{"name":1,"description":NaN}', JSON),
+            ("POST", "/api/items", b'{"name":"a","description":"b"}', None),
+            ("POST", "/api/items", b'{"name":"a","description":"b"}', "text/plain"),
+            ("POST", "/api/items", b'{"name":"a","description":"b"}', "x/y+json"),
+            ("POST", "/api/items", b'{"name":"a","description":"b"}', "a/b+json"),
+            ("POST", "/api/items", '﻿{"name":"a","description":"b"}', JSON),
+            ("PUT", "/api/items/1", b'{"name":"  x  "}', JSON),
+            ("PUT", "/api/items/1", b'{"name":"","description":" "}', JSON),
+            ("PUT", "/api/items/1", b"{bad", JSON),
+            ("PUT", "/api/items/abc", b'{"name":""}', JSON),
+            ("PUT", "/api/items/abc", b"", JSON),
+            ("PUT", "/api/items/abc", b"{bad", JSON),
+        ],
+    )
+    def test_same_as_body_parameter(
+        self,
+        client: TestClient,
+        clean_items_storage,
+        method: str,
+        path: str,
+        content: bytes | str,
+        content_type: str | None,
+    ):
+        """エラーの種類・位置・メッセージが参照用アプリケーションと一致することを確認"""
+        client.post("/api/items", json={"name": "アイテム", "description": "説明"})
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        headers = {"content-type": content_type} if content_type else {}
+
+        response = client.request(method, path, content=content, headers=headers)
+        expected = TestClient(_reference_app).request(
+            method, path, content=content, headers=headers
+        )
+
+        assert response.status_code == expected.status_code
+        data, reference = response.json(), expected.json()
+        if response.status_code in (400, 422):
+            data.pop("timestamp", None)
+            reference.pop("timestamp", None)
+            assert data == reference
+        else:
+            assert {key: data[key] for key in reference} == reference
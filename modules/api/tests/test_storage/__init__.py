@@ -0,0 +1 @@
+# ストレージテストパッケージ
@@ -0,0 +1,985 @@
+"""
+ストレージバックエンドのテスト
+全バックエンドが同じ振る舞いをすることを確認する
+"""
+
+import asyncio
+import multiprocessing
+import sqlite3
+from collections.abc import AsyncGenerator
+from datetime import UTC, datetime
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+
+from ...storage import memory as memory_module
+from ...storage import shared as shared_module
+from ...storage import sqlite as sqlite_module
+from ...storage.base import ItemStorage, VersionConflictError
+from ...storage.durable import DurableItemStorage
+from ...storage.memory import InMemoryItemStorage
+from ...storage.provider import create_storage
+from ...storage.record import (
+    ItemRecord,
+    from_micros,
+    now_micros,
+    pack_record,
+    to_micros,
+    unpack_record,
+)
+from ...storage.shared import SharedItemStorage
+from ...storage.sqlite import SQLiteItemStorage
+
+
+@pytest_asyncio.fixture(params=["memory", "sqlite", "shared", "durable"])
+async def storage(request, tmp_path: Path) -> AsyncGenerator[ItemStorage]:
+    """各バックエンドのストレージを生成するフィクスチャ"""
+    if request.param == "memory":
+        backend: ItemStorage = InMemoryItemStorage()
+    elif request.param == "sqlite":
+        backend = SQLiteItemStorage(str(tmp_path / "items.db"), pool_size=2)
+    elif request.param == "shared":
+        backend = SharedItemStorage(str(tmp_path / "items.shm"), capacity=1000)
+    else:
+        backend = DurableItemStorage(str(tmp_path / "wal"), fsync="always")
+
+    yield backend
+    await backend.close()
+
+
+class TestItemStorageContract:
+    """ストレージインターフェースの共通テストクラス"""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_create_and_get(self, storage: ItemStorage):
+        """作成したアイテムを取得できることを確認"""
+        created = await storage.create_item("アイテム", "説明")
+
+        assert created.id == 1
+        assert created.updated_at is None
+
+        fetched = await storage.get_item(created.id)
+        assert fetched == created
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_ids_are_sequential(self, storage: ItemStorage):
+        """IDが連番で採番されることを確認"""
+        ids = [(await storage.create_item(f"名前{i}", "説明")).id for i in range(3)]
+
+        assert ids == [1, 2, 3]
+        assert [record.id for record in await storage.list_items()] == [1, 2, 3]
+        assert await storage.count() == 3
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_list_page_after_id(self, storage: ItemStorage):
+        """after_idとlimitでページ単位に取得できることを確認"""
+        for i in range(6):
+            await storage.create_item(f"名前{i}", "説明")
+        await storage.delete_item(3)
+
+        page = await storage.list_items(after_id=1, limit=3)
+
+        assert [record.id for record in page] == [2, 4, 5]
+        assert [record.id for record in await storage.list_items(after_id=5)] == [6]
+        assert await storage.count() == 5
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_iter_items_is_snapshot(self, storage: ItemStorage):
+        """ストリーミング中の書き込みが結果に影響しないことを確認"""
+        for i in range(5):
+            await storage.create_item(f"名前{i}", "説明")
+
+        iterator = storage.iter_items(batch_size=1)
+        first = await anext(iterator)
+
+        await storage.update_item(2, "変更後", None)
+        await storage.delete_item(4)
+        await storage.create_item("追加", "説明")
+        rest = [row async for row in iterator]
+
+        assert first.id == 1
+        assert [record.id for record in rest] == [2, 3, 4, 5]
+        assert rest[0].name == "名前1"
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_create_items_contiguous_ids(self, storage: ItemStorage):
+        """一括作成で連続したIDが確保されることを確認"""
+        await storage.create_item("先頭", "説明")
+
+        records = await storage.create_items([("名前1", "説明1"), ("名前2", "説明2")])
+
+        assert [record.id for record in records] == [2, 3]
+        assert await storage.get_item(3) == records[1]
+        assert await storage.count() == 3
+        assert (await storage.create_item("末尾", "説明")).id == 4
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_partial_update(self, storage: ItemStorage):
+        """Noneのフィールドが更新されないことを確認"""
+        created = await storage.create_item("名前", "説明")
+
+        updated = await storage.update_item(created.id, "新しい名前", None)
+
+        assert updated is not None
+        assert updated.name == "新しい名前"
+        assert updated.description == "説明"
+        assert updated.created_at == created.created_at
+        assert updated.updated_at is not None
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_bulk_update_and_delete(self, storage: ItemStorage):
+        """一括更新・一括削除の結果が入力順で返ることを確認"""
+        await storage.create_items([("名前1", "説明1"), ("名前2", "説明2")])
+
+        updated = await storage.update_items([(2, "更新", None), (5, "不明", None)])
+        assert updated[0] is not None and updated[0].name == "更新"
+        assert updated[1] is None
+
+        assert await storage.delete_items([1, 5, 1]) == [True, False, False]
+        assert await storage.count() == 1
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_search(self, storage: ItemStorage):
+        """部分一致したアイテムが関連度順に返ることを確認"""
+        await storage.create_items(
+            [("説明に一致", "東京タワー"), ("東京駅", "説明"), ("大阪", "説明")]
+        )
+
+        found, total = await storage.search("東京", 10)
+        assert [record.id for record in found] == [2, 1]
+        assert total == 2
+
+        await storage.delete_item(2)
+        found, total = await storage.search("東京", 10)
+        assert [record.id for record in found] == [1]
+        assert total == 1
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_search_limit(self, storage: ItemStorage):
+        """limitより多く一致した場合も、関連度の上位と一致件数を返すことを確認"""
+        await storage.create_items(
+            [("説明", "東京")] * 3 + [("東京", "東京東京"), ("説明", "東京東京")]
+        )
+
+        found, total = await storage.search("東京", 2)
+        assert [record.id for record in found] == [4, 5]
+        assert total == 5
+        found, total = await storage.search("京", 3)
+        assert [record.id for record in found] == [4, 5, 1]
+        assert total == 5
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_search_short_and_normalized(self, storage: ItemStorage):
+        """1文字・2文字のクエリと、全角・半角の違いを吸収した検索を確認"""
+        await storage.create_items(
+            [("ＡＢＣマウス", "100%"), ("キーボード", "abc"), ("ﾏｳｽ", "説明")]
+        )
+        await storage.update_item(2, None, "説明")
+
+        for query, expected in [
+            ("ス", [1, 3]),
+            ("マウ", [1, 3]),
+            ("abc", [1]),
+            ("%", [1]),
+            ("ｷｰﾎﾞｰﾄﾞ", [2]),
+        ]:
+            found, total = await storage.search(query, 10)
+            assert [record.id for record in found] == expected, query
+            assert total == len(expected)
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_list_items_by_time(self, storage: ItemStorage):
+        """作成日時・最終変更日時の範囲と並び順で取得できることを確認"""
+        records = []
+        for i in range(3):
+            records.append(await storage.create_item(f"名前{i}", "説明"))
+            await asyncio.sleep(0.002)
+        updated = await storage.update_item(1, "更新", None)
+        assert updated is not None
+
+        by_modified = await storage.list_items_by_time("updated_at")
+        assert [r.id for r in by_modified] == [2, 3, 1]
+        newest = await storage.list_items_by_time("created_at", descending=True)
+        assert [r.id for r in newest] == [3, 2, 1]
+
+        since = await storage.list_items_by_time(
+            "updated_at", modified=(updated.updated_at, None)
+        )
+        assert [r.id for r in since] == [1]
+        window = await storage.list_items_by_time(
+            "id", created=(records[1].created_at, records[2].created_at)
+        )
+        assert [r.id for r in window] == [2]
+
+        page = await storage.list_items_by_time(
+            "created_at", after=(records[0].created_at, 1), limit=1
+        )
+        assert [r.id for r in page] == [2]
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_versions_advance_on_write(self, storage: ItemStorage):
+        """書き込みごとに最終変更日時とストレージのバージョンが進むことを確認"""
+        created = await storage.create_item("名前", "説明")
+        version = await storage.store_version()
+
+        # 同じ更新日時の一括更新でも、アイテムの最終変更日時は必ず進む
+        first, second = await storage.update_items(
+            [(created.id, "更新1", None), (created.id, "更新2", None)]
+        )
+        assert first is not None and second is not None
+        assert created.modified_at < first.modified_at < second.modified_at
+
+        if version is not None:
+            assert await storage.store_version() != version
+            version = await storage.store_version()
+            assert await storage.store_version() == version
+            await storage.delete_item(created.id)
+            assert await storage.store_version() != version
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_version_changes_on_expiry(self, storage: ItemStorage, monkeypatch):
+        """書き込みがなくても、アイテムが期限切れになるとストレージのバージョンが変わることを確認"""
+        now = now_micros()
+        await storage.create_items([("名前", "説明")] * 2, [None, now + 60_000_000])
+        version = await storage.store_version()
+        if version is None:
+            return
+        assert await storage.store_version() == version
+
+        for module in (memory_module, sqlite_module):
+            monkeypatch.setattr(module, "now_micros", lambda: now + 120_000_000)
+        assert [record.id for record in await storage.list_items()] == [1]
+        assert await storage.store_version() != version
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_if_match(self, storage: ItemStorage):
+        """バージョンが一致する場合のみ更新・削除し、不一致は現在のバージョンを返すことを確認"""
+        created = await storage.create_item("名前", "説明")
+
+        updated = await storage.update_item(
+            created.id, "更新", None, if_match=[0, created.version]
+        )
+        assert updated is not None and updated.version > created.version
+
+        with pytest.raises(VersionConflictError) as conflict:
+            await storage.update_item(
+                created.id, "上書き", None, if_match=[created.version]
+            )
+        assert conflict.value.version == updated.version
+        with pytest.raises(VersionConflictError):
+            await storage.delete_item(created.id, if_match=[created.version])
+        assert await storage.get_item(created.id) == updated
+
+        assert await storage.delete_item(created.id, if_match=[updated.version])
+        assert await storage.update_item(created.id, "名前", None, if_match=[1]) is None
+        assert await storage.delete_item(created.id, if_match=[1]) is False
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_missing_item(self, storage: ItemStorage):
+        """存在しないアイテムの操作結果を確認"""
+        assert await storage.get_item(999) is None
+        assert await storage.update_item(999, "名前", None) is None
+        assert await storage.delete_item(999) is False
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_expired_items(self, storage: ItemStorage):
+        """有効期限が過ぎたアイテムは、削除前でもすべての操作で存在しない扱いになることを確認"""
+        now = now_micros()
+        expired = await storage.create_item("期限切れ", "説明", now - 1)
+        live, _ = await storage.create_items(
+            [("期限内", "説明"), ("無期限", "説明")], [now + 60_000_000, None]
+        )
+        assert live.expires_at == now + 60_000_000
+        assert await storage.get_item(live.id) == live
+
+        assert await storage.get_item(expired.id) is None
+        assert [record.id for record in await storage.list_items()] == [2, 3]
+        assert [record.id async for record in storage.iter_items()] == [2, 3]
+        assert [r.id for r in await storage.list_items_by_time("created_at")] == [2, 3]
+        assert (await storage.search("期限", 10))[1] == 2
+        assert await storage.update_item(expired.id, "名前", None) is None
+        assert await storage.update_items([(expired.id, "名前", None)]) == [None]
+        assert await storage.delete_item(expired.id) is False
+        assert await storage.delete_items([expired.id]) == [False]
+
+        # 期限切れのアイテムだけを削除する
+        assert await storage.delete_expired(
+            [expired.id, live.id, 3, 999], now_micros()
+        ) == [True, False, False, False]
+        assert await storage.count() == 2
+
+        # 更新で期限を設定し直せる（省略した場合は変えない）
+        updated = await storage.update_item(live.id, "名前", None)
+        assert updated is not None and updated.expires_at == live.expires_at
+        updated = await storage.update_item(live.id, None, None, expires_at=now - 1)
+        assert updated is not None and updated.expires_at == now - 1
+        assert await storage.get_item(live.id) is None
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_delete_and_clear(self, storage: ItemStorage):
+        """削除とクリアの動作を確認"""
+        first = await storage.create_item("名前1", "説明")
+        await storage.create_item("名前2", "説明")
+
+        assert await storage.delete_item(first.id) is True
+        assert await storage.get_item(first.id) is None
+        assert await storage.count() == 1
+
+        await storage.clear()
+        assert await storage.count() == 0
+        assert (await storage.create_item("名前", "説明")).id == 1
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_tombstones(self, storage: ItemStorage):
+        """削除の墓標を削除順に返し、回収した範囲はNoneを返すことを確認"""
+        await storage.create_items([(f"名前{i}", "説明") for i in range(4)])
+        await storage.delete_item(2)
+        await storage.delete_items([3, 1])
+
+        tombstones = await storage.list_tombstones((0, 0), 10)
+        if isinstance(storage, SharedItemStorage):
+            # 共有メモリストレージは墓標を保持しない
+            assert tombstones is None
+            return
+        assert tombstones is not None
+        assert sorted(t.id for t in tombstones) == [1, 2, 3]
+        positions = [(t.deleted_at, t.id) for t in tombstones]
+        assert positions == sorted(positions)
+        assert await storage.list_tombstones(positions[0], 10) == tombstones[1:]
+
+        before = positions[-1][0] + 1
+        assert await storage.compact(before, 1.0) >= 3
+        assert await storage.list_tombstones((0, 0), 10) is None
+        assert await storage.list_tombstones((before, 0), 10) == []
+
+        await storage.delete_item(4)
+        assert [t.id for t in await storage.list_tombstones((before, 0), 10)] == [4]
+
+
+class TestInMemoryItemStorage:
+    """インメモリストレージ固有のテストクラス"""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_compact_ids_in_slices(self, monkeypatch):
+        """削除済みIDの詰め直しを回収の呼び出しに分けて進め、途中の書き込みも反映することを確認"""
+        monkeypatch.setattr(memory_module, "_PURGE_CHUNK", 2)
+        storage = InMemoryItemStorage()
+        await storage.create_items([("名前", "説明")] * 10)
+        await storage.delete_items(list(range(3, 11)))
+
+        # 時間切れで残りがある場合は、除いた件数が0でも続けて呼び出させる
+        assert await storage.compact(0, 0) == 1
+        assert storage._purge_kept == [1, 2]
+        assert await storage.compact(0, 0) == 2
+        # 移し終えた位置より前の削除は削除済みIDとして残り、後ろへの追加は移される
+        await storage.delete_item(1)
+        await storage.create_item("追加", "説明")
+        while storage._purge_kept is not None:
+            await storage.compact(0, 0)
+
+        assert storage._ids == [1, 2, 11]
+        assert storage._stale_ids == 1
+        assert await storage.compact(0, 0) == 0
+        assert [r.id for r in await storage.list_items()] == [2, 11]
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_compact_purges_expired(self, monkeypatch):
+        """期限切れのアイテムをcompact()で削除し、期限を延ばしたアイテムは残すことを確認"""
+        clock = [now_micros()]
+        monkeypatch.setattr(memory_module, "now_micros", lambda: clock[0])
+        storage = InMemoryItemStorage()
+        start = clock[0]
+        await storage.create_items(
+            [("名前", "説明")] * 3, [start + 10, start + 10, None]
+        )
+        await storage.update_item(2, None, None, expires_at=start + 20)
+
+        clock[0] = start + 10
+        assert await storage.count() == 3
+        assert await storage.compact(0, 1.0) == 1
+        assert await storage.count() == 2
+        assert [t.id for t in await storage.list_tombstones((0, 0), 10)] == [1]
+
+        clock[0] = start + 20
+        assert await storage.compact(0, 1.0) >= 1
+        assert await storage.count() == 1
+        assert storage._expiring == []
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_compact_waits_for_streaming(self):
+        """ストリーミング中は削除済みIDを残し、終わってから詰め直すことを確認"""
+        storage = InMemoryItemStorage()
+        await storage.create_items([("名前", "説明")] * 4)
+        iterator = storage.iter_items(batch_size=1)
+        await anext(iterator)
+        await storage.delete_items([2, 3, 4])
+
+        await storage.compact(0, 1.0)
+        assert [r.id async for r in iterator] == [2, 3, 4]
+        await storage.compact(0, 1.0)
+
+        assert storage._ids == [1]
+
+
+class TestSQLiteItemStorage:
+    """SQLiteストレージ固有のテストクラス"""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_items_survive_reopen(self, tmp_path: Path):
+        """再オープン後もアイテムが残ることを確認"""
+        path = str(tmp_path / "items.db")
+
+        storage = SQLiteItemStorage(path)
+        created = await storage.create_item("永続アイテム", "説明")
+        await storage.close()
+
+        reopened = SQLiteItemStorage(path)
+        try:
+            assert await reopened.get_item(created.id) == created
+        finally:
+            await reopened.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_expires_at_column_added(self, tmp_path: Path):
+        """expires_at列のない既存のDBも、列を追加して有効期限を扱えることを確認"""
+        path = str(tmp_path / "items.db")
+        connection = sqlite3.connect(path)
+        connection.execute(
+            "CREATE TABLE items (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "name TEXT NOT NULL, description TEXT NOT NULL, "
+            "created_at INTEGER NOT NULL, updated_at INTEGER)"
+        )
+        connection.execute("INSERT INTO items VALUES (1, '既存', '説明', 1, NULL)")
+        connection.commit()
+        connection.close()
+
+        storage = SQLiteItemStorage(path)
+        try:
+            assert await storage.get_item(1) == ItemRecord(1, "既存", "説明", 1)
+            created = await storage.create_item("期限切れ", "説明", now_micros() - 1)
+            assert await storage.get_item(created.id) is None
+        finally:
+            await storage.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_compact_deletes_expired(self, tmp_path: Path):
+        """期限切れのアイテムは、作成したプロセスとは別のインスタンスのcompact()で削除されることを確認"""
+        path = str(tmp_path / "items.db")
+        storage = SQLiteItemStorage(path)
+        await storage.create_items([("名前", "説明")] * 3, [now_micros() - 1, None, 1])
+        await storage.close()
+
+        reopened = SQLiteItemStorage(path)
+        try:
+            assert await reopened.count() == 3
+            assert await reopened.compact(0, 1.0) == 2
+            assert await reopened.count() == 1
+            tombstones = await reopened.list_tombstones((0, 0), 10)
+            assert tombstones is not None and {t.id for t in tombstones} == {1, 3}
+        finally:
+            await reopened.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_wal_mode_enabled(self, tmp_path: Path):
+        """WALモードで動作していることを確認"""
+        path = str(tmp_path / "items.db")
+        storage = SQLiteItemStorage(path)
+        await storage.close()
+
+        connection = sqlite3.connect(path)
+        try:
+            mode = connection.execute("PRAGMA journal_mode").fetchone()[0]
+        finally:
+            connection.close()
+        assert mode == "wal"
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_streams_limited_to_pool_size(self, tmp_path: Path):
+        """ストリーミングの接続はpool_size本までで、空くまで待って使い回すことを確認"""
+        storage = SQLiteItemStorage(str(tmp_path / "items.db"), pool_size=1)
+        try:
+            await storage.create_items([("名前", "説明")] * 3)
+            first = storage.iter_items()
+            assert (await anext(first)).id == 1
+            connections = len(storage._connections)
+
+            second = storage.iter_items()
+            waiting = asyncio.create_task(anext(second))
+            await asyncio.sleep(0.05)
+            assert not waiting.done()
+
+            await first.aclose()
+            assert (await asyncio.wait_for(waiting, 1)).id == 1
+            await second.aclose()
+            for _ in range(3):
+                assert [r.id async for r in storage.iter_items()] == [1, 2, 3]
+            assert len(storage._connections) == connections
+        finally:
+            await storage.close()
+
+    @pytest.mark.unit
+    def test_invalid_pool_size(self, tmp_path: Path):
+        """不正なプールサイズでエラーになることを確認"""
+        with pytest.raises(ValueError):
+            SQLiteItemStorage(str(tmp_path / "items.db"), pool_size=0)
+
+
+def _create_in_worker(path: str, count: int) -> list[int]:
+    """別プロセスで共有ストレージにアイテムを作成する"""
+
+    async def create() -> list[int]:
+        storage = SharedItemStorage(path, capacity=1000)
+        try:
+            ids = [(await storage.create_item("名前", "説明")).id for _ in range(count)]
+            ids += [r.id for r in await storage.create_items([("名前", "説明")] * 5)]
+            return ids
+        finally:
+            await storage.close()
+
+    return asyncio.run(create())
+
+
+def _update_in_worker(path: str, rounds: int) -> None:
+    """別プロセスでnameとdescriptionを常に同じ値に更新し続ける"""
+
+    async def update() -> None:
+        storage = SharedItemStorage(path, capacity=1000)
+        try:
+            for i in range(rounds):
+                await storage.update_item(1, f"値{i}", f"値{i}")
+        finally:
+            await storage.close()
+
+    asyncio.run(update())
+
+
+class TestSharedItemStorage:
+    """共有メモリストレージ固有のテストクラス"""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_instances_share_items(self, tmp_path: Path):
+        """同じファイルを開いたインスタンス間で書き込みが見えることを確認"""
+        path = str(tmp_path / "items.shm")
+        writer = SharedItemStorage(path, capacity=10)
+        reader = SharedItemStorage(path, capacity=10)
+        try:
+            created = await writer.create_item("共有アイテム", "説明")
+            assert await reader.get_item(created.id) == created
+
+            await reader.update_item(created.id, None, "別インスタンスから更新")
+            updated = await writer.get_item(created.id)
+            assert (
+                updated is not None and updated.description == "別インスタンスから更新"
+            )
+
+            assert (await reader.create_item("名前", "説明")).id == 2
+            assert await writer.count() == 2
+        finally:
+            await writer.close()
+            await reader.close()
+
+    @pytest.mark.unit
+    def test_ids_unique_across_processes(self, tmp_path: Path):
+        """複数プロセスから同時に作成してもIDが重複しないことを確認"""
+        path = str(tmp_path / "items.shm")
+        context = multiprocessing.get_context("fork")
+
+        with context.Pool(4) as pool:
+            results = pool.starmap(_create_in_worker, [(path, 20)] * 4)
+
+        ids = [item_id for worker_ids in results for item_id in worker_ids]
+        assert sorted(ids) == list(range(1, 101))
+        for worker_ids in results:
+            # 一括作成のIDはワーカー間でも連続する
+            assert worker_ids[-5:] == list(range(worker_ids[-5], worker_ids[-5] + 5))
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_reads_never_torn(self, tmp_path: Path):
+        """別プロセスが更新中でも、書き込み途中の値を読まないことを確認"""
+        path = str(tmp_path / "items.shm")
+        storage = SharedItemStorage(path, capacity=1000)
+        try:
+            await storage.create_item("値", "値")
+            process = multiprocessing.get_context("fork").Process(
+                target=_update_in_worker, args=(path, 2000)
+            )
+            process.start()
+            while process.is_alive():
+                record = await storage.get_item(1)
+                assert record is not None
+                assert record.name == record.description
+            process.join()
+            assert process.exitcode == 0
+        finally:
+            await storage.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_header_does_not_overlap_slots(self, tmp_path: Path):
+        """ヘッダーの書き込みが先頭スロットのseqを上書きしないことを確認"""
+        storage = SharedItemStorage(str(tmp_path / "items.shm"), capacity=10)
+        try:
+            await storage.create_item("名前", "説明")
+            await storage.update_item(1, "更新", None)
+            # 作成・更新で2回ずつ進み、書き込み中でない偶数になる
+            assert storage._load_seq(storage._slot_offset(1)) == 4
+        finally:
+            await storage.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_capacity_exceeded(self, tmp_path: Path):
+        """容量を超える作成は何も書き込まずにエラーになることを確認"""
+        storage = SharedItemStorage(str(tmp_path / "items.shm"), capacity=2)
+        try:
+            await storage.create_item("名前", "説明")
+            with pytest.raises(RuntimeError):
+                await storage.create_items([("名前", "説明")] * 2)
+            assert await storage.count() == 1
+            assert (await storage.create_item("名前", "説明")).id == 2
+        finally:
+            await storage.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_heap_exhausted(self, tmp_path: Path):
+        """文字列領域が不足した更新は何も書き込まずにエラーになることを確認"""
+        storage = SharedItemStorage(
+            str(tmp_path / "items.shm"), capacity=2, heap_size=8
+        )
+        try:
+            await storage.create_item("名", "説")
+            with pytest.raises(RuntimeError):
+                await storage.update_items([(1, "長い名前", None)])
+            record = await storage.get_item(1)
+            assert record is not None and record.name == "名"
+        finally:
+            await storage.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_deleted_slots_reused(self, tmp_path: Path):
+        """削除で空いたスロットを後のIDで使い、残っているアイテムのスロットは飛ばすことを確認"""
+        storage = SharedItemStorage(str(tmp_path / "items.shm"), capacity=3)
+        try:
+            previous = (
+                await storage.create_items([("残す", "説明"), ("消す", "説明")])
+            )[1]
+            for _ in range(10):
+                created = await storage.create_item("一時", "説明")
+                await storage.delete_item(previous.id)
+                previous = created
+            await storage.create_item("最後", "説明")
+
+            # IDが一周しても、取得・一覧はIDで引き、ID昇順で返す
+            records = await storage.list_items()
+            assert [r.id for r in records] == [1, 17, 18]
+            assert [r.name for r in records] == ["残す", "一時", "最後"]
+            assert [r.id for r in await storage.list_items(after_id=1, limit=1)] == [17]
+            assert [r.id async for r in storage.iter_items(after_id=1)] == [17, 18]
+            assert await storage.get_item(1) is not None
+            assert await storage.get_item(4) is None
+            with pytest.raises(RuntimeError):
+                await storage.create_item("超過", "説明")
+        finally:
+            await storage.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_heap_compacted(self, tmp_path: Path):
+        """更新・削除で使われなくなった文字列は詰め直して再利用することを確認"""
+        storage = SharedItemStorage(
+            str(tmp_path / "items.shm"), capacity=4, heap_size=64
+        )
+        try:
+            await storage.create_items([("a" * 8, "b" * 8), ("c" * 8, "d" * 8)])
+            for i in range(20):
+                await storage.update_item(1, f"{i:08d}", None)
+            await storage.delete_item(2)
+            assert (await storage.create_item("e" * 8, "f" * 8)).id == 3
+
+            record = await storage.get_item(1)
+            assert record is not None
+            assert (record.name, record.description) == ("00000019", "b" * 8)
+            # 使われなくなった文字列が半分を超えるまではcompact()で詰め直さない
+            assert await storage.compact(0, 0.0) == 0
+            await storage.delete_item(1)
+            await storage.update_item(3, None, "h")
+            assert await storage.compact(0, 1.0) > 0
+            assert await storage.compact(0, 1.0) == 0
+            assert storage._read_state()[2] == 9
+            assert [(r.name, r.description) for r in await storage.list_items()] == [
+                ("e" * 8, "h")
+            ]
+        finally:
+            await storage.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_heap_compacted_in_slices(self, tmp_path: Path, monkeypatch):
+        """詰め直しは区切って続きから行い、途中の書き込みも保つことを確認"""
+        monkeypatch.setattr(shared_module, "_COMPACT_CHUNK", 2)
+        path = str(tmp_path / "items.shm")
+        storage = SharedItemStorage(path, capacity=10, heap_size=256)
+        other = SharedItemStorage(path, capacity=10, heap_size=256)
+        try:
+            await storage.create_items([(f"名{i}", "b" * 8) for i in range(6)])
+            await storage.delete_items([1, 3, 5, 6])
+
+            # 1回目は文字列を集めるだけで、まだ移さない
+            assert await storage.compact(0, 0.0) == 1
+            assert storage._locked_compaction()[3] > 0
+            assert await storage.compact(0, 0.0) >= 1
+            # 途中の更新・作成は、詰め直しの残りを他のインスタンスが進めても保たれる
+            await storage.update_item(4, "更新", None)
+            await storage.create_item("新規", "c")
+            while await other.compact(0, 0.0):
+                pass
+            assert storage._locked_compaction()[3] == 0
+
+            expected = [("名1", "b" * 8), ("更新", "b" * 8), ("新規", "c")]
+            records = await storage.list_items()
+            assert [(r.name, r.description) for r in records] == expected
+            live = sum(len(n.encode()) + len(d.encode()) for n, d in expected)
+            assert storage._read_state()[2] - storage._read_state()[5] == live
+        finally:
+            await storage.close()
+            await other.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_stream_survives_compaction(self, tmp_path: Path):
+        """ストリーミング中に文字列が詰め直されても、残りを正しく読むことを確認"""
+        storage = SharedItemStorage(str(tmp_path / "items.shm"), capacity=10)
+        try:
+            await storage.create_items([(f"名前{i}", "説明") for i in range(1, 4)])
+            stream = storage.iter_items(batch_size=1)
+            assert (await anext(stream)).name == "名前1"
+
+            await storage.update_item(3, "更新", "更新")
+            await storage.delete_item(2)
+            assert await storage.compact(0, 1.0) > 0
+
+            assert [r.name async for r in stream] == ["更新"]
+        finally:
+            await storage.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_unfinished_write_bounded(self, tmp_path: Path, monkeypatch):
+        """書き込み中のまま残ったスロットは待ち続けずにエラーにし、次の書き込みで戻ることを確認"""
+        monkeypatch.setattr(shared_module, "_SPIN_RETRIES", 10)
+        monkeypatch.setattr(shared_module, "_RETRY_TIMEOUT_SECONDS", 0.01)
+        storage = SharedItemStorage(str(tmp_path / "items.shm"), capacity=10)
+        try:
+            await storage.create_item("名前", "説明")
+            # 書き込み中に異常終了したプロセスが残すseq
+            offset = storage._slot_offset(1)
+            storage._store_seq(offset, storage._load_seq(offset) + 1)
+
+            with pytest.raises(RuntimeError):
+                await storage.get_item(1)
+            await storage.update_item(1, "更新", None)
+            record = await storage.get_item(1)
+            assert record is not None and record.name == "更新"
+        finally:
+            await storage.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_lock_wait_does_not_block_loop(self, tmp_path: Path):
+        """他のプロセスが書き込みロックを保持している間もイベントループが動くことを確認"""
+        path = str(tmp_path / "items.shm")
+        storage = SharedItemStorage(path, capacity=10)
+        other = SharedItemStorage(path, capacity=10)
+        try:
+            with other._write_lock():
+                creating = asyncio.create_task(storage.create_item("名前", "説明"))
+                ticks = 0
+                for _ in range(5):
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+                assert ticks == 5 and not creating.done()
+            assert (await asyncio.wait_for(creating, 1)).id == 1
+        finally:
+            await storage.close()
+            await other.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_expiry_shared(self, tmp_path: Path):
+        """有効期限は他のインスタンスからも見え、compact()で削除されることを確認"""
+        path = str(tmp_path / "items.shm")
+        writer = SharedItemStorage(path, capacity=10)
+        reader = SharedItemStorage(path, capacity=10)
+        try:
+            await writer.create_items(
+                [("名前", "説明")] * 3, [1, None, now_micros() - 1]
+            )
+            assert [record.id for record in await reader.list_items()] == [2]
+            assert await reader.delete_item(1) is False
+
+            assert await reader.compact(0, 1.0) >= 2
+            assert await writer.count() == 1
+            # 空いたスロットは後のIDで再利用される
+            assert (await writer.create_item("名前", "説明")).id == 4
+        finally:
+            await writer.close()
+            await reader.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_purge_expired_in_chunks(self, tmp_path: Path, monkeypatch):
+        """期限切れの掃引は区切って続きから行い、期限前は掃引しないことを確認"""
+        monkeypatch.setattr(shared_module, "_PURGE_CHUNK", 2)
+        path = str(tmp_path / "items.shm")
+        storage = SharedItemStorage(path, capacity=10)
+        other = SharedItemStorage(path, capacity=10)
+        try:
+            now = now_micros()
+            await storage.create_items(
+                [("名前", "説明")] * 6, [now - 1] * 5 + [now + 60_000_000]
+            )
+            # 途中で止めた掃引は他のインスタンスが続きから行う
+            assert await storage.compact(0, 0.0) == 2
+            assert await other.compact(0, 0.0) == 2
+            assert await storage.compact(0, 0.0) >= 1
+            assert await storage.count() == 1
+            # 残ったアイテムの有効期限まで掃引しない
+            assert storage._locked_expiry() == (now + 60_000_000, 0, 0)
+        finally:
+            await storage.close()
+            await other.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_capacity_mismatch(self, tmp_path: Path):
+        """既存ファイルと異なるcapacityで開くとエラーになることを確認"""
+        path = str(tmp_path / "items.shm")
+        await SharedItemStorage(path, capacity=10).close()
+
+        with pytest.raises(ValueError):
+            SharedItemStorage(path, capacity=20)
+
+
+class TestCreateStorage:
+    """環境変数によるバックエンド選択のテストクラス"""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_sqlite_backend_from_env(self, monkeypatch, tmp_path: Path):
+        """APP_STORAGE_BACKEND=sqliteでSQLiteストレージが生成されることを確認"""
+        monkeypatch.setenv("APP_STORAGE_BACKEND", "sqlite")
+        monkeypatch.setenv("APP_SQLITE_PATH", str(tmp_path / "items.db"))
+
+        storage = create_storage()
+        try:
+            assert isinstance(storage, SQLiteItemStorage)
+        finally:
+            await storage.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_shared_backend_from_env(self, monkeypatch, tmp_path: Path):
+        """APP_STORAGE_BACKEND=sharedで共有メモリストレージが生成されることを確認"""
+        monkeypatch.setenv("APP_STORAGE_BACKEND", "shared")
+        monkeypatch.setenv("APP_SHARED_PATH", str(tmp_path / "items.shm"))
+        monkeypatch.setenv("APP_SHARED_CAPACITY", "10")
+
+        storage = create_storage()
+        try:
+            assert isinstance(storage, SharedItemStorage)
+        finally:
+            await storage.close()
+
+    @pytest.mark.unit
+    def test_default_backend_is_memory(self, monkeypatch):
+        """デフォルトでインメモリストレージが生成されることを確認"""
+        monkeypatch.delenv("APP_STORAGE_BACKEND", raising=False)
+
+        assert isinstance(create_storage(), InMemoryItemStorage)
+
+    @pytest.mark.unit
+    def test_unknown_backend(self, monkeypatch):
+        """未対応のバックエンドでエラーになることを確認"""
+        monkeypatch.setenv("APP_STORAGE_BACKEND", "unknown")
+
+        with pytest.raises(ValueError):
+            create_storage()
+
+
+class TestItemRecord:
+    """レコード表現のテストクラス"""
+
+    @pytest.mark.unit
+    def test_micros_round_trip(self):
+        """エポックマイクロ秒とdatetimeの変換で精度が落ちないことを確認"""
+        value = datetime(2024, 1, 1, 12, 34, 56, 789012, tzinfo=UTC)
+
+        assert from_micros(to_micros(value)) == value
+
+    @pytest.mark.unit
+    def test_record_has_no_instance_dict(self):
+        """__slots__によりインスタンスdictを持たないことを確認"""
+        record = ItemRecord(1, "名前", "説明", 0)
+
+        assert not hasattr(record, "__dict__")
+
+    @pytest.mark.unit
+    def test_replace_keeps_original(self):
+        """replaceが元のレコードを変更しないことを確認"""
+        record = ItemRecord(1, "名前", "説明", 0)
+
+        updated = record.replace(10, name="新しい名前")
+
+        assert record.name == "名前" and record.updated_at is None
+        assert updated == ItemRecord(1, "新しい名前", "説明", 0, 10)
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("updated_at", [None, 1_700_000_000_000_000])
+    def test_pack_round_trip(self, updated_at: int | None):
+        """バイナリ形式との変換で値が変わらないことを確認"""
+        record = ItemRecord(7, "名前🍣", "説明", 1_600_000_000_000_000, updated_at)
+
+        data = b"prefix" + pack_record(record)
+
+        assert unpack_record(data, 6) == (record, len(data))
+
+    @pytest.mark.unit
+    def test_pack_with_expiry(self):
+        """有効期限のあるレコードも変換で値が変わらず、ないものは以前の形式のままであることを確認"""
+        record = ItemRecord(7, "名前", "説明", 1, None, 1_700_000_000_000_000)
+        data = pack_record(record)
+
+        assert unpack_record(data) == (record, len(data))
+        plain = pack_record(ItemRecord(7, "名前", "説明", 1))
+        assert len(data) == len(plain) + 8
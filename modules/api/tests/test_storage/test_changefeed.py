@@ -0,0 +1,158 @@
+"""
+変更フィードのテスト
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from ...storage.changefeed import CREATED, DELETED, ChangeFeed
+
+
+def _ids(events) -> list[int]:
+    return [event.item_id for event in events]
+
+
+class TestChangeFeed:
+    """ChangeFeedのテストクラス"""
+
+    @pytest.mark.unit
+    def test_since(self):
+        """指定したシーケンス番号より後の変更を古い順に返すことを確認"""
+        feed = ChangeFeed()
+        for item_id in (1, 2, 3):
+            feed.publish(CREATED, item_id, b'{"id":%d}' % item_id)
+
+        assert _ids(feed.since(0, 10)) == [1, 2, 3]
+        assert _ids(feed.since(1, 1)) == [2]
+        assert feed.since(3, 10) == []
+        assert feed.last_seq == 3
+
+    @pytest.mark.unit
+    def test_event_json(self):
+        """イベントのJSONにシーケンス番号・種類・アイテムを含むことを確認"""
+        feed = ChangeFeed()
+        feed.publish(CREATED, 7, b'{"id":7}')
+        feed.publish(DELETED, 7, None)
+
+        cursors = [feed.cursor(1), feed.cursor(2)]
+        assert [json.loads(event.data) for event in feed.since(0, 10)] == [
+            {
+                "seq": 1,
+                "cursor": cursors[0],
+                "op": "created",
+                "id": 7,
+                "item": {"id": 7},
+            },
+            {"seq": 2, "cursor": cursors[1], "op": "deleted", "id": 7, "item": None},
+        ]
+
+    @pytest.mark.unit
+    def test_cursor_epoch(self):
+        """カーソルは同じ変更フィードのものだけを受け付けることを確認"""
+        feed = ChangeFeed()
+        other = ChangeFeed()
+
+        assert feed.resolve(feed.cursor(5)) == 5
+        assert feed.resolve("0") == 0
+        assert feed.resolve(other.cursor(5)) is None
+        assert feed.resolve("5") is None
+        with pytest.raises(ValueError):
+            feed.resolve(f"{feed.epoch}:x")
+
+    @pytest.mark.unit
+    def test_overflow_requires_resync(self):
+        """押し出された位置・未来の位置からの読み出しはNoneを返すことを確認"""
+        feed = ChangeFeed(capacity=3)
+        for item_id in range(1, 6):
+            feed.publish(CREATED, item_id, b"{}")
+
+        assert feed.oldest_seq == 3
+        assert _ids(feed.since(2, 10)) == [3, 4, 5]
+        assert feed.since(1, 10) is None
+        assert feed.since(6, 10) is None
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_wait_wakes_on_publish(self):
+        """変更が届くと待っている読み出しが起きることを確認"""
+        feed = ChangeFeed()
+        waiter = asyncio.create_task(feed.wait(0, 5))
+        await asyncio.sleep(0)
+
+        feed.publish(CREATED, 1, b"{}")
+
+        assert await asyncio.wait_for(waiter, 1) is True
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_wait_timeout(self):
+        """変更がなければタイムアウトでFalseを返し、待機を残さないことを確認"""
+        feed = ChangeFeed()
+
+        assert await feed.wait(0, 0.01) is False
+        assert not feed._waiters
+
+
+class TestChangeFeedSubscription:
+    """購読者への配信のテストクラス"""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_fan_out_encodes_once(self):
+        """全購読者に同じ文字列を届けることを確認"""
+        feed = ChangeFeed()
+        first, second = feed.subscribe(), feed.subscribe()
+
+        feed.publish(CREATED, 1, b'{"id":1}')
+        feed.publish(DELETED, 1, None)
+
+        first_events = await first.get()
+        second_events = await second.get()
+        assert len(first_events) == 2
+        assert all(a is b for a, b in zip(first_events, second_events, strict=True))
+        assert json.loads(first_events[1])["op"] == "deleted"
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_get_waits_for_event(self):
+        """イベントが届くまでget()が待つことを確認"""
+        feed = ChangeFeed()
+        subscription = feed.subscribe()
+        getter = asyncio.create_task(subscription.get())
+        await asyncio.sleep(0)
+        assert not getter.done()
+
+        feed.publish(CREATED, 1, b"{}")
+
+        assert len(await asyncio.wait_for(getter, 1)) == 1
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_slow_subscriber_dropped(self):
+        """キューが一杯の購読者は切り離し、他の購読者には届け続けることを確認"""
+        feed = ChangeFeed()
+        slow, fast = feed.subscribe(max_queue=2), feed.subscribe(max_queue=10)
+
+        for item_id in range(1, 4):
+            feed.publish(CREATED, item_id, b"{}")
+
+        assert await slow.get() is None
+        assert len(await fast.get()) == 3
+        assert feed.subscribers == 1
+        assert feed.dropped_subscribers == 1
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_close_wakes_getter(self):
+        """close()で待っているget()がNoneを返し、購読者から外れることを確認"""
+        feed = ChangeFeed()
+        subscription = feed.subscribe()
+        getter = asyncio.create_task(subscription.get())
+        await asyncio.sleep(0)
+
+        subscription.close()
+
+        assert await asyncio.wait_for(getter, 1) is None
+        assert feed.subscribers == 0
@@ -0,0 +1,57 @@
+"""
+墓標の回収タスクのテスト
+"""
+
+import asyncio
+
+import pytest
+
+from ...storage.compaction import TombstoneCompactor
+from ...storage.memory import InMemoryItemStorage
+from ...storage.record import now_micros
+
+
+class TestTombstoneCompactor:
+    """TombstoneCompactorのテストクラス"""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_reclaims_after_retention(self):
+        """保持期間を過ぎた墓標だけを回収することを確認"""
+        storage = InMemoryItemStorage()
+        await storage.create_items([("名前", "説明")] * 5)
+        await storage.delete_items([1, 2])
+        now = now_micros()
+        compactor = TombstoneCompactor(
+            lambda: storage, retention_seconds=10, clock=lambda: now
+        )
+
+        assert await compactor.run_once() == 0
+        since = (now - 5_000_000, 0)
+        assert len(await storage.list_tombstones(since, 10)) == 2
+
+        now += 11_000_000
+        assert await compactor.run_once() == 2
+        assert await storage.list_tombstones(since, 10) is None
+        assert compactor.stats()["reclaimed"] == 2
+        assert compactor.stats()["slices"] == 2
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_run_until_cancelled(self):
+        """バックグラウンドで回収を続け、キャンセルで止まることを確認"""
+        storage = InMemoryItemStorage()
+        await storage.create_items([("名前", "説明")] * 3)
+        await storage.delete_item(1)
+        compactor = TombstoneCompactor(
+            lambda: storage, retention_seconds=0, interval_seconds=0.01
+        )
+
+        task = asyncio.create_task(compactor.run())
+        while not compactor.reclaimed:
+            await asyncio.sleep(0.01)
+        task.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert compactor.reclaimed == 1
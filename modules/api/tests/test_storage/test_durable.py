@@ -0,0 +1,311 @@
+"""
+WAL付きインメモリストレージのテスト
+"""
+
+import asyncio
+import os
+import threading
+from pathlib import Path
+
+import pytest
+
+from ...storage import durable as durable_module
+from ...storage import memory as memory_module
+from ...storage import wal as wal_module
+from ...storage.durable import DurableItemStorage
+from ...storage.provider import create_storage
+from ...storage.record import now_micros
+from ...storage.snapshot import SNAPSHOT_NAME
+from ...storage.wal import list_segments, segment_name
+
+
+class TestDurableItemStorage:
+    """WALによる復旧のテストクラス"""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_recover_from_wal(self, tmp_path: Path):
+        """再起動後にWALの再生で同じ状態に戻ることを確認"""
+        storage = DurableItemStorage(str(tmp_path), fsync="always")
+        await storage.create_items([("名前1", "説明1"), ("名前2", "説明2")])
+        await storage.create_item("名前3", "説明3")
+        await storage.update_item(2, "更新", None)
+        await storage.delete_items([1])
+        expected = await storage.list_items()
+        await storage.close()
+
+        reopened = DurableItemStorage(str(tmp_path))
+        try:
+            assert await reopened.list_items() == expected
+            assert reopened.replayed_entries == 5
+            # 採番は復旧したIDの続きから行う
+            assert (await reopened.create_item("名前4", "説明4")).id == 4
+        finally:
+            await reopened.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_recover_clear(self, tmp_path: Path):
+        """全件削除も再生されることを確認"""
+        storage = DurableItemStorage(str(tmp_path), fsync="os")
+        await storage.create_item("消える", "説明")
+        await storage.clear()
+        await storage.create_item("残る", "説明")
+        await storage.close()
+
+        reopened = DurableItemStorage(str(tmp_path))
+        try:
+            records = await reopened.list_items()
+            assert [(r.id, r.name) for r in records] == [(1, "残る")]
+        finally:
+            await reopened.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_recovered_deletes_have_no_tombstones(self, tmp_path: Path):
+        """WALから復旧した削除は墓標を作らず、それより前を保持していない扱いにすることを確認"""
+        storage = DurableItemStorage(str(tmp_path), fsync="always")
+        await storage.create_items([("名前1", "説明1"), ("名前2", "説明2")])
+        await storage.delete_item(1)
+        assert len(await storage.list_tombstones((0, 0), 10)) == 1
+        await storage.close()
+
+        reopened = DurableItemStorage(str(tmp_path))
+        try:
+            assert await reopened.list_tombstones((0, 0), 10) is None
+            since = now_micros()
+            await reopened.delete_item(2)
+            tombstones = await reopened.list_tombstones((since, 0), 10)
+            assert [t.id for t in tombstones] == [2]
+        finally:
+            await reopened.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_torn_tail_is_truncated(self, tmp_path: Path):
+        """書き込み途中で停止した末尾を捨てて復旧することを確認"""
+        storage = DurableItemStorage(str(tmp_path), fsync="always")
+        await storage.create_item("名前", "説明")
+        await storage.close()
+
+        segment = tmp_path / segment_name(list_segments(str(tmp_path))[-1])
+        size = segment.stat().st_size
+        with open(segment, "ab") as f:
+            f.write(b"\x40\x00\x00\x00\x00")
+
+        reopened = DurableItemStorage(str(tmp_path))
+        try:
+            assert await reopened.count() == 1
+            assert segment.stat().st_size == size
+        finally:
+            await reopened.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_checkpoint(self, tmp_path: Path):
+        """スナップショット作成後は、それ以降のWALだけを再生することを確認"""
+        storage = DurableItemStorage(str(tmp_path), fsync="os")
+        await storage.create_items([(f"名前{i}", "説明") for i in range(10)])
+        await storage.checkpoint()
+        await storage.update_item(3, "更新", None)
+        expected = await storage.list_items()
+        await storage.close()
+
+        assert (tmp_path / SNAPSHOT_NAME).exists()
+        assert min(list_segments(str(tmp_path))) == 2
+
+        reopened = DurableItemStorage(str(tmp_path))
+        try:
+            assert await reopened.list_items() == expected
+            assert reopened.replayed_entries == 1
+        finally:
+            await reopened.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_expiry_survives_restart(self, tmp_path: Path):
+        """有効期限は再起動後も残り、期限切れのアイテムはスナップショットに含めないことを確認"""
+        storage = DurableItemStorage(str(tmp_path), fsync="os")
+        expires_at = now_micros() + 60_000_000
+        await storage.create_items(
+            [("期限内", "説明"), ("期限切れ", "説明")], [expires_at, now_micros() - 1]
+        )
+        await storage.close()
+
+        reopened = DurableItemStorage(str(tmp_path))
+        try:
+            assert (await reopened.get_item(1)).expires_at == expires_at
+            assert await reopened.get_item(2) is None
+            await reopened.checkpoint()
+            assert await reopened.count() == 2
+        finally:
+            await reopened.close()
+
+        restarted = DurableItemStorage(str(tmp_path))
+        try:
+            assert restarted.replayed_entries == 0
+            assert await restarted.count() == 1
+        finally:
+            await restarted.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_recovered_expiry_compacted(self, tmp_path: Path, monkeypatch):
+        """スナップショット・WALから戻ったアイテムも、期限が過ぎたらcompact()で削除されることを確認"""
+        storage = DurableItemStorage(str(tmp_path), fsync="os")
+        expires_at = now_micros() + 60_000_000
+        await storage.create_items([("名前", "説明")] * 4, [expires_at] * 3 + [None])
+        await storage.checkpoint()
+        await storage.create_items([("名前", "説明")] * 2, [expires_at, None])
+        await storage.close()
+
+        # 期限が過ぎた時刻に再起動する
+        monkeypatch.setattr(memory_module, "now_micros", lambda: expires_at)
+        monkeypatch.setattr(durable_module, "now_micros", lambda: expires_at)
+        reopened = DurableItemStorage(str(tmp_path))
+        try:
+            assert await reopened.count() == 6
+            assert [record.id for record in await reopened.list_items()] == [4, 6]
+            while await reopened.compact(0, 1.0):
+                pass
+            assert await reopened.count() == 2
+        finally:
+            await reopened.close()
+
+        # 削除はWALに記録され、再起動後も戻らない
+        restarted = DurableItemStorage(str(tmp_path))
+        try:
+            assert await restarted.count() == 2
+        finally:
+            await restarted.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_automatic_snapshot(self, tmp_path: Path):
+        """WALが閾値を超えるとスナップショットが作成されることを確認"""
+        storage = DurableItemStorage(str(tmp_path), fsync="os", snapshot_bytes=1024)
+        for i in range(50):
+            await storage.create_item(f"名前{i}", "説明")
+        await storage.close()
+
+        assert (tmp_path / SNAPSHOT_NAME).exists()
+        reopened = DurableItemStorage(str(tmp_path))
+        try:
+            assert await reopened.count() == 50
+            assert reopened.replayed_entries < 50
+        finally:
+            await reopened.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_group_commit(self, tmp_path: Path, monkeypatch):
+        """同時の書き込みがまとめてfsyncされることを確認"""
+        calls = []
+        original_fsync = os.fsync
+
+        def counting_fsync(fd: int) -> None:
+            calls.append(fd)
+            original_fsync(fd)
+
+        monkeypatch.setattr(wal_module.os, "fsync", counting_fsync)
+        storage = DurableItemStorage(str(tmp_path), fsync="always")
+        try:
+            await asyncio.gather(
+                *(storage.create_item(f"名前{i}", "説明") for i in range(50))
+            )
+            assert 1 <= len(calls) < 50
+        finally:
+            await storage.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_write_visible_after_commit(self, tmp_path: Path, monkeypatch):
+        """WALの永続化を待つ間、変更が読み取りに見えないことを確認"""
+        storage = DurableItemStorage(str(tmp_path), fsync="always")
+        await storage.create_item("名前", "説明")
+        released = asyncio.Event()
+        original_commit = storage._wal.commit
+
+        async def held_commit(lsn: int) -> None:
+            await released.wait()
+            await original_commit(lsn)
+
+        monkeypatch.setattr(storage._wal, "commit", held_commit)
+        try:
+            update = asyncio.create_task(storage.update_item(1, "更新", None))
+            create = asyncio.create_task(storage.create_item("追加", "説明"))
+            await asyncio.sleep(0)
+            # 後続の書き込みは永続化待ちの変更に重ねて検証する
+            described = asyncio.create_task(storage.update_item(1, None, "追記"))
+            await asyncio.sleep(0)
+            assert (await storage.get_item(1)).name == "名前"
+            assert await storage.count() == 1
+
+            released.set()
+            await asyncio.gather(update, create, described)
+            record = await storage.get_item(1)
+            assert (record.name, record.description) == ("更新", "追記")
+            assert await storage.count() == 2
+        finally:
+            await storage.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_snapshot_fsync_off_loop(self, tmp_path: Path, monkeypatch):
+        """スナップショット作成のfsyncがイベントループのスレッドで行われないことを確認"""
+        storage = DurableItemStorage(str(tmp_path), fsync="os")
+        await storage.create_items([(f"名前{i}", "説明") for i in range(10)])
+        threads = []
+        original_fsync = os.fsync
+
+        def recording_fsync(fd: int) -> None:
+            threads.append(threading.get_ident())
+            original_fsync(fd)
+
+        monkeypatch.setattr(wal_module.os, "fsync", recording_fsync)
+        try:
+            await storage.checkpoint()
+            assert threads
+            assert threading.get_ident() not in threads
+        finally:
+            await storage.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_snapshot_during_writes(self, tmp_path: Path):
+        """スナップショット作成中の書き込みも復旧後に反映されることを確認"""
+        storage = DurableItemStorage(str(tmp_path), fsync="os")
+        await storage.create_items([(f"名前{i}", "説明") for i in range(1000)])
+        thread = await storage._start_snapshot()
+        await storage.update_item(500, "更新", None)
+        await storage.delete_items([1, 999])
+        await storage.create_item("追加", "説明")
+        await asyncio.to_thread(thread.join)
+        expected = await storage.list_items()
+        await storage.close()
+
+        reopened = DurableItemStorage(str(tmp_path))
+        try:
+            assert await reopened.list_items() == expected
+        finally:
+            await reopened.close()
+
+    @pytest.mark.unit
+    def test_invalid_fsync_policy(self, tmp_path: Path):
+        """未対応のfsync方針でエラーになることを確認"""
+        with pytest.raises(ValueError):
+            DurableItemStorage(str(tmp_path), fsync="never")
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_wal_dir_from_env(self, monkeypatch, tmp_path: Path):
+        """APP_WAL_DIRを設定するとWAL付きストレージが生成されることを確認"""
+        monkeypatch.delenv("APP_STORAGE_BACKEND", raising=False)
+        monkeypatch.setenv("APP_WAL_DIR", str(tmp_path))
+        monkeypatch.setenv("APP_WAL_FSYNC", "os")
+
+        storage = create_storage()
+        try:
+            assert isinstance(storage, DurableItemStorage)
+        finally:
+            await storage.close()
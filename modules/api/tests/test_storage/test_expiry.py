@@ -0,0 +1,200 @@
+"""
+アイテムの有効期限（タイミングホイール）のテスト
+"""
+
+import asyncio
+
+import pytest
+
+from ...storage.expiry import SLOTS, ItemExpiry, TimingWheel
+
+
+class TestTimingWheel:
+    """TimingWheelのテストクラス"""
+
+    @pytest.mark.unit
+    def test_fires_at_deadline(self):
+        """期限のtickになったキーだけを返すことを確認"""
+        wheel = TimingWheel()
+        wheel.schedule(1, 3)
+        wheel.schedule(2, 5)
+
+        assert wheel.advance(2) == []
+        assert wheel.advance(3) == [1]
+        assert wheel.advance(10) == [2]
+        assert len(wheel) == 0
+
+    @pytest.mark.unit
+    def test_cascades_across_levels(self):
+        """上の段に置いた期限も、下の段に移されて期限のtickに返すことを確認"""
+        wheel = TimingWheel(start_tick=5)
+        deadlines = {1: SLOTS + 7, 2: SLOTS * SLOTS + 3, 3: SLOTS**3 * 2 + 1}
+        for key, deadline in deadlines.items():
+            wheel.schedule(key, deadline)
+
+        for key, deadline in deadlines.items():
+            # 1tickずつ進めても、一度に進めても、期限の前には返さない
+            assert wheel.advance(deadline - 1) == []
+            assert wheel.advance(deadline) == [key]
+        assert len(wheel) == 0
+
+    @pytest.mark.unit
+    def test_advance_one_tick_at_a_time(self):
+        """1tickずつ進めた場合も、すべてのキーを期限のtickに返すことを確認"""
+        wheel = TimingWheel()
+        deadlines = {key: key * 37 % (SLOTS * SLOTS * 2) for key in range(1, 200)}
+        for key, deadline in deadlines.items():
+            wheel.schedule(key, deadline)
+
+        fired: dict[int, int] = {}
+        for tick in range(SLOTS * SLOTS * 2):
+            for key in wheel.advance(tick):
+                fired[key] = tick
+        assert fired == deadlines
+
+    @pytest.mark.unit
+    def test_cancel_and_reschedule(self):
+        """取り消したキーは返さず、登録し直したキーは新しい期限に返すことを確認"""
+        wheel = TimingWheel()
+        wheel.schedule(1, 10)
+        wheel.schedule(2, 10)
+        wheel.schedule(2, SLOTS * 3)
+
+        assert wheel.cancel(1) is True
+        assert wheel.cancel(1) is False
+        assert wheel.advance(10) == []
+        assert wheel.deadline(2) == SLOTS * 3
+        assert wheel.advance(SLOTS * 3) == [2]
+
+    @pytest.mark.unit
+    def test_past_deadline_fires_next(self):
+        """過ぎた期限は次に進めたときに返すことを確認"""
+        wheel = TimingWheel(start_tick=100)
+        wheel.schedule(1, 50)
+
+        assert wheel.advance(100) == [1]
+
+    @pytest.mark.unit
+    def test_too_far(self):
+        """登録できる範囲より遠い期限はValueErrorになることを確認"""
+        wheel = TimingWheel()
+        wheel.schedule(1, wheel.max_ticks)
+
+        with pytest.raises(ValueError):
+            wheel.schedule(2, wheel.max_ticks + 1)
+
+
+class TestItemExpiry:
+    """ItemExpiryのテストクラス"""
+
+    @pytest.mark.unit
+    def test_due_after_expires_at(self):
+        """有効期限が過ぎてから取り出すことを確認（tickの境界に切り上げる）"""
+        now = 1_000_000_000
+        expiry = ItemExpiry(tick_seconds=1.0, clock=lambda: now)
+        expiry.schedule(1, expiry.expires_at(2.5))
+
+        now += 2_500_000
+        assert expiry.due() == []
+        assert expiry.has_due() is False
+
+        now += 500_000
+        assert expiry.has_due() is True
+        assert expiry.due() == [1]
+        assert expiry.has_due() is False
+        assert expiry.backlog == 0
+
+    @pytest.mark.unit
+    def test_cancel(self):
+        """取り消した期限は返さず、件数に数えることを確認"""
+        now = 0
+        expiry = ItemExpiry(tick_seconds=1.0, clock=lambda: now)
+        expiry.schedule(1, expiry.expires_at(1))
+        expiry.cancel(1)
+        expiry.cancel(2)
+
+        now += 5_000_000
+        assert expiry.due() == []
+        assert expiry.stats() == {
+            "backlog": 0,
+            "scheduled": 1,
+            "cancelled": 1,
+            "expired": 0,
+        }
+
+    @pytest.mark.unit
+    def test_max_ttl_after_idle(self):
+        """ホイールを進めずに時間が経っても、上限までの期限を予約できることを確認"""
+        now = 0
+        expiry = ItemExpiry(tick_seconds=1.0, clock=lambda: now)
+        expiry.schedule(1, expiry.expires_at(10))
+
+        now += 100_500_000
+        expiry.schedule(2, expiry.expires_at(expiry.max_ttl_seconds))
+        # 進めた間に期限が来たものは、次に取り出す
+        assert expiry.due() == [1]
+        assert expiry.backlog == 1
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_run_deletes_due_items(self):
+        """run()が期限の来たアイテムを削除関数に渡すことを確認"""
+        expiry = ItemExpiry(tick_seconds=0.01)
+        deleted: list[int] = []
+
+        async def delete(item_ids: list[int]) -> int:
+            deleted.extend(item_ids)
+            return len(item_ids)
+
+        expiry.schedule(1, expiry.expires_at(0.01))
+        task = asyncio.create_task(expiry.run(delete))
+        for _ in range(100):
+            if deleted:
+                break
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert deleted == [1]
+        assert expiry.stats()["expired"] == 1
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_expire_due_requeues_on_failure(self):
+        """削除が失敗・キャンセルされたIDは戻し、次の呼び出しで削除し直すことを確認"""
+        now = 0
+        expiry = ItemExpiry(tick_seconds=1.0, clock=lambda: now)
+        expiry.schedule(1, expiry.expires_at(1))
+        expiry.schedule(2, expiry.expires_at(1))
+        now += 2_000_000
+
+        async def fail(item_ids: list[int]) -> int:
+            raise RuntimeError("削除に失敗")
+
+        with pytest.raises(RuntimeError):
+            await expiry.expire_due(fail)
+        assert expiry.has_due() is True
+
+        blocked = asyncio.Event()
+
+        async def block(item_ids: list[int]) -> int:
+            await blocked.wait()
+            return len(item_ids)
+
+        task = asyncio.create_task(expiry.expire_due(block))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        deleted: list[int] = []
+
+        async def delete(item_ids: list[int]) -> int:
+            deleted.extend(item_ids)
+            return len(item_ids)
+
+        assert await expiry.expire_due(delete) == 2
+        assert sorted(deleted) == [1, 2]
+        assert expiry.backlog == 0
+        assert expiry.stats()["expired"] == 2
@@ -0,0 +1,182 @@
+"""
+Idempotency-Keyのレスポンスキャッシュのテスト
+"""
+
+from pathlib import Path
+
+import pytest
+
+from ...storage.idempotency import (
+    IdempotencyCache,
+    IdempotencyKeyInUse,
+    IdempotencyKeyMismatch,
+    InMemoryIdempotencyCache,
+    SQLiteIdempotencyCache,
+    StoredResponse,
+    fingerprint,
+)
+from ...storage.provider import create_idempotency_cache
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def clock_and_cache(request, tmp_path: Path):
+    """全実装で同じ振る舞いを確認するため、時刻を進められるキャッシュを生成する"""
+    clock = _Clock()
+    if request.param == "memory":
+        cache: IdempotencyCache = InMemoryIdempotencyCache(ttl_seconds=60, clock=clock)
+    else:
+        cache = SQLiteIdempotencyCache(
+            str(tmp_path / "idempotency.db"), ttl_seconds=60, clock=clock
+        )
+    yield clock, cache
+    cache.close()
+
+
+class TestIdempotencyCacheContract:
+    """全実装に共通の振る舞いのテストクラス"""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_replay(self, clock_and_cache):
+        """保存したレスポンスを同じキー・同じボディに返すことを確認"""
+        _, cache = clock_and_cache
+        digest = fingerprint(b'{"name": "x"}')
+
+        assert await cache.begin("key", digest) is None
+        await cache.complete("key", StoredResponse(201, b'{"id":1}'))
+        stored = await cache.begin("key", digest)
+
+        assert stored is not None
+        assert (stored.status_code, stored.body) == (201, b'{"id":1}')
+        assert cache.stats()["hit_rate"] == 0.5
+        assert cache.stats()["entries"] == 1
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_in_use_and_mismatch(self, clock_and_cache):
+        """処理中の再送・別のボディでの再利用を区別することを確認"""
+        _, cache = clock_and_cache
+        digest = fingerprint(b"a")
+        await cache.begin("key", digest)
+
+        with pytest.raises(IdempotencyKeyInUse):
+            await cache.begin("key", digest)
+        await cache.complete("key", StoredResponse(201, b"{}"))
+        with pytest.raises(IdempotencyKeyMismatch):
+            await cache.begin("key", fingerprint(b"b"))
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_release(self, clock_and_cache):
+        """解放したキーは同じキーで再び予約できることを確認"""
+        _, cache = clock_and_cache
+        digest = fingerprint(b"a")
+        await cache.begin("key", digest)
+        await cache.release("key")
+
+        assert await cache.begin("key", digest) is None
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_expiry(self, clock_and_cache):
+        """期限切れのエントリは返さず、別のボディでも予約できることを確認"""
+        clock, cache = clock_and_cache
+        await cache.begin("key", fingerprint(b"a"))
+        await cache.complete("key", StoredResponse(201, b"{}"))
+
+        clock.now += 61
+
+        assert await cache.begin("key", fingerprint(b"b")) is None
+
+
+class TestInMemoryIdempotencyCache:
+    """InMemoryIdempotencyCacheのテストクラス"""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_memory_bound(self):
+        """上限を超えると最も古く使われたエントリから捨てることを確認"""
+        cache = InMemoryIdempotencyCache(max_bytes=1200)
+        for key in ("a", "b", "c"):
+            await cache.begin(key, fingerprint(b""))
+            await cache.complete(key, StoredResponse(201, b"x" * 200))
+
+        assert cache.stats()["entries"] == 2
+        assert cache.stats()["bytes"] <= 1200
+        assert cache.evictions == 1
+        assert await cache.begin("a", fingerprint(b"")) is None
+
+
+class TestSQLiteIdempotencyCache:
+    """SQLiteIdempotencyCacheのテストクラス"""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_shared_between_instances(self, tmp_path: Path):
+        """同じファイルを開いた別のインスタンス（別ワーカー）と予約・保存を共有することを確認"""
+        path = str(tmp_path / "idempotency.db")
+        first, second = SQLiteIdempotencyCache(path), SQLiteIdempotencyCache(path)
+        digest = fingerprint(b"a")
+        try:
+            assert await first.begin("key", digest) is None
+            with pytest.raises(IdempotencyKeyInUse):
+                await second.begin("key", digest)
+
+            await first.complete("key", StoredResponse(201, b"{}"))
+            stored = await second.begin("key", digest)
+            assert stored is not None and stored.body == b"{}"
+        finally:
+            first.close()
+            second.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_max_entries(self, tmp_path: Path):
+        """件数の上限を超えた分を期限の近いものから消すことを確認"""
+        clock = _Clock()
+        cache = SQLiteIdempotencyCache(
+            str(tmp_path / "idempotency.db"), max_entries=3, clock=clock
+        )
+        cache.TRIM_INTERVAL = 5
+        try:
+            for i in range(5):
+                clock.now += 1
+                await cache.begin(f"key{i}", fingerprint(b""))
+                await cache.complete(f"key{i}", StoredResponse(201, b"{}"))
+
+            assert cache.stats()["entries"] == 3
+            assert await cache.begin("key0", fingerprint(b"")) is None
+        finally:
+            cache.close()
+
+
+class TestCreateIdempotencyCache:
+    """バックエンドに応じたキャッシュの選択のテストクラス"""
+
+    @pytest.mark.unit
+    def test_memory_backend(self, monkeypatch):
+        """インメモリストレージではワーカー内のキャッシュを使うことを確認"""
+        monkeypatch.delenv("APP_STORAGE_BACKEND", raising=False)
+
+        assert isinstance(create_idempotency_cache(), InMemoryIdempotencyCache)
+
+    @pytest.mark.unit
+    def test_shared_backend(self, monkeypatch, tmp_path: Path):
+        """共有メモリストレージでは同じディレクトリのSQLiteファイルで共有することを確認"""
+        monkeypatch.setenv("APP_STORAGE_BACKEND", "shared")
+        monkeypatch.setenv("APP_SHARED_PATH", str(tmp_path / "items.shm"))
+
+        cache = create_idempotency_cache()
+        try:
+            assert isinstance(cache, SQLiteIdempotencyCache)
+            assert (tmp_path / "idempotency.db").exists()
+        finally:
+            cache.close()
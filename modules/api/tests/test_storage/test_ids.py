@@ -0,0 +1,169 @@
+"""
+ID採番器のテスト
+"""
+
+import fcntl
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from ...storage import ids as ids_module
+from ...storage.ids import CounterIdAllocator, SnowflakeIdAllocator, claim_node_id
+from ...storage.memory import InMemoryItemStorage
+from ...storage.provider import create_id_allocator
+
+
+class TestCounterIdAllocator:
+    """連番採番器のテストクラス"""
+
+    @pytest.mark.unit
+    def test_sequential_and_block(self):
+        """連番と連続した範囲の確保を確認"""
+        allocator = CounterIdAllocator()
+
+        assert allocator.allocate() == 1
+        assert list(allocator.allocate_block(3)) == [2, 3, 4]
+        assert allocator.allocate() == 5
+
+        allocator.observe(10)
+        assert allocator.allocate() == 11
+        allocator.observe(3)
+        assert allocator.allocate() == 12
+
+        allocator.reset()
+        assert allocator.allocate() == 1
+
+    @pytest.mark.unit
+    def test_thread_safe(self):
+        """複数スレッドから採番しても重複しないことを確認"""
+        allocator = CounterIdAllocator()
+
+        def allocate_many(_: int) -> list[int]:
+            return [allocator.allocate() for _ in range(1000)]
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = [i for ids in executor.map(allocate_many, range(8)) for i in ids]
+
+        assert sorted(results) == list(range(1, 8001))
+
+
+class TestSnowflakeIdAllocator:
+    """Snowflake採番器のテストクラス"""
+
+    @pytest.mark.unit
+    def test_layout(self):
+        """時刻・ノードID・シーケンスのビット配置を確認"""
+        allocator = SnowflakeIdAllocator(node_id=5, epoch_ms=0, clock=lambda: 1000)
+
+        first, second = allocator.allocate_block(2)
+
+        assert first == (1000 << 22) | (5 << 12)
+        assert second == first + 1
+
+    @pytest.mark.unit
+    def test_sequence_overflow_advances_time(self):
+        """シーケンスを使い切ると次のミリ秒に進むことを確認"""
+        allocator = SnowflakeIdAllocator(node_id=1, epoch_ms=0, clock=lambda: 1000)
+
+        ids = allocator.allocate_block(SnowflakeIdAllocator.MAX_SEQUENCE + 2)
+
+        assert ids == sorted(set(ids))
+        assert ids[-1] >> 22 == 1001
+        assert allocator.allocate() >> 22 == 1001
+
+    @pytest.mark.unit
+    def test_monotonic_when_clock_goes_back(self):
+        """時計が巻き戻っても単調増加を保つことを確認"""
+        now = [2000]
+        allocator = SnowflakeIdAllocator(node_id=1, epoch_ms=0, clock=lambda: now[0])
+
+        first = allocator.allocate()
+        now[0] = 1500
+        second = allocator.allocate()
+
+        assert second > first
+
+    @pytest.mark.unit
+    def test_observe_restored_id(self):
+        """復旧したIDより後から採番することを確認"""
+        allocator = SnowflakeIdAllocator(node_id=1, epoch_ms=0, clock=lambda: 1000)
+        restored = (1000 << 22) | (1 << 12) | 5
+
+        allocator.observe(restored)
+
+        assert allocator.allocate() == restored + 1
+
+    @pytest.mark.unit
+    def test_different_nodes_never_collide(self):
+        """同じ時刻でもノードIDが異なれば重複しないことを確認"""
+        node_a = SnowflakeIdAllocator(node_id=1, epoch_ms=0, clock=lambda: 1000)
+        node_b = SnowflakeIdAllocator(node_id=2, epoch_ms=0, clock=lambda: 1000)
+
+        assert not set(node_a.allocate_block(100)) & set(node_b.allocate_block(100))
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("node_id", [-1, 1024])
+    def test_invalid_node_id(self, node_id: int):
+        """範囲外のノードIDでエラーになることを確認"""
+        with pytest.raises(ValueError):
+            SnowflakeIdAllocator(node_id=node_id)
+
+
+class TestClaimNodeId:
+    """ノードID確保のテストクラス"""
+
+    @pytest.fixture(autouse=True)
+    def unclaimed(self, monkeypatch):
+        """確保済みのノードIDをリセットするフィクスチャ"""
+        monkeypatch.delenv("APP_NODE_ID", raising=False)
+        monkeypatch.setattr(ids_module, "_claimed_node_id", None)
+        monkeypatch.setattr(ids_module, "_node_lock_file", None)
+
+    @pytest.mark.unit
+    def test_env_node_id(self, monkeypatch):
+        """APP_NODE_IDが優先されることを確認"""
+        monkeypatch.setenv("APP_NODE_ID", "42")
+
+        assert claim_node_id() == 42
+
+    @pytest.mark.unit
+    def test_skips_locked_slots(self, tmp_path: Path):
+        """他プロセスが確保済みの番号を避けることを確認"""
+        with open(tmp_path / "items-node-0.lock", "w") as other:
+            fcntl.flock(other, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+            node_id = claim_node_id(lock_dir=str(tmp_path))
+
+        assert node_id == 1
+        assert claim_node_id(lock_dir=str(tmp_path)) == 1
+        ids_module._node_lock_file.close()
+
+
+class TestSnowflakeStorage:
+    """Snowflake採番を使うストレージのテストクラス"""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_memory_storage_with_snowflake(self, monkeypatch):
+        """Snowflake採番でも一覧・ページングが昇順で動作することを確認"""
+        monkeypatch.setenv("APP_ID_STRATEGY", "snowflake")
+        monkeypatch.setenv("APP_NODE_ID", "3")
+        storage = InMemoryItemStorage(id_allocator=create_id_allocator())
+
+        first = await storage.create_item("名前", "説明")
+        block = await storage.create_items([("名前", "説明")] * 3)
+
+        ids = [first.id, *(record.id for record in block)]
+        assert ids == sorted(ids)
+        assert (first.id >> 12) & SnowflakeIdAllocator.MAX_NODE_ID == 3
+        listed = await storage.list_items(after_id=first.id, limit=2)
+        assert [record.id for record in listed] == ids[1:3]
+
+    @pytest.mark.unit
+    def test_unknown_strategy(self, monkeypatch):
+        """未対応の採番方式でエラーになることを確認"""
+        monkeypatch.setenv("APP_ID_STRATEGY", "uuid")
+
+        with pytest.raises(ValueError):
+            create_id_allocator()
@@ -0,0 +1,82 @@
+"""
+アイテムのJSONキャッシュのテスト
+"""
+
+import pytest
+
+from ...storage.jsoncache import ItemJsonCache
+from ...storage.record import ItemRecord
+
+
+def _encode(record: ItemRecord) -> bytes:
+    return f"{record.id}:{record.name}".encode()
+
+
+class TestItemJsonCache:
+    """ItemJsonCacheのテストクラス"""
+
+    @pytest.mark.unit
+    def test_hit_and_miss(self):
+        """同じバージョンのレコードはエンコードせずにキャッシュから返すことを確認"""
+        cache = ItemJsonCache()
+        record = ItemRecord(1, "名前", "説明", 10)
+        encoded: list[int] = []
+
+        def encode(record: ItemRecord) -> bytes:
+            encoded.append(record.id)
+            return _encode(record)
+
+        assert cache.get(record, encode) == "1:名前".encode()
+        assert cache.get(record, encode) == "1:名前".encode()
+
+        assert encoded == [1]
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    @pytest.mark.unit
+    def test_stale_version(self):
+        """無効化されていなくても、更新されたレコードには古いJSONを返さないことを確認"""
+        cache = ItemJsonCache()
+        cache.put(ItemRecord(1, "古い", "説明", 10), _encode)
+
+        updated = ItemRecord(1, "新しい", "説明", 10, updated_at=20)
+
+        assert cache.get(updated, _encode) == "1:新しい".encode()
+        assert len(cache) == 1
+
+    @pytest.mark.unit
+    def test_memory_bound(self):
+        """上限を超えると最も古く使われたエントリから捨てることを確認"""
+        records = [ItemRecord(i, "x" * 100, "説明", 10) for i in range(1, 4)]
+        cache = ItemJsonCache()
+        cache.put(records[0], _encode)
+        cache.max_bytes = cache.size_bytes * 2
+
+        cache.put(records[1], _encode)
+        cache.get(records[0], _encode)
+        cache.put(records[2], _encode)
+
+        assert cache.evictions == 1
+        assert cache.size_bytes <= cache.max_bytes
+        cache.get(records[1], _encode)
+        assert cache.stats()["misses"] == 1
+
+    @pytest.mark.unit
+    def test_disabled(self):
+        """上限0ではエンコード結果を返すだけで保持しないことを確認"""
+        cache = ItemJsonCache(max_bytes=0)
+
+        assert cache.get(ItemRecord(1, "名前", "説明", 10), _encode)
+        assert len(cache) == 0
+        assert cache.size_bytes == 0
+
+    @pytest.mark.unit
+    def test_discard(self):
+        """無効化でエントリとバイト数が減ることを確認"""
+        cache = ItemJsonCache()
+        cache.put(ItemRecord(1, "名前", "説明", 10), _encode)
+
+        cache.discard(1)
+        cache.discard(2)
+
+        assert len(cache) == 0
+        assert cache.size_bytes == 0
@@ -0,0 +1,141 @@
+"""
+全文検索のテスト
+"""
+
+import pytest
+
+from ...storage.memory import InMemoryItemStorage
+from ...storage.record import ItemRecord
+from ...storage.search import InvertedIndex, bigrams, grams, normalize
+
+
+def _lookup_from(records: list[ItemRecord]):
+    items = {record.id: record for record in records}
+    return items.get
+
+
+class TestTokenize:
+    """正規化・分割のテストクラス"""
+
+    @pytest.mark.unit
+    def test_normalize(self):
+        """全角英数字・半角カナ・大文字を同一視することを確認"""
+        assert normalize("ＡＢＣ ｶﾀｶﾅ Abc") == "abc カタカナ abc"
+
+    @pytest.mark.unit
+    def test_bigrams(self):
+        """文字bigramに分割することを確認"""
+        assert bigrams("東京都") == {"東京", "京都"}
+        assert bigrams("東") == set()
+        assert grams("東京") == {"東", "京", "東京"}
+
+
+class TestInvertedIndex:
+    """転置インデックスのテストクラス"""
+
+    @pytest.mark.unit
+    def test_substring_match_only(self):
+        """bigramがすべて含まれても、連続していなければ一致しないことを確認"""
+        records = [
+            ItemRecord(1, "京都タワー", "説明", 0),
+            ItemRecord(2, "東京の京都展", "説明", 0),
+            ItemRecord(3, "東京都庁", "説明", 0),
+        ]
+        index = InvertedIndex(records)
+
+        found, total = index.search("東京都", 10, _lookup_from(records))
+
+        assert [record.id for record in found] == [3]
+        assert total == 1
+
+    @pytest.mark.unit
+    def test_ranking(self):
+        """名前の一致を優先し、出現回数の多い順・同点はID順に並ぶことを確認"""
+        records = [
+            ItemRecord(1, "説明だけ", "りんご", 0),
+            ItemRecord(2, "りんご", "説明", 0),
+            ItemRecord(3, "りんご", "りんごジュース", 0),
+            ItemRecord(4, "りんご", "説明", 0),
+        ]
+        index = InvertedIndex(records)
+
+        found, total = index.search("りんご", 3, _lookup_from(records))
+
+        assert [record.id for record in found] == [3, 2, 4]
+        assert total == 4
+
+    @pytest.mark.unit
+    def test_single_character(self):
+        """1文字のクエリも索引の候補から照合することを確認"""
+        records = [
+            ItemRecord(1, "東京", "説明", 0),
+            ItemRecord(2, "京都", "東", 0),
+            ItemRecord(3, "大阪", "説明", 0),
+        ]
+        index = InvertedIndex(records)
+
+        found, total = index.search("東", 10, _lookup_from(records))
+
+        assert [record.id for record in found] == [1, 2]
+        assert total == 2
+        assert index.search("北", 10, _lookup_from(records)) == ([], 0)
+
+    @pytest.mark.unit
+    def test_rebuild_threshold(self):
+        """不要なエントリが半数を超えると作り直しが必要になることを確認"""
+        record = ItemRecord(1, "あいう", "えお", 0)
+        index = InvertedIndex([record])
+
+        assert not index.needs_rebuild()
+        index.discard(record)
+        assert index.needs_rebuild()
+
+
+class TestMemoryStorageSearch:
+    """インメモリストレージの検索のテストクラス"""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_index_follows_writes(self):
+        """インデックス作成後の作成・更新・削除が検索結果に反映されることを確認"""
+        storage = InMemoryItemStorage()
+        await storage.create_items([("赤いりんご", "説明"), ("青いりんご", "説明")])
+        assert (await storage.search("りんご", 10))[1] == 2
+
+        await storage.create_item("りんごパイ", "説明")
+        await storage.update_item(1, "赤いみかん", None)
+        await storage.delete_item(2)
+
+        found, total = await storage.search("りんご", 10)
+        assert [record.id for record in found] == [3]
+        assert total == 1
+        found, _ = await storage.search("みかん", 10)
+        assert [record.id for record in found] == [1]
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_writes_during_build(self):
+        """インデックスの作成中に行われた書き込みが作成後に反映されることを確認"""
+        storage = InMemoryItemStorage()
+        await storage.create_items([("赤いりんご", "説明"), ("青いりんご", "説明")])
+        await storage._start_index_build()
+
+        await storage.create_item("りんごパイ", "説明")
+        await storage.delete_item(1)
+
+        found, total = await storage.search("りんご", 10)
+        assert [record.id for record in found] == [2, 3]
+        assert total == 2
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_clear_resets_index(self):
+        """クリア後に古いアイテムが検索されないことを確認"""
+        storage = InMemoryItemStorage()
+        await storage.create_item("りんご", "説明")
+        await storage.search("りんご", 10)
+
+        await storage.clear()
+        await storage.create_item("みかん", "説明")
+
+        assert await storage.search("りんご", 10) == ([], 0)
@@ -0,0 +1,171 @@
+"""
+スナップショットの読み込みのテスト
+"""
+
+from pathlib import Path
+
+import pytest
+
+from ...storage.durable import DurableItemStorage
+from ...storage.memory import InMemoryItemStorage
+from ...storage.provider import create_storage
+from ...storage.record import ItemRecord
+from ...storage.snapshot import MappedSnapshot, write_snapshot
+
+
+@pytest.fixture
+def snapshot_path(tmp_path: Path) -> str:
+    """ID 2, 4, 6, 8, 10のアイテムを含むスナップショットを作成するフィクスチャ"""
+    path = str(tmp_path / "seed.bin")
+    records = [
+        ItemRecord(i, f"名前{i}", f"説明{i}", 1_000 + i) for i in range(2, 11, 2)
+    ]
+    write_snapshot(path, records, wal_segment=1)
+    return path
+
+
+@pytest.fixture
+def loaded(snapshot_path: str) -> InMemoryItemStorage:
+    """スナップショットを読み込んだインメモリストレージのフィクスチャ"""
+    storage = InMemoryItemStorage()
+    storage.load_snapshot(MappedSnapshot(snapshot_path))
+    return storage
+
+
+class TestMappedSnapshot:
+    """mmapしたスナップショットのテストクラス"""
+
+    @pytest.mark.unit
+    def test_find_and_decode(self, snapshot_path: str):
+        """IDから索引上の位置を引いてレコードを復元できることを確認"""
+        snapshot = MappedSnapshot(snapshot_path)
+        try:
+            assert len(snapshot) == 5
+            assert list(snapshot.ids) == [2, 4, 6, 8, 10]
+            assert snapshot.find(3) is None
+            assert snapshot.find(11) is None
+
+            position = snapshot.find(6)
+            assert position == 2
+            assert snapshot.record_at(position) == ItemRecord(6, "名前6", "説明6", 1006)
+        finally:
+            snapshot.close()
+
+    @pytest.mark.unit
+    def test_invalid_file(self, tmp_path: Path):
+        """スナップショット以外のファイルでエラーになることを確認"""
+        path = tmp_path / "invalid.bin"
+        path.write_bytes(b"x" * 64)
+
+        with pytest.raises(ValueError):
+            MappedSnapshot(str(path))
+
+
+class TestLazySnapshotLoading:
+    """スナップショットを読み込んだインメモリストレージのテストクラス"""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_records_decoded_on_access(self, loaded: InMemoryItemStorage):
+        """読み込み時には復元せず、初回アクセス時に復元することを確認"""
+        assert await loaded.count() == 5
+        assert not loaded._items
+
+        record = await loaded.get_item(4)
+
+        assert record == ItemRecord(4, "名前4", "説明4", 1004)
+        assert list(loaded._items) == [4]
+        assert await loaded.count() == 5
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_pagination_across_snapshot_and_new_items(
+        self, loaded: InMemoryItemStorage
+    ):
+        """スナップショットと追加したアイテムをID順にページングできることを確認"""
+        created = await loaded.create_item("追加", "説明")
+
+        assert created.id == 11
+        first = await loaded.list_items(limit=3)
+        rest = await loaded.list_items(after_id=first[-1].id)
+        assert [r.id for r in first] == [2, 4, 6]
+        assert [r.id for r in rest] == [8, 10, 11]
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_update_and_delete_snapshot_items(self, loaded: InMemoryItemStorage):
+        """スナップショットのアイテムを更新・削除できることを確認"""
+        updated = await loaded.update_item(2, "更新", None)
+        assert updated is not None and updated.description == "説明2"
+
+        assert await loaded.delete_item(8) is True
+        assert await loaded.delete_item(8) is False
+        assert await loaded.get_item(8) is None
+        assert await loaded.count() == 4
+        assert [r.id for r in await loaded.list_items()] == [2, 4, 6, 10]
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_stream_includes_snapshot(self, loaded: InMemoryItemStorage):
+        """ストリーミングでもスナップショットのアイテムを変更前の状態で返すことを確認"""
+        iterator = loaded.iter_items(batch_size=1)
+        first = await anext(iterator)
+
+        await loaded.update_item(4, "変更後", None)
+        await loaded.create_item("追加", "説明")
+        rest = [record async for record in iterator]
+
+        assert first.id == 2
+        assert [r.id for r in rest] == [4, 6, 8, 10]
+        assert rest[0].name == "名前4"
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_clear_drops_snapshot(self, loaded: InMemoryItemStorage):
+        """クリアでスナップショットも破棄されることを確認"""
+        await loaded.clear()
+
+        assert await loaded.count() == 0
+        assert await loaded.get_item(2) is None
+        assert (await loaded.create_item("名前", "説明")).id == 1
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_load_into_non_empty_storage(self, snapshot_path: str):
+        """データがあるストレージには読み込めないことを確認"""
+        storage = InMemoryItemStorage()
+        await storage.create_item("名前", "説明")
+
+        with pytest.raises(RuntimeError):
+            storage.load_snapshot(MappedSnapshot(snapshot_path))
+
+
+class TestSnapshotStartup:
+    """起動時のスナップショット読み込みのテストクラス"""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_snapshot_path_from_env(self, monkeypatch, snapshot_path: str):
+        """APP_SNAPSHOT_PATHのスナップショットが読み込まれることを確認"""
+        monkeypatch.delenv("APP_STORAGE_BACKEND", raising=False)
+        monkeypatch.delenv("APP_WAL_DIR", raising=False)
+        monkeypatch.setenv("APP_SNAPSHOT_PATH", snapshot_path)
+
+        storage = create_storage()
+
+        assert await storage.count() == 5
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_seed_snapshot_with_wal(self, tmp_path: Path, snapshot_path: str):
+        """WAL付きの場合、初回はシードのスナップショットにWALを重ねて復旧することを確認"""
+        directory = str(tmp_path / "wal")
+        storage = DurableItemStorage(directory, fsync="os", seed_snapshot=snapshot_path)
+        await storage.create_item("追加", "説明")
+        await storage.close()
+
+        reopened = DurableItemStorage(directory, seed_snapshot=snapshot_path)
+        try:
+            assert [r.id for r in await reopened.list_items()] == [2, 4, 6, 8, 10, 11]
+        finally:
+            await reopened.close()
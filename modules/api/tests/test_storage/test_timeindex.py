@@ -0,0 +1,90 @@
+"""
+作成日時・更新日時の索引のテスト
+"""
+
+import random
+
+import pytest
+
+from ...storage.memory import InMemoryItemStorage
+from ...storage.timeindex import SortedKeyIndex, key_bounds
+
+
+class TestSortedKeyIndex:
+    """(時刻, ID)の索引のテストクラス"""
+
+    @pytest.fixture
+    def entries(self) -> list[tuple[int, int]]:
+        """チャンクの分割が起きる件数の(時刻, ID)の一覧を返すフィクスチャ"""
+        rng = random.Random(0)
+        return [(rng.randrange(1000), item_id) for item_id in range(1, 5001)]
+
+    @pytest.mark.unit
+    def test_add_and_discard_keep_order(self, entries: list[tuple[int, int]]):
+        """追加・削除を繰り返しても(時刻, ID)の昇順を保つことを確認"""
+        index = SortedKeyIndex()
+        for value, item_id in entries:
+            index.add(value, item_id)
+        for value, item_id in entries[::3]:
+            index.discard(value, item_id)
+        index.discard(2000, 1)
+
+        expected = sorted(set(entries) - set(entries[::3]))
+        assert len(index) == len(expected)
+        assert list(index.ids(None, None)) == [item_id for _, item_id in expected]
+
+    @pytest.mark.unit
+    def test_range_and_cursor(self, entries: list[tuple[int, int]]):
+        """範囲とカーソルで昇順・降順に取り出せることを確認"""
+        index = SortedKeyIndex(value << 64 | item_id for value, item_id in entries)
+        ordered = sorted(entries)
+        in_range = [e for e in ordered if 100 <= e[0] < 200]
+
+        low, high = key_bounds((100, 200), None, False)
+        assert list(index.ids(low, high)) == [item_id for _, item_id in in_range]
+
+        low, high = key_bounds((100, 200), in_range[9], True)
+        assert list(index.ids(low, high, descending=True)) == [
+            item_id for _, item_id in reversed(in_range[:9])
+        ]
+
+    @pytest.mark.unit
+    def test_empty_range(self):
+        """空の索引・範囲外の指定で何も返さないことを確認"""
+        assert list(SortedKeyIndex().ids(None, None)) == []
+
+        index = SortedKeyIndex([5 << 64 | 1])
+        assert list(index.ids(*key_bounds((6, None), None, False))) == []
+        assert list(index.ids(*key_bounds((None, 5), None, False))) == []
+
+
+class TestMemoryStorageTimeIndex:
+    """インメモリストレージの日時の索引のテストクラス"""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_index_follows_writes(self):
+        """索引の作成後の作成・更新・削除が取得結果に反映されることを確認"""
+        storage = InMemoryItemStorage()
+        await storage.create_items([("名前1", "説明"), ("名前2", "説明")])
+        assert len(await storage.list_items_by_time("updated_at")) == 2
+
+        await storage.create_item("名前3", "説明")
+        await storage.update_item(1, "更新", None)
+        await storage.delete_item(2)
+
+        records = await storage.list_items_by_time("updated_at")
+        assert [r.id for r in records] == [3, 1]
+        assert len(storage._created_index) == len(storage._modified_index) == 2
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_clear_resets_index(self):
+        """クリア後に古いアイテムが返らないことを確認"""
+        storage = InMemoryItemStorage()
+        await storage.create_item("名前", "説明")
+        await storage.list_items_by_time("created_at")
+
+        await storage.clear()
+
+        assert await storage.list_items_by_time("created_at") == []